@@ -0,0 +1,92 @@
+"""Benchmark for response compression.
+
+Runs routes in-process without ``Accept-Encoding`` and with gzip, and
+reports the p50 latency and body size of each, then compares serving the
+static ``/`` payload's cached gzip body with compressing it per request.
+
+Usage:
+    python -m benchmarks.bench_compression
+"""
+
+import time
+
+from benchmarks import bench_routes
+
+REQUESTS = 500
+ROUTES = [
+    ("GET /metrics", "GET", "/metrics", None),
+    ("GET /", "GET", "/", None),
+    ("GET /api/info", "GET", "/api/info", None),
+    ("POST /api/echo 64KB", "POST", "/api/echo", bench_routes.echo_body(64 * 1024)),
+]
+ENCODINGS = {"identity": None, "gzip": "gzip"}
+
+
+def run_route(app, method, path, body, encoding):
+    """Return ``(p50_ms, body_bytes)`` for one route and encoding."""
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+    client = app.test_client()
+    latencies = []
+    size = 0
+    for _ in range(REQUESTS):
+        began = time.perf_counter()
+        response = client.open(path, method=method, data=body, headers=headers)
+        size = len(response.get_data())
+        latencies.append(time.perf_counter() - began)
+    return bench_routes.percentiles(latencies)["p50_ms"], size
+
+
+def static_gzip_us(app):
+    """Time gzipping the static / payload from its cache and in full."""
+    payload = app.extensions["static_payloads"]["index"]
+    compressor = app.extensions["compression"]
+    timings = {}
+    for name, encode in (
+        ("cached_us", lambda: payload.encoded("gzip", compressor)),
+        ("full_us", lambda: compressor.compress(payload.render(), "gzip")),
+    ):
+        began = time.perf_counter()
+        for _ in range(REQUESTS * 10):
+            encode()
+        timings[name] = (time.perf_counter() - began) / (REQUESTS * 10) * 1e6
+    return timings
+
+
+def run():
+    """Run the benchmark.
+
+    Returns:
+        Dict mapping route to encoding to ``{"p50_ms", "bytes"}``, plus
+        ``static_gzip`` with the time to gzip the / payload from its cache
+        and in full.
+    """
+    app = bench_routes.build_app("compression", {"config": {"COMPRESSION_MIN_SIZE": 0}})
+    app.test_client().get("/api/hello")
+    results = {}
+    for route, method, path, body in ROUTES:
+        results[route] = {}
+        for name, encoding in ENCODINGS.items():
+            p50, size = run_route(app, method, path, body, encoding)
+            results[route][name] = {"p50_ms": p50, "bytes": size}
+    results["static_gzip"] = static_gzip_us(app)
+    return results
+
+
+def main():
+    """Print a results table."""
+    results = run()
+    static = results.pop("static_gzip")
+    print(f"{'route':<22} {'encoding':<10} {'p50 ms':>9} {'bytes':>9}")
+    for route, encodings in results.items():
+        for name, r in encodings.items():
+            print(f"{route:<22} {name:<10} {r['p50_ms']:>9.3f} {r['bytes']:>9}")
+    print(
+        f"\n/ payload gzip: {static['cached_us']:.2f} us cached, "
+        f"{static['full_us']:.1f} us in full"
+    )
+
+
+if __name__ == "__main__":
+    main()
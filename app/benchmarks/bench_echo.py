@@ -0,0 +1,84 @@
+"""Benchmark for the /api/echo modes.
+
+Posts 1 KB, 1 MB and 50 MB bodies through the parsing echo, the raw
+passthrough and the NDJSON stream and reports wall time and peak Python
+memory (tracemalloc) per request.
+
+Usage:
+    python -m benchmarks.bench_echo
+"""
+
+import json
+import logging
+import time
+import tracemalloc
+
+from benchmarks.common import quiet_app
+from src.app import create_app
+
+SIZES = {"1KB": 1024, "1MB": 1024 * 1024, "50MB": 50 * 1024 * 1024}
+
+
+def make_records(size):
+    """Return JSON records totalling roughly ``size`` bytes once serialized."""
+    record = {"id": 0, "name": "benchmark", "tags": ["a", "b", "c"], "value": 3.14159}
+    per_record = len(json.dumps(record)) + 1
+    return [dict(record, id=i) for i in range(max(1, size // per_record))]
+
+
+def make_bodies(size):
+    """Return the JSON document and NDJSON body for one payload size."""
+    records = make_records(size)
+    document = json.dumps({"records": records}).encode()
+    ndjson = b"\n".join(json.dumps(r).encode() for r in records) + b"\n"
+    return document, ndjson
+
+
+def measure(client, path, body, content_type):
+    """Return ``(seconds, peak_bytes)`` for one request, including the body read."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.post(path, data=body, content_type=content_type)
+    response.get_data()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.status_code == 200, response.status_code
+    return elapsed, peak
+
+
+def run():
+    """Run the benchmark and return results keyed by ``(size, mode)``.
+
+    Returns:
+        Dict mapping ``(size, mode)`` to ``{"ms", "peak_mb"}``.
+    """
+    app = quiet_app(create_app, "prod")
+    logging.getLogger().handlers.clear()
+    # Let the largest document through the non-streaming modes
+    app.config["MAX_CONTENT_LENGTH"] = 2 * max(SIZES.values())
+    client = app.test_client()
+
+    results = {}
+    for size_name, size in SIZES.items():
+        document, ndjson = make_bodies(size)
+        cases = {
+            "parse": ("/api/echo", document, "application/json"),
+            "raw": ("/api/echo?raw=1", document, "application/json"),
+            "stream": ("/api/echo/stream", ndjson, "application/x-ndjson"),
+        }
+        for mode, (path, body, content_type) in cases.items():
+            elapsed, peak = measure(client, path, body, content_type)
+            results[(size_name, mode)] = {"ms": elapsed * 1000, "peak_mb": peak / 1024 / 1024}
+    return results
+
+
+def main():
+    """Print a results table."""
+    print(f"{'size':<6} {'mode':<8} {'ms':>10} {'peak MB':>10}")
+    for (size, mode), r in run().items():
+        print(f"{size:<6} {mode:<8} {r['ms']:>10.2f} {r['peak_mb']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Micro-benchmark for JSONFormatter.
+
+Compares the optimized formatter with the original implementation for
+records logged inside and outside a request.
+
+Usage:
+    python -m benchmarks.bench_formatter
+"""
+
+import contextlib
+import json
+import logging
+import timeit
+from datetime import datetime, timezone
+
+from flask import g, request
+
+from benchmarks.common import quiet_app
+from src.app import create_app
+from src.middleware.logging import JSONFormatter
+
+NUMBER = 20000
+
+
+class LegacyJSONFormatter(logging.Formatter):
+    """JSONFormatter as originally written, kept as the comparison baseline."""
+
+    def format(self, record):
+        """Format log record as JSON."""
+        log_data = {
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        try:
+            if hasattr(g, "request_id"):
+                log_data["request_id"] = g.request_id
+            if request:
+                log_data["request"] = {
+                    "method": request.method,
+                    "path": request.path,
+                    "remote_addr": request.remote_addr,
+                }
+        except RuntimeError:
+            pass
+        if record.exc_info:
+            log_data["exception"] = self.formatException(record.exc_info)
+        if hasattr(record, "extra_fields"):
+            log_data.update(record.extra_fields)
+        return json.dumps(log_data)
+
+
+def make_access_record():
+    """Build a record shaped like the per-request access log line."""
+    record = logging.LogRecord(
+        "src.app", logging.INFO, __file__, 1, "GET /api/hello 200", None, None
+    )
+    record.extra_fields = {
+        "request_id": "6f1c2b9e-3f0a-4b8e-9d67-5a2f9c1d0e11",
+        "method": "GET",
+        "path": "/api/hello",
+        "status_code": 200,
+        "user_agent": "ELB-HealthChecker/2.0",
+        "content_length": 187,
+    }
+    return record
+
+
+@contextlib.contextmanager
+def request_context(app):
+    """Push a request context that has run the app's before_request hooks."""
+    with app.test_request_context("/api/hello", headers={"User-Agent": "bench"}):
+        app.preprocess_request()
+        yield
+
+
+# Context each case formats its records in
+CASES = {
+    "no_request": lambda app: contextlib.nullcontext(),
+    "in_request": request_context,
+}
+
+
+def time_formatter(formatter, record, number=NUMBER):
+    """Return the best-of-five time per ``format`` call in microseconds."""
+    timings = timeit.repeat(lambda: formatter.format(record), number=number, repeat=5)
+    return min(timings) / number * 1e6
+
+
+def run():
+    """Run the benchmark and return results keyed by case name.
+
+    Returns:
+        Dict mapping case name to ``{"legacy_us", "fast_us", "speedup"}``.
+    """
+    app = quiet_app(create_app, "prod")
+    logging.getLogger().handlers.clear()
+    record = make_access_record()
+    formatters = {
+        "legacy": LegacyJSONFormatter(),
+        "fast": JSONFormatter(),
+        "fast_orjson": JSONFormatter(backend="orjson"),
+    }
+
+    results = {}
+    for case, context in CASES.items():
+        with context(app):
+            timings = {name: time_formatter(f, record) for name, f in formatters.items()}
+        results[case] = dict(timings, speedup=timings["legacy"] / timings["fast"])
+    return results
+
+
+def main():
+    """Print a results table."""
+    print(f"{'case':<12} {'legacy us':>10} {'fast us':>10} {'orjson us':>10} {'speedup':>8}")
+    for case, r in run().items():
+        print(
+            f"{case:<12} {r['legacy']:>10.2f} {r['fast']:>10.2f} "
+            f"{r['fast_orjson']:>10.2f} {r['speedup']:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark for the JSON response provider.
+
+Runs the JSON routes in-process with the standard library backend and with
+the fast backend ``JSON_BACKEND=auto`` picks, and reports the p50 latency
+of each, then times serializing the /api/hello body alone.
+
+Usage:
+    python -m benchmarks.bench_json
+"""
+
+import time
+from datetime import datetime, timezone
+
+from benchmarks import bench_routes
+
+REQUESTS = 2000
+ROUTES = [
+    ("GET /api/hello", "GET", "/api/hello", None),
+    ("GET /health/ready", "GET", "/health/ready", None),
+    ("GET /health/live", "GET", "/health/live", None),
+    ("POST /api/echo 1KB", "POST", "/api/echo", bench_routes.echo_body(1024)),
+    ("POST /api/echo 64KB", "POST", "/api/echo", bench_routes.echo_body(64 * 1024)),
+]
+BACKENDS = ("json", "auto")
+
+
+def hello_body():
+    """Return a body shaped like the /api/hello response."""
+    return {
+        "message": "Hello, World!",
+        "timestamp": datetime.now(timezone.utc),
+        "service": "demo-app",
+        "version": "1.0.0",
+        "environment": "prod",
+        "hostname": "ip-10-0-0-1",
+    }
+
+
+def serialize_us(provider):
+    """Time serializing the /api/hello body with ``provider``."""
+    body = hello_body()
+    began = time.perf_counter()
+    for _ in range(REQUESTS * 10):
+        provider.dumps_bytes(body)
+    return (time.perf_counter() - began) / (REQUESTS * 10) * 1e6
+
+
+def run():
+    """Run the benchmark.
+
+    Returns:
+        Dict mapping route to backend to p50 in ms, plus ``serialize_us``
+        mapping backend to the time to serialize the /api/hello body. The
+        ``auto`` entries are labelled with the backend actually used.
+    """
+    results = {route: {} for route, *_ in ROUTES}
+    results["serialize_us"] = {}
+    for backend in BACKENDS:
+        variant = f"json_{backend}"
+        app = bench_routes.build_app(variant, {"config": {"JSON_BACKEND": backend}})
+        name = app.json.backend
+        for route, method, path, body in ROUTES:
+            requests = REQUESTS if body is None or len(body) < 4096 else REQUESTS // 10
+            stats = bench_routes.run_in_process(app, method, path, body, requests)
+            results[route][name] = stats["p50_ms"]
+        results["serialize_us"][name] = serialize_us(app.json)
+    return results
+
+
+def main():
+    """Print a results table."""
+    results = run()
+    serialize = results.pop("serialize_us")
+    backends = list(serialize)
+    print(f"{'route':<22}" + "".join(f"{name + ' p50 ms':>16}" for name in backends))
+    for route, timings in results.items():
+        print(f"{route:<22}" + "".join(f"{timings[name]:>16.3f}" for name in backends))
+    print(
+        "\n/api/hello body: " + ", ".join(f"{name} {us:.2f} us" for name, us in serialize.items())
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark for the cost of per-phase timing.
+
+Runs a few routes in-process with phase timing disabled (the default, where
+no hook is wrapped), enabled, and enabled with a Server-Timing header on
+every response, and reports the per-request overhead against the disabled
+app.
+
+Usage:
+    python -m benchmarks.bench_phase_timing
+"""
+
+from benchmarks import bench_routes
+
+REQUESTS = 5000
+ROUTES = [
+    ("GET /health/live", "GET", "/health/live", None),
+    ("GET /api/hello", "GET", "/api/hello", None),
+    ("POST /api/echo 1KB", "POST", "/api/echo", bench_routes.echo_body(1024)),
+]
+VARIANTS = {
+    "disabled": {},
+    "enabled": {"PHASE_TIMING_ENABLED": True},
+    "header": {"PHASE_TIMING_ENABLED": True, "SERVER_TIMING_ENABLED": True},
+}
+
+
+def run():
+    """Run the benchmark.
+
+    Returns:
+        Dict mapping route to variant to ``{"p50_us", "overhead_us"}``.
+    """
+    apps = {}
+    for variant, config in VARIANTS.items():
+        name = f"phase_timing_{variant}"
+        apps[variant] = bench_routes.build_app(name, {"config": config})
+
+    results = {}
+    for route, method, path, body in ROUTES:
+        p50 = {
+            variant: bench_routes.run_in_process(app, method, path, body, REQUESTS)["p50_ms"] * 1000
+            for variant, app in apps.items()
+        }
+        results[route] = {
+            variant: {"p50_us": us, "overhead_us": us - p50["disabled"]}
+            for variant, us in p50.items()
+        }
+    return results
+
+
+def main():
+    """Print a results table."""
+    print(f"{'route':<22} {'variant':<10} {'p50 us':>10} {'overhead us':>12}")
+    for route, variants in run().items():
+        for variant, r in variants.items():
+            print(f"{route:<22} {variant:<10} {r['p50_us']:>10.1f} {r['overhead_us']:>+12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Per-route throughput and latency benchmark.
+
+Drives the app built by ``create_app`` in two ways:
+
+* in-process, by calling the WSGI interface directly, once per middleware
+  variant (everything, without request logging, metrics, CORS or tracing,
+  and with phase timing and Server-Timing headers);
+* through a locally started gunicorn (sync workers, full middleware).
+
+Reports requests per second and p50/p99/p999 latency for every route.
+
+Usage:
+    python -m benchmarks.bench_routes
+"""
+
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.test import EnvironBuilder
+
+from benchmarks.common import fetch, gunicorn, percentiles, quiet_app
+from src.app import create_app
+from src.config import ProductionConfig, config_by_name
+
+ORIGIN = "https://bench.example.com"
+
+# Hooks removed from the full app, or config overridden, per variant
+VARIANTS = {
+    "full": {},
+    "no_logging": {"hooks": ("add_request_id", "log_request")},
+    "no_metrics": {"config": {"ENABLE_METRICS": False}},
+    "no_cors": {"hooks": ("cors_after_request",)},
+    "no_tracing": {"config": {"TRACING_ENABLED": False}},
+    # Checked against the shared table, but never over the limit
+    "rate_limit": {
+        "config": {"RATE_LIMIT_ENABLED": True, "RATE_LIMIT_RATE": 1e9, "RATE_LIMIT_BURST": 1e9}
+    },
+    "phase_timing": {"config": {"PHASE_TIMING_ENABLED": True, "SERVER_TIMING_ENABLED": True}},
+    # Only /api/hello is cached; every request after the first is a hit
+    "route_cache": {"config": {"ROUTE_CACHE_ENABLED": True}},
+}
+
+GUNICORN_WORKERS = 2
+GUNICORN_CONCURRENCY = 8
+
+
+def echo_body(size):
+    """Return a JSON document of roughly ``size`` bytes."""
+    item = {"id": 0, "name": "benchmark", "value": 3.14159}
+    count = max(1, size // (len(json.dumps(item)) + 2))
+    return json.dumps({"items": [dict(item, id=i) for i in range(count)]}).encode()
+
+
+# (name, method, path, body, requests)
+ROUTES = [
+    ("GET /", "GET", "/", None, 2000),
+    ("GET /health", "GET", "/health", None, 2000),
+    ("GET /health/ready", "GET", "/health/ready", None, 2000),
+    ("GET /health/live", "GET", "/health/live", None, 2000),
+    ("GET /api/hello", "GET", "/api/hello", None, 2000),
+    ("GET /api/info", "GET", "/api/info", None, 2000),
+    ("POST /api/echo 1KB", "POST", "/api/echo", echo_body(1024), 2000),
+    ("POST /api/echo 64KB", "POST", "/api/echo", echo_body(64 * 1024), 200),
+    ("POST /api/echo 1MB", "POST", "/api/echo", echo_body(1024 * 1024), 20),
+]
+
+
+def build_app(variant, spec=None):
+    """Create the app for a middleware variant.
+
+    Args:
+        variant: Name of the variant, a key of ``VARIANTS`` unless ``spec``
+            is given.
+        spec: Variant spec like the values of ``VARIANTS``.
+
+    Returns:
+        Flask application instance.
+    """
+    spec = VARIANTS[variant] if spec is None else spec
+    name = f"bench_{variant}"
+    config_by_name[name] = type(name, (ProductionConfig,), dict(spec.get("config", {})))
+    # Production CORS is only active for configured origins
+    origins = os.environ.get("CORS_ORIGINS")
+    os.environ["CORS_ORIGINS"] = origins or ORIGIN
+    try:
+        app = quiet_app(create_app, name)
+    finally:
+        del config_by_name[name]
+        if origins is None:
+            del os.environ["CORS_ORIGINS"]
+        else:
+            os.environ["CORS_ORIGINS"] = origins
+    hooks = set(spec.get("hooks", ()))
+    for registry in (app.before_request_funcs, app.after_request_funcs):
+        registry[None] = [f for f in registry.get(None, []) if f.__name__ not in hooks]
+    # Keep the log output itself out of the measurement
+    logging.getLogger().handlers.clear()
+    return app
+
+
+def run_in_process(app, method, path, body, requests):
+    """Call the WSGI app ``requests`` times and return its stats."""
+    headers = {"Origin": ORIGIN}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+    builder = EnvironBuilder(path=path, method=method, headers=headers, data=body)
+    template = builder.get_environ()
+    builder.close()
+
+    def start_response(status, response_headers, exc_info=None):
+        return None
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        environ = dict(template, **{"wsgi.input": io.BytesIO(body or b"")})
+        began = time.perf_counter()
+        response = app(environ, start_response)
+        for _ in response:
+            pass
+        if hasattr(response, "close"):
+            response.close()
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+    return dict(percentiles(latencies), rps=requests / elapsed)
+
+
+def run_gunicorn(port, method, path, body, requests):
+    """Send ``requests`` requests through gunicorn and return their stats."""
+    headers = {"Origin": ORIGIN}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+    start = time.perf_counter()
+    with ThreadPoolExecutor(GUNICORN_CONCURRENCY) as pool:
+        latencies = list(
+            pool.map(lambda _: fetch(port, path, method, body, headers), range(requests))
+        )
+    elapsed = time.perf_counter() - start
+    return dict(percentiles(latencies), rps=requests / elapsed)
+
+
+def run(variants=None, with_gunicorn=True):
+    """Run the benchmark.
+
+    Args:
+        variants: Middleware variants to run in-process, all if None.
+        with_gunicorn: Whether to also measure through gunicorn.
+
+    Returns:
+        Dict with ``in_process`` (variant -> route -> stats) and, when
+        measured, ``gunicorn`` (``full`` -> route -> stats).
+    """
+    results = {"in_process": {}}
+    for variant in variants or VARIANTS:
+        app = build_app(variant)
+        results["in_process"][variant] = {
+            name: run_in_process(app, method, path, body, requests)
+            for name, method, path, body, requests in ROUTES
+        }
+
+    if with_gunicorn:
+        with gunicorn(
+            "src.app:create_app()", WORKERS=str(GUNICORN_WORKERS), CORS_ORIGINS=ORIGIN
+        ) as port:
+            results["gunicorn"] = {
+                "full": {
+                    name: run_gunicorn(port, method, path, body, requests)
+                    for name, method, path, body, requests in ROUTES
+                }
+            }
+    return results
+
+
+def print_table(results):
+    """Print one table per driver and variant."""
+    for driver, variants in results.items():
+        for variant, routes in variants.items():
+            print(f"\n{driver} / {variant}")
+            print(f"{'route':<22} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'p999 ms':>9}")
+            for name, r in routes.items():
+                print(
+                    f"{name:<22} {r['rps']:>10.1f} {r['p50_ms']:>9.3f} "
+                    f"{r['p99_ms']:>9.3f} {r['p999_ms']:>9.3f}"
+                )
+
+
+def main():
+    """Print results tables."""
+    print_table(run())
+
+
+if __name__ == "__main__":
+    main()
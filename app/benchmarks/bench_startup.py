@@ -0,0 +1,211 @@
+"""Benchmark for startup: import time and cold start to first response.
+
+Reports:
+
+* the slowest imports of ``src.app`` (``python -X importtime``);
+* import, ``create_app`` and first-request times in a fresh interpreter;
+* time from launching gunicorn to the first response and to every worker
+  being initialized, with and without ``PRELOAD_APP``.
+
+Usage:
+    python -m benchmarks.bench_startup
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import fetch, free_port
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+WORKERS = 4
+TOP_IMPORTS = 12
+
+COLD_START = """
+import time
+started = time.perf_counter()
+from src.app import create_app
+imported = time.perf_counter()
+app = create_app("prod")
+created = time.perf_counter()
+app.test_client().get("/api/hello")
+print(imported - started, created - imported, time.perf_counter() - created)
+"""
+
+
+def _env(**extra):
+    """Return the environment for benchmark subprocesses."""
+    env = dict(os.environ, ENVIRONMENT="prod", LOG_LEVEL="WARNING")
+    env.update(extra)
+    return env
+
+
+def _importtime(statement):
+    """Return ``(module, depth, cumulative_ms)`` for every import of ``statement``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        env=_env(),
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Two spaces of indentation per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(cumulative) / 1000))
+    return modules
+
+
+def import_report():
+    """Return the slowest direct imports of ``src.app``.
+
+    Modules the interpreter imports at startup anyway are left out.
+
+    Returns:
+        Tuple of ``(total_ms, [(module, cumulative_ms), ...])``.
+    """
+    startup = {module for module, _, _ in _importtime("pass")}
+    modules = _importtime("import src.app")
+    total = next(ms for module, _, ms in modules if module == "src.app")
+    slowest = sorted(
+        (
+            (module, ms)
+            for module, depth, ms in modules
+            if depth <= 1 and module not in startup and module != "src.app"
+        ),
+        key=lambda m: -m[1],
+    )
+    return total, slowest[:TOP_IMPORTS]
+
+
+def cold_start():
+    """Return median import, create and first-request times in ms."""
+    runs = []
+    for _ in range(RUNS):
+        result = subprocess.run(
+            [sys.executable, "-c", COLD_START],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+            env=_env(),
+            check=True,
+        )
+        runs.append([float(v) * 1000 for v in result.stdout.split()[-3:]])
+    return {
+        name: statistics.median(run[i] for run in runs)
+        for i, name in enumerate(("import_ms", "create_ms", "first_request_ms"))
+    }
+
+
+def gunicorn_start(preload):
+    """Return ms from launch to the first response and to all workers initialized."""
+    port = free_port()
+    with tempfile.TemporaryFile("w+") as output:
+        launched = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "src/gunicorn_conf.py"]
+            + ["--bind", f"127.0.0.1:{port}", "src.app:create_app()"],
+            cwd=APP_DIR,
+            env=_env(WORKERS=str(WORKERS), PRELOAD_APP=str(preload).lower(), LOG_LEVEL="INFO"),
+            stdout=output,
+            stderr=subprocess.STDOUT,
+        )
+        try:
+            first = _wait(lambda: _responds(port))
+            initialized = _wait(lambda: _initialized_workers(output) >= WORKERS)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return {
+        "first_response_ms": (first - launched) * 1000,
+        "all_workers_ms": (initialized - launched) * 1000,
+    }
+
+
+def _responds(port):
+    """Return whether the server answers on ``port``."""
+    try:
+        fetch(port, "/api/hello")
+        return True
+    except OSError:
+        return False
+
+
+def _initialized_workers(output):
+    """Count "Worker initialized" log lines written so far."""
+    output.seek(0)
+    count = 0
+    for line in output:
+        if line.startswith("{") and json.loads(line).get("message") == "Worker initialized":
+            count += 1
+    return count
+
+
+def _wait(condition, timeout=30.0):
+    """Poll ``condition`` until it holds and return the time it did."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return time.perf_counter()
+        time.sleep(0.005)
+    raise RuntimeError("gunicorn did not start")
+
+
+def run():
+    """Run the benchmark.
+
+    Returns:
+        Dict with ``imports``, ``cold_start`` and ``gunicorn`` sections.
+    """
+    total, slowest = import_report()
+    return {
+        "imports": {"total_ms": total, "slowest": slowest},
+        "cold_start": cold_start(),
+        "gunicorn": {
+            f"preload_{'on' if preload else 'off'}": _median_run(preload)
+            for preload in (False, True)
+        },
+    }
+
+
+def _median_run(preload, runs=3):
+    """Return the gunicorn run with the median time to all workers initialized."""
+    results = sorted(
+        (gunicorn_start(preload) for _ in range(runs)), key=lambda r: r["all_workers_ms"]
+    )
+    return results[len(results) // 2]
+
+
+def main():
+    """Print the report."""
+    results = run()
+    imports = results["imports"]
+    print(f"import src.app: {imports['total_ms']:.1f} ms; slowest imports:")
+    for module, ms in imports["slowest"]:
+        print(f"  {module:<40} {ms:>8.1f} ms")
+
+    cold = results["cold_start"]
+    print(
+        f"\ncold start (median of {RUNS}): import {cold['import_ms']:.1f} ms, "
+        f"create_app {cold['create_ms']:.1f} ms, first request {cold['first_request_ms']:.1f} ms"
+    )
+
+    print(f"\ngunicorn, {WORKERS} workers")
+    print(f"{'mode':<12} {'first response ms':>18} {'all workers ms':>15}")
+    for mode, r in results["gunicorn"].items():
+        print(f"{mode:<12} {r['first_response_ms']:>18.1f} {r['all_workers_ms']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
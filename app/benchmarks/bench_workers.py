@@ -0,0 +1,74 @@
+"""Benchmark for sync vs gevent gunicorn workers under I/O-heavy load.
+
+Starts gunicorn with ``src/gunicorn_conf.py`` for each worker class and
+drives an endpoint that waits on a simulated dependency call, reporting
+throughput and p50/p99 latency.
+
+Usage:
+    python -m benchmarks.bench_workers
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import fetch, gunicorn, percentiles
+
+IO_DELAY = 0.05
+WORKERS = 2
+CONCURRENCY = 64
+REQUESTS = 1000
+
+
+def create_io_app():
+    """Return the app with a ``/bench/io`` route that waits on I/O."""
+    from src.app import create_app
+
+    app = create_app()
+
+    @app.route("/bench/io")
+    def bench_io():
+        """Stand in for a downstream call taking ``IO_DELAY`` seconds."""
+        time.sleep(IO_DELAY)
+        return {"ok": True}
+
+    return app
+
+
+def load(port):
+    """Run ``REQUESTS`` requests at ``CONCURRENCY`` and return latency stats."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        latencies = list(pool.map(lambda _: fetch(port, "/bench/io"), range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    return dict(percentiles(latencies), rps=REQUESTS / elapsed)
+
+
+def run_worker_class(worker_class):
+    """Benchmark one worker class and return its stats."""
+    with gunicorn(
+        "benchmarks.bench_workers:create_io_app()",
+        WORKERS=str(WORKERS),
+        WORKER_CLASS=worker_class,
+    ) as port:
+        return load(port)
+
+
+def run():
+    """Run the benchmark for both worker classes.
+
+    Returns:
+        Dict mapping worker class to ``{"rps", "p50_ms", "p99_ms"}``.
+    """
+    return {worker_class: run_worker_class(worker_class) for worker_class in ("sync", "gevent")}
+
+
+def main():
+    """Print a results table."""
+    print(f"{WORKERS} workers, {CONCURRENCY} clients, {IO_DELAY * 1000:.0f} ms I/O per request")
+    print(f"{'worker':<8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for worker_class, r in run().items():
+        print(f"{worker_class:<8} {r['rps']:>10.1f} {r['p50_ms']:>10.1f} {r['p99_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Shared helpers for the benchmarks."""
+
+import contextlib
+import http.client
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from prometheus_client import REGISTRY
+
+
+def percentiles(latencies):
+    """Summarize request latencies.
+
+    Args:
+        latencies: Latencies in seconds.
+
+    Returns:
+        Dict with ``p50_ms``, ``p99_ms`` and ``p999_ms``.
+    """
+    ordered = sorted(latencies)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {"p50_ms": pick(0.5), "p99_ms": pick(0.99), "p999_ms": pick(0.999)}
+
+
+def quiet_app(factory, *args, **kwargs):
+    """Build an app with a fresh Prometheus registry and without startup output."""
+    for collector in list(REGISTRY._collector_to_names):
+        with contextlib.suppress(Exception):
+            REGISTRY.unregister(collector)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return factory(*args, **kwargs)
+
+
+def free_port():
+    """Return a free local TCP port."""
+    with contextlib.closing(socket.socket()) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def fetch(port, path, method="GET", body=None, headers=None):
+    """Issue one request and return its latency in seconds."""
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        connection.getresponse().read()
+    finally:
+        connection.close()
+    return time.perf_counter() - start
+
+
+def wait_ready(port, timeout=20.0):
+    """Wait until a server answers on ``port``."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            fetch(port, "/health/live")
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("gunicorn did not start")
+
+
+@contextlib.contextmanager
+def gunicorn(app_spec, **env):
+    """Run gunicorn with ``src/gunicorn_conf.py`` and yield its port.
+
+    Args:
+        app_spec: Gunicorn application spec, e.g. ``"src.app:create_app()"``.
+        **env: Extra environment variables for the server.
+    """
+    port = free_port()
+    server_env = dict(
+        os.environ,
+        PORT=str(port),
+        ENVIRONMENT="prod",
+        ACCESS_LOG_SAMPLE_RATE="0",
+        ACCESS_LOG_SLOW_MS="0",
+    )
+    server_env.update(env)
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "src/gunicorn_conf.py",
+            "--bind",
+            f"127.0.0.1:{port}",
+            app_spec,
+        ],
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port)
+        yield port
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
@@ -0,0 +1,154 @@
+"""Benchmark suite with a regression gate.
+
+Runs the route benchmark (in-process per middleware variant, and through
+gunicorn) and the JSONFormatter micro-benchmark, writes the results as JSON
+and compares them with a stored baseline. Exits with status 1 when a gated
+metric regressed by more than the threshold, and with status 2, before
+running anything, when there is no baseline to compare with.
+
+Usage:
+    python -m benchmarks.run                     # compare with the baseline
+    python -m benchmarks.run --update-baseline   # record a new baseline
+    python -m benchmarks.run --threshold 0.1 --gate rps,p50_ms,p99_ms
+
+Baselines are machine-specific; record one with ``--update-baseline`` on
+the machine that runs the gate.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from benchmarks import bench_formatter, bench_routes
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "results", "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+# Throughput must not drop; latencies and per-call times must not rise
+HIGHER_IS_BETTER = {"rps"}
+DEFAULT_GATE = "rps,p50_ms,fast_us"
+
+
+def run_suite(with_gunicorn=True):
+    """Run every benchmark.
+
+    Args:
+        with_gunicorn: Whether to include the gunicorn driver.
+
+    Returns:
+        Results dict with ``meta``, ``routes`` and ``formatter`` sections.
+    """
+    formatter = {
+        case: {"legacy_us": r["legacy"], "fast_us": r["fast"], "orjson_us": r["fast_orjson"]}
+        for case, r in bench_formatter.run().items()
+    }
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "routes": bench_routes.run(with_gunicorn=with_gunicorn),
+        "formatter": formatter,
+    }
+
+
+def flatten(results, prefix=()):
+    """Yield ``(path, metric, value)`` for every measurement in ``results``."""
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        if isinstance(value, dict):
+            yield from flatten(value, prefix + (key,))
+        else:
+            yield " / ".join(prefix), key, value
+
+
+def compare(baseline, current, threshold, gate):
+    """Find gated metrics that regressed beyond ``threshold``.
+
+    Args:
+        baseline: Results of a previous run.
+        current: Results of this run.
+        threshold: Allowed relative change, e.g. 0.25 for 25%.
+        gate: Metric names to check, e.g. ``{"rps", "p50_ms"}``.
+
+    Returns:
+        List of ``(path, metric, baseline, current, change)`` tuples, where
+        ``change`` is the relative regression.
+    """
+    before = {(path, metric): value for path, metric, value in flatten(baseline)}
+    regressions = []
+    for path, metric, value in flatten(current):
+        old = before.get((path, metric))
+        if metric not in gate or not old:
+            continue
+        if metric in HIGHER_IS_BETTER:
+            change = (old - value) / old
+        else:
+            change = (value - old) / old
+        if change > threshold:
+            regressions.append((path, metric, old, value, change))
+    return regressions
+
+
+def write_json(path, data):
+    """Write ``data`` to ``path``, creating the directory if needed."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    """Run the suite and apply the regression gate.
+
+    Returns:
+        Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument(
+        "--threshold", type=float, default=float(os.environ.get("BENCH_THRESHOLD", 0.25))
+    )
+    parser.add_argument("--gate", default=os.environ.get("BENCH_GATE", DEFAULT_GATE))
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--skip-gunicorn", action="store_true")
+    args = parser.parse_args(argv)
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        print(
+            f"No baseline at {args.baseline}; record one with --update-baseline",
+            file=sys.stderr,
+        )
+        return 2
+
+    current = run_suite(with_gunicorn=not args.skip_gunicorn)
+    bench_routes.print_table(current["routes"])
+    write_json(args.output, current)
+
+    if args.update_baseline:
+        write_json(args.baseline, current)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    gate = {metric.strip() for metric in args.gate.split(",") if metric.strip()}
+    regressions = compare(baseline, current, args.threshold, gate)
+    if not regressions:
+        print(f"\nNo regressions beyond {args.threshold:.0%} in {', '.join(sorted(gate))}")
+        return 0
+
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+    for path, metric, old, new, change in regressions:
+        print(f"  {path} {metric}: {old:.3f} -> {new:.3f} ({change:+.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
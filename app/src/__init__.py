@@ -1,8 +1,29 @@
 """Platform Engineering Demo Application."""
 
-try:
-    from importlib.metadata import version
+import functools
+import time
 
-    __version__ = version("demo-app")
-except Exception:
-    __version__ = "unknown"
+# When the application package started importing, for the startup report
+IMPORT_STARTED = time.perf_counter()
+
+
+@functools.lru_cache(maxsize=None)
+def package_version():
+    """Return the installed demo-app version, or "unknown".
+
+    Looked up on first use: importing importlib.metadata and scanning the
+    installed distributions is a noticeable share of startup time.
+    """
+    try:
+        from importlib.metadata import version
+
+        return version("demo-app")
+    except Exception:
+        return "unknown"
+
+
+def __getattr__(name):
+    """Resolve ``__version__`` lazily."""
+    if name == "__version__":
+        return package_version()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,17 +5,72 @@ Creates and configures the Flask application with all middleware and routes.
 
 import logging
 import os
+import time
 from flask import Flask
-from flask_cors import CORS
 
+from src import IMPORT_STARTED, package_version
 from src.config import get_config
+from src.middleware.compression import setup_compression
+from src.middleware.concurrency import setup_concurrency_limit
 from src.middleware.logging import setup_logging
 from src.middleware.metrics import setup_metrics
+from src.middleware.ratelimit import setup_rate_limit
+from src.middleware.timing import setup_phase_timing
+from src.middleware.tracing import setup_tracing
 from src.routes import health, api
+from src.utils.dependencies import setup_dependencies
+from src.utils.health_checks import setup_health_checks
+from src.utils.memory import setup_memory
+from src.utils.json_provider import setup_json_provider
+from src.utils.route_cache import setup_route_cache
+from src.utils.runtime_config import setup_runtime_config, watch_runtime_config
+from src.utils.static_payload import static_response
+from src.utils.warmup import setup_warmup, warm_up
 
 logger = logging.getLogger(__name__)
 
 
+def _index_payload(app):
+    """Build the root endpoint body from configuration."""
+    return {
+        "service": app.config.get("APP_NAME", "demo-app"),
+        "version": app.config.get("APP_VERSION", "unknown"),
+        "environment": app.config.get("ENVIRONMENT", "unknown"),
+        "status": "running",
+        "endpoints": {
+            "health": "/health",
+            "ready": "/health/ready",
+            "live": "/health/live",
+            "metrics": "/metrics",
+            "api": "/api",
+        },
+    }
+
+
+def _setup_cors(app):
+    """Enable CORS with environment-specific restrictions."""
+    env = app.config.get("ENVIRONMENT")
+    if env in ["dev", "development"]:
+        from flask_cors import CORS
+
+        # Allow all origins in development
+        CORS(app)
+        return
+
+    # Restrict origins in production
+    cors_origins = os.environ.get("CORS_ORIGINS", "")
+    allowed_origins = [o.strip() for o in cors_origins.split(",") if o.strip()]
+    if allowed_origins:
+        from flask_cors import CORS
+
+        CORS(app, origins=allowed_origins)
+    else:
+        logger.warning(
+            "CORS_ORIGINS not set; CORS disabled for environment %s",
+            env,
+        )
+
+
 def create_app(config_name=None):
     """Application factory pattern for Flask.
 
@@ -26,54 +81,60 @@ def create_app(config_name=None):
     Returns:
         Configured Flask application instance.
     """
+    started = time.perf_counter()
     app = Flask(__name__)
 
     # Load configuration
     config = get_config(config_name)
     app.config.from_object(config)
+    if app.config.get("APP_VERSION") is None:
+        app.config["APP_VERSION"] = package_version()
+    # Overrides from RUNTIME_CONFIG_PATH, applied before any middleware reads them
+    setup_runtime_config(app)
+    setup_json_provider(app)
 
     # Setup middleware (order matters!)
     setup_logging(app)  # Logging first so other middleware can log
+    setup_tracing(app)  # Trace context before metrics, which export its stats
+    setup_concurrency_limit(app)  # Before metrics, which export its stats
+    setup_route_cache(app)  # Likewise
     setup_metrics(app)  # Metrics to track all requests
+    # After metrics, which export its counters; its hook runs before all others,
+    # so throttled clients do not take a concurrency slot
+    setup_rate_limit(app)
+    setup_memory(app)  # After metrics, which its per-worker gauges join
 
-    # Enable CORS with environment-specific restrictions
-    env = app.config.get("ENVIRONMENT")
-    if env in ["dev", "development"]:
-        # Allow all origins in development
-        CORS(app)
-    else:
-        # Restrict origins in production
-        cors_origins = os.environ.get("CORS_ORIGINS", "")
-        allowed_origins = [o.strip() for o in cors_origins.split(",") if o.strip()]
-        if allowed_origins:
-            CORS(app, origins=allowed_origins)
-        else:
-            logger.warning(
-                "CORS_ORIGINS not set; CORS disabled for environment %s",
-                env,
-            )
+    _setup_cors(app)
+
+    # Pooled dependency clients, and the checks behind /health/ready that use them
+    setup_dependencies(app)
+    setup_health_checks(app)
 
     # Register blueprints
     app.register_blueprint(health.bp)
     app.register_blueprint(api.bp)
+    if app.config.get("ENABLE_DEBUG_ENDPOINTS", False):
+        # Imported on demand, like the profiler, since both are rarely enabled
+        from src.routes import debug
+        from src.utils.profiler import setup_profiler
+
+        app.register_blueprint(debug.bp)
+        if not app.config.get("DEBUG_TOKEN"):
+            logger.warning("DEBUG_TOKEN not set; debug endpoints will answer 403")
+        setup_profiler(app)
+    setup_warmup(app)
+    # Registered after logging and metrics, so it runs before their
+    # after_request hooks and they see the compressed size
+    setup_compression(app)
 
     # Root endpoint
     @app.route("/")
     def index():
         """Root endpoint with service information."""
-        return {
-            "service": app.config.get("APP_NAME", "demo-app"),
-            "version": app.config.get("APP_VERSION", "unknown"),
-            "environment": app.config.get("ENVIRONMENT", "unknown"),
-            "status": "running",
-            "endpoints": {
-                "health": "/health",
-                "ready": "/health/ready",
-                "live": "/health/live",
-                "metrics": "/metrics",
-                "api": "/api",
-            },
-        }, 200
+        return static_response("index", _index_payload, timestamp=False)
+
+    # Phase timing wraps every hook and view, so it is set up last
+    setup_phase_timing(app)
 
     # Log application startup
     logger.info(
@@ -84,6 +145,11 @@ def create_app(config_name=None):
                 "version": app.config.get("APP_VERSION"),
                 "environment": app.config.get("ENVIRONMENT"),
                 "debug": app.debug,
+                "worker_class": app.config.get("WORKER_CLASS"),
+                "startup": {
+                    "import_ms": _IMPORT_MS,
+                    "create_ms": round((time.perf_counter() - started) * 1000, 3),
+                },
             }
         },
     )
@@ -91,9 +157,58 @@ def create_app(config_name=None):
     return app
 
 
+def init_worker(app):
+    """Prepare a gunicorn worker before it accepts connections.
+
+    Opens dependency connections ahead of the first requests, warms the
+    app up in this process, reinstalls the profiler signal
+    handler, which gunicorn resets in every worker, starts reloading
+    runtime settings on SIGHUP and file changes, and takes a first memory
+    sample, drawing the worker's recycling threshold. With ``preload_app`` the
+    app was created (and warmed up) in the master, so only per-process state
+    such as thread pools and clients is left to warm.
+
+    Args:
+        app: Flask application served by the worker.
+    """
+    started = time.perf_counter()
+    connections = app.extensions["dependencies"].warm()
+    connect_ms = round((time.perf_counter() - started) * 1000, 3)
+    warmup = warm_up(app)
+    profiler = app.extensions.get("profiler")
+    if profiler is not None:
+        from src.utils.profiler import install_profile_signal
+
+        install_profile_signal(app, profiler)
+    watch_runtime_config(app)
+    # Draws this worker's own recycling threshold
+    memory = app.extensions.get("memory_monitor")
+    if memory is not None:
+        memory.check(force=True)
+    logger.info(
+        "Worker initialized",
+        extra={
+            "extra_fields": {
+                "pid": os.getpid(),
+                "warmup_ms": warmup.duration_ms,
+                "connections": connections,
+                "connect_ms": connect_ms,
+                "recycle_rss_bytes": memory.threshold if memory is not None else None,
+            }
+        },
+    )
+
+
+# Time to import this module and its dependencies, for the startup log
+_IMPORT_MS = round((time.perf_counter() - IMPORT_STARTED) * 1000, 3)
+
+
 # Create application instance for running directly
 if __name__ == "__main__":
     app = create_app()
+    app.extensions["dependencies"].warm()
+    warm_up(app)
+    watch_runtime_config(app)
     # Bind to 0.0.0.0 for Docker container - this is required for the app
     # to be accessible from outside the container. The security boundary
     # is at the ALB/ingress level, not at the container network interface.
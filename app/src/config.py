@@ -14,17 +14,9 @@ class Config:
 
     # Application
     APP_NAME = "demo-app"
-    # Version injected by CI/CD or read from package metadata
+    # Version injected by CI/CD; when unset, create_app reads package metadata
     APP_VERSION = os.environ.get("APP_VERSION", None)
 
-    if APP_VERSION is None:
-        try:
-            from importlib.metadata import version
-
-            APP_VERSION = version("demo-app")
-        except Exception:
-            APP_VERSION = "unknown"
-
     ENVIRONMENT = os.environ.get("ENVIRONMENT", "dev")
 
     # AWS
@@ -32,12 +24,192 @@ class Config:
 
     # Observability
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    # "json" (stdlib, default) or "orjson" (faster, compact output) when installed
+    LOG_JSON_BACKEND = os.environ.get("LOG_JSON_BACKEND", "json").lower()
+    # Add service, version and environment to every log line
+    LOG_STATIC_FIELDS = os.environ.get("LOG_STATIC_FIELDS", "false").lower() == "true"
+    # Write logs from a background thread through a bounded queue
+    LOG_ASYNC = os.environ.get("LOG_ASYNC", "false").lower() == "true"
+    LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    # "block", "drop_oldest" or "drop" (discard new records and count them)
+    LOG_OVERFLOW_POLICY = os.environ.get("LOG_OVERFLOW_POLICY", "drop").lower()
+    # Access log sampling, e.g. "/api/hello:2xx=0.01,*:5xx=1" (see src/utils/sampling.py)
+    ACCESS_LOG_SAMPLE_RULES = os.environ.get("ACCESS_LOG_SAMPLE_RULES", "")
+    ACCESS_LOG_SAMPLE_RATE = float(os.environ.get("ACCESS_LOG_SAMPLE_RATE", 1.0))
+    # Requests at least this slow are always logged (0 disables)
+    ACCESS_LOG_SLOW_MS = float(os.environ.get("ACCESS_LOG_SLOW_MS", 1000))
+    # Identical access lines allowed per second and in a burst (rate 0 disables)
+    ACCESS_LOG_DEDUPE_RATE = float(os.environ.get("ACCESS_LOG_DEDUPE_RATE", 0))
+    ACCESS_LOG_DEDUPE_BURST = int(os.environ.get("ACCESS_LOG_DEDUPE_BURST", 10))
     ENABLE_METRICS = os.environ.get("ENABLE_METRICS", "true").lower() == "true"
+    # Per-route latency quantile sketches over 1m/5m/15m windows
+    LATENCY_QUANTILES_ENABLED = (
+        os.environ.get("LATENCY_QUANTILES_ENABLED", "true").lower() == "true"
+    )
+    LATENCY_SKETCH_ACCURACY = float(os.environ.get("LATENCY_SKETCH_ACCURACY", 0.02))
+    # Seconds between snapshots shared with other workers in multiprocess mode
+    LATENCY_SKETCH_SYNC_INTERVAL = float(os.environ.get("LATENCY_SKETCH_SYNC_INTERVAL", 5.0))
+    # Time every request hook and view (exported as http_request_phase_*)
+    PHASE_TIMING_ENABLED = os.environ.get("PHASE_TIMING_ENABLED", "false").lower() == "true"
+    # Add a Server-Timing header to every response, or only to requests that
+    # send SERVER_TIMING_TOKEN in X-Server-Timing-Token
+    SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "false").lower() == "true"
+    SERVER_TIMING_TOKEN = os.environ.get("SERVER_TIMING_TOKEN", "")
+    # W3C trace context: continue incoming traceparent headers and add trace
+    # and span IDs to every log line of a request
+    TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+    # Where kept spans go: "" (nowhere), "file" or "otlp" (OTLP/HTTP JSON)
+    TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "").lower()
+    # "{pid}" is replaced by the worker's process ID
+    TRACE_EXPORT_PATH = os.environ.get("TRACE_EXPORT_PATH", "traces-{pid}.jsonl")
+    TRACE_OTLP_ENDPOINT = os.environ.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    # Tail sampling: errors and requests at least TRACE_SLOW_MS slow are always
+    # kept, other new traces at TRACE_SAMPLE_RATE
+    TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0.01))
+    TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", 500))
+    TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", 256))
+    TRACE_EXPORT_INTERVAL = float(os.environ.get("TRACE_EXPORT_INTERVAL", 5.0))
+    TRACE_MAX_QUEUE = int(os.environ.get("TRACE_MAX_QUEUE", 2048))
     ENABLE_CLOUDWATCH = os.environ.get("ENABLE_CLOUDWATCH", "false").lower() == "true"
+    # "api" publishes with PutMetricData, "emf" writes Embedded Metric Format logs
+    CLOUDWATCH_MODE = os.environ.get("CLOUDWATCH_MODE", "api").lower()
+    CLOUDWATCH_FLUSH_INTERVAL = float(os.environ.get("CLOUDWATCH_FLUSH_INTERVAL", 10.0))
+    CLOUDWATCH_MAX_QUEUE = int(os.environ.get("CLOUDWATCH_MAX_QUEUE", 10000))
+
+    # Response serializer: "auto" (orjson, then msgspec, when installed),
+    # "orjson", "msgspec" or "json" (standard library)
+    JSON_BACKEND = os.environ.get("JSON_BACKEND", "auto").lower()
+
+    # Include a per-request timestamp in /health and /api/info; when disabled the
+    # bodies are fully static and carry strong ETags
+    STATIC_PAYLOAD_TIMESTAMPS = (
+        os.environ.get("STATIC_PAYLOAD_TIMESTAMPS", "true").lower() == "true"
+    )
+
+    # gzip/brotli response compression for clients sending Accept-Encoding
+    COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "true").lower() == "true"
+    # Smaller bodies are sent uncompressed; streamed bodies are always compressed
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+    # Brotli is offered when the brotli package is installed
+    COMPRESSION_BROTLI = os.environ.get("COMPRESSION_BROTLI", "true").lower() == "true"
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+
+    # Response cache for views decorated with cache_response (e.g. /api/hello)
+    ROUTE_CACHE_ENABLED = os.environ.get("ROUTE_CACHE_ENABLED", "false").lower() == "true"
+    # "memory" (per worker) or "sqlite" (shared by the workers of a task)
+    ROUTE_CACHE_BACKEND = os.environ.get("ROUTE_CACHE_BACKEND", "memory").lower()
+    ROUTE_CACHE_TTL = float(os.environ.get("ROUTE_CACHE_TTL", 30))
+    # Least recently used entries are evicted above this many bytes
+    ROUTE_CACHE_MAX_BYTES = int(os.environ.get("ROUTE_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+    # SQLite database file; set by gunicorn_conf.py for multiple workers
+    ROUTE_CACHE_PATH = os.environ.get("ROUTE_CACHE_PATH", "")
+
+    # Adaptive per-worker concurrency limit; excess requests get 503 and
+    # sustained shedding makes /health/ready report not_ready
+    CONCURRENCY_LIMIT_ENABLED = (
+        os.environ.get("CONCURRENCY_LIMIT_ENABLED", "false").lower() == "true"
+    )
+    CONCURRENCY_INITIAL_LIMIT = int(os.environ.get("CONCURRENCY_INITIAL_LIMIT", 20))
+    CONCURRENCY_MIN_LIMIT = int(os.environ.get("CONCURRENCY_MIN_LIMIT", 1))
+    CONCURRENCY_MAX_LIMIT = int(os.environ.get("CONCURRENCY_MAX_LIMIT", 200))
+    # The limit is cut when latency exceeds this multiple of the no-load latency
+    CONCURRENCY_LATENCY_TOLERANCE = float(os.environ.get("CONCURRENCY_LATENCY_TOLERANCE", 2.0))
+    CONCURRENCY_BACKOFF = float(os.environ.get("CONCURRENCY_BACKOFF", 0.9))
+    CONCURRENCY_OVERLOAD_SECONDS = float(os.environ.get("CONCURRENCY_OVERLOAD_SECONDS", 5.0))
+
+    # Per-client token buckets shared by the workers of a task; over-limit
+    # requests get 429 with Retry-After
+    RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "false").lower() == "true"
+    # Default requests per second and burst per client and route
+    RATE_LIMIT_RATE = float(os.environ.get("RATE_LIMIT_RATE", 10))
+    RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", 20))
+    # Per-route overrides, e.g. "/api/echo=5:10,/api/hello=0:0" (rate 0 = unlimited)
+    RATE_LIMIT_RULES = os.environ.get("RATE_LIMIT_RULES", "")
+    # Header identifying clients when sent (e.g. X-API-Key); otherwise the
+    # address appended to X-Forwarded-For by the outermost of
+    # RATE_LIMIT_TRUSTED_PROXIES proxies (0 = the peer address)
+    RATE_LIMIT_KEY_HEADER = os.environ.get("RATE_LIMIT_KEY_HEADER", "")
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", 1))
+    RATE_LIMIT_TABLE_SIZE = int(os.environ.get("RATE_LIMIT_TABLE_SIZE", 8192))
+    # File backing the shared table; set by gunicorn_conf.py for multiple workers
+    RATE_LIMIT_SHM_PATH = os.environ.get("RATE_LIMIT_SHM_PATH", "")
+
+    # Request bodies larger than this are rejected with 413 before being read
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 10 * 1024 * 1024))
+    # /api/echo: echo the validated request bytes instead of re-serializing
+    ECHO_RAW_PASSTHROUGH = os.environ.get("ECHO_RAW_PASSTHROUGH", "false").lower() == "true"
+    # /api/echo/stream: total body and per-record limits
+    ECHO_STREAM_MAX_BYTES = int(os.environ.get("ECHO_STREAM_MAX_BYTES", 1024 * 1024 * 1024))
+    ECHO_STREAM_MAX_LINE = int(os.environ.get("ECHO_STREAM_MAX_LINE", 1024 * 1024))
+
+    # /api/batch: sub-requests per batch and threads for parallel batches
+    BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", 20))
+    BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 4))
+
+    # Pooled dependency clients, e.g.
+    # "database=tcp://db.internal:5432,search=http://search.internal:9200/health"
+    # (tcp, http or https; see src/utils/dependencies.py); each gets a readiness check
+    DEPENDENCY_URLS = os.environ.get("DEPENDENCY_URLS", "")
+    # Connections per pool and worker (also per boto3 client), and how many
+    # each worker opens before accepting requests
+    DEPENDENCY_POOL_SIZE = int(os.environ.get("DEPENDENCY_POOL_SIZE", 10))
+    DEPENDENCY_POOL_WARM = int(os.environ.get("DEPENDENCY_POOL_WARM", 1))
+    # Idle connections are closed after this many seconds instead of reused
+    DEPENDENCY_IDLE_TIMEOUT = float(os.environ.get("DEPENDENCY_IDLE_TIMEOUT", 60))
+    # Seconds to wait for a free connection before answering 503
+    DEPENDENCY_ACQUIRE_TIMEOUT = float(os.environ.get("DEPENDENCY_ACQUIRE_TIMEOUT", 1.0))
+    DEPENDENCY_CONNECT_TIMEOUT = float(os.environ.get("DEPENDENCY_CONNECT_TIMEOUT", 2.0))
+    DEPENDENCY_READ_TIMEOUT = float(os.environ.get("DEPENDENCY_READ_TIMEOUT", 5.0))
+
+    # Readiness dependency checks
+    HEALTH_CHECK_TIMEOUT = float(os.environ.get("HEALTH_CHECK_TIMEOUT", 2.0))
+    HEALTH_CHECK_TTL = float(os.environ.get("HEALTH_CHECK_TTL", 10.0))
+    HEALTH_CHECK_WORKERS = int(os.environ.get("HEALTH_CHECK_WORKERS", 4))
+
+    # /debug endpoints; they answer 403 unless the token is set and sent as a Bearer token
+    ENABLE_DEBUG_ENDPOINTS = os.environ.get("ENABLE_DEBUG_ENDPOINTS", "false").lower() == "true"
+    DEBUG_TOKEN = os.environ.get("DEBUG_TOKEN", "")
+    # Sampling profiler behind /debug/profile (also needs the two settings above)
+    PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILER_INTERVAL_MS = float(os.environ.get("PROFILER_INTERVAL_MS", 10))
+    # Keep below the gunicorn worker timeout; sync workers block while profiling
+    PROFILER_MAX_SECONDS = float(os.environ.get("PROFILER_MAX_SECONDS", 30))
+    PROFILER_MAX_STACKS = int(os.environ.get("PROFILER_MAX_STACKS", 5000))
+    # Signal that profiles a worker into PROFILER_OUTPUT_DIR, e.g. "SIGUSR2"
+    PROFILER_SIGNAL = os.environ.get("PROFILER_SIGNAL", "")
+    PROFILER_SIGNAL_SECONDS = float(os.environ.get("PROFILER_SIGNAL_SECONDS", 10))
+    PROFILER_OUTPUT_DIR = os.environ.get("PROFILER_OUTPUT_DIR", "")
+
+    # Allocation tracing behind /debug/memory/trace (also needs the two
+    # settings above); tracemalloc only runs between POST and DELETE
+    MEMORY_TRACE_ENABLED = os.environ.get("MEMORY_TRACE_ENABLED", "false").lower() == "true"
+    MEMORY_TRACE_FRAMES = int(os.environ.get("MEMORY_TRACE_FRAMES", 10))
+
+    # Seconds between samples of each worker's memory (after requests)
+    MEMORY_SAMPLE_INTERVAL = float(os.environ.get("MEMORY_SAMPLE_INTERVAL", 1.0))
+    # RSS budget per worker in MB; a worker over it is replaced gracefully
+    # after its current request (0 = never). Used instead of gunicorn's max_requests
+    MEMORY_RECYCLE_RSS_MB = float(os.environ.get("MEMORY_RECYCLE_RSS_MB", 0))
+    # Each worker recycles up to this fraction below the budget, so they do
+    # not restart together
+    MEMORY_RECYCLE_JITTER = float(os.environ.get("MEMORY_RECYCLE_JITTER", 0.1))
+
+    # JSON object overriding runtime settings without a restart, e.g.
+    # {"LOG_LEVEL": "DEBUG"} (see src/utils/runtime_config.py); set by
+    # gunicorn_conf.py for multiple workers
+    RUNTIME_CONFIG_PATH = os.environ.get("RUNTIME_CONFIG_PATH", "")
+    # Seconds between checks of that file for changes (0 = only on SIGHUP)
+    RUNTIME_CONFIG_POLL_INTERVAL = float(os.environ.get("RUNTIME_CONFIG_POLL_INTERVAL", 5.0))
+
+    # Send one request to every route before /health/ready reports ready
+    WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() == "true"
 
     # Server
     PORT = int(os.environ.get("PORT", 8080))
     WORKERS = int(os.environ.get("WORKERS", 4))
+    # Gunicorn worker class, "sync" or "gevent" (see src/gunicorn_conf.py)
+    WORKER_CLASS = os.environ.get("WORKER_CLASS", "sync").lower()
 
 
 class DevelopmentConfig(Config):
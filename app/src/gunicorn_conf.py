@@ -0,0 +1,212 @@
+"""Gunicorn settings.
+
+Usage:
+    gunicorn -c src/gunicorn_conf.py "src.app:create_app()"
+
+``WORKER_CLASS`` selects the serving mode: ``sync`` (default) runs one
+request per worker process; ``gevent`` runs up to ``WORKER_CONNECTIONS``
+requests per worker as greenlets, so requests waiting on I/O (CloudWatch,
+dependency checks) no longer hold a whole worker.
+
+Gunicorn imports ``ssl`` before it loads this file, so patching here comes
+too late for it; start gevent mode with the interpreter patched first::
+
+    python -m gevent.monkey --module gunicorn -c src/gunicorn_conf.py "src.app:create_app()"
+
+Started with plain ``gunicorn``, this file still patches, but logs which
+modules were imported unpatched.
+
+The middleware is safe under gevent once the standard library is patched:
+background flushers, the health check pool and the batch pool run on
+``threading``, which becomes greenlet-based; locks, queues and events are
+patched alike; botocore's sockets are patched; and Flask's ``g``/``request``
+live in contextvars, which are per greenlet.
+
+With more than one worker, Prometheus runs in multiprocess mode: workers
+write metrics to mmap files in ``PROMETHEUS_MULTIPROC_DIR`` and ``/metrics``
+sums them. ``METRICS_PORT`` additionally serves the aggregated metrics from
+the master process, so scrapes do not occupy a request worker.
+
+``PRELOAD_APP`` (default on) imports and creates the app once in the master
+and warms it up there, so workers fork with it ready instead of each paying
+for imports and first-request setup. Everything that must not cross a fork
+(background threads, thread pools, boto3 clients, Prometheus value files) is
+created lazily per process. Each worker warms up again for its own state
+before accepting connections.
+
+With more than one worker, rate limit buckets (``RATE_LIMIT_*``) live in a
+file in ``/dev/shm`` mapped by every worker, so a client's limit holds across
+workers whether or not the app is preloaded. The route cache's SQLite
+backend (``ROUTE_CACHE_BACKEND=sqlite``) is kept there too. Files this
+configuration named are removed on exit; paths set by the operator are kept.
+
+Runtime settings (``src/utils/runtime_config.py``) are overridden through
+``RUNTIME_CONFIG_PATH``, which defaults to a file there as well, so a change
+made through one worker reaches the others. Workers reload it on SIGHUP
+and when it changes. SIGHUP sent to the master makes gunicorn replace the
+workers; the preloaded app reloads the file first, so they start with it.
+
+Workers are not recycled after a fixed number of requests (``max_requests``
+stays off). Instead, with ``MEMORY_RECYCLE_RSS_MB`` set, a worker whose
+RSS passes the budget finishes its current requests and is replaced; each
+worker draws its own threshold below the budget, so they do not all
+restart at once (``src/utils/memory.py``).
+"""
+
+import glob
+import logging
+import os
+import sys
+import tempfile
+
+WORKER_CLASS = os.environ.get("WORKER_CLASS", "sync").lower()
+# Modules that keep references to unpatched socket and ssl objects
+EARLY_IMPORTS = ("ssl", "urllib3", "botocore", "requests")
+
+if WORKER_CLASS == "gevent":
+    # Patch before the app imports anything; gunicorn only patches once the
+    # worker starts, which is too late for preloaded code
+    from gevent import monkey
+
+    if not monkey.is_module_patched("socket"):
+        _early = [name for name in EARLY_IMPORTS if name in sys.modules]
+        if _early:
+            logging.getLogger("gunicorn.error").warning(
+                "gevent patching after %s were imported; start with "
+                "'python -m gevent.monkey --module gunicorn ...' to patch first",
+                ", ".join(_early),
+            )
+        monkey.patch_all()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get("WORKERS", 4))
+worker_class = WORKER_CLASS
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 1000))
+timeout = int(os.environ.get("WORKER_TIMEOUT", 60))
+# Recycling is driven by memory instead (see post_request)
+max_requests = 0
+preload_app = os.environ.get("PRELOAD_APP", "true").lower() == "true"
+
+
+def _prepare_multiproc_dir():
+    """Create the metrics directory and remove files left by a previous run.
+
+    Runs when this file is loaded, because a preloaded app writes metric files
+    before gunicorn's ``on_starting`` hook. The master's pid is recorded so a
+    configuration reload (SIGHUP) does not remove live workers' files.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path or os.environ.get("PROMETHEUS_MULTIPROC_OWNER") == str(os.getpid()):
+        return
+    os.makedirs(path, exist_ok=True)
+    for pattern in ("*.db", "latency_sketch_*.json"):
+        for stale in glob.glob(os.path.join(path, pattern)):
+            os.remove(stale)
+    os.environ["PROMETHEUS_MULTIPROC_OWNER"] = str(os.getpid())
+
+
+# Shared files named for this run, removed on exit
+_owned_paths = []
+
+
+def _default_path(name, path):
+    """Point ``name`` at ``path`` unless the operator set it.
+
+    ``path`` contains the master's pid, so when the file is loaded again on
+    a reload (SIGHUP) a path set by an earlier load is still recognized.
+    """
+    os.environ.setdefault(name, path)
+    if os.environ[name] == path:
+        _owned_paths.append(path)
+
+
+# Must be set before prometheus_client is imported in any process
+if workers > 1:
+    os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus-multiproc")
+    )
+    _prepare_multiproc_dir()
+    # Named after the master's pid, so a new run never sees old state
+    _shared_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    _default_path(
+        "RATE_LIMIT_SHM_PATH", os.path.join(_shared_dir, f"demo-app-ratelimit-{os.getpid()}")
+    )
+    _route_cache_path = os.path.join(_shared_dir, f"demo-app-route-cache-{os.getpid()}.sqlite3")
+    _default_path("ROUTE_CACHE_PATH", _route_cache_path)
+    if _route_cache_path in _owned_paths:
+        # SQLite's write-ahead log and shared memory index
+        _owned_paths.extend((f"{_route_cache_path}-wal", f"{_route_cache_path}-shm"))
+    _default_path(
+        "RUNTIME_CONFIG_PATH",
+        os.path.join(_shared_dir, f"demo-app-runtime-config-{os.getpid()}.json"),
+    )
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+
+# Access logs come from the app itself (sampled, see ACCESS_LOG_* settings)
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """Warm up the preloaded app and serve aggregated metrics on ``METRICS_PORT``."""
+    if server.cfg.preload_app:
+        from src.utils.warmup import warm_up
+
+        warmup = warm_up(server.app.wsgi())
+        if warmup is not None and warmup.duration_ms is not None:
+            server.log.info("Warmed up preloaded app in %.1f ms", warmup.duration_ms)
+    if METRICS_PORT and "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_flask_exporter.multiprocess import GunicornPrometheusMetrics
+
+        GunicornPrometheusMetrics.start_http_server_when_ready(METRICS_PORT)
+
+
+def post_worker_init(worker):
+    """Warm up the worker before it accepts connections."""
+    if hasattr(worker.wsgi, "extensions"):
+        from src.app import init_worker
+
+        init_worker(worker.wsgi)
+
+
+def post_request(worker, req, environ, resp):
+    """Replace the worker gracefully once its RSS passed its threshold."""
+    from src.utils.memory import recycle_worker
+
+    if recycle_worker(worker):
+        worker.log.info("Recycling worker %s over its memory threshold", worker.pid)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges and latency sketches of an exited worker; its counters are kept."""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+        # Written by src.utils.quantiles.LatencyQuantiles.write_snapshot
+        try:
+            os.remove(os.path.join(path, f"latency_sketch_{worker.pid}.json"))
+        except FileNotFoundError:
+            pass
+
+
+def on_reload(server):
+    """Reload runtime settings in the preloaded app before workers are replaced."""
+    if not server.cfg.preload_app:
+        return
+    runtime = server.app.wsgi().extensions.get("runtime_config")
+    if runtime is not None:
+        try:
+            runtime.reload()
+        except ValueError as exc:
+            server.log.warning("Runtime settings rejected: %s", exc)
+
+
+def on_exit(server):
+    """Remove the shared rate limit table, route cache and runtime settings this file named."""
+    for path in _owned_paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,246 @@
+"""Response compression.
+
+Negotiates ``gzip`` and, when the ``brotli`` (or ``brotlicffi``) package is
+installed, ``br`` from ``Accept-Encoding``. Bodies below
+``COMPRESSION_MIN_SIZE`` and types that do not compress (images, archives)
+are sent as they are. Streamed responses are compressed chunk by chunk and
+flushed after each chunk, so records still reach the client as they are
+produced.
+
+Fully static payloads (``src/utils/static_payload.py``) keep their
+compressed variants and are not recompressed per request; the ``/metrics``
+endpoint reuses the last compressed scrape while its output is unchanged.
+"""
+
+import logging
+import threading
+import zlib
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+GZIP = "gzip"
+BROTLI = "br"
+
+# Types worth compressing besides text/*
+COMPRESSIBLE_MIMETYPES = frozenset(
+    {
+        "application/json",
+        "application/x-ndjson",
+        "application/openmetrics-text",
+        "application/javascript",
+        "application/xml",
+    }
+)
+# Endpoints whose last compressed body is reused while the output is unchanged
+CACHED_ENDPOINTS = frozenset({"prometheus_metrics"})
+
+
+def _brotli_module():
+    """Return the installed brotli binding, or None."""
+    try:
+        import brotli
+    except ImportError:
+        try:
+            import brotlicffi as brotli
+        except ImportError:
+            return None
+    return brotli
+
+
+class Compressor:
+    """Negotiate content codings and compress bodies."""
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4, brotli=True):
+        """Create a compressor.
+
+        Args:
+            min_size: Bodies smaller than this many bytes are not compressed.
+            gzip_level: zlib compression level, 1 (fastest) to 9.
+            brotli_quality: Brotli quality, 0 (fastest) to 11.
+            brotli: Whether to offer ``br`` when a binding is installed.
+        """
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._brotli = _brotli_module() if brotli else None
+        # Preferred first when the client accepts both equally
+        self.encodings = (BROTLI, GZIP) if self._brotli is not None else (GZIP,)
+        self._lock = threading.Lock()
+        self._cached = {}
+
+    def negotiate(self, accept_encodings):
+        """Pick the content coding for a request.
+
+        Args:
+            accept_encodings: The request's parsed ``Accept-Encoding``.
+
+        Returns:
+            ``"br"``, ``"gzip"`` or None for an uncompressed body.
+        """
+        return accept_encodings.best_match(self.encodings)
+
+    def compress(self, data, encoding):
+        """Compress a complete body.
+
+        Args:
+            data: Body bytes.
+            encoding: ``"br"`` or ``"gzip"``.
+
+        Returns:
+            Compressed bytes.
+        """
+        if encoding == BROTLI:
+            return self._brotli.compress(data, quality=self.brotli_quality)
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def compress_cached(self, key, data, encoding):
+        """Compress a body, reusing the previous result for identical bodies.
+
+        One body is kept per key, so repeated scrapes that return the same
+        output are only compressed once per encoding.
+
+        Args:
+            key: Cache key, e.g. the endpoint.
+            data: Body bytes.
+            encoding: ``"br"`` or ``"gzip"``.
+
+        Returns:
+            Compressed bytes.
+        """
+        with self._lock:
+            cached = self._cached.get(key)
+            if cached is None or cached[0] != data:
+                cached = self._cached[key] = (data, {})
+            compressed = cached[1].get(encoding)
+        if compressed is None:
+            compressed = self.compress(data, encoding)
+            with self._lock:
+                cached[1][encoding] = compressed
+        return compressed
+
+    def stream(self, chunks, encoding):
+        """Compress an iterable of chunks, flushing after each one.
+
+        Args:
+            chunks: Iterable of body chunks (bytes or str).
+            encoding: ``"br"`` or ``"gzip"``.
+
+        Yields:
+            Compressed chunks.
+        """
+        if encoding == BROTLI:
+            compressor = self._brotli.Compressor(quality=self.brotli_quality)
+
+            def emit(chunk):
+                return compressor.process(chunk) + compressor.flush()
+
+            finish = compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+
+            def emit(chunk):
+                return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+            finish = compressor.flush
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield emit(chunk)
+        yield finish()
+
+
+def compressible(response):
+    """Return whether a response's type and status allow compression."""
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return False
+    if "no-transform" in response.headers.get("Cache-Control", ""):
+        return False
+    mimetype = response.mimetype or ""
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def _compress_stream(response, compressor, encoding):
+    """Replace a streamed body with its compressed stream."""
+    chunks = response.response
+    response.response = compressor.stream(chunks, encoding)
+    if hasattr(chunks, "close"):
+        # Also closes a stream that never started, unlike a finally block
+        response.call_on_close(chunks.close)
+    response.headers.pop("Content-Length", None)
+    response.headers["Content-Encoding"] = encoding
+
+
+def setup_compression(app):
+    """Compress responses for clients that accept it.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        Compressor instance, also stored in ``app.extensions``, or None
+        when compression is disabled.
+    """
+    if not app.config.get("COMPRESSION_ENABLED", True):
+        return None
+
+    compressor = Compressor(
+        min_size=app.config.get("COMPRESSION_MIN_SIZE", 1024),
+        gzip_level=app.config.get("COMPRESSION_GZIP_LEVEL", 6),
+        brotli_quality=app.config.get("COMPRESSION_BROTLI_QUALITY", 4),
+        brotli=app.config.get("COMPRESSION_BROTLI", True),
+    )
+    app.extensions["compression"] = compressor
+
+    @app.after_request
+    def compress_response(response):
+        """Compress the body when the client accepts it and it is large enough.
+
+        Args:
+            response: Flask response object.
+
+        Returns:
+            Response object, compressed when negotiated.
+        """
+        if not compressible(response):
+            return response
+        if response.is_streamed:
+            response.vary.add("Accept-Encoding")
+            encoding = compressor.negotiate(request.accept_encodings)
+            if encoding is not None:
+                _compress_stream(response, compressor, encoding)
+            return response
+
+        data = response.get_data()
+        if len(data) < compressor.min_size:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = compressor.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        if request.endpoint in CACHED_ENDPOINTS:
+            data = compressor.compress_cached(request.endpoint, data, encoding)
+        else:
+            data = compressor.compress(data, encoding)
+        response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # Strong validators must differ between representations
+            response.set_etag(f"{etag}-{encoding}")
+        return response
+
+    logger.info(
+        "Compression configured",
+        extra={
+            "extra_fields": {
+                "encodings": list(compressor.encodings),
+                "min_size": compressor.min_size,
+            }
+        },
+    )
+    return compressor
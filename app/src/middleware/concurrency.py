@@ -0,0 +1,106 @@
+"""Adaptive concurrency limiting and load shedding.
+
+Each worker admits requests up to an adaptive limit (see
+``src/utils/concurrency.py``) and answers the excess at once with 503 and
+``Retry-After`` instead of letting every request slow down. Health probes
+and ``/metrics`` are never shed and do not count towards the limit, so the
+load balancer and Prometheus still reach an overloaded worker; while it has
+been shedding for ``CONCURRENCY_OVERLOAD_SECONDS``, ``/health/ready``
+reports ``not_ready`` and the load balancer moves traffic elsewhere.
+
+The limit bounds requests in flight within a worker, so it sheds with
+``gevent`` workers or threads. A ``sync`` worker never has more than one
+request in flight and is not limited.
+"""
+
+import logging
+from flask import request
+
+from src.utils.concurrency import AdaptiveConcurrencyLimiter
+from src.utils.subrequest import BATCH_ID_ENVIRON_KEY
+from src.utils.warmup import WARMUP_ENVIRON_KEY
+
+logger = logging.getLogger(__name__)
+
+# The admitted request's limiter token
+CONCURRENCY_ENVIRON_KEY = "demo_app.concurrency"
+# Served even when the worker sheds everything else
+PRIORITY_ENDPOINTS = frozenset({"prometheus_metrics"})
+PRIORITY_BLUEPRINTS = frozenset({"health"})
+
+
+def _prioritized(environ, endpoint):
+    """Return whether a request bypasses the limit."""
+    if WARMUP_ENVIRON_KEY in environ or BATCH_ID_ENVIRON_KEY in environ:
+        # Sub-requests run inside their batch's slot
+        return True
+    if endpoint is None:
+        return False
+    return endpoint in PRIORITY_ENDPOINTS or endpoint.partition(".")[0] in PRIORITY_BLUEPRINTS
+
+
+def setup_concurrency_limit(app):
+    """Shed requests beyond the worker's adaptive concurrency limit.
+
+    Must run before ``setup_metrics``, which exports the limiter's stats.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        AdaptiveConcurrencyLimiter instance, also stored in
+        ``app.extensions``, or None when limiting is disabled.
+    """
+    if not app.config.get("CONCURRENCY_LIMIT_ENABLED", False):
+        return None
+
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=app.config.get("CONCURRENCY_INITIAL_LIMIT", 20),
+        min_limit=app.config.get("CONCURRENCY_MIN_LIMIT", 1),
+        max_limit=app.config.get("CONCURRENCY_MAX_LIMIT", 200),
+        tolerance=app.config.get("CONCURRENCY_LATENCY_TOLERANCE", 2.0),
+        backoff=app.config.get("CONCURRENCY_BACKOFF", 0.9),
+        overload_seconds=app.config.get("CONCURRENCY_OVERLOAD_SECONDS", 5.0),
+    )
+    app.extensions["concurrency_limiter"] = limiter
+
+    def enforce_concurrency_limit():
+        """Admit the request or shed it with 503.
+
+        Returns:
+            None to continue, or a 503 response with ``Retry-After``.
+        """
+        environ = request.environ
+        if _prioritized(environ, request.endpoint):
+            return None
+        rule = request.url_rule
+        token = limiter.acquire(rule.rule if rule is not None else None)
+        if token is not None:
+            environ[CONCURRENCY_ENVIRON_KEY] = token
+            return None
+        return ({"error": "Server overloaded"}, 503, {"Retry-After": "1"})
+
+    @app.teardown_request
+    def release_concurrency_slot(exc):
+        """Release the request's slot and feed its latency to the limiter.
+
+        Args:
+            exc: Exception raised during the request, if any.
+        """
+        token = request.environ.pop(CONCURRENCY_ENVIRON_KEY, None)
+        if token is not None:
+            limiter.release(token)
+
+    app.before_request_funcs.setdefault(None, []).insert(0, enforce_concurrency_limit)
+
+    logger.info(
+        "Concurrency limiting configured",
+        extra={
+            "extra_fields": {
+                "initial_limit": limiter.limit,
+                "min_limit": limiter.min_limit,
+                "max_limit": limiter.max_limit,
+            }
+        },
+    )
+    return limiter
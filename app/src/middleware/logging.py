@@ -1,20 +1,129 @@
 """Structured logging middleware.
 
 Configures JSON-formatted logging for CloudWatch Logs integration.
-Adds request context to all log messages.
+Adds request context to all log messages. The request context is captured
+once per request in ``add_request_id`` and reused by every record logged
+during that request.
+
+With ``LOG_ASYNC`` enabled, records are handed to a bounded queue and
+formatted and written in batches by a background thread, so a slow log
+driver never blocks request threads.
 """
 
+import functools
 import logging
 import json
+import time
 import uuid
 from datetime import datetime, timezone
-from flask import request, g
+from flask import request, g, has_app_context, has_request_context
 from werkzeug.exceptions import HTTPException
 import sys
 
+from src.utils.batching import BackgroundBatcher
+from src.utils.runtime_config import on_settings_change
+from src.utils.sampling import AccessLogSampler
+from src.utils.subrequest import BATCH_ID_ENVIRON_KEY
+from src.utils.tracing import current_trace
+from src.utils.warmup import WARMUP_ENVIRON_KEY
+
+_exception_formatter = logging.Formatter()
+
+
+def _json_backend(name):
+    """Return ``(dumps, item_separator)`` for the configured JSON backend.
+
+    The stdlib backend is the default and matches ``json.dumps`` byte for
+    byte. ``orjson`` is used when requested and installed; its output is
+    compact and not ASCII-escaped, so it is opt-in.
+    """
+    if name == "orjson":
+        try:
+            import orjson
+        except ImportError:
+            return json.dumps, ", "
+
+        def dumps(obj):
+            return orjson.dumps(obj).decode()
+
+        return dumps, ","
+    return json.dumps, ", "
+
+
+def capture_request_context():
+    """Collect request fields to attach to log records.
+
+    Flask's ``g`` and ``request`` are bound to the current thread, so this
+    must run on the request thread, not on a background writer.
+
+    Returns:
+        Dict with ``request_id``, ``request`` and, when traced, ``trace_id``
+        and ``span_id`` entries for the active request, or an empty dict
+        outside a request.
+    """
+    context = {}
+    if not has_app_context():
+        return context
+    if has_request_context():
+        cached = g.get("log_context")
+        if cached is not None:
+            return cached
+    if hasattr(g, "request_id"):
+        context["request_id"] = g.request_id
+    if has_request_context():
+        context["request"] = {
+            "method": request.method,
+            "path": request.path,
+            "remote_addr": request.remote_addr,
+        }
+    trace = current_trace()
+    if trace is not None:
+        context["trace_id"] = trace.trace_id
+        context["span_id"] = trace.span_id
+    return context
+
 
 class JSONFormatter(logging.Formatter):
-    """Custom JSON formatter for structured logging."""
+    """Custom JSON formatter for structured logging.
+
+    Static fields are serialized once at construction and spliced into each
+    line, and the timestamp's date/time part is only re-rendered when the
+    second changes.
+    """
+
+    def __init__(self, static_fields=None, backend="json"):
+        """Create a formatter.
+
+        Args:
+            static_fields: Optional dict of fields appended to every line
+                (e.g. service, version, environment).
+            backend: JSON backend name, ``json`` or ``orjson``.
+        """
+        super().__init__()
+        self._dumps, separator = _json_backend(backend)
+        self._static_fields = dict(static_fields or {})
+        self._static_keys = frozenset(self._static_fields)
+        self._static_suffix = ""
+        if self._static_fields:
+            self._static_suffix = separator + self._dumps(self._static_fields)[1:-1]
+        # (epoch second, rendered "YYYY-MM-DDTHH:MM:SS"), swapped as one tuple
+        self._clock = (None, "")
+
+    def _timestamp(self, created):
+        """Render ``created`` exactly like ``datetime.isoformat`` with a Z suffix."""
+        seconds = int(created)
+        # Same half-even rounding as datetime.fromtimestamp
+        micros = round((created - seconds) * 1e6)
+        if micros >= 1000000:
+            seconds += 1
+            micros -= 1000000
+        cached_second, prefix = self._clock
+        if seconds != cached_second:
+            prefix = datetime.fromtimestamp(seconds, timezone.utc).isoformat()[:-6]
+            self._clock = (seconds, prefix)
+        if micros:
+            return f"{prefix}.{micros:06d}Z"
+        return prefix + "Z"
 
     def format(self, record):
         """Format log record as JSON.
@@ -26,7 +135,7 @@ class JSONFormatter(logging.Formatter):
             JSON-formatted log string.
         """
         log_data = {
-            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -35,30 +144,172 @@ class JSONFormatter(logging.Formatter):
             "line": record.lineno,
         }
 
-        # Add request context if available (only works during active request)
-        try:
-            if hasattr(g, "request_id"):
-                log_data["request_id"] = g.request_id
-
-            if request:
-                log_data["request"] = {
-                    "method": request.method,
-                    "path": request.path,
-                    "remote_addr": request.remote_addr,
-                }
-        except RuntimeError:
-            # Outside application context (e.g., during app startup)
-            pass
+        # Add request context if available (captured at emit time when queued)
+        context = getattr(record, "request_context", None)
+        if context is None:
+            context = capture_request_context()
+        if context:
+            log_data.update(context)
 
         # Add exception info if present
+        if record.exc_info or record.exc_text:
+            log_data["exception"] = record.exc_text or self.formatException(record.exc_info)
+
+        # Add any extra fields; static fields they override go through the dict
+        static_suffix = self._static_suffix
+        extra_fields = getattr(record, "extra_fields", None)
+        if extra_fields is not None:
+            if static_suffix and not self._static_keys.isdisjoint(extra_fields):
+                log_data.update(self._static_fields)
+                static_suffix = ""
+            log_data.update(extra_fields)
+
+        encoded = self._dumps(log_data)
+        if static_suffix:
+            return encoded[:-1] + static_suffix + "}"
+        return encoded
+
+
+class AsyncLogHandler(logging.Handler):
+    """Queue records and write them from a background thread in batches.
+
+    Request threads only capture the request context and enqueue the record;
+    formatting with ``JSONFormatter`` and writing happen on the writer
+    thread, which coalesces everything pending into a single write. Pending
+    records are flushed at exit, and the queue is reset in forked workers.
+    """
+
+    def __init__(self, stream, max_queue=10000, overflow="drop", flush_interval=0.05):
+        """Create a handler.
+
+        Args:
+            stream: Stream to write formatted lines to.
+            max_queue: Maximum queued records.
+            overflow: ``block``, ``drop_oldest`` or ``drop`` (count and discard).
+            flush_interval: Maximum seconds a record waits before being written.
+        """
+        super().__init__()
+        self.stream = stream
+        self.written = 0
+        self._batcher = BackgroundBatcher(
+            self._write,
+            name="log-writer",
+            max_queue=max_queue,
+            max_batch=512,
+            flush_interval=flush_interval,
+            overflow=overflow,
+        )
+
+    def prepare(self, record):
+        """Detach a record from the request thread before queueing it.
+
+        Args:
+            record: Log record to prepare.
+
+        Returns:
+            The same record with its message merged and context captured.
+        """
+        record.request_context = capture_request_context()
+        record.msg = record.getMessage()
+        record.args = None
         if record.exc_info:
-            log_data["exception"] = self.formatException(record.exc_info)
+            # Render now so the traceback's frames are not kept alive in the queue
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
-        # Add any extra fields
-        if hasattr(record, "extra_fields"):
-            log_data.update(record.extra_fields)
+    def emit(self, record):
+        """Queue a record according to the overflow policy.
 
-        return json.dumps(log_data)
+        Args:
+            record: Log record to emit.
+        """
+        try:
+            self._batcher.submit(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def stats(self):
+        """Return pipeline counters.
+
+        Returns:
+            Dict with ``queue_depth``, ``dropped`` and ``written`` record counts.
+        """
+        return {
+            "queue_depth": self._batcher.depth,
+            "dropped": self._batcher.dropped,
+            "written": self.written,
+        }
+
+    def flush(self):
+        """Write all queued records on the calling thread."""
+        self._batcher.flush()
+
+    def close(self):
+        """Flush pending records and stop the writer thread."""
+        self._batcher.close()
+        super().close()
+
+    def _write(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        if lines:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+            self.written += len(lines)
+
+
+def _create_console_handler(app, log_level):
+    """Create the stdout handler with the configured JSON formatter."""
+    if app.config.get("LOG_ASYNC", False):
+        console_handler = AsyncLogHandler(
+            sys.stdout,
+            max_queue=app.config.get("LOG_QUEUE_SIZE", 10000),
+            overflow=app.config.get("LOG_OVERFLOW_POLICY", "drop"),
+        )
+        app.extensions["log_pipeline"] = console_handler
+    else:
+        console_handler = logging.StreamHandler(sys.stdout)
+
+    console_handler.setLevel(log_level)
+    console_handler.setFormatter(create_json_formatter(app))
+    return console_handler
+
+
+def create_json_formatter(app):
+    """Create the JSON formatter configured for ``app``'s stdout lines.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        JSONFormatter instance.
+    """
+    static_fields = None
+    if app.config.get("LOG_STATIC_FIELDS", False):
+        static_fields = {
+            "service": app.config.get("APP_NAME", "demo-app"),
+            "version": app.config.get("APP_VERSION", "unknown"),
+            "environment": app.config.get("ENVIRONMENT", "unknown"),
+        }
+    return JSONFormatter(
+        static_fields=static_fields, backend=app.config.get("LOG_JSON_BACKEND", "json")
+    )
+
+
+def _apply_settings(loggers, sampler, settings):
+    """Apply a reloaded log level and access log sampling."""
+    for target in loggers:
+        target.setLevel(settings.log_level)
+    sampler.configure(
+        settings.access_log_sample_rules,
+        settings.access_log_sample_rate,
+        settings.access_log_slow_ms,
+    )
 
 
 def setup_logging(app):
@@ -77,26 +328,43 @@ def setup_logging(app):
     # Remove existing handlers
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+        if isinstance(handler, AsyncLogHandler):
+            handler.close()
 
-    # Create console handler with JSON formatter
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(log_level)
-    console_handler.setFormatter(JSONFormatter())
+    console_handler = _create_console_handler(app, log_level)
     root_logger.addHandler(console_handler)
 
     # Configure Flask app logger
     app.logger.setLevel(log_level)
 
+    # Access log sampling (gunicorn's own access log is disabled in favour of this one)
+    sampler = AccessLogSampler(
+        rules=app.config.get("ACCESS_LOG_SAMPLE_RULES", ""),
+        default_rate=app.config.get("ACCESS_LOG_SAMPLE_RATE", 1.0),
+        slow_ms=app.config.get("ACCESS_LOG_SLOW_MS", 0),
+        dedupe_rate=app.config.get("ACCESS_LOG_DEDUPE_RATE", 0.0),
+        dedupe_burst=app.config.get("ACCESS_LOG_DEDUPE_BURST", 10),
+    )
+    on_settings_change(
+        app,
+        functools.partial(_apply_settings, (root_logger, console_handler, app.logger), sampler),
+    )
+
     # Add request ID to all requests
     @app.before_request
     def add_request_id():
         """Generate unique request ID for tracing."""
+        g.request_start = time.perf_counter()
         g.request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
+        # ``g`` can outlive a request when the app context was pushed by the caller
+        g.pop("log_fields", None)
+        g.pop("log_context", None)
+        g.log_context = capture_request_context()
 
     # Log all requests
     @app.after_request
     def log_request(response):
-        """Log request details after processing.
+        """Log request details after processing, subject to sampling.
 
         Args:
             response: Flask response object.
@@ -104,22 +372,42 @@ def setup_logging(app):
         Returns:
             Unmodified response object.
         """
-        # Skip health check logging in production to reduce noise
-        if request.path.startswith("/health"):
+        # Skip health check logging in production to reduce noise; batched
+        # sub-requests are reported on the line of their batch instead, and
+        # warm-up requests are not traffic
+        environ = request.environ
+        if (
+            request.path.startswith("/health")
+            or BATCH_ID_ENVIRON_KEY in environ
+            or WARMUP_ENVIRON_KEY in environ
+        ):
             return response
 
+        start = g.get("request_start")
+        duration_ms = (time.perf_counter() - start) * 1000 if start is not None else 0.0
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        status_code = response.status_code
+        sampled = sampler.sample(
+            route, status_code, duration_ms, (request.method, route, status_code)
+        )
+        if sampled is None:
+            return response
+
+        extra_fields = {
+            "request_id": g.get("request_id"),
+            "method": request.method,
+            "path": request.path,
+            "status_code": status_code,
+            "user_agent": request.headers.get("User-Agent"),
+            "content_length": response.content_length,
+            "duration_ms": round(duration_ms, 3),
+        }
+        extra_fields.update(sampled)
+        # Fields added by the view, e.g. the sub-requests of a batch
+        extra_fields.update(g.get("log_fields") or {})
         app.logger.info(
-            f"{request.method} {request.path} {response.status_code}",
-            extra={
-                "extra_fields": {
-                    "request_id": g.get("request_id"),
-                    "method": request.method,
-                    "path": request.path,
-                    "status_code": response.status_code,
-                    "user_agent": request.headers.get("User-Agent"),
-                    "content_length": response.content_length,
-                }
-            },
+            f"{request.method} {request.path} {status_code}",
+            extra={"extra_fields": extra_fields},
         )
         return response
 
@@ -1,16 +1,254 @@
 """Metrics middleware for observability.
 
 Integrates Prometheus metrics export and CloudWatch custom metrics.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (``src/gunicorn_conf.py`` sets it
+for multi-worker deployments), every worker writes its metrics to mmap files
+in that directory and ``/metrics`` aggregates all of them, so a scrape sees
+the whole container rather than whichever worker answered.
 """
 
 import logging
+import os
+import sys
+import threading
+import time
+from prometheus_client import CollectorRegistry, Gauge
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.exposition import choose_encoder
+from prometheus_client.multiprocess import MultiProcessCollector
 from prometheus_flask_exporter import PrometheusMetrics
-from flask import request
+from prometheus_flask_exporter.multiprocess import GunicornInternalPrometheusMetrics
+from flask import request, g
+
+from src.utils.batching import BackgroundBatcher
+from src.utils.quantiles import LatencyQuantiles
+from src.utils.warmup import is_warmup_request
 
 logger = logging.getLogger(__name__)
 
+CLOUDWATCH_EMITTER_STATS = {
+    "counters": {
+        "dropped": "CloudWatch datapoints dropped before publishing",
+        "flushed": "CloudWatch datapoints published",
+        "failed": "CloudWatch datapoints lost to failed PutMetricData calls",
+    },
+    "gauges": {
+        "queue_depth": "CloudWatch samples waiting to be published",
+        "circuit_open": "Whether the CloudWatch circuit breaker is open",
+    },
+}
+
+LOG_PIPELINE_STATS = {
+    "counters": {
+        "dropped": "Log records dropped by the queue overflow policy",
+        "written": "Log records written by the background writer",
+    },
+    "gauges": {"queue_depth": "Log records waiting to be written"},
+}
+
+TRACER_STATS = {
+    "counters": {
+        "started": "Request traces started",
+        "kept": "Request traces kept by tail sampling",
+        "dropped": "Kept traces dropped because the export queue was full",
+        "exported": "Spans exported",
+    },
+    "gauges": {"queue_depth": "Kept traces waiting to be exported"},
+}
+
+
+CONCURRENCY_LIMITER_STATS = {
+    "counters": {
+        "admitted": "Requests admitted by the concurrency limiter",
+        "shed": "Requests shed with 503 by the concurrency limiter",
+    },
+    "gauges": {
+        "limit": "Adaptive concurrency limit",
+        "inflight": "Requests counted against the concurrency limit",
+        "overloaded": "Whether the worker reports itself overloaded",
+    },
+}
+
+
+ROUTE_CACHE_STATS = {
+    "counters": {
+        "hits": "Responses served from the route cache",
+        "misses": "Responses computed and offered to the route cache",
+        "coalesced": "Misses served by a concurrent request's response",
+        "evictions": "Route cache entries evicted to stay within the memory budget",
+    },
+    "gauges": {
+        # A shared backend reports the whole task's cache from every worker
+        "entries": "Entries in the route cache",
+        "size_bytes": "Bytes held by the route cache",
+    },
+}
+
+
+class StatsCollector:
+    """Expose a component's ``stats()`` dict as Prometheus metrics."""
+
+    def __init__(self, prefix, source, counters=None, gauges=None):
+        """Create a collector.
+
+        Args:
+            prefix: Metric name prefix.
+            source: Object with a ``stats()`` method returning a dict.
+            counters: Mapping of stats key to description, exported as counters.
+            gauges: Mapping of stats key to description, exported as gauges.
+        """
+        self._prefix = prefix
+        self._source = source
+        self._counters = counters or {}
+        self._gauges = gauges or {}
+
+    def collect(self):
+        """Yield current values as metric families."""
+        stats = self._source.stats()
+        for key, description in self._counters.items():
+            yield CounterMetricFamily(f"{self._prefix}_{key}", description, value=stats[key])
+        for key, description in self._gauges.items():
+            yield GaugeMetricFamily(f"{self._prefix}_{key}", description, value=stats[key])
+
+
+class LatencyQuantilesCollector:
+    """Expose windowed latency quantiles as Prometheus summaries."""
+
+    def __init__(self, latency, directory=None):
+        """Create a collector.
+
+        Args:
+            latency: LatencyQuantiles instance.
+            directory: Shared directory to merge other workers' snapshots from.
+        """
+        self._latency = latency
+        self._directory = directory
+
+    def collect(self):
+        """Yield one summary with a sample per route, status class, window and quantile."""
+        snapshots = self._latency.read_snapshots(self._directory) if self._directory else ()
+        name = "http_request_latency_window_seconds"
+        metric = Metric(name, "Request latency quantiles over sliding windows", "summary")
+        for (route, status_class), windows in sorted(self._latency.summaries(snapshots).items()):
+            for window, summary in windows.items():
+                labels = {"route": route, "status_class": status_class, "window": window}
+                for q, value in summary["quantiles"].items():
+                    metric.add_sample(name, dict(labels, quantile=str(q)), value / 1000)
+                metric.add_sample(f"{name}_count", labels, summary["count"])
+                metric.add_sample(f"{name}_sum", labels, summary["sum"] / 1000)
+        yield metric
+
+
+class SharedPrometheusMetrics(GunicornInternalPrometheusMetrics):
+    """Multiprocess metrics that also export collectors merging worker state themselves.
+
+    The exporter builds multiprocess scrapes from the shared files only; the
+    collectors in ``merged_collectors`` are added to every scrape.
+    """
+
+    def __init__(self, app, **kwargs):
+        """Create the metrics extension; see ``GunicornInternalPrometheusMetrics``."""
+        self.merged_collectors = []
+        super().__init__(app, **kwargs)
+
+    def generate_metrics(self, accept_header=None, names=None):
+        """Generate the aggregated metrics output for a scrape."""
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        for collector in self.merged_collectors:
+            registry.register(collector)
+        if names:
+            registry = registry.restricted_registry(names)
+        generate_latest, content_type = choose_encoder(accept_header)
+        return generate_latest(registry).decode("utf-8"), content_type
 
-def setup_metrics(app):  # noqa: C901
+
+class MultiprocessStatsBridge:
+    """Publish ``stats()`` dicts through multiprocess gauges.
+
+    In multiprocess mode ``/metrics`` is built from the shared files only, so
+    collectors registered in a worker are never asked. The bridge copies each
+    source's stats into ``livesum`` gauges (summed over live workers) at most
+    once per ``interval`` seconds. Counters keep their ``_total`` name but are
+    exported as gauges, since they reset when a worker is replaced.
+    """
+
+    def __init__(self, interval=1.0, clock=time.monotonic):
+        """Create an empty bridge.
+
+        Args:
+            interval: Minimum seconds between refreshes.
+            clock: Monotonic clock, injectable for tests.
+        """
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sources = []
+        self._refreshed = None
+
+    def add(self, prefix, source, counters=None, gauges=None):
+        """Bridge a component's stats.
+
+        Args:
+            prefix: Metric name prefix.
+            source: Object with a ``stats()`` method returning a dict.
+            counters: Mapping of stats key to description, exported as ``_total``.
+            gauges: Mapping of stats key to description.
+        """
+        metrics = {}
+        for keys, suffix in ((counters or {}, "_total"), (gauges or {}, "")):
+            for key, description in keys.items():
+                metrics[key] = Gauge(
+                    f"{prefix}_{key}{suffix}",
+                    description,
+                    registry=None,
+                    multiprocess_mode="livesum",
+                )
+        self._sources.append((source, metrics))
+
+    def refresh(self, force=False):
+        """Copy current stats into the gauges unless refreshed recently.
+
+        Args:
+            force: Refresh regardless of ``interval``.
+        """
+        now = self._clock()
+        with self._lock:
+            if not force and self._refreshed is not None and now - self._refreshed < self.interval:
+                return
+            self._refreshed = now
+        for source, metrics in self._sources:
+            stats = source.stats()
+            for key, gauge in metrics.items():
+                gauge.set(stats[key])
+
+
+def _multiprocess_mode():
+    """Return whether metrics are shared between worker processes."""
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ or "prometheus_multiproc_dir" in os.environ
+
+
+def _register_stats(app, metrics, prefix, source, spec):
+    """Export a component's ``stats()`` on ``/metrics``."""
+    if not _multiprocess_mode():
+        metrics.registry.register(StatsCollector(prefix, source, **spec))
+        return
+
+    bridge = app.extensions.get("metrics_stats_bridge")
+    if bridge is None:
+        bridge = app.extensions["metrics_stats_bridge"] = MultiprocessStatsBridge()
+
+        @app.before_request
+        def refresh_stats_gauges():
+            """Publish this worker's component stats before scrapes see them."""
+            if not is_warmup_request():
+                bridge.refresh()
+
+    bridge.add(prefix, source, **spec)
+
+
+def setup_metrics(app):
     """Configure Prometheus metrics and CloudWatch integration.
 
     Args:
@@ -23,8 +261,12 @@ def setup_metrics(app):  # noqa: C901
         logger.info("Metrics disabled by configuration")
         return None
 
-    # Initialize Prometheus metrics
-    metrics = PrometheusMetrics(app)
+    # Initialize Prometheus metrics, aggregated across workers when shared
+    if _multiprocess_mode():
+        metrics = SharedPrometheusMetrics(app)
+    else:
+        metrics = PrometheusMetrics(app)
+    app.extensions["prometheus_metrics"] = metrics
 
     # Add application info metric
     metrics.info(
@@ -34,102 +276,224 @@ def setup_metrics(app):  # noqa: C901
         environment=app.config.get("ENVIRONMENT", "unknown"),
     )
 
+    log_pipeline = app.extensions.get("log_pipeline")
+    if log_pipeline is not None:
+        _register_stats(app, metrics, "log_pipeline", log_pipeline, LOG_PIPELINE_STATS)
+
+    tracer = app.extensions.get("tracer")
+    if tracer is not None and tracer.recording:
+        _register_stats(app, metrics, "tracing", tracer, TRACER_STATS)
+
+    limiter = app.extensions.get("concurrency_limiter")
+    if limiter is not None:
+        _register_stats(app, metrics, "concurrency_limiter", limiter, CONCURRENCY_LIMITER_STATS)
+
+    route_cache = app.extensions.get("route_cache")
+    if route_cache is not None:
+        _register_stats(app, metrics, "route_cache", route_cache, ROUTE_CACHE_STATS)
+
+    if app.config.get("LATENCY_QUANTILES_ENABLED", True):
+        setup_latency_quantiles(app, metrics)
+
     # CloudWatch integration (optional, enabled via config)
     if app.config.get("ENABLE_CLOUDWATCH", False):
-        try:
-            import boto3
-            from botocore.exceptions import ClientError
-
-            cloudwatch = boto3.client(
-                "cloudwatch", region_name=app.config.get("AWS_REGION", "us-east-1")
-            )
-
-            @app.after_request
-            def send_metrics_to_cloudwatch(response):
-                """Send custom metrics to CloudWatch after each request.
-
-                Args:
-                    response: Flask response object.
-
-                Returns:
-                    Unmodified response object.
-                """
-                # Skip metrics for health checks to reduce noise and costs
-                if request.path.startswith("/health") or request.path == "/metrics":
-                    return response
-
-                try:
-                    # Prepare metric data
-                    metric_data = [
-                        {
-                            "MetricName": "RequestCount",
-                            "Value": 1,
-                            "Unit": "Count",
-                            "Dimensions": [
-                                {
-                                    "Name": "Environment",
-                                    "Value": app.config.get("ENVIRONMENT", "unknown"),
-                                },
-                                {
-                                    "Name": "StatusCode",
-                                    "Value": str(response.status_code),
-                                },
-                                {
-                                    "Name": "Method",
-                                    "Value": request.method,
-                                },
-                                {
-                                    "Name": "Endpoint",
-                                    "Value": request.endpoint or "unknown",
-                                },
-                            ],
-                        }
-                    ]
-
-                    # Send metrics to CloudWatch (async would be better in production)
-                    cloudwatch.put_metric_data(
-                        Namespace=f"DemoApp/{app.config.get('ENVIRONMENT', 'dev')}",
-                        MetricData=metric_data,
-                    )
-
-                except ClientError as e:
-                    # Log error but don't fail the request
-                    logger.warning(
-                        "Failed to send metrics to CloudWatch: %s",
-                        e,
-                        extra={"extra_fields": {"error": str(e)}},
-                    )
-                except Exception as e:
-                    logger.exception(
-                        "Unexpected error sending CloudWatch metrics: %s",
-                        e,
-                        extra={"extra_fields": {"error": str(e)}},
-                    )
-
-                return response
-
-            logger.info("CloudWatch metrics integration enabled")
-
-        except ImportError:
-            logger.warning(
-                "boto3 not available, CloudWatch metrics disabled. "
-                "Install boto3 to enable CloudWatch integration."
-            )
-        except Exception as e:
-            logger.exception(
-                "Failed to initialize CloudWatch metrics: %s",
-                e,
-                extra={"extra_fields": {"error": str(e)}},
-            )
+        emitter = setup_cloudwatch(app)
+        if emitter is not None:
+            _register_stats(app, metrics, "cloudwatch_emitter", emitter, CLOUDWATCH_EMITTER_STATS)
 
     logger.info(
         "Metrics configured",
         extra={
             "extra_fields": {
                 "prometheus_enabled": True,
+                "prometheus_multiprocess": _multiprocess_mode(),
                 "cloudwatch_enabled": app.config.get("ENABLE_CLOUDWATCH", False),
             }
         },
     )
 
     return metrics
+
+
+def setup_latency_quantiles(app, metrics):
+    """Record every request's latency in windowed quantile sketches.
+
+    Sketches are exported on ``/metrics`` and ``/debug/latency``. In
+    multiprocess mode each worker publishes a snapshot to the shared metrics
+    directory at most every ``LATENCY_SKETCH_SYNC_INTERVAL`` seconds and
+    scrapes merge all of them. Snapshots are written by a background
+    thread, not by the request that finds one due.
+
+    Args:
+        app: Flask application instance.
+        metrics: PrometheusMetrics instance from ``setup_metrics``.
+
+    Returns:
+        LatencyQuantiles instance, also stored in ``app.extensions``.
+    """
+    latency = LatencyQuantiles(
+        relative_accuracy=app.config.get("LATENCY_SKETCH_ACCURACY", 0.02),
+    )
+    app.extensions["latency_quantiles"] = latency
+
+    directory = None
+    if _multiprocess_mode():
+        directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get(
+            "prometheus_multiproc_dir"
+        )
+        app.extensions["latency_quantiles_dir"] = directory
+    collector = LatencyQuantilesCollector(latency, directory)
+    if isinstance(metrics, SharedPrometheusMetrics):
+        metrics.merged_collectors.append(collector)
+    else:
+        metrics.registry.register(collector)
+
+    sync_interval = app.config.get("LATENCY_SKETCH_SYNC_INTERVAL", 5.0)
+    synced = [float("-inf")]
+    writer = None
+    if directory:
+        # One pending item is enough: each batch writes the latest state
+        writer = BackgroundBatcher(
+            lambda batch: latency.write_snapshot(directory),
+            name="latency-snapshots",
+            max_queue=1,
+            max_batch=1,
+            flush_interval=sync_interval,
+        )
+        app.extensions["latency_snapshot_writer"] = writer
+
+    @app.after_request
+    def record_latency(response):
+        """Count the request in its route's latency sketch.
+
+        Args:
+            response: Flask response object.
+
+        Returns:
+            Unmodified response object.
+        """
+        start = g.get("request_start")
+        if start is None or is_warmup_request():
+            return response
+        now = time.perf_counter()
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        latency.record(route, response.status_code, (now - start) * 1000)
+        if writer is not None and now - synced[0] >= sync_interval:
+            synced[0] = now
+            writer.submit(None)
+        return response
+
+    return latency
+
+
+def _create_api_emitter(app, namespace):
+    """Create a PutMetricData emitter, or None if boto3 is unavailable."""
+    from src.utils.cloudwatch import CloudWatchEmitter
+
+    try:
+        import boto3  # noqa: F401
+    except ImportError:
+        logger.warning(
+            "boto3 not available, CloudWatch metrics disabled. "
+            "Install boto3 to enable CloudWatch integration."
+        )
+        return None
+
+    def client_factory():
+        # The worker's shared client (src/utils/dependencies.py), set up after metrics
+        return app.extensions["dependencies"].aws_client("cloudwatch")
+
+    return CloudWatchEmitter(
+        client_factory,
+        namespace=namespace,
+        flush_interval=app.config.get("CLOUDWATCH_FLUSH_INTERVAL", 10.0),
+        max_queue=app.config.get("CLOUDWATCH_MAX_QUEUE", 10000),
+    )
+
+
+def _create_emf_logger(app):
+    """Return the logger EMF documents are written to.
+
+    Metrics must reach the log stream whatever ``LOG_LEVEL`` is, so the
+    logger has its own level and stdout handler and does not propagate to
+    the root logger's level-filtered handler.
+    """
+    from src.middleware.logging import create_json_formatter
+
+    emf_logger = logging.getLogger("src.metrics.emf")
+    emf_logger.setLevel(logging.INFO)
+    emf_logger.propagate = False
+    for handler in emf_logger.handlers[:]:
+        emf_logger.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(create_json_formatter(app))
+    emf_logger.addHandler(handler)
+    return emf_logger
+
+
+def setup_cloudwatch(app):
+    """Start the background CloudWatch emitter and register its hooks.
+
+    Requests are only sampled on the request thread; aggregation and output
+    happen on the emitter's flush thread. ``CLOUDWATCH_MODE`` selects the
+    output: ``api`` publishes with ``PutMetricData``, ``emf`` writes Embedded
+    Metric Format documents to the log stream and needs no boto3 at all.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        Emitter instance, or None if CloudWatch could not be enabled.
+    """
+    environment = app.config.get("ENVIRONMENT", "unknown")
+    namespace = f"DemoApp/{app.config.get('ENVIRONMENT', 'dev')}"
+    mode = app.config.get("CLOUDWATCH_MODE", "api")
+
+    if mode == "emf":
+        from src.utils.cloudwatch import EMFEmitter
+
+        emitter = EMFEmitter(
+            namespace,
+            flush_interval=app.config.get("CLOUDWATCH_FLUSH_INTERVAL", 10.0),
+            max_queue=app.config.get("CLOUDWATCH_MAX_QUEUE", 10000),
+            emf_logger=_create_emf_logger(app),
+        )
+    else:
+        emitter = _create_api_emitter(app, namespace)
+        if emitter is None:
+            return None
+
+    app.extensions["cloudwatch_emitter"] = emitter
+
+    @app.after_request
+    def send_metrics_to_cloudwatch(response):
+        """Queue a request sample for the background CloudWatch emitter.
+
+        Args:
+            response: Flask response object.
+
+        Returns:
+            Unmodified response object.
+        """
+        # Skip metrics for health checks to reduce noise and costs
+        if request.path.startswith("/health") or request.path == "/metrics" or is_warmup_request():
+            return response
+
+        start = g.get("request_start")
+        latency_ms = (time.perf_counter() - start) * 1000 if start is not None else 0.0
+        emitter.record(
+            (
+                ("Environment", environment),
+                ("StatusCode", str(response.status_code)),
+                ("Method", request.method),
+                ("Endpoint", request.endpoint or "unknown"),
+            ),
+            latency_ms,
+        )
+        return response
+
+    logger.info(
+        "CloudWatch metrics integration enabled",
+        extra={"extra_fields": {"cloudwatch_mode": mode}},
+    )
+    return emitter
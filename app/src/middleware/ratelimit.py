@@ -0,0 +1,209 @@
+"""Per-client rate limiting.
+
+Each client gets a token bucket per limited route (see
+``src/utils/ratelimit.py``), shared by all workers of the task. Clients are
+identified by ``RATE_LIMIT_KEY_HEADER`` (e.g. an API key) when sent, and
+otherwise by the address the ALB appended to ``X-Forwarded-For``. Requests
+over the limit are answered with 429 and ``Retry-After`` by the first
+``before_request`` hook, before any other hook or the view runs.
+
+Health probes, ``/metrics``, warm-up requests and the sub-requests of a
+batch are never limited; a batch counts as one request to ``/api/batch``.
+"""
+
+import logging
+import math
+from prometheus_client import Counter
+from flask import request
+
+from src.utils.ratelimit import SharedTokenBuckets, parse_rate_rules
+from src.utils.subrequest import BATCH_ID_ENVIRON_KEY
+from src.utils.warmup import WARMUP_ENVIRON_KEY
+
+logger = logging.getLogger(__name__)
+
+EXEMPT_ENDPOINTS = frozenset({"prometheus_metrics", "static"})
+EXEMPT_BLUEPRINTS = frozenset({"health"})
+# Bucket key prefix for routes without their own rule
+DEFAULT_ROUTE = "*"
+
+
+class RateLimiter:
+    """Decide whether a request is within its client's limit."""
+
+    def __init__(
+        self,
+        buckets,
+        rate=10.0,
+        burst=20.0,
+        rules="",
+        key_header="",
+        trusted_proxies=1,
+    ):
+        """Create a limiter.
+
+        Args:
+            buckets: SharedTokenBuckets instance.
+            rate: Default requests per second per client.
+            burst: Default bucket capacity.
+            rules: Per-route limits, see ``parse_rate_rules``.
+            key_header: Header identifying clients when present, e.g. ``X-API-Key``.
+            trusted_proxies: Proxies (ALBs) that append to ``X-Forwarded-For``;
+                the address added by the outermost one is used. 0 ignores the
+                header and uses the peer address.
+        """
+        self.buckets = buckets
+        self.rate = rate
+        self.burst = burst
+        self.rules = parse_rate_rules(rules)
+        self.key_environ = "HTTP_" + key_header.upper().replace("-", "_") if key_header else None
+        self.trusted_proxies = trusted_proxies
+
+    def client(self, environ):
+        """Return the client identity of a request.
+
+        Args:
+            environ: WSGI environ.
+
+        Returns:
+            ``key:<value>`` for a key header, otherwise the client address.
+        """
+        if self.key_environ is not None:
+            value = environ.get(self.key_environ)
+            if value:
+                return f"key:{value}"
+        forwarded = environ.get("HTTP_X_FORWARDED_FOR")
+        if forwarded and self.trusted_proxies:
+            hops = forwarded.split(",")
+            return hops[max(0, len(hops) - self.trusted_proxies)].strip()
+        return environ.get("REMOTE_ADDR", "")
+
+    def check(self, environ, route):
+        """Take a token for a request.
+
+        Args:
+            environ: WSGI environ.
+            route: Flask URL rule, or None when no route matched.
+
+        Returns:
+            None when allowed, otherwise seconds until the client may retry.
+        """
+        limit = self.rules.get(route)
+        if limit is None:
+            route, (rate, burst) = DEFAULT_ROUTE, (self.rate, self.burst)
+        else:
+            rate, burst = limit
+        if not rate:
+            return None
+        allowed, retry_after = self.buckets.take(f"{route}|{self.client(environ)}", rate, burst)
+        return None if allowed else retry_after
+
+
+class RateLimitMetrics:
+    """Prometheus counter of allowed and throttled requests per route."""
+
+    def __init__(self, registry):
+        """Create the counter.
+
+        Args:
+            registry: Prometheus registry to register it with.
+        """
+        self.requests = Counter(
+            "http_rate_limit_requests",
+            "Requests checked by the rate limiter",
+            ["route", "outcome"],
+            registry=registry,
+        )
+        self._children = {}
+
+    def record(self, route, outcome):
+        """Count one request.
+
+        Args:
+            route: Flask URL rule, or ``unmatched``.
+            outcome: ``allowed`` or ``throttled``.
+        """
+        child = self._children.get((route, outcome))
+        if child is None:
+            child = self._children[(route, outcome)] = self.requests.labels(route, outcome)
+        child.inc()
+
+
+def _exempt(environ, endpoint):
+    """Return whether a request bypasses the limiter."""
+    if WARMUP_ENVIRON_KEY in environ or BATCH_ID_ENVIRON_KEY in environ:
+        return True
+    if endpoint is None:
+        return False
+    return endpoint in EXEMPT_ENDPOINTS or endpoint.partition(".")[0] in EXEMPT_BLUEPRINTS
+
+
+def setup_rate_limit(app):
+    """Reject requests over their client's rate limit with 429.
+
+    Must run after ``setup_metrics`` so the counters are exported; the hook
+    is inserted first so rejected requests skip the other hooks.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        RateLimiter instance, also stored in ``app.extensions``, or None
+        when rate limiting is disabled.
+    """
+    if not app.config.get("RATE_LIMIT_ENABLED", False):
+        return None
+
+    buckets = SharedTokenBuckets(
+        slots=app.config.get("RATE_LIMIT_TABLE_SIZE", 8192),
+        path=app.config.get("RATE_LIMIT_SHM_PATH") or None,
+    )
+    limiter = RateLimiter(
+        buckets,
+        rate=app.config.get("RATE_LIMIT_RATE", 10.0),
+        burst=app.config.get("RATE_LIMIT_BURST", 20.0),
+        rules=app.config.get("RATE_LIMIT_RULES", ""),
+        key_header=app.config.get("RATE_LIMIT_KEY_HEADER", ""),
+        trusted_proxies=app.config.get("RATE_LIMIT_TRUSTED_PROXIES", 1),
+    )
+    app.extensions["rate_limiter"] = limiter
+    prometheus = app.extensions.get("prometheus_metrics")
+    metrics = RateLimitMetrics(prometheus.registry) if prometheus is not None else None
+
+    def enforce_rate_limit():
+        """Reject the request with 429 when its client is over the limit.
+
+        Returns:
+            None to continue, or a 429 response with ``Retry-After``.
+        """
+        environ = request.environ
+        if _exempt(environ, request.endpoint):
+            return None
+        rule = request.url_rule
+        route = rule.rule if rule is not None else None
+        retry_after = limiter.check(environ, route)
+        if metrics is not None:
+            metrics.record(route or "unmatched", "allowed" if retry_after is None else "throttled")
+        if retry_after is None:
+            return None
+        seconds = max(1, math.ceil(retry_after))
+        return (
+            {"error": "Too many requests", "retry_after": seconds},
+            429,
+            {"Retry-After": str(seconds)},
+        )
+
+    app.before_request_funcs.setdefault(None, []).insert(0, enforce_rate_limit)
+
+    logger.info(
+        "Rate limiting configured",
+        extra={
+            "extra_fields": {
+                "rate": limiter.rate,
+                "burst": limiter.burst,
+                "rules": len(limiter.rules),
+                "shared_path": app.config.get("RATE_LIMIT_SHM_PATH") or None,
+            }
+        },
+    )
+    return limiter
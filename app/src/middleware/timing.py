@@ -0,0 +1,240 @@
+"""Per-phase request timing and the Server-Timing response header.
+
+When ``PHASE_TIMING_ENABLED`` is set, every ``before_request``,
+``after_request`` and ``teardown_request`` hook and every view registered by
+``create_app`` is wrapped with a ``perf_counter_ns`` timer. Per-phase totals
+are exported on ``/metrics`` and, for requests that ask for it, returned in a
+``Server-Timing`` header. When disabled nothing is wrapped, so requests pay
+no overhead at all.
+"""
+
+import contextvars
+import functools
+import hmac
+import logging
+import time
+from prometheus_client import Counter
+from flask import request, g
+from src.utils.runtime_config import on_settings_change
+
+from src.utils.warmup import is_warmup_request
+
+logger = logging.getLogger(__name__)
+
+# Sent by clients holding SERVER_TIMING_TOKEN to get the header on demand
+TOKEN_HEADER = "X-Server-Timing-Token"
+
+# Current request's (phase, nanoseconds) list; a context variable rather than
+# ``g`` because the wrappers run several times per request and resolving the
+# ``g`` proxy costs more than the timing itself
+_timings = contextvars.ContextVar("phase_timings", default=None)
+
+_REGISTRIES = (
+    ("before_request_funcs", "before"),
+    ("after_request_funcs", "after"),
+    ("teardown_request_funcs", "teardown"),
+)
+
+
+def phase_name(func, kind):
+    """Return the phase name for a hook.
+
+    Hooks defined in this application are named after their function, and
+    third-party hooks after their package and kind, e.g.
+    ``prometheus_flask_exporter.before``.
+
+    Args:
+        func: Hook function.
+        kind: ``"before"``, ``"after"`` or ``"teardown"``.
+
+    Returns:
+        Phase name usable as a Server-Timing metric name.
+    """
+    module = getattr(func, "__module__", None) or ""
+    if module.startswith("src."):
+        return func.__name__
+    return f"{module.split('.')[0] or 'hook'}.{kind}"
+
+
+def _timed(func, phase):
+    """Wrap ``func`` so each call's duration is recorded under ``phase``.
+
+    The wrapper's ``timed_phase`` attribute holds the phase name, which
+    tells it apart from other decorators that set ``__wrapped__``.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings = _timings.get()
+            if timings is not None:
+                timings.append((phase, time.perf_counter_ns() - start))
+
+    wrapper.timed_phase = phase
+    return wrapper
+
+
+def format_server_timing(timings, total_ns=None):
+    """Format phase timings as a Server-Timing header value.
+
+    Repeated phases are summed; durations are in milliseconds.
+
+    Args:
+        timings: List of ``(phase, nanoseconds)`` tuples.
+        total_ns: Optional overall duration, added as ``total``.
+
+    Returns:
+        Header value, e.g. ``add_request_id;dur=0.012, view;dur=0.204``.
+    """
+    totals = {}
+    for phase, ns in timings:
+        totals[phase] = totals.get(phase, 0) + ns
+    if total_ns is not None:
+        totals["total"] = total_ns
+    return ", ".join(f"{phase};dur={ns / 1e6:.3f}" for phase, ns in totals.items())
+
+
+class PhaseMetrics:
+    """Prometheus counters with per-phase time and call totals."""
+
+    def __init__(self, registry):
+        """Create the counters.
+
+        Args:
+            registry: Prometheus registry to register them with.
+        """
+        self.seconds = Counter(
+            "http_request_phase_seconds",
+            "Time spent in each request phase (hooks and views)",
+            ["phase"],
+            registry=registry,
+        )
+        self.calls = Counter(
+            "http_request_phase_calls",
+            "Calls of each request phase (hooks and views)",
+            ["phase"],
+            registry=registry,
+        )
+        self._children = {}
+
+    def record(self, timings):
+        """Add one request's timings to the totals.
+
+        Args:
+            timings: List of ``(phase, nanoseconds)`` tuples.
+        """
+        for phase, ns in timings:
+            children = self._children.get(phase)
+            if children is None:
+                children = self._children[phase] = (
+                    self.seconds.labels(phase),
+                    self.calls.labels(phase),
+                )
+            children[0].inc(ns / 1e9)
+            children[1].inc()
+
+
+def _header_requested(always, token):
+    """Return whether the current request gets a Server-Timing header."""
+    if always:
+        return True
+    if not token:
+        return False
+    sent = request.headers.get(TOKEN_HEADER, "")
+    return bool(sent) and hmac.compare_digest(sent.encode(), token.encode())
+
+
+def _wrap_hooks(app):
+    """Wrap every registered hook and view with a phase timer."""
+    for attr, kind in _REGISTRIES:
+        registry = getattr(app, attr)
+        for key, funcs in registry.items():
+            registry[key] = [_timed(f, phase_name(f, kind)) for f in funcs]
+    for endpoint, view in app.view_functions.items():
+        app.view_functions[endpoint] = _timed(view, "view")
+
+
+def setup_phase_timing(app):
+    """Time each request phase, export totals and add Server-Timing headers.
+
+    Must run after all other middleware and blueprints are registered; hooks
+    and views added later are not timed.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        PhaseMetrics instance, or None when timing or metrics are disabled.
+    """
+    if not app.config.get("PHASE_TIMING_ENABLED", False):
+        return None
+
+    _wrap_hooks(app)
+
+    prometheus = app.extensions.get("prometheus_metrics")
+    phase_metrics = PhaseMetrics(prometheus.registry) if prometheus is not None else None
+    always = app.config.get("SERVER_TIMING_ENABLED", False)
+    token = app.config.get("SERVER_TIMING_TOKEN", "")
+
+    def apply_settings(settings):
+        """Apply a reloaded SERVER_TIMING_ENABLED."""
+        nonlocal always
+        always = settings.server_timing_enabled
+
+    on_settings_change(app, apply_settings)
+
+    def start_phase_timing():
+        """Start collecting this request's phase timings."""
+        g.phase_timing_start = time.perf_counter_ns()
+        g.phase_timing_token = _timings.set([])
+
+    def add_server_timing(response):
+        """Add the Server-Timing header when requested.
+
+        Args:
+            response: Flask response object.
+
+        Returns:
+            Response object with the header added when requested.
+        """
+        timings = _timings.get()
+        if timings is not None and _header_requested(always, token):
+            total = time.perf_counter_ns() - g.phase_timing_start
+            response.headers["Server-Timing"] = format_server_timing(timings, total)
+        return response
+
+    def record_phase_timings(exc):
+        """Add this request's phase timings to the exported totals.
+
+        Args:
+            exc: Exception raised during the request, if any.
+        """
+        token = g.pop("phase_timing_token", None)
+        if token is None:
+            return
+        timings = _timings.get()
+        # Restore the enclosing request's list for in-process sub-requests
+        _timings.reset(token)
+        if timings and phase_metrics is not None and not is_warmup_request():
+            phase_metrics.record(timings)
+
+    # Start first; add the header and record totals after every other hook,
+    # since after_request and teardown hooks run in reverse order
+    app.before_request_funcs.setdefault(None, []).insert(0, start_phase_timing)
+    app.after_request_funcs.setdefault(None, []).insert(0, add_server_timing)
+    app.teardown_request_funcs.setdefault(None, []).insert(0, record_phase_timings)
+
+    logger.info(
+        "Phase timing configured",
+        extra={
+            "extra_fields": {
+                "server_timing_always": always,
+                "server_timing_token": bool(token),
+                "phase_metrics": phase_metrics is not None,
+            }
+        },
+    )
+    return phase_metrics
@@ -0,0 +1,170 @@
+"""W3C trace context propagation and request span recording.
+
+Every request continues the caller's ``traceparent`` or starts a new trace;
+its trace and span IDs are added to every log line of the request. With
+``TRACE_EXPORTER`` set, the request's spans are buffered and tail sampled
+(see ``src/utils/tracing.py``): errors and slow requests are always
+exported, the rest at ``TRACE_SAMPLE_RATE``.
+"""
+
+import logging
+from flask import request, g
+from src.utils.runtime_config import on_settings_change
+
+from src.utils.tracing import FileSpanSink, OTLPHTTPSpanSink, Tracer
+from src.utils.warmup import WARMUP_ENVIRON_KEY
+
+logger = logging.getLogger(__name__)
+
+# The request's RequestTrace; kept in the WSGI environ rather than ``g`` because
+# it is per request even when the caller pushed a shared app context
+TRACE_ENVIRON_KEY = "demo_app.trace"
+
+
+def _file_sink(app, resource):
+    return FileSpanSink(app.config.get("TRACE_EXPORT_PATH", "traces-{pid}.jsonl"), resource)
+
+
+def _otlp_sink(app, resource):
+    return OTLPHTTPSpanSink(
+        app.config.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"), resource
+    )
+
+
+# TRACE_EXPORTER values and the sink factories they select
+SPAN_SINKS = {
+    "file": _file_sink,
+    "otlp": _otlp_sink,
+}
+
+
+def create_span_sink(app):
+    """Create the span sink selected by ``TRACE_EXPORTER``.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        Sink instance, or None when no exporter is configured.
+
+    Raises:
+        ValueError: If ``TRACE_EXPORTER`` names an unknown sink.
+    """
+    name = app.config.get("TRACE_EXPORTER", "")
+    if not name:
+        return None
+    factory = SPAN_SINKS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {name!r}")
+    resource = {
+        "service.name": app.config.get("APP_NAME", "demo-app"),
+        "service.version": app.config.get("APP_VERSION", "unknown"),
+        "deployment.environment": app.config.get("ENVIRONMENT", "unknown"),
+    }
+    return factory(app, resource)
+
+
+def _describe_request(root, status_code):
+    """Name the root span after the route and add the request's attributes."""
+    route = request.url_rule.rule if request.url_rule is not None else None
+    root.name = f"{request.method} {route or request.path}"
+    attributes = root.attributes
+    if route is not None:
+        attributes["http.route"] = route
+    attributes["http.request.method"] = request.method
+    attributes["url.path"] = request.path
+    attributes["http.response.status_code"] = status_code
+    attributes["request_id"] = g.get("request_id")
+
+
+def setup_tracing(app):
+    """Propagate trace context and record request spans.
+
+    Must run after ``setup_logging``: the trace is started before any other
+    hook, so the log context captured by ``add_request_id`` includes it.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        Tracer instance, also stored in ``app.extensions``, or None when
+        tracing is disabled.
+    """
+    if not app.config.get("TRACING_ENABLED", True):
+        return None
+
+    tracer = Tracer(
+        sink=create_span_sink(app),
+        sample_rate=app.config.get("TRACE_SAMPLE_RATE", 0.01),
+        slow_ms=app.config.get("TRACE_SLOW_MS", 500.0),
+        max_spans=app.config.get("TRACE_MAX_SPANS", 256),
+        flush_interval=app.config.get("TRACE_EXPORT_INTERVAL", 5.0),
+        max_queue=app.config.get("TRACE_MAX_QUEUE", 2048),
+    )
+    app.extensions["tracer"] = tracer
+    on_settings_change(app, tracer.configure)
+
+    def start_trace():
+        """Continue or start the request's trace."""
+        environ = request.environ
+        if WARMUP_ENVIRON_KEY in environ:
+            return
+        # The root span is named after the route once it is known
+        environ[TRACE_ENVIRON_KEY] = tracer.start_request(
+            environ.get("REQUEST_METHOD", "GET"),
+            environ.get("HTTP_TRACEPARENT"),
+            environ.get("HTTP_TRACESTATE"),
+        )
+
+    @app.after_request
+    def record_trace_status(response):
+        """Record the response status on the request's trace.
+
+        Args:
+            response: Flask response object.
+
+        Returns:
+            Unmodified response object.
+        """
+        trace = request.environ.get(TRACE_ENVIRON_KEY)
+        if trace is not None:
+            trace.status_code = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_trace(exc):
+        """End the request's trace and export it if tail sampling keeps it.
+
+        Request attributes are only collected for kept traces, so discarded
+        ones cost nothing beyond their IDs.
+
+        Args:
+            exc: Exception raised during the request, if any.
+        """
+        trace = request.environ.pop(TRACE_ENVIRON_KEY, None)
+        if trace is None:
+            return
+        root = trace.root
+        if exc is not None:
+            root.error = type(exc).__name__
+        status_code = trace.status_code or 500
+        reason = tracer.finish_request(trace, status_code)
+        if reason is None:
+            return
+        _describe_request(root, status_code)
+        tracer.export(trace, reason)
+
+    # Before add_request_id, which captures the trace into the log context
+    app.before_request_funcs.setdefault(None, []).insert(0, start_trace)
+
+    logger.info(
+        "Tracing configured",
+        extra={
+            "extra_fields": {
+                "exporter": app.config.get("TRACE_EXPORTER", "") or None,
+                "sample_rate": tracer.sample_rate,
+                "slow_ms": tracer.slow_ms,
+            }
+        },
+    )
+    return tracer
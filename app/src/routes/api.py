@@ -3,18 +3,31 @@
 Simple demonstration API with hello-world functionality.
 """
 
+import json
 from datetime import datetime, timezone
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, g, jsonify, request, current_app, stream_with_context
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.wsgi import get_input_stream
 import socket
 
+from src.utils.route_cache import cache_response
+from src.utils.runtime_config import current_settings
+from src.utils.static_payload import static_response
+from src.utils.subrequest import batch_dispatcher
 
 bp = Blueprint("api", __name__, url_prefix="/api")
 
+ECHO_PLACEHOLDER = "__echo_payload__"
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 @bp.route("/hello", methods=["GET"])
+@cache_response(query_args=("name",), timestamp="timestamp")
 def hello():
     """Hello world endpoint.
 
+    Cached per ``name`` when the route cache is enabled.
+
     Returns:
         JSON response with greeting and metadata.
     """
@@ -24,7 +37,7 @@ def hello():
         jsonify(
             {
                 "message": f"Hello, {name}!",
-                "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                "timestamp": datetime.now(timezone.utc),
                 "service": current_app.config.get("APP_NAME", "demo-app"),
                 "version": current_app.config.get("APP_VERSION", "unknown"),
                 "environment": current_app.config.get("ENVIRONMENT", "unknown"),
@@ -35,33 +48,78 @@ def hello():
     )
 
 
+def _info_payload(app):
+    """Build the /api/info body from configuration."""
+    return {
+        "service": {
+            "name": app.config.get("APP_NAME", "demo-app"),
+            "version": app.config.get("APP_VERSION", "unknown"),
+            "environment": app.config.get("ENVIRONMENT", "unknown"),
+        },
+        "platform": {
+            "hostname": socket.gethostname(),
+            "region": app.config.get("AWS_REGION", "unknown"),
+        },
+        "features": {
+            "metrics_enabled": app.config.get("ENABLE_METRICS", False),
+            "cloudwatch_enabled": app.config.get("ENABLE_CLOUDWATCH", False),
+        },
+        # Changes when runtime settings are reloaded (src/utils/runtime_config.py)
+        "config_version": app.extensions["runtime_config"].current.version,
+    }
+
+
 @bp.route("/info", methods=["GET"])
 def info():
     """Service information endpoint.
 
+    The body is serialized once per worker; see ``src.utils.static_payload``.
+
     Returns:
         JSON response with service metadata and configuration.
     """
-    return (
-        jsonify(
-            {
-                "service": {
-                    "name": current_app.config.get("APP_NAME", "demo-app"),
-                    "version": current_app.config.get("APP_VERSION", "unknown"),
-                    "environment": current_app.config.get("ENVIRONMENT", "unknown"),
-                },
-                "platform": {
-                    "hostname": socket.gethostname(),
-                    "region": current_app.config.get("AWS_REGION", "unknown"),
-                },
-                "features": {
-                    "metrics_enabled": current_app.config.get("ENABLE_METRICS", False),
-                    "cloudwatch_enabled": current_app.config.get("ENABLE_CLOUDWATCH", False),
-                },
-                "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-            }
-        ),
-        200,
+    return static_response("api.info", _info_payload)
+
+
+def _raw_mode():
+    """Return whether /api/echo should pass the request body through unparsed."""
+    raw = request.args.get("raw")
+    if raw is None:
+        return current_settings().echo_raw_passthrough
+    return raw.lower() in ("1", "true", "yes")
+
+
+def _echo_raw():
+    """Validate the JSON body and splice the original bytes into the envelope.
+
+    The body is only parsed to validate it; the response reuses the request
+    bytes instead of re-serializing a Python object graph.
+    """
+    if not request.is_json:
+        raise UnsupportedMediaType(
+            "Did not attempt to load JSON data because the request Content-Type "
+            "was not 'application/json'."
+        )
+    body = request.get_data()
+    if json.detect_encoding(body) != "utf-8":
+        return None
+    try:
+        data = current_app.json.loads(body)
+    except ValueError:
+        raise BadRequest("Failed to decode JSON object") from None
+    if not data:
+        body = b"{}"
+
+    envelope = current_app.json.response(
+        {
+            "echo": ECHO_PLACEHOLDER,
+            "timestamp": datetime.now(timezone.utc),
+            "content_type": request.content_type,
+        }
+    ).get_data()
+    prefix, _, suffix = envelope.partition(f'"{ECHO_PLACEHOLDER}"'.encode())
+    return current_app.response_class(
+        b"".join((prefix, body, suffix)), mimetype=current_app.json.mimetype
     )
 
 
@@ -69,18 +127,152 @@ def info():
 def echo():
     """Echo endpoint that returns the posted JSON data.
 
+    Bodies larger than ``MAX_CONTENT_LENGTH`` are rejected with 413 before
+    they are read. With ``?raw=1`` (or ``ECHO_RAW_PASSTHROUGH``) the body is
+    validated and echoed byte for byte instead of being re-serialized.
+
     Returns:
         JSON response echoing the request payload.
     """
+    if _raw_mode():
+        response = _echo_raw()
+        if response is not None:
+            return response
+
     data = request.get_json() or {}
 
     return (
         jsonify(
             {
                 "echo": data,
-                "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                "timestamp": datetime.now(timezone.utc),
                 "content_type": request.content_type,
             }
         ),
         200,
     )
+
+
+def _validated_lines(lines, first_line_no):
+    """Return non-blank NDJSON lines up to the first invalid one, and its error."""
+    valid = []
+    for offset, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            current_app.json.loads(line)
+        except ValueError:
+            return valid, f"Invalid JSON on line {first_line_no + offset}"
+        valid.append(line)
+    return valid, None
+
+
+def _stream_error(message):
+    """Render an in-band NDJSON error record."""
+    return json.dumps({"error": message}).encode() + b"\n"
+
+
+def _echo_ndjson(stream, max_line):
+    """Yield validated NDJSON records as they are read from ``stream``.
+
+    Memory stays bounded by the chunk size plus ``max_line``. Errors after
+    the response has started are reported as a final ``{"error": ...}`` record.
+    """
+    buffer = b""
+    line_no = 1
+    try:
+        while True:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                lines, buffer = [buffer], b""
+            else:
+                *lines, buffer = (buffer + chunk).split(b"\n")
+            valid, error = _validated_lines(lines, line_no)
+            line_no += len(lines)
+            if valid:
+                yield b"\n".join(valid) + b"\n"
+            if error is None and len(buffer) > max_line:
+                error = f"Line {line_no} exceeds {max_line} bytes"
+            if error is not None:
+                yield _stream_error(error)
+                return
+            if not chunk:
+                return
+    except RequestEntityTooLarge:
+        yield _stream_error("Request body too large")
+
+
+@bp.route("/echo/stream", methods=["POST"])
+def echo_stream():
+    """Echo an NDJSON request body record by record.
+
+    Records are validated and written back as they are read in chunks, so
+    memory use does not grow with the payload size. The body is limited by
+    ``ECHO_STREAM_MAX_BYTES`` rather than ``MAX_CONTENT_LENGTH``.
+
+    Returns:
+        Streamed ``application/x-ndjson`` response.
+    """
+    settings = current_settings()
+    stream = get_input_stream(request.environ, max_content_length=settings.echo_stream_max_bytes)
+    max_line = settings.echo_stream_max_line
+    return current_app.response_class(
+        stream_with_context(_echo_ndjson(stream, max_line)), mimetype="application/x-ndjson"
+    )
+
+
+def _batch_specs(payload):
+    """Validate a batch body and return its sub-request specs."""
+    specs = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(specs, list) or not specs:
+        raise BadRequest("Expected a non-empty 'requests' list")
+    limit = current_settings().batch_max_requests
+    if len(specs) > limit:
+        raise BadRequest(f"At most {limit} requests can be batched")
+    for spec in specs:
+        path = spec.get("path") if isinstance(spec, dict) else None
+        if not isinstance(path, str) or not path.startswith("/"):
+            raise BadRequest("Each request needs a 'path' starting with '/'")
+        if not isinstance(spec.get("method", "GET"), str):
+            raise BadRequest("'method' must be a string")
+        if not isinstance(spec.get("headers") or {}, dict):
+            raise BadRequest("'headers' must be an object")
+    return specs
+
+
+@bp.route("/batch", methods=["POST"])
+def batch():
+    """Execute several API calls in one round trip.
+
+    The body is ``{"requests": [{"method", "path", "headers", "body"}, ...],
+    "parallel": false}``. Each sub-request goes through the middleware stack
+    in-process with its own request ID (``<batch id>.<index>``) and metrics
+    labels; the batch emits a single aggregated access log line.
+
+    Returns:
+        JSON response with one ``{"status", "request_id", "duration_ms",
+        "body"}`` result per sub-request, in request order.
+    """
+    payload = request.get_json()
+    specs = _batch_specs(payload)
+    parallel = bool(payload.get("parallel", False))
+    results = batch_dispatcher().dispatch(specs, g.request_id, parallel=parallel)
+
+    g.log_fields = {
+        "batch": {
+            "size": len(results),
+            "parallel": parallel,
+            "requests": [
+                {key: r[key] for key in ("request_id", "method", "path", "status", "duration_ms")}
+                for r in results
+            ],
+        }
+    }
+    return jsonify(
+        {
+            "responses": [
+                {key: r[key] for key in ("status", "request_id", "duration_ms", "body")}
+                for r in results
+            ]
+        }
+    )
@@ -0,0 +1,281 @@
+"""Debug endpoints.
+
+Only registered when ``ENABLE_DEBUG_ENDPOINTS`` is set. Requests must send
+``Authorization: Bearer <DEBUG_TOKEN>``; without a configured token every
+endpoint answers 403. The profiler and allocation tracing endpoints
+additionally need ``PROFILER_ENABLED`` or ``MEMORY_TRACE_ENABLED``.
+"""
+
+import hmac
+
+from flask import Blueprint, abort, current_app, jsonify, request
+from werkzeug.exceptions import BadRequest
+
+from src.utils.memory import GROUP_BY, TracerBusy
+from src.utils.profiler import MIN_INTERVAL, ProfilerBusy
+
+bp = Blueprint("debug", __name__, url_prefix="/debug")
+
+
+@bp.before_request
+def require_token():
+    """Reject requests without the configured debug token, and all of them without one."""
+    token = current_app.config.get("DEBUG_TOKEN")
+    if not token or not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        abort(403)
+
+
+def _quantile_name(q):
+    """Return a label such as ``p99`` or ``p99.9`` for a quantile."""
+    return f"p{q * 100:g}"
+
+
+@bp.route("/latency", methods=["GET"])
+def latency():
+    """Latency quantiles per route and status class.
+
+    In multiprocess mode the snapshots of all workers are merged.
+
+    Returns:
+        JSON response with milliseconds per window, route and status class.
+    """
+    quantiles = current_app.extensions.get("latency_quantiles")
+    if quantiles is None:
+        abort(404)
+    directory = current_app.extensions.get("latency_quantiles_dir")
+    snapshots = quantiles.read_snapshots(directory) if directory else ()
+
+    windows = {window: [] for window in quantiles.windows}
+    for (route, status_class), summaries in sorted(quantiles.summaries(snapshots).items()):
+        for window, summary in summaries.items():
+            entry = {
+                "route": route,
+                "status_class": status_class,
+                "count": summary["count"],
+                "mean_ms": round(summary["sum"] / summary["count"], 3),
+            }
+            for q, value in summary["quantiles"].items():
+                entry[f"{_quantile_name(q)}_ms"] = round(value, 3)
+            windows[window].append(entry)
+
+    return jsonify(
+        {
+            "relative_accuracy": quantiles.mapping.relative_accuracy,
+            "workers": len(snapshots) + 1,
+            "windows": windows,
+        }
+    )
+
+
+def _profiler():
+    """Return the app's profiler, or abort with 404 when it is disabled."""
+    profiler = current_app.extensions.get("profiler")
+    if profiler is None:
+        abort(404)
+    return profiler
+
+
+def _number(name, default, minimum, maximum=None, kind=float):
+    """Read a numeric query argument within bounds, or abort with 400."""
+    raw = request.args.get(name)
+    try:
+        value = default if raw is None else kind(raw)
+    except ValueError:
+        value = None
+    if value is None or not minimum <= value <= (maximum if maximum is not None else value):
+        bounds = f"between {minimum} and {maximum}" if maximum is not None else f">= {minimum}"
+        raise BadRequest(f"'{name}' must be a number {bounds}")
+    return value
+
+
+def _collapsed_response(sampler, **headers):
+    """Return a profile as a collapsed-stack text response."""
+    response = current_app.response_class(sampler.collapsed(), mimetype="text/plain")
+    response.headers["X-Profile-Samples"] = str(sampler.samples)
+    for name, value in headers.items():
+        response.headers[name] = value
+    return response
+
+
+@bp.route("/profile", methods=["GET"])
+def profile():
+    """Sample every thread of this worker for ``seconds``.
+
+    Query args:
+        seconds: Duration, up to ``PROFILER_MAX_SECONDS`` (default 5).
+        interval_ms: Sampling interval, up to ``seconds`` (default
+            ``PROFILER_INTERVAL_MS``).
+
+    Returns:
+        Collapsed stacks as text, or 409 if a profile is already running.
+    """
+    profiler = _profiler()
+    seconds = _number("seconds", 5.0, 0.01, profiler.max_seconds)
+    interval_ms = _number(
+        "interval_ms", profiler.interval * 1000, MIN_INTERVAL * 1000, seconds * 1000
+    )
+    try:
+        sampler = profiler.profile(seconds, interval_ms / 1000)
+    except ProfilerBusy:
+        return jsonify({"error": "A profile is already running"}), 409
+    return _collapsed_response(sampler)
+
+
+@bp.route("/profile/requests", methods=["POST"])
+def arm_request_profile():
+    """Profile every ``every``-th request served by this worker, ``count`` times.
+
+    Returns:
+        JSON status of the new request profile.
+    """
+    profiler = _profiler()
+    every = _number("every", 1, 1, kind=int)
+    count = _number("count", 10, 1, 1000, kind=int)
+    profiler.arm(every, count)
+    status, _ = profiler.request_status()
+    return jsonify(status), 202
+
+
+@bp.route("/profile/requests", methods=["GET"])
+def request_profile():
+    """Stacks collected so far by the request profile.
+
+    Returns:
+        Collapsed stacks as text with progress in ``X-Profile-Requests``,
+        or 404 if request profiling was never armed.
+    """
+    status, sampler = _profiler().request_status()
+    if status is None:
+        abort(404)
+    return _collapsed_response(
+        sampler, **{"X-Profile-Requests": f"{status['profiled']}/{status['count']}"}
+    )
+
+
+@bp.route("/memory", methods=["GET"])
+def memory():
+    """Memory and garbage collection figures of this worker, sampled now.
+
+    Returns:
+        JSON response with RSS, Python allocator blocks, GC counts and pause
+        totals, the recycling threshold and, if tracing, tracemalloc totals.
+    """
+    monitor = current_app.extensions.get("memory_monitor")
+    if monitor is None:
+        abort(404)
+    monitor.check(force=True)
+    status = monitor.stats()
+    tracer = current_app.extensions.get("allocation_tracer")
+    if tracer is not None:
+        status["tracemalloc"] = tracer.status()
+    return jsonify(status)
+
+
+def _allocation_tracer():
+    """Return the app's allocation tracer, or abort with 404 when it is disabled."""
+    tracer = current_app.extensions.get("allocation_tracer")
+    if tracer is None:
+        abort(404)
+    return tracer
+
+
+@bp.route("/memory/trace", methods=["POST"])
+def start_allocation_trace():
+    """Start tracing allocations in this worker and take the baseline for diffs.
+
+    Tracing slows every allocation until it is stopped; posting again while
+    tracing only takes a new baseline.
+
+    Returns:
+        JSON tracemalloc status, or 409 if a snapshot is being taken.
+    """
+    tracer = _allocation_tracer()
+    try:
+        tracer.start()
+    except TracerBusy:
+        return jsonify({"error": "A snapshot is already being taken"}), 409
+    return jsonify(tracer.status()), 202
+
+
+@bp.route("/memory/trace", methods=["GET"])
+def allocation_sites():
+    """Top allocation sites of this worker.
+
+    Query args:
+        limit: Sites to return, up to 100 (default 20).
+        group_by: ``filename``, ``lineno`` (default) or ``traceback``.
+        diff: ``true`` to rank sites by growth since the baseline.
+
+    Returns:
+        JSON response with the sites, 409 if not tracing or a snapshot is
+        being taken.
+    """
+    tracer = _allocation_tracer()
+    limit = _number("limit", 20, 1, 100, kind=int)
+    group_by = request.args.get("group_by", "lineno")
+    if group_by not in GROUP_BY:
+        raise BadRequest(f"'group_by' must be one of {', '.join(GROUP_BY)}")
+    diff = request.args.get("diff", "false").lower() == "true"
+    try:
+        sites = tracer.top(limit, group_by, diff=diff)
+    except TracerBusy:
+        return jsonify({"error": "A snapshot is already being taken"}), 409
+    except RuntimeError:
+        return jsonify({"error": "Not tracing; POST /debug/memory/trace first"}), 409
+    return jsonify(dict(tracer.status(), group_by=group_by, diff=diff, sites=sites))
+
+
+@bp.route("/memory/trace", methods=["DELETE"])
+def stop_allocation_trace():
+    """Stop tracing allocations in this worker.
+
+    Returns:
+        JSON tracemalloc status.
+    """
+    tracer = _allocation_tracer()
+    tracer.stop()
+    return jsonify(tracer.status())
+
+
+def _config_status(runtime):
+    """Return the runtime settings as reported by /debug/config."""
+    return {
+        "version": runtime.current.version,
+        "settings": runtime.current.as_config(),
+        "overrides": runtime.overrides,
+        "path": runtime.path,
+        "reloads": runtime.reloads,
+    }
+
+
+@bp.route("/config", methods=["GET"])
+def runtime_config():
+    """Runtime settings of this worker.
+
+    Returns:
+        JSON response with the settings, their version and the overrides.
+    """
+    return jsonify(_config_status(current_app.extensions["runtime_config"]))
+
+
+@bp.route("/config", methods=["PUT"])
+def update_runtime_config():
+    """Override runtime settings in this worker and, through the file, the others.
+
+    The body is a JSON object of setting names to values; null removes an
+    override.
+
+    Returns:
+        JSON response with the new settings, or 400 if a value is invalid.
+    """
+    changes = request.get_json()
+    if not isinstance(changes, dict):
+        raise BadRequest("Expected a JSON object of settings")
+    runtime = current_app.extensions["runtime_config"]
+    try:
+        runtime.update(changes)
+    except ValueError as exc:
+        raise BadRequest(str(exc)) from None
+    return jsonify(_config_status(runtime))
@@ -2,58 +2,87 @@
 
 Implements Kubernetes-style health probes:
 - /health - Basic health check
-- /health/ready - Readiness probe (checks dependencies)
+- /health/ready - Readiness probe (cached dependency checks)
 - /health/live - Liveness probe (checks if app is alive)
 """
 
 from datetime import datetime, timezone
 from flask import Blueprint, jsonify, current_app
 
+from src.utils.static_payload import static_response
+
 
 bp = Blueprint("health", __name__)
 
 
+def _health_payload(app):
+    """Build the /health body from configuration."""
+    return {
+        "status": "healthy",
+        "service": app.config.get("APP_NAME", "demo-app"),
+        "version": app.config.get("APP_VERSION", "unknown"),
+        "environment": app.config.get("ENVIRONMENT", "unknown"),
+    }
+
+
 @bp.route("/health", methods=["GET"])
 def health():
     """Return basic health check information.
 
+    The body is serialized once per worker; see ``src.utils.static_payload``.
+
     Returns:
         JSON response with health status and metadata.
     """
-    return (
-        jsonify(
-            {
-                "status": "healthy",
-                "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-                "service": current_app.config.get("APP_NAME", "demo-app"),
-                "version": current_app.config.get("APP_VERSION", "unknown"),
-                "environment": current_app.config.get("ENVIRONMENT", "unknown"),
-            }
-        ),
-        200,
-    )
+    return static_response("health", _health_payload)
 
 
 @bp.route("/health/ready", methods=["GET"])
 def ready():
     """Check if the application is ready to serve traffic.
 
-    Checks if the application is ready to serve traffic.
-    In a real application, this would check:
-    - Database connectivity
-    - Cache availability
-    - External service dependencies
+    Reports the cached results of the dependency checks registered in
+    ``src.utils.health_checks`` (database, cache, external services).
+    Stale results are refreshed in the background, so the probe itself
+    is answered from memory. With concurrency limiting enabled, a worker
+    that keeps shedding requests reports ``concurrency: overloaded``.
+
+    A process that has not warmed up yet (see ``src.utils.warmup``)
+    reports ``warmup: pending``; the probe never runs the warm-up itself.
 
     Returns:
         JSON response with readiness status and dependency checks.
     """
-    checks = {}
-    all_ready = True
-
-    # Example dependency checks (simulated for demo)
-    # In production, replace with actual dependency health checks
-    checks["database"] = "ok"  # Replace with actual DB check
-    checks["cache"] = "ok"  # Replace with actual cache check
+    registry = current_app.extensions["health_checks"]
+    results = registry.results()
+    now = registry.clock()
+
+    checks = {name: result.status for name, result in results.items()}
+    details = {
+        name: {
+            "status": result.status,
+            "latency_ms": result.latency_ms,
+            "age_seconds": round(now - result.checked_at, 3),
+        }
+        for name, result in results.items()
+    }
+
+    warmup = current_app.extensions.get("warmup")
+    if warmup is not None and not warmup.warmed:
+        checks["warmup"] = "pending"
+        details["warmup"] = {"status": "pending"}
+
+    limiter = current_app.extensions.get("concurrency_limiter")
+    if limiter is not None:
+        # Sustained shedding takes the worker out of rotation until it recovers
+        stats = limiter.stats()
+        status = "overloaded" if stats["overloaded"] else "ok"
+        checks["concurrency"] = status
+        details["concurrency"] = {
+            "status": status,
+            "limit": stats["limit"],
+            "inflight": stats["inflight"],
+        }
 
     # Determine overall status
     all_ready = all(status == "ok" for status in checks.values())
@@ -64,7 +93,8 @@ def ready():
             {
                 "status": "ready" if all_ready else "not_ready",
                 "checks": checks,
-                "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                "details": details,
+                "timestamp": datetime.now(timezone.utc),
             }
         ),
         status_code,
@@ -85,7 +115,7 @@ def live():
         jsonify(
             {
                 "status": "alive",
-                "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                "timestamp": datetime.now(timezone.utc),
             }
         ),
         200,
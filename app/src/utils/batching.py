@@ -0,0 +1,206 @@
+"""Bounded background batching.
+
+Request threads hand items to a ``BackgroundBatcher`` without blocking; a
+daemon thread drains the queue and passes items to a handler in batches,
+either when enough items are pending or when the flush interval elapses.
+When the queue is full the ``overflow`` policy decides what happens:
+``drop`` discards the new item, ``drop_oldest`` evicts the oldest queued
+item, and ``block`` waits for space. The thread delivering a batch never
+waits, since only it would make space: items it submits itself, such as
+the log record of a failing handler, are dropped when the queue is full.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import weakref
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop", "drop_oldest", "block")
+
+# Batchers still alive in this process, flushed once at interpreter exit
+_live_batchers = weakref.WeakSet()
+
+
+class BackgroundBatcher:
+    """Deliver queued items to a handler in batches from a daemon thread.
+
+    The worker thread is started lazily on first use and restarted in a
+    forked child, so a batcher created in the gunicorn master (preload)
+    is safe to use in every worker.
+    """
+
+    def __init__(
+        self,
+        handler,
+        name,
+        max_queue=10000,
+        max_batch=500,
+        flush_interval=10.0,
+        overflow="drop",
+    ):
+        """Create a batcher.
+
+        Args:
+            handler: Callable receiving a list of items.
+            name: Thread name, used in logs.
+            max_queue: Maximum pending items before the overflow policy applies.
+            max_batch: Maximum items per handler call; reaching it triggers a flush.
+            flush_interval: Seconds between time-triggered flushes.
+            overflow: One of ``OVERFLOW_POLICIES``.
+
+        Raises:
+            ValueError: If ``overflow`` is not a known policy.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.name = name
+        self.overflow = overflow
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._handler = handler
+        self.dropped = 0
+        self.processed = 0
+        self._reset()
+        _live_batchers.add(self)
+
+    def _reset(self):
+        # Also called in a forked child: the parent's queue, locks and thread
+        # are not ours, and its pending items are flushed by the parent.
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        # Thread running the handler, which must not wait for queue space
+        self._flushing = None
+        self._pid = os.getpid()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None and not self._stopping.is_set():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    @property
+    def depth(self):
+        """Return the number of items waiting to be flushed."""
+        return self._queue.qsize()
+
+    def submit(self, item):
+        """Queue an item, applying the overflow policy when the queue is full.
+
+        Only the ``block`` policy ever waits, and never on the thread that
+        is delivering a batch, where it would wait for itself.
+
+        Args:
+            item: Item to hand to the handler on the next flush.
+
+        Returns:
+            True if queued, False if dropped because the queue is full.
+        """
+        self._ensure_started()
+        if self.overflow == "block" and self._flushing != threading.get_ident():
+            if self._queue.full():
+                self._wakeup.set()
+            self._queue.put(item)
+        else:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    if not self._make_room():
+                        return False
+        if self._queue.qsize() >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    def _make_room(self):
+        """Drop the new or the oldest item; return True if the new one should be retried."""
+        if self.overflow == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return True
+        with self._lock:
+            self.dropped += 1
+        return self.overflow == "drop_oldest"
+
+    def flush(self):
+        """Deliver everything queued so far on the calling thread."""
+        with self._flush_lock:
+            self._flushing = threading.get_ident()
+            try:
+                while True:
+                    batch = self._take_batch()
+                    if not batch:
+                        return
+                    self._dispatch(batch)
+            finally:
+                self._flushing = None
+
+    def close(self, timeout=5.0):
+        """Stop the worker thread after a final flush.
+
+        Args:
+            timeout: Seconds to wait for the worker thread to finish.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            thread.join(timeout)
+        if self._pid == os.getpid():
+            self.flush()
+
+    def _take_batch(self):
+        batch = []
+        try:
+            while len(batch) < self.max_batch:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _dispatch(self, batch):
+        try:
+            self._handler(batch)
+        except Exception as e:
+            logger.exception(
+                "Batch handler %s failed: %s",
+                self.name,
+                e,
+                extra={"extra_fields": {"error": str(e), "batch_size": len(batch)}},
+            )
+        with self._lock:
+            self.processed += len(batch)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def _reset_after_fork():
+    """Give every batcher fresh locks and an empty queue in a forked child."""
+    for batcher in list(_live_batchers):
+        batcher._reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@atexit.register
+def _flush_all():
+    """Flush every live batcher on interpreter (worker) shutdown."""
+    for batcher in list(_live_batchers):
+        batcher.close(timeout=2.0)
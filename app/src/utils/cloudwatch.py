@@ -0,0 +1,410 @@
+"""Asynchronous, batched CloudWatch metric emitter.
+
+Request samples are queued by ``after_request`` hooks and rolled up per
+dimension set on a background thread. Each flush turns the window into one
+``RequestCount`` datum with ``StatisticValues`` and ``Latency`` datums with
+``Values``/``Counts`` per dimension set, so a worker makes at most a handful
+of ``PutMetricData`` calls per interval instead of one per request.
+
+``EMFEmitter`` shares the same aggregation but writes CloudWatch Embedded
+Metric Format documents to the application log instead, so no AWS API call
+is made in-process at all.
+"""
+
+import logging
+import os
+import threading
+import time
+from itertools import repeat
+from datetime import datetime, timezone
+
+from src.utils.batching import BackgroundBatcher
+
+logger = logging.getLogger(__name__)
+
+# PutMetricData accepts up to 1000 datums (and 1 MB) per call; stay well below
+MAX_DATUMS_PER_CALL = 100
+# Each datum accepts up to 150 distinct values in Values/Counts
+MAX_VALUES_PER_DATUM = 150
+# EMF accepts up to 100 values per metric per document
+MAX_EMF_VALUES = 100
+
+
+class SeriesAggregate:
+    """Running aggregate of request samples for one dimension set."""
+
+    __slots__ = ("count", "latencies")
+
+    def __init__(self):
+        """Create an empty aggregate."""
+        self.count = 0
+        self.latencies = {}
+
+    def add(self, latency_ms):
+        """Add one request sample.
+
+        Args:
+            latency_ms: Request latency in milliseconds.
+        """
+        self.count += 1
+        # Round so that similar latencies share a Values/Counts slot
+        value = round(latency_ms, 1) if latency_ms < 100 else float(round(latency_ms))
+        self.latencies[value] = self.latencies.get(value, 0) + 1
+
+
+def aggregate_samples(samples):
+    """Roll request samples up per dimension set.
+
+    Args:
+        samples: Iterable of ``(dimensions, latency_ms)`` tuples where
+            ``dimensions`` is a tuple of ``(name, value)`` pairs.
+
+    Returns:
+        Dict mapping dimensions to ``SeriesAggregate``.
+    """
+    series = {}
+    for dimensions, latency_ms in samples:
+        aggregate = series.get(dimensions)
+        if aggregate is None:
+            aggregate = series[dimensions] = SeriesAggregate()
+        aggregate.add(latency_ms)
+    return series
+
+
+def build_metric_data(series, timestamp):
+    """Build PutMetricData datums for aggregated series.
+
+    Args:
+        series: Dict from ``aggregate_samples``.
+        timestamp: Datetime stamped on every datum.
+
+    Returns:
+        List of ``(datum, sample_count)`` tuples. ``sample_count`` is the
+        number of requests a datum accounts for (zero for latency datums,
+        so that requests are only counted once).
+    """
+    metric_data = []
+    for dimensions, aggregate in series.items():
+        dims = [{"Name": name, "Value": value} for name, value in dimensions]
+        metric_data.append(
+            (
+                {
+                    "MetricName": "RequestCount",
+                    "Dimensions": dims,
+                    "Timestamp": timestamp,
+                    "StatisticValues": {
+                        "SampleCount": aggregate.count,
+                        "Sum": aggregate.count,
+                        "Minimum": 1,
+                        "Maximum": 1,
+                    },
+                    "Unit": "Count",
+                },
+                aggregate.count,
+            )
+        )
+        items = sorted(aggregate.latencies.items())
+        for start in range(0, len(items), MAX_VALUES_PER_DATUM):
+            chunk = items[start : start + MAX_VALUES_PER_DATUM]
+            metric_data.append(
+                (
+                    {
+                        "MetricName": "Latency",
+                        "Dimensions": dims,
+                        "Timestamp": timestamp,
+                        "Values": [value for value, _ in chunk],
+                        "Counts": [count for _, count in chunk],
+                        "Unit": "Milliseconds",
+                    },
+                    0,
+                )
+            )
+    return metric_data
+
+
+class CloudWatchEmitter:
+    """Background CloudWatch publisher with load shedding and a circuit breaker.
+
+    ``record`` only enqueues a sample; when the queue is full the sample is
+    dropped. After ``failure_threshold`` consecutive failed calls the breaker
+    opens and batches are dropped for ``reset_timeout`` seconds before a
+    single trial call is allowed again; if it fails the breaker reopens.
+    Any exception from the client counts as a failed call.
+    """
+
+    def __init__(
+        self,
+        client_factory,
+        namespace,
+        flush_interval=10.0,
+        max_queue=10000,
+        max_batch=5000,
+        failure_threshold=5,
+        reset_timeout=60.0,
+        clock=time.monotonic,
+    ):
+        """Create an emitter.
+
+        Args:
+            client_factory: Callable returning a boto3 CloudWatch client. It is
+                called lazily on the flush thread, i.e. after any fork.
+            namespace: CloudWatch namespace for all metrics.
+            flush_interval: Seconds between time-triggered flushes.
+            max_queue: Maximum queued samples before new ones are dropped.
+            max_batch: Queued samples that trigger an early flush.
+            failure_threshold: Consecutive failures that open the breaker.
+            reset_timeout: Seconds the breaker stays open.
+            clock: Monotonic clock, injectable for tests.
+        """
+        self.namespace = namespace
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._client_factory = client_factory
+        self._client = None
+        self._client_pid = os.getpid()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._half_open = False
+        self.flushed = 0
+        self.failed = 0
+        self.shed = 0
+        self._batcher = BackgroundBatcher(
+            self._publish,
+            name="cloudwatch-emitter",
+            max_queue=max_queue,
+            max_batch=max_batch,
+            flush_interval=flush_interval,
+        )
+
+    def record(self, dimensions, latency_ms):
+        """Queue one request sample without blocking.
+
+        Args:
+            dimensions: Tuple of ``(name, value)`` pairs.
+            latency_ms: Request latency in milliseconds.
+
+        Returns:
+            True if queued, False if dropped.
+        """
+        return self._batcher.submit((dimensions, latency_ms))
+
+    @property
+    def circuit_open(self):
+        """Return whether the circuit breaker currently rejects calls."""
+        return self._clock() < self._open_until
+
+    def stats(self):
+        """Return emitter counters.
+
+        Returns:
+            Dict with ``dropped``, ``flushed``, ``failed`` datapoint counts,
+            the current ``queue_depth`` and ``circuit_open`` (0 or 1).
+        """
+        return {
+            "dropped": self._batcher.dropped + self.shed,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "queue_depth": self._batcher.depth,
+            "circuit_open": int(self.circuit_open),
+        }
+
+    def flush(self):
+        """Publish everything queued so far on the calling thread."""
+        self._batcher.flush()
+
+    def close(self, timeout=5.0):
+        """Flush and stop the background thread.
+
+        Args:
+            timeout: Seconds to wait for the flush thread.
+        """
+        self._batcher.close(timeout)
+
+    def _publish(self, samples):
+        if self.circuit_open:
+            with self._lock:
+                self.shed += len(samples)
+            return
+
+        metric_data = build_metric_data(aggregate_samples(samples), datetime.now(timezone.utc))
+        for start in range(0, len(metric_data), MAX_DATUMS_PER_CALL):
+            chunk = metric_data[start : start + MAX_DATUMS_PER_CALL]
+            self._put(chunk)
+
+    def _put(self, chunk):
+        sample_count = sum(count for _, count in chunk)
+        if self.circuit_open:
+            with self._lock:
+                self.shed += sample_count
+            return
+
+        try:
+            # boto3 clients are not fork-safe; each process creates its own
+            if self._client is None or self._client_pid != os.getpid():
+                self._client = self._client_factory()
+                self._client_pid = os.getpid()
+            self._client.put_metric_data(
+                Namespace=self.namespace, MetricData=[datum for datum, _ in chunk]
+            )
+        except Exception as e:
+            self._record_failure(sample_count, e)
+            return
+
+        with self._lock:
+            self.flushed += sample_count
+            self._consecutive_failures = 0
+            self._half_open = False
+
+    def _record_failure(self, sample_count, error):
+        with self._lock:
+            self.failed += sample_count
+            self._consecutive_failures += 1
+            # A failed trial call after the reset timeout reopens at once
+            tripped = self._half_open or self._consecutive_failures >= self.failure_threshold
+            if tripped:
+                self._open_until = self._clock() + self.reset_timeout
+                self._consecutive_failures = 0
+                self._half_open = True
+
+        logger.warning(
+            "Failed to send metrics to CloudWatch: %s",
+            error,
+            extra={
+                "extra_fields": {
+                    "error": str(error),
+                    "datapoints": sample_count,
+                    "circuit_open": tripped,
+                }
+            },
+        )
+
+
+def build_emf_documents(series, namespace, timestamp_ms):
+    """Build Embedded Metric Format documents for aggregated series.
+
+    Each dimension set yields one document carrying the window's
+    ``RequestCount`` and up to ``MAX_EMF_VALUES`` latency samples; larger
+    windows spill the remaining latency samples into follow-up documents.
+
+    Args:
+        series: Dict from ``aggregate_samples``.
+        namespace: CloudWatch namespace for all metrics.
+        timestamp_ms: Epoch milliseconds stamped on every document.
+
+    Returns:
+        List of EMF documents (dicts ready to be logged as JSON).
+    """
+    documents = []
+    for dimensions, aggregate in series.items():
+        names = [name for name, _ in dimensions]
+        latencies = [
+            value
+            for value, count in sorted(aggregate.latencies.items())
+            for value in repeat(value, count)
+        ]
+        for start in range(0, len(latencies), MAX_EMF_VALUES):
+            metrics = [{"Name": "Latency", "Unit": "Milliseconds"}]
+            document = dict(dimensions)
+            document["Latency"] = latencies[start : start + MAX_EMF_VALUES]
+            if start == 0:
+                metrics.insert(0, {"Name": "RequestCount", "Unit": "Count"})
+                document["RequestCount"] = aggregate.count
+            document["_aws"] = {
+                "Timestamp": timestamp_ms,
+                "CloudWatchMetrics": [
+                    {"Namespace": namespace, "Dimensions": [names], "Metrics": metrics}
+                ],
+            }
+            documents.append(document)
+    return documents
+
+
+class EMFEmitter:
+    """Background emitter writing CloudWatch EMF documents to the log stream.
+
+    Documents are logged at INFO to ``emf_logger``; ``setup_cloudwatch``
+    gives it its own stdout JSON handler, independent of ``LOG_LEVEL``. The
+    ECS awslogs driver ships the stream to CloudWatch Logs, where the
+    documents are extracted into metrics.
+    """
+
+    def __init__(
+        self,
+        namespace,
+        flush_interval=10.0,
+        max_queue=10000,
+        max_batch=5000,
+        emf_logger=None,
+        clock=time.time,
+    ):
+        """Create an emitter.
+
+        Args:
+            namespace: CloudWatch namespace for all metrics.
+            flush_interval: Seconds of requests aggregated into one document.
+            max_queue: Maximum queued samples before new ones are dropped.
+            max_batch: Queued samples that trigger an early flush.
+            emf_logger: Logger to write documents to.
+            clock: Wall clock returning epoch seconds, injectable for tests.
+        """
+        self.namespace = namespace
+        self._logger = emf_logger or logging.getLogger("src.metrics.emf")
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.flushed = 0
+        self._batcher = BackgroundBatcher(
+            self._publish,
+            name="emf-emitter",
+            max_queue=max_queue,
+            max_batch=max_batch,
+            flush_interval=flush_interval,
+        )
+
+    def record(self, dimensions, latency_ms):
+        """Queue one request sample without blocking.
+
+        Args:
+            dimensions: Tuple of ``(name, value)`` pairs.
+            latency_ms: Request latency in milliseconds.
+
+        Returns:
+            True if queued, False if dropped.
+        """
+        return self._batcher.submit((dimensions, latency_ms))
+
+    def stats(self):
+        """Return emitter counters.
+
+        Returns:
+            Dict with the same keys as ``CloudWatchEmitter.stats``.
+        """
+        return {
+            "dropped": self._batcher.dropped,
+            "flushed": self.flushed,
+            "failed": 0,
+            "queue_depth": self._batcher.depth,
+            "circuit_open": 0,
+        }
+
+    def flush(self):
+        """Write everything queued so far on the calling thread."""
+        self._batcher.flush()
+
+    def close(self, timeout=5.0):
+        """Flush and stop the background thread.
+
+        Args:
+            timeout: Seconds to wait for the flush thread.
+        """
+        self._batcher.close(timeout)
+
+    def _publish(self, samples):
+        documents = build_emf_documents(
+            aggregate_samples(samples), self.namespace, int(self._clock() * 1000)
+        )
+        for document in documents:
+            self._logger.info("EMF metrics", extra={"extra_fields": document})
+        with self._lock:
+            self.flushed += len(samples)
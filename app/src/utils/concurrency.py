@@ -0,0 +1,153 @@
+"""Adaptive concurrency limit for one worker process.
+
+``AdaptiveConcurrencyLimiter`` admits requests while fewer than ``limit``
+are in flight and sheds the rest. The limit follows AIMD on latency: the
+no-load latency of each route is estimated as its lowest recent latency
+(drifting slowly upwards so a permanently slower dependency becomes the
+new normal, as in TCP Vegas). Routes are compared with their own estimate,
+so a mix of fast and slow routes is not mistaken for congestion. A request
+slower than ``tolerance`` times its route's estimate, admitted while most
+of the limit was in use, means requests are queueing inside the worker,
+and the limit is cut by ``backoff``, at most once per round trip;
+otherwise, while the limit is actually in use, it grows by one per
+``limit`` completions.
+
+Shedding that persists for ``overload_seconds`` marks the worker as
+overloaded, which ``/health/ready`` reports so the load balancer moves
+traffic to other tasks.
+"""
+
+import threading
+import time
+
+# Share of the gap to a higher latency the no-load estimate moves per sample
+BASELINE_DRIFT = 0.001
+# Seconds without shedding that end an overload episode
+OVERLOAD_RECOVERY = 1.0
+# Share of the limit in use at admission for a slow request to cut it; a
+# slow request with slots to spare was slow on its own, not queued
+CUT_UTILIZATION = 0.75
+
+
+class AdaptiveConcurrencyLimiter:
+    """Per-process concurrency limit adapted to observed latency."""
+
+    def __init__(
+        self,
+        initial_limit=20,
+        min_limit=1,
+        max_limit=200,
+        tolerance=2.0,
+        backoff=0.9,
+        overload_seconds=5.0,
+        clock=time.monotonic,
+    ):
+        """Create a limiter.
+
+        Args:
+            initial_limit: Concurrent requests admitted before any latency is known.
+            min_limit: The limit never drops below this.
+            max_limit: The limit never grows beyond this.
+            tolerance: Latency, as a multiple of the no-load latency, above
+                which the limit is cut.
+            backoff: Factor applied to the limit when it is cut.
+            overload_seconds: Seconds of continuous shedding after which
+                the worker reports itself overloaded.
+            clock: Monotonic clock, injectable for tests.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.overload_seconds = overload_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.inflight = 0
+        # No-load latency estimate per route
+        self.baselines = {}
+        self._last_cut = None
+        self._shed_started = None
+        self._last_shed = None
+        self._admitted = 0
+        self._shed = 0
+
+    def acquire(self, route=None):
+        """Admit a request if the limit allows.
+
+        Args:
+            route: Key whose requests share a latency baseline, e.g. the URL rule.
+
+        Returns:
+            Token to pass to ``release`` when the request ends, or None when
+            the request must be shed.
+        """
+        now = self._clock()
+        with self._lock:
+            if self.inflight >= int(self.limit):
+                self._shed += 1
+                if self._shed_started is None or now - self._last_shed > OVERLOAD_RECOVERY:
+                    self._shed_started = now
+                self._last_shed = now
+                return None
+            self.inflight += 1
+            self._admitted += 1
+            return now, self.inflight, route
+
+    def release(self, token):
+        """End an admitted request and adapt the limit to its latency.
+
+        Args:
+            token: Value returned by ``acquire``.
+        """
+        started, inflight, route = token
+        latency = self._clock() - started
+        with self._lock:
+            self.inflight -= 1
+            self._update(started, latency, inflight, route)
+
+    def _update(self, started, latency, inflight, route):
+        """Adapt the limit to one latency sample; caller holds the lock."""
+        if latency <= 0:
+            return
+        baseline = self.baselines.get(route)
+        if baseline is None or latency < baseline:
+            baseline = latency
+        else:
+            baseline += (latency - baseline) * BASELINE_DRIFT
+        self.baselines[route] = baseline
+        if latency > baseline * self.tolerance:
+            if inflight < self.limit * CUT_UTILIZATION:
+                return
+            # Requests admitted before the last cut measure the old limit
+            if self._last_cut is None or started >= self._last_cut:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_cut = self._clock()
+        elif inflight * 2 >= self.limit:
+            # Only grow a limit that is actually used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def overloaded(self):
+        """Return whether requests have been shed continuously for ``overload_seconds``."""
+        now = self._clock()
+        with self._lock:
+            if self._last_shed is None or now - self._last_shed > OVERLOAD_RECOVERY:
+                return False
+            return now - self._shed_started >= self.overload_seconds
+
+    def stats(self):
+        """Return admission counters and the current limit.
+
+        Returns:
+            Dict with ``admitted`` and ``shed`` counts, ``limit``,
+            ``inflight`` and ``overloaded`` (0 or 1).
+        """
+        overloaded = self.overloaded()
+        with self._lock:
+            return {
+                "admitted": self._admitted,
+                "shed": self._shed,
+                "limit": int(self.limit),
+                "inflight": self.inflight,
+                "overloaded": int(overloaded),
+            }
@@ -0,0 +1,351 @@
+"""Pooled clients for the app's dependencies.
+
+``DEPENDENCY_URLS`` names the dependencies and their pool type by scheme,
+e.g. ``database=tcp://db.internal:5432,search=http://search.internal:9200/health``:
+
+- ``tcp``: plain sockets (``src/utils/pools.py``), the base for database
+  and cache protocols.
+- ``http``/``https``: urllib3 keep-alive pools (``src/utils/http_pool.py``);
+  the URL's path is what the readiness check requests.
+
+Every dependency gets a readiness check that borrows from its pool. Views
+borrow with ``dependency(name)``. Waiting longer than
+``DEPENDENCY_ACQUIRE_TIMEOUT`` for a connection answers the request with
+503. boto3 clients come from ``aws_client``: one per service and process,
+sharing ``DEPENDENCY_POOL_SIZE`` connections per service.
+
+Pools and clients are created once per process, on first use, so nothing
+created in the gunicorn master is shared with the workers. Each worker
+opens ``DEPENDENCY_POOL_WARM`` connections per pool, and creates the boto3
+clients it will need, before accepting requests (``src.app.init_worker``).
+Pool utilization, wait time and timeouts are exported as
+``dependency_pool_*`` metrics.
+"""
+
+import logging
+import os
+import threading
+from urllib.parse import urlsplit
+
+from flask import current_app
+from prometheus_client import Counter, Gauge, Histogram
+
+from src.utils.pools import tcp_pool
+
+logger = logging.getLogger(__name__)
+
+# Seconds waited for a pooled connection; most borrows do not wait at all
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _tcp(name, url, settings):
+    if url.port is None:
+        raise ValueError(f"Dependency {name} needs a port: {url.geturl()}")
+    return tcp_pool(name, url.hostname, url.port, **settings)
+
+
+def _http(name, url, settings):
+    from src.utils.http_pool import HTTPPool, HTTPSPool
+
+    pool_class = HTTPSPool if url.scheme == "https" else HTTPPool
+    return pool_class(name, url.hostname, url.port, health_path=url.path or "/", **settings)
+
+
+# DEPENDENCY_URLS schemes and the pool factories they select
+POOL_TYPES = {
+    "tcp": _tcp,
+    "http": _http,
+    "https": _http,
+}
+
+
+def parse_dependency_urls(spec):
+    """Parse ``name=url`` pairs.
+
+    Args:
+        spec: Comma-separated ``name=url`` pairs.
+
+    Returns:
+        Dict of name to ``urllib.parse.SplitResult``.
+
+    Raises:
+        ValueError: If an entry is malformed or its scheme has no pool type.
+    """
+    urls = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, url = entry.partition("=")
+        parsed = urlsplit(url.strip())
+        if not sep or not name.strip() or not parsed.hostname:
+            raise ValueError(f"Invalid dependency, expected name=url: {entry!r}")
+        if parsed.scheme not in POOL_TYPES:
+            raise ValueError(f"Unknown dependency scheme {parsed.scheme!r} in {entry!r}")
+        urls[name.strip()] = parsed
+    return urls
+
+
+class PoolMetrics:
+    """Prometheus metrics for dependency pools."""
+
+    def __init__(self, registry):
+        """Register the pool metrics.
+
+        Args:
+            registry: Prometheus registry of the app.
+        """
+        self.connections = Gauge(
+            "dependency_pool_connections",
+            "Pooled dependency connections by state (in_use, idle)",
+            ["pool", "state"],
+            registry=registry,
+            multiprocess_mode="livesum",
+        )
+        self.max_size = Gauge(
+            "dependency_pool_max_size",
+            "Connections a dependency pool may hold",
+            ["pool"],
+            registry=registry,
+            multiprocess_mode="livesum",
+        )
+        self.wait = Histogram(
+            "dependency_pool_wait_seconds",
+            "Time spent waiting for a pooled dependency connection",
+            ["pool"],
+            registry=registry,
+            buckets=WAIT_BUCKETS,
+        )
+        self.timeouts = Counter(
+            "dependency_pool_timeouts",
+            "Borrowers that gave up waiting for a pooled dependency connection",
+            ["pool"],
+            registry=registry,
+        )
+
+    def attach(self, pool):
+        """Start reporting ``pool``.
+
+        Args:
+            pool: Pool with ``name``, ``max_size`` and an ``observer`` attribute.
+        """
+        self.max_size.labels(pool.name).set(pool.max_size)
+        pool.observer = self
+        self.released(pool)
+
+    def acquired(self, pool, waited):
+        """Record a borrowed connection and the time spent waiting for it."""
+        self.wait.labels(pool.name).observe(waited)
+        self.connections.labels(pool.name, "in_use").set(pool.in_use)
+
+    def released(self, pool):
+        """Record a connection given back."""
+        stats = pool.stats()
+        self.connections.labels(pool.name, "in_use").set(stats["in_use"])
+        self.connections.labels(pool.name, "idle").set(stats["idle"])
+
+    def timed_out(self, pool):
+        """Record a borrower that gave up."""
+        self.timeouts.labels(pool.name).inc()
+
+
+class Dependencies:
+    """The app's dependency pools and boto3 clients, created per process."""
+
+    def __init__(
+        self,
+        urls=None,
+        max_size=10,
+        warm_size=1,
+        idle_timeout=60.0,
+        acquire_timeout=1.0,
+        connect_timeout=2.0,
+        read_timeout=5.0,
+        region=None,
+        metrics=None,
+    ):
+        """Create the registry; nothing is connected yet.
+
+        Args:
+            urls: Dict of dependency name to parsed URL.
+            max_size: Connections per pool, and per boto3 client.
+            warm_size: Connections each pool opens in ``warm``.
+            idle_timeout: Seconds an idle connection is kept for reuse.
+            acquire_timeout: Seconds to wait for a free connection.
+            connect_timeout: Seconds to wait for a new connection.
+            read_timeout: Seconds to wait for a response (HTTP and boto3).
+            region: AWS region for boto3 clients.
+            metrics: PoolMetrics instance, or None.
+        """
+        self.urls = dict(urls or {})
+        self.max_size = max_size
+        self.warm_size = warm_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.region = region
+        self.metrics = metrics
+        # boto3 services whose clients are created by ``warm``
+        self.aws_services = []
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._clients = {}
+        self._pid = os.getpid()
+
+    def _local(self):
+        """Forget pools and clients inherited from the parent process."""
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._pools = {}
+            self._clients = {}
+            self._pid = os.getpid()
+
+    def pool(self, name):
+        """Return this process's pool for a dependency.
+
+        Args:
+            name: Name from ``DEPENDENCY_URLS``.
+
+        Returns:
+            ConnectionPool, or HTTPPool/HTTPSPool for HTTP dependencies.
+
+        Raises:
+            KeyError: If no dependency has that name.
+        """
+        self._local()
+        pool = self._pools.get(name)
+        if pool is not None:
+            return pool
+        url = self.urls[name]
+        with self._lock:
+            pool = self._pools.get(name)
+            if pool is None:
+                settings = {
+                    "max_size": self.max_size,
+                    "idle_timeout": self.idle_timeout,
+                    "acquire_timeout": self.acquire_timeout,
+                    "connect_timeout": self.connect_timeout,
+                }
+                if url.scheme != "tcp":
+                    settings["read_timeout"] = self.read_timeout
+                pool = POOL_TYPES[url.scheme](name, url, settings)
+                if self.metrics is not None:
+                    self.metrics.attach(pool)
+                self._pools[name] = pool
+        return pool
+
+    def check(self, name):
+        """Borrow from a dependency's pool, for its readiness check."""
+        return self.pool(name).check()
+
+    def aws_client(self, service):
+        """Return this process's boto3 client for a service.
+
+        boto3 clients are thread-safe but not fork-safe, so each process
+        creates its own; botocore pools up to ``max_size`` connections in it.
+
+        Args:
+            service: boto3 service name, e.g. ``cloudwatch``.
+
+        Returns:
+            boto3 client.
+        """
+        self._local()
+        client = self._clients.get(service)
+        if client is not None:
+            return client
+        import boto3
+        from botocore.config import Config as BotoConfig
+
+        config = BotoConfig(
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            retries={"max_attempts": 2},
+            max_pool_connections=self.max_size,
+        )
+        with self._lock:
+            client = self._clients.get(service)
+            if client is None:
+                client = boto3.client(service, region_name=self.region, config=config)
+                self._clients[service] = client
+        return client
+
+    def warm(self):
+        """Connect ahead in this process before it serves requests.
+
+        Returns:
+            Dict of dependency name to connections opened, and boto3
+            service to 1 for each client created.
+        """
+        opened = {name: self.pool(name).warm(self.warm_size) for name in self.urls}
+        for service in self.aws_services:
+            try:
+                self.aws_client(service)
+            except Exception as e:
+                logger.warning("Could not create the %s client: %s", service, e)
+                continue
+            opened[service] = 1
+        return opened
+
+    def stats(self):
+        """Return the stats of every pool used in this process.
+
+        Returns:
+            Dict of dependency name to pool stats.
+        """
+        self._local()
+        return {name: pool.stats() for name, pool in self._pools.items()}
+
+
+def dependency(name):
+    """Return the current app's pool for a dependency, for views.
+
+    Args:
+        name: Name from ``DEPENDENCY_URLS``.
+
+    Returns:
+        Pool; borrow with ``pool.connection()`` (TCP) or ``pool.request()`` (HTTP).
+    """
+    return current_app.extensions["dependencies"].pool(name)
+
+
+def setup_dependencies(app):
+    """Create the dependency registry.
+
+    Runs after ``setup_metrics``, whose registry the pool metrics join,
+    and before ``setup_health_checks``, which checks every dependency.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        Dependencies instance, also stored in ``app.extensions``.
+
+    Raises:
+        ValueError: If ``DEPENDENCY_URLS`` is invalid.
+    """
+    prometheus = app.extensions.get("prometheus_metrics")
+    dependencies = Dependencies(
+        parse_dependency_urls(app.config.get("DEPENDENCY_URLS", "")),
+        max_size=app.config.get("DEPENDENCY_POOL_SIZE", 10),
+        warm_size=app.config.get("DEPENDENCY_POOL_WARM", 1),
+        idle_timeout=app.config.get("DEPENDENCY_IDLE_TIMEOUT", 60.0),
+        acquire_timeout=app.config.get("DEPENDENCY_ACQUIRE_TIMEOUT", 1.0),
+        connect_timeout=app.config.get("DEPENDENCY_CONNECT_TIMEOUT", 2.0),
+        read_timeout=app.config.get("DEPENDENCY_READ_TIMEOUT", 5.0),
+        region=app.config.get("AWS_REGION", "us-east-1"),
+        metrics=PoolMetrics(prometheus.registry) if prometheus is not None else None,
+    )
+    if app.config.get("ENABLE_CLOUDWATCH", False) and app.config.get("CLOUDWATCH_MODE") == "api":
+        dependencies.aws_services.append("cloudwatch")
+    app.extensions["dependencies"] = dependencies
+
+    if dependencies.urls:
+        logger.info(
+            "Dependencies configured",
+            extra={
+                "extra_fields": {
+                    "dependencies": {name: url.scheme for name, url in dependencies.urls.items()},
+                    "pool_size": dependencies.max_size,
+                }
+            },
+        )
+    return dependencies
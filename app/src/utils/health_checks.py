@@ -0,0 +1,197 @@
+"""Dependency check registry for readiness probes.
+
+Each check declares a timeout and a TTL. Checks run concurrently on a small
+thread pool and their results are cached, so ``/health/ready`` is answered
+from memory: stale results trigger a background refresh instead of making
+the probe wait. Only the very first probe waits, up to the check timeout.
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+CheckResult = namedtuple("CheckResult", ["status", "latency_ms", "checked_at", "error"])
+DependencyCheck = namedtuple("DependencyCheck", ["name", "func", "timeout", "ttl"])
+
+
+class CheckRegistry:
+    """Registry of dependency checks with cached, concurrent execution."""
+
+    def __init__(self, max_workers=4, clock=time.monotonic):
+        """Create an empty registry.
+
+        Args:
+            max_workers: Threads used to run checks concurrently.
+            clock: Monotonic clock used for result ages, injectable for tests.
+        """
+        self.max_workers = max_workers
+        self.clock = clock
+        self._checks = {}
+        self._lock = threading.Lock()
+        self._results = {}
+        self._inflight = {}
+        self._executor = None
+        self._pid = None
+
+    def register(self, name, func, timeout=2.0, ttl=10.0):
+        """Register a dependency check.
+
+        Args:
+            name: Check name, reported under ``checks`` in the probe response.
+            func: Callable taking no arguments. It passes unless it raises or
+                returns False.
+            timeout: Seconds after which a running check is reported as timed out.
+            ttl: Seconds a result is served before it is refreshed.
+        """
+        self._checks[name] = DependencyCheck(name, func, timeout, ttl)
+
+    def check(self, name, timeout=2.0, ttl=10.0):
+        """Register the decorated function as a dependency check.
+
+        Args:
+            name: Check name.
+            timeout: Seconds after which a running check is reported as timed out.
+            ttl: Seconds a result is served before it is refreshed.
+
+        Returns:
+            Decorator returning the function unchanged.
+        """
+
+        def decorator(func):
+            self.register(name, func, timeout=timeout, ttl=ttl)
+            return func
+
+        return decorator
+
+    def results(self):
+        """Return cached results, refreshing stale ones in the background.
+
+        Checks that have never completed are run and waited for (up to their
+        timeout); everything else is served from the cache.
+
+        Returns:
+            Dict mapping check name to ``CheckResult``.
+        """
+        now = self.clock()
+        missing = []
+        with self._lock:
+            for check in self._checks.values():
+                result = self._results.get(check.name)
+                if result is None or now - result.checked_at >= check.ttl:
+                    future = self._submit(check)
+                    if result is None:
+                        missing.append(future)
+                self._expire_hung(check, now)
+
+        if missing:
+            wait(missing, timeout=max(c.timeout for c in self._checks.values()))
+            with self._lock:
+                for check in self._checks.values():
+                    if check.name not in self._results:
+                        self._expire_hung(check, now, force=True)
+
+        with self._lock:
+            return dict(self._results)
+
+    def refresh(self):
+        """Run every check now and wait for the results.
+
+        Returns:
+            Dict mapping check name to ``CheckResult``.
+        """
+        with self._lock:
+            futures = [self._submit(check) for check in self._checks.values()]
+        if futures:
+            wait(futures, timeout=max(c.timeout for c in self._checks.values()))
+        return self.results()
+
+    def _pool(self):
+        # Created lazily and re-created after fork: the parent's threads are gone
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="health")
+            self._inflight = {}
+            self._pid = os.getpid()
+        return self._executor
+
+    def _submit(self, check):
+        """Start a check unless already running and return its future; caller holds the lock."""
+        pool = self._pool()
+        inflight = self._inflight.get(check.name)
+        if inflight is not None:
+            return inflight[1]
+        # _run needs the lock to record its result, so it cannot finish before this
+        future = pool.submit(self._run, check)
+        self._inflight[check.name] = (self.clock(), future)
+        return future
+
+    def _expire_hung(self, check, now, force=False):
+        """Report a check that exceeded its timeout; caller holds the lock."""
+        inflight = self._inflight.get(check.name)
+        if inflight is None:
+            return
+        started = inflight[0]
+        if force or now - started >= check.timeout:
+            previous = self._results.get(check.name)
+            if previous is None or previous.checked_at < started:
+                self._results[check.name] = CheckResult(
+                    "timeout", round(check.timeout * 1000, 3), now, "check timed out"
+                )
+
+    def _run(self, check):
+        start = self.clock()
+        error = None
+        try:
+            passed = check.func() is not False
+        except Exception as e:
+            passed = False
+            error = str(e)
+            logger.warning(
+                "Dependency check %s failed: %s",
+                check.name,
+                e,
+                extra={"extra_fields": {"check": check.name, "error": error}},
+            )
+        end = self.clock()
+        result = CheckResult(
+            "ok" if passed else "failed", round((end - start) * 1000, 3), end, error
+        )
+        with self._lock:
+            self._results[check.name] = result
+            self._inflight.pop(check.name, None)
+        return result
+
+
+def setup_health_checks(app):
+    """Create the dependency check registry used by ``/health/ready``.
+
+    Runs after ``setup_dependencies``, whose pools the checks borrow from.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        CheckRegistry instance, also stored in ``app.extensions``.
+    """
+    registry = CheckRegistry(max_workers=app.config.get("HEALTH_CHECK_WORKERS", 4))
+    timeout = app.config.get("HEALTH_CHECK_TIMEOUT", 2.0)
+    ttl = app.config.get("HEALTH_CHECK_TTL", 10.0)
+
+    # Each configured dependency is checked by borrowing from its pool
+    dependencies = app.extensions.get("dependencies")
+    names = list(dependencies.urls) if dependencies is not None else []
+    for name in names:
+        registry.register(name, functools.partial(dependencies.check, name), timeout, ttl)
+
+    # Simulated until configured in DEPENDENCY_URLS
+    for name in ("database", "cache"):
+        if name not in names:
+            registry.register(name, lambda: True, timeout=timeout, ttl=ttl)
+
+    app.extensions["health_checks"] = registry
+    return registry
@@ -0,0 +1,178 @@
+"""urllib3 connection pools with the accounting of ``src.utils.pools``.
+
+urllib3 already pools keep-alive connections per host; ``HTTPPool`` runs it
+in blocking mode, so ``max_size`` is a hard limit, and adds the idle
+timeout, warm-up, counters and observer events of ``ConnectionPool``.
+Imported only when an HTTP dependency is configured.
+"""
+
+import logging
+import threading
+import time
+
+import urllib3
+from urllib3.exceptions import EmptyPoolError, HTTPError
+
+from src.utils.pools import PoolTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class _AccountedPool:
+    """Accounting shared by the HTTP and HTTPS pools."""
+
+    def __init__(
+        self,
+        name,
+        host,
+        port=None,
+        max_size=10,
+        idle_timeout=60.0,
+        acquire_timeout=1.0,
+        connect_timeout=2.0,
+        read_timeout=5.0,
+        health_path="/",
+        clock=time.monotonic,
+        **kwargs,
+    ):
+        """Create an empty pool.
+
+        Args:
+            name: Dependency name, used in metrics and errors.
+            host: Host name or address.
+            port: Port, default for the scheme if None.
+            max_size: Connections open or borrowed at most at once.
+            idle_timeout: Seconds an idle connection is kept for reuse.
+            acquire_timeout: Seconds to wait for a free connection.
+            connect_timeout: Seconds to wait for a connection.
+            read_timeout: Seconds to wait for response data.
+            health_path: Path requested by ``check``.
+            clock: Monotonic clock, injectable for tests.
+            **kwargs: Further urllib3 pool arguments.
+        """
+        super().__init__(
+            host,
+            port,
+            maxsize=max_size,
+            block=True,
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+            retries=False,
+            **kwargs,
+        )
+        self.name = name
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_path = health_path
+        self.observer = None
+        self._clock = clock
+        self._counts = threading.Lock()
+        self.in_use = 0
+        self.created = 0
+        self.discarded = 0
+        self.timeouts = 0
+
+    def stats(self):
+        """Return pool counters, as ``ConnectionPool.stats``."""
+        idle = [conn for conn in list(self.pool.queue) if conn is not None and not conn.is_closed]
+        return {
+            "max_size": self.max_size,
+            "in_use": self.in_use,
+            "idle": len(idle),
+            "created": self.created,
+            "discarded": self.discarded,
+            "timeouts": self.timeouts,
+        }
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        with self._counts:
+            self.created += 1
+        return conn
+
+    def _get_conn(self, timeout=None):
+        started = self._clock()
+        try:
+            conn = super()._get_conn(self.acquire_timeout if timeout is None else timeout)
+        except EmptyPoolError:
+            with self._counts:
+                self.timeouts += 1
+            self._notify("timed_out")
+            raise
+        idle_since = getattr(conn, "pool_idle_since", None)
+        if idle_since is not None and self._clock() - idle_since >= self.idle_timeout:
+            # Reconnects on its next request
+            conn.close()
+            with self._counts:
+                self.discarded += 1
+        with self._counts:
+            self.in_use += 1
+        self._notify("acquired", self._clock() - started)
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.pool_idle_since = self._clock()
+        with self._counts:
+            self.in_use -= 1
+        super()._put_conn(conn)
+        self._notify("released")
+
+    def urlopen(self, method, url, *args, **kwargs):
+        """Send a request; see ``urllib3.HTTPConnectionPool.urlopen``.
+
+        Raises:
+            PoolTimeout: If no connection became free in time.
+        """
+        try:
+            return super().urlopen(method, url, *args, **kwargs)
+        except EmptyPoolError:
+            raise PoolTimeout(self.name, self.acquire_timeout) from None
+
+    def warm(self, count):
+        """Open connections ahead of the first requests; see ``ConnectionPool.warm``."""
+        borrowed = []
+        try:
+            while len(borrowed) < min(count, self.max_size):
+                conn = self._get_conn(timeout=0)
+                borrowed.append(conn)
+                if conn.is_closed:
+                    conn.connect()
+        except (OSError, HTTPError) as e:
+            logger.warning(
+                "Could not warm up pool %s: %s",
+                self.name,
+                e,
+                extra={"extra_fields": {"pool": self.name, "error": str(e)}},
+            )
+        opened = sum(1 for conn in borrowed if not conn.is_closed)
+        for conn in borrowed:
+            self._put_conn(conn)
+        return opened
+
+    def check(self):
+        """Request ``health_path``, for readiness checks.
+
+        Returns:
+            True.
+
+        Raises:
+            urllib3.exceptions.HTTPError: If the request failed.
+            RuntimeError: If the dependency answered with a 5xx status.
+        """
+        response = self.request("GET", self.health_path)
+        if response.status >= 500:
+            raise RuntimeError(f"{self.name} returned {response.status}")
+        return True
+
+    def _notify(self, event, *args):
+        if self.observer is not None:
+            getattr(self.observer, event)(self, *args)
+
+
+class HTTPPool(_AccountedPool, urllib3.HTTPConnectionPool):
+    """Bounded pool of HTTP connections to one host."""
+
+
+class HTTPSPool(_AccountedPool, urllib3.HTTPSConnectionPool):
+    """Bounded pool of HTTPS connections to one host."""
@@ -0,0 +1,220 @@
+"""Fast JSON provider for responses and request bodies.
+
+``FastJSONProvider`` replaces Flask's default provider, so ``jsonify``,
+``app.json.response`` and ``request.get_json`` all use it. With
+``JSON_BACKEND=auto`` it serializes with orjson or msgspec when installed
+and with the standard library otherwise. Output is compact and key-sorted
+with every backend; the fast backends write non-ASCII characters as UTF-8
+instead of escape sequences. Values a fast backend rejects (e.g. integers
+beyond 64 bits or non-string keys) fall back to the standard library, so
+anything Flask's provider could serialize still serializes.
+
+Request bodies are parsed by the standard library on every backend: orjson
+turns integers beyond 64 bits into floats without an error, and neither
+fast parser accepts ``NaN`` or ``Infinity``. Non-finite numbers parsed
+from a request are ``NonFiniteFloat``, which the fast backends hand to the
+standard library, so they are echoed as ``NaN`` rather than ``null``.
+Non-finite floats computed by views still serialize as ``null`` with a
+fast backend.
+
+Datetimes are serialized as ISO 8601, with ``Z`` for UTC, so views pass
+``datetime`` objects instead of formatting timestamps themselves.
+Responses stay compact in debug mode; set ``app.json.compact = False`` for
+indented output.
+"""
+
+import dataclasses
+import decimal
+import uuid
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+# Tried in order by JSON_BACKEND=auto
+FAST_BACKENDS = ("orjson", "msgspec")
+
+
+def isoformat(value):
+    """Format a date or datetime as ISO 8601, writing the UTC offset as ``Z``.
+
+    Args:
+        value: ``datetime`` or ``date``.
+
+    Returns:
+        String such as ``2024-01-01T12:00:00.123456Z``.
+    """
+    text = value.isoformat()
+    if text.endswith("+00:00"):
+        return text[:-6] + "Z"
+    return text
+
+
+class NonFiniteFloat(float):
+    """``NaN`` or an infinity parsed from JSON.
+
+    Not a plain float, so the fast backends pass it to ``_default``, which
+    rejects it, and the standard library writes it as Flask's provider would.
+    """
+
+
+def _default(value):
+    """Serialize types the JSON backends do not handle themselves."""
+    if isinstance(value, date):
+        return isoformat(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _orjson_backend():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    sorted_option = orjson.OPT_UTC_Z | orjson.OPT_SORT_KEYS
+
+    def dumps(obj, sort_keys):
+        return orjson.dumps(
+            obj, default=_default, option=sorted_option if sort_keys else orjson.OPT_UTC_Z
+        )
+
+    return dumps, (orjson.JSONEncodeError,)
+
+
+def _msgspec_backend():
+    try:
+        import msgspec
+
+        # Sorted output needs msgspec 0.18
+        encoders = {
+            True: msgspec.json.Encoder(enc_hook=_default, order="sorted"),
+            False: msgspec.json.Encoder(enc_hook=_default),
+        }
+    except (ImportError, TypeError):
+        return None
+
+    def dumps(obj, sort_keys):
+        return encoders[sort_keys].encode(obj)
+
+    return dumps, (msgspec.EncodeError, TypeError, OverflowError)
+
+
+# JSON_BACKEND values and the factories returning ``(dumps, errors)``,
+# or None when the package is not installed
+JSON_BACKENDS = {
+    "orjson": _orjson_backend,
+    "msgspec": _msgspec_backend,
+}
+
+
+def load_backend(name):
+    """Load a fast JSON backend.
+
+    Args:
+        name: ``auto`` (first installed of ``FAST_BACKENDS``), ``orjson``,
+            ``msgspec`` or ``json`` (standard library only).
+
+    Returns:
+        ``(name, dumps, errors)``; ``dumps`` is None for the standard
+        library, which is also used when the requested package is not
+        installed.
+
+    Raises:
+        ValueError: If ``name`` is not a known backend.
+    """
+    if name == "auto":
+        candidates = FAST_BACKENDS
+    elif name == "json":
+        candidates = ()
+    elif name in JSON_BACKENDS:
+        candidates = (name,)
+    else:
+        raise ValueError(f"Unknown JSON_BACKEND: {name!r}")
+    for candidate in candidates:
+        backend = JSON_BACKENDS[candidate]()
+        if backend is not None:
+            return (candidate,) + backend
+    return "json", None, ()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson or msgspec when installed."""
+
+    default = staticmethod(_default)
+    # Compact in debug mode too; False still selects indented output
+    compact = True
+
+    def __init__(self, app, backend="auto"):
+        """Create the provider.
+
+        Args:
+            app: Flask application instance.
+            backend: ``JSON_BACKEND`` value, see ``load_backend``.
+        """
+        super().__init__(app)
+        self.backend, self._dumps, self._errors = load_backend(backend)
+
+    def dumps_bytes(self, obj):
+        """Serialize ``obj`` as compact JSON bytes.
+
+        Args:
+            obj: Data to serialize.
+
+        Returns:
+            UTF-8 encoded JSON.
+        """
+        if self._dumps is not None:
+            try:
+                return self._dumps(obj, self.sort_keys)
+            except self._errors:
+                pass
+        return super().dumps(obj, separators=(",", ":")).encode()
+
+    def dumps(self, obj, **kwargs):
+        """Serialize ``obj`` as a JSON string.
+
+        Keyword arguments select the standard library with Flask's defaults.
+        """
+        if kwargs or self._dumps is None:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        """Deserialize JSON text or UTF-8 bytes with the standard library.
+
+        ``NaN`` and infinities become ``NonFiniteFloat``, so they serialize
+        back unchanged.
+        """
+        kwargs.setdefault("parse_constant", _non_finite)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Serialize the arguments into a JSON response; see ``DefaultJSONProvider``."""
+        if self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def _non_finite(name):
+    """Parse ``NaN``, ``Infinity`` or ``-Infinity``."""
+    return NonFiniteFloat(name)
+
+
+def setup_json_provider(app):
+    """Install the fast JSON provider selected by ``JSON_BACKEND``.
+
+    Must run before any response body is serialized, e.g. by static payloads.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        FastJSONProvider instance, also installed as ``app.json``.
+    """
+    app.json = FastJSONProvider(app, backend=app.config.get("JSON_BACKEND", "auto"))
+    return app.json
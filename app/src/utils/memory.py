@@ -0,0 +1,473 @@
+"""Worker memory telemetry and RSS-based recycling.
+
+``MemoryMonitor`` samples the worker after requests, at most once per
+``MEMORY_SAMPLE_INTERVAL`` seconds: resident set size, blocks allocated by
+Python's allocator, and the object counts of the GC generations. Garbage
+collections are timed through ``gc.callbacks``. All of it is exported per
+worker as ``worker_memory_*`` and ``worker_gc_*`` metrics.
+
+With ``MEMORY_RECYCLE_RSS_MB`` set, a worker whose RSS passes the budget
+asks to be recycled, and the gunicorn ``post_request`` hook
+(``recycle_worker``) stops it gracefully after the current request; the
+master starts a replacement. Each worker recycles at its own threshold, a
+random fraction up to ``MEMORY_RECYCLE_JITTER`` below the budget, so
+workers that grow alike do not all restart at once. RSS includes pages
+still shared with the master after a preloaded fork, so the budget should
+leave room for them.
+
+``AllocationTracer`` backs ``/debug/memory/trace``: it starts
+``tracemalloc`` on demand, since tracing slows every allocation, and
+reports the top allocation sites and their growth since tracing started.
+"""
+
+import collections
+import gc
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from src.utils.warmup import is_warmup_request
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+GC_PAUSE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Allocation sites can be grouped by file, line or whole traceback
+GROUP_BY = ("filename", "lineno", "traceback")
+
+
+class TracerBusy(Exception):
+    """Raised when another request is already taking a snapshot."""
+
+
+def read_rss():
+    """Return the resident set size of this process in bytes.
+
+    Reads ``/proc/self/statm`` where available; elsewhere (e.g. macOS) falls
+    back to the peak RSS, which only grows.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class GCTimer:
+    """Times garbage collections, installed once per process in ``gc.callbacks``.
+
+    The callback runs inside the collector, in whichever thread triggered
+    it, so it only appends to a bounded deque; ``drain`` hands the pauses
+    to the metrics outside the collector.
+    """
+
+    def __init__(self, max_pending=10000, clock=time.perf_counter):
+        """Create a timer.
+
+        Args:
+            max_pending: Pauses kept until drained; older ones are dropped.
+            clock: High resolution clock, injectable for tests.
+        """
+        self._clock = clock
+        self._max_pending = max_pending
+        self.reset()
+        # A forked worker reports its own collections, not the master's
+        os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        """Forget the collections recorded so far."""
+        self._started = None
+        self._pending = collections.deque(maxlen=self._max_pending)
+        self.collections = [0] * len(gc.get_count())
+        self.pause_seconds = [0.0] * len(self.collections)
+
+    def __call__(self, phase, info):
+        """Record the start or end of a collection; see ``gc.callbacks``."""
+        if phase == "start":
+            self._started = self._clock()
+            return
+        if self._started is None:
+            return
+        pause = self._clock() - self._started
+        self._started = None
+        generation = info["generation"]
+        self.collections[generation] += 1
+        self.pause_seconds[generation] += pause
+        self._pending.append((generation, pause))
+
+    def install(self):
+        """Start timing collections in this process."""
+        if self not in gc.callbacks:
+            gc.callbacks.append(self)
+
+    def drain(self):
+        """Return and forget the ``(generation, seconds)`` pauses recorded so far."""
+        pauses = []
+        while True:
+            try:
+                pauses.append(self._pending.popleft())
+            except IndexError:
+                return pauses
+
+
+# The process's timer, shared by every app in it
+GC_TIMER = GCTimer()
+
+
+class MemoryMetrics:
+    """Prometheus metrics for worker memory, one series per worker."""
+
+    def __init__(self, registry):
+        """Register the memory metrics.
+
+        Gauges use the ``liveall`` multiprocess mode, so each live worker
+        is reported under its own ``pid`` label rather than summed.
+
+        Args:
+            registry: Prometheus registry of the app.
+        """
+        self.rss = Gauge(
+            "worker_memory_rss_bytes",
+            "Resident set size of the worker",
+            registry=registry,
+            multiprocess_mode="liveall",
+        )
+        self.blocks = Gauge(
+            "worker_memory_python_blocks",
+            "Memory blocks allocated by the Python allocator in the worker",
+            registry=registry,
+            multiprocess_mode="liveall",
+        )
+        self.threshold = Gauge(
+            "worker_memory_recycle_threshold_bytes",
+            "RSS at which the worker is recycled (0 when recycling is off)",
+            registry=registry,
+            multiprocess_mode="liveall",
+        )
+        self.gc_objects = Gauge(
+            "worker_gc_objects",
+            "Objects counted towards the next collection of each GC generation",
+            ["generation"],
+            registry=registry,
+            multiprocess_mode="liveall",
+        )
+        self.gc_pause = Histogram(
+            "worker_gc_pause_seconds",
+            "Garbage collection pauses per generation",
+            ["generation"],
+            registry=registry,
+            buckets=GC_PAUSE_BUCKETS,
+        )
+        self.recycles = Counter(
+            "worker_memory_recycles",
+            "Workers recycled for passing their RSS threshold",
+            registry=registry,
+        )
+
+    def record(self, sample, threshold, pauses):
+        """Publish a sample and the GC pauses since the previous one."""
+        self.rss.set(sample["rss_bytes"])
+        self.blocks.set(sample["python_blocks"])
+        self.threshold.set(threshold or 0)
+        for generation, count in enumerate(sample["gc_objects"]):
+            self.gc_objects.labels(str(generation)).set(count)
+        for generation, pause in pauses:
+            self.gc_pause.labels(str(generation)).observe(pause)
+
+
+class MemoryMonitor:
+    """Samples this worker's memory and decides when it should be recycled."""
+
+    def __init__(
+        self,
+        budget_bytes=None,
+        jitter=0.1,
+        interval=1.0,
+        metrics=None,
+        rss=read_rss,
+        timer=GC_TIMER,
+        clock=time.monotonic,
+    ):
+        """Create a monitor.
+
+        Args:
+            budget_bytes: RSS above which the worker is recycled, or None.
+            jitter: Fraction of the budget each worker may recycle below it.
+            interval: Minimum seconds between samples.
+            metrics: MemoryMetrics instance, or None.
+            rss: Callable returning the RSS in bytes, injectable for tests.
+            timer: GCTimer whose pauses are exported.
+            clock: Monotonic clock, injectable for tests.
+        """
+        self.budget_bytes = budget_bytes
+        self.jitter = jitter
+        self.interval = interval
+        self.metrics = metrics
+        self._rss = rss
+        self._timer = timer
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pid = None
+        self._local()
+
+    def _local(self):
+        """Pick this process's threshold; forked workers each draw their own."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.threshold = None
+        if self.budget_bytes:
+            self.threshold = int(self.budget_bytes * (1 - random.uniform(0, self.jitter)))
+        self.recycle_due = False
+        self.last = None
+        self._sampled = None
+
+    def sample(self):
+        """Measure this process now.
+
+        Returns:
+            Dict with ``rss_bytes``, ``python_blocks`` and ``gc_objects``
+            (per generation).
+        """
+        self._local()
+        sample = {
+            "rss_bytes": self._rss(),
+            "python_blocks": sys.getallocatedblocks(),
+            "gc_objects": list(gc.get_count()),
+        }
+        if self.metrics is not None:
+            self.metrics.record(sample, self.threshold, self._timer.drain())
+        self.last = sample
+        return sample
+
+    def check(self, force=False):
+        """Sample unless sampled recently, and flag the worker for recycling.
+
+        Args:
+            force: Sample regardless of ``interval``.
+
+        Returns:
+            Whether the worker should be recycled.
+        """
+        self._local()
+        now = self._clock()
+        with self._lock:
+            if not force and self._sampled is not None and now - self._sampled < self.interval:
+                return self.recycle_due
+            self._sampled = now
+        rss = self.sample()["rss_bytes"]
+        if self.threshold is not None and rss >= self.threshold and not self.recycle_due:
+            self.recycle_due = True
+            if self.metrics is not None:
+                self.metrics.recycles.inc()
+            logger.warning(
+                "Worker over its memory threshold, recycling",
+                extra={
+                    "extra_fields": {
+                        "pid": self._pid,
+                        "rss_bytes": rss,
+                        "threshold_bytes": self.threshold,
+                    }
+                },
+            )
+        return self.recycle_due
+
+    def stats(self):
+        """Return the latest sample with GC totals and the recycling state."""
+        self._local()
+        sample = self.last or self.sample()
+        return dict(
+            sample,
+            pid=self._pid,
+            gc_collections=list(self._timer.collections),
+            gc_pause_seconds=[round(total, 6) for total in self._timer.pause_seconds],
+            budget_bytes=self.budget_bytes,
+            threshold_bytes=self.threshold,
+            recycle_due=self.recycle_due,
+        )
+
+
+def _site(statistic, group_by):
+    """Return an allocation site, innermost frame first, as a dict."""
+    frames = statistic.traceback if group_by == "traceback" else statistic.traceback[:1]
+    return [{"filename": frame.filename, "lineno": frame.lineno} for frame in frames]
+
+
+class AllocationTracer:
+    """Top allocation sites from ``tracemalloc``, started on demand."""
+
+    def __init__(self, frames=10):
+        """Create a tracer; nothing is traced until ``start``.
+
+        Args:
+            frames: Frames recorded per allocation.
+        """
+        self.frames = frames
+        self._baseline = None
+        self._busy = threading.Lock()
+
+    @property
+    def tracing(self):
+        """Whether tracemalloc is running."""
+        return tracemalloc.is_tracing()
+
+    def _snapshot(self):
+        """Take a snapshot without tracemalloc's own and the import system's allocations."""
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            )
+        )
+
+    def start(self):
+        """Start tracing, if needed, and take the baseline later diffs compare with.
+
+        Raises:
+            TracerBusy: If another snapshot is being taken.
+        """
+        if not self._busy.acquire(blocking=False):
+            raise TracerBusy()
+        try:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            self._baseline = self._snapshot()
+        finally:
+            self._busy.release()
+
+    def stop(self):
+        """Stop tracing and free the traces."""
+        self._baseline = None
+        tracemalloc.stop()
+
+    def status(self):
+        """Return whether tracing and the memory it currently accounts for."""
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": True,
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "tracemalloc_bytes": tracemalloc.get_tracemalloc_memory(),
+        }
+
+    def top(self, limit=20, group_by="lineno", diff=False):
+        """Return the largest allocation sites, or the fastest growing ones.
+
+        Args:
+            limit: Sites to return.
+            group_by: ``filename``, ``lineno`` or ``traceback``.
+            diff: Compare with the baseline taken by ``start``.
+
+        Returns:
+            List of dicts with ``size_bytes``, ``count`` and ``site``, plus
+            ``size_diff_bytes`` and ``count_diff`` when diffing.
+
+        Raises:
+            TracerBusy: If another snapshot is being taken.
+            RuntimeError: If tracemalloc is not tracing.
+        """
+        if not self._busy.acquire(blocking=False):
+            raise TracerBusy()
+        try:
+            if not tracemalloc.is_tracing() or self._baseline is None:
+                raise RuntimeError("Not tracing allocations")
+            snapshot = self._snapshot()
+            if diff:
+                statistics = snapshot.compare_to(self._baseline, group_by)
+            else:
+                statistics = snapshot.statistics(group_by)
+        finally:
+            self._busy.release()
+
+        sites = []
+        for statistic in statistics[:limit]:
+            site = {
+                "size_bytes": statistic.size,
+                "count": statistic.count,
+                "site": _site(statistic, group_by),
+            }
+            if diff:
+                site["size_diff_bytes"] = statistic.size_diff
+                site["count_diff"] = statistic.count_diff
+            sites.append(site)
+        return sites
+
+
+def recycle_worker(worker):
+    """Stop a gunicorn worker gracefully once its app asks to be recycled.
+
+    Called from the ``post_request`` hook; the worker finishes in-flight
+    requests and exits, and the master starts a replacement, as it does
+    for ``max_requests``.
+
+    Args:
+        worker: gunicorn worker.
+
+    Returns:
+        Whether the worker was told to stop.
+    """
+    extensions = getattr(worker.wsgi, "extensions", {})
+    monitor = extensions.get("memory_monitor")
+    if monitor is None or not worker.alive or not monitor.recycle_due:
+        return False
+    worker.alive = False
+    return True
+
+
+def setup_memory(app):
+    """Create the memory monitor, and the allocation tracer when allowed.
+
+    Runs after ``setup_metrics``, whose registry the memory metrics join.
+    The tracer requires ``MEMORY_TRACE_ENABLED``, ``ENABLE_DEBUG_ENDPOINTS``
+    and a ``DEBUG_TOKEN``, since allocation sites expose source paths.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        MemoryMonitor instance, also stored in ``app.extensions``, or None.
+    """
+    if app.config.get("MEMORY_TRACE_ENABLED", False):
+        if app.config.get("ENABLE_DEBUG_ENDPOINTS", False) and app.config.get("DEBUG_TOKEN"):
+            tracer = AllocationTracer(frames=app.config.get("MEMORY_TRACE_FRAMES", 10))
+            app.extensions["allocation_tracer"] = tracer
+        else:
+            logger.warning("Allocation tracing needs ENABLE_DEBUG_ENDPOINTS and DEBUG_TOKEN")
+
+    prometheus = app.extensions.get("prometheus_metrics")
+    budget_mb = app.config.get("MEMORY_RECYCLE_RSS_MB", 0)
+    if prometheus is None and not budget_mb:
+        return None
+
+    GC_TIMER.install()
+    monitor = MemoryMonitor(
+        budget_bytes=int(budget_mb * 1024 * 1024) or None,
+        jitter=app.config.get("MEMORY_RECYCLE_JITTER", 0.1),
+        interval=app.config.get("MEMORY_SAMPLE_INTERVAL", 1.0),
+        metrics=MemoryMetrics(prometheus.registry) if prometheus is not None else None,
+    )
+    app.extensions["memory_monitor"] = monitor
+
+    @app.teardown_request
+    def check_memory(exc):
+        """Sample the worker after the request, at most once per interval.
+
+        Args:
+            exc: Exception raised during the request, if any.
+        """
+        if not is_warmup_request():
+            monitor.check()
+
+    return monitor
@@ -0,0 +1,306 @@
+"""Bounded connection pools for dependencies.
+
+A ``ConnectionPool`` holds at most ``max_size`` connections of one worker.
+Borrowers wait up to ``acquire_timeout`` for a free one, then get
+``PoolTimeout``, which views turn into a 503. Idle connections are reused
+most recently used first, so surplus ones age out: connections idle for
+``idle_timeout`` and connections the peer closed are dropped when found,
+instead of being handed out.
+
+Pools open no connections until used or warmed, so a pool created before
+gunicorn forks only connects in the workers. ``src/utils/dependencies.py``
+additionally creates every pool once per process.
+"""
+
+import collections
+import contextlib
+import logging
+import select
+import selectors
+import socket
+import threading
+import time
+
+from werkzeug.exceptions import ServiceUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(ServiceUnavailable):
+    """No pooled connection became free in time.
+
+    A ``ServiceUnavailable``, so a view that raises it answers 503 with
+    ``Retry-After`` instead of 500.
+    """
+
+    def __init__(self, name, timeout):
+        """Create the error for pool ``name`` after waiting ``timeout`` seconds."""
+        super().__init__(f"No connection to {name} became free within {timeout:g}s", retry_after=1)
+        self.pool = name
+
+
+def socket_alive(sock):
+    """Return whether an idle socket can be reused.
+
+    An idle socket should have nothing to read; if it does, the peer
+    either closed it or sent data nobody asked for, and it is dropped.
+    ``select.select`` is avoided since it fails for descriptors past 1023,
+    which busy workers reach; gevent removes ``select.poll`` but patches
+    ``selectors``.
+    """
+    try:
+        if hasattr(select, "poll"):
+            poller = select.poll()
+            poller.register(sock, select.POLLIN)
+            return not poller.poll(0)
+        with selectors.DefaultSelector() as selector:
+            selector.register(sock, selectors.EVENT_READ)
+            return not selector.select(0)
+    except (OSError, ValueError):
+        return False
+
+
+class ConnectionPool:
+    """A bounded pool of connections to one dependency."""
+
+    def __init__(
+        self,
+        name,
+        connect,
+        max_size=10,
+        idle_timeout=60.0,
+        acquire_timeout=1.0,
+        alive=None,
+        clock=time.monotonic,
+    ):
+        """Create an empty pool.
+
+        Args:
+            name: Dependency name, used in metrics and errors.
+            connect: Callable opening a new connection. Connections need a
+                ``close()`` method.
+            max_size: Connections open or borrowed at most at once.
+            idle_timeout: Seconds an idle connection is kept for reuse.
+            acquire_timeout: Default seconds to wait for a free connection.
+            alive: Callable telling whether an idle connection is still usable.
+            clock: Monotonic clock, injectable for tests.
+        """
+        self.name = name
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.observer = None
+        self._connect = connect
+        self._alive = alive
+        self._clock = clock
+        self._available = threading.Condition(threading.Lock())
+        # (connection, idle since), most recently released last
+        self._idle = collections.deque()
+        # Connections borrowed, being opened, or idle
+        self._size = 0
+        self.in_use = 0
+        self.created = 0
+        self.discarded = 0
+        self.timeouts = 0
+
+    def stats(self):
+        """Return pool counters.
+
+        Returns:
+            Dict with ``max_size``, ``in_use`` and ``idle`` connections, and
+            the ``created``, ``discarded`` and ``timeouts`` counts.
+        """
+        return {
+            "max_size": self.max_size,
+            "in_use": self.in_use,
+            "idle": len(self._idle),
+            "created": self.created,
+            "discarded": self.discarded,
+            "timeouts": self.timeouts,
+        }
+
+    def _take_idle(self, now):
+        """Return a reusable idle connection or None; caller holds the lock."""
+        stale = []
+        while self._idle and now - self._idle[0][1] >= self.idle_timeout:
+            stale.append(self._idle.popleft()[0])
+        conn = None
+        while self._idle and conn is None:
+            conn = self._idle.pop()[0]
+            if self._alive is not None and not self._alive(conn):
+                stale.append(conn)
+                conn = None
+        self._size -= len(stale)
+        self.discarded += len(stale)
+        for old in stale:
+            _close(old)
+        return conn
+
+    def acquire(self, timeout=None):
+        """Borrow a connection, opening one if the pool is not full.
+
+        Args:
+            timeout: Seconds to wait for a free connection, default
+                ``acquire_timeout``.
+
+        Returns:
+            Connection; give it back with ``release``.
+
+        Raises:
+            PoolTimeout: If no connection became free in time.
+            OSError: If opening a new connection failed.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = self._clock()
+        with self._available:
+            while True:
+                conn = self._take_idle(self._clock())
+                if conn is not None or self._size < self.max_size:
+                    break
+                remaining = started + timeout - self._clock()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    self._notify("timed_out")
+                    raise PoolTimeout(self.name, timeout)
+                self._available.wait(remaining)
+            if conn is None:
+                self._size += 1
+            self.in_use += 1
+        if conn is None:
+            conn = self._open()
+        self._notify("acquired", self._clock() - started)
+        return conn
+
+    def _open(self):
+        """Open a connection for a slot already counted in the size."""
+        try:
+            conn = self._connect()
+        except BaseException:
+            with self._available:
+                self._size -= 1
+                self.in_use -= 1
+                self._available.notify()
+            raise
+        self.created += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """Give a borrowed connection back.
+
+        Args:
+            conn: Connection from ``acquire``.
+            discard: Close it instead of keeping it, e.g. after an error.
+        """
+        with self._available:
+            self.in_use -= 1
+            if discard:
+                self._size -= 1
+                self.discarded += 1
+            else:
+                self._idle.append((conn, self._clock()))
+            self._available.notify()
+        if discard:
+            _close(conn)
+        self._notify("released")
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection for a ``with`` block.
+
+        The connection is discarded if the block raises, since it may be
+        left mid-conversation.
+
+        Args:
+            timeout: Seconds to wait for a free connection.
+
+        Yields:
+            Connection.
+        """
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+
+    def warm(self, count):
+        """Open connections ahead of the first requests that need them.
+
+        Failures are logged rather than raised; the readiness check reports
+        a dependency that is down.
+
+        Args:
+            count: Idle connections to have ready, up to ``max_size``.
+
+        Returns:
+            Number of connections opened.
+        """
+        opened = []
+        try:
+            while len(opened) < count:
+                with self._available:
+                    if self._size >= self.max_size or len(self._idle) + len(opened) >= count:
+                        break
+                    self._size += 1
+                    self.in_use += 1
+                opened.append(self._open())
+        except (OSError, PoolTimeout) as e:
+            logger.warning(
+                "Could not warm up pool %s: %s",
+                self.name,
+                e,
+                extra={"extra_fields": {"pool": self.name, "error": str(e)}},
+            )
+        for conn in opened:
+            self.release(conn)
+        return len(opened)
+
+    def check(self):
+        """Borrow a connection and give it back, for readiness checks.
+
+        Returns:
+            True.
+        """
+        with self.connection():
+            return True
+
+    def close(self):
+        """Close the idle connections."""
+        with self._available:
+            idle, self._idle = self._idle, collections.deque()
+            self._size -= len(idle)
+        for conn, _ in idle:
+            _close(conn)
+
+    def _notify(self, event, *args):
+        if self.observer is not None:
+            getattr(self.observer, event)(self, *args)
+
+
+def _close(conn):
+    """Close a connection, ignoring errors from one that is already broken."""
+    try:
+        conn.close()
+    except OSError:
+        pass
+
+
+def tcp_pool(name, host, port, connect_timeout=2.0, **kwargs):
+    """Create a pool of plain TCP sockets, e.g. for a database or cache protocol.
+
+    Args:
+        name: Dependency name.
+        host: Host name or address.
+        port: TCP port.
+        connect_timeout: Seconds to wait for a connection; also the socket timeout.
+        **kwargs: ``ConnectionPool`` arguments.
+
+    Returns:
+        ConnectionPool of connected sockets.
+    """
+
+    def connect():
+        return socket.create_connection((host, port), timeout=connect_timeout)
+
+    return ConnectionPool(name, connect, alive=socket_alive, **kwargs)
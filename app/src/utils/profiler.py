@@ -0,0 +1,440 @@
+"""Statistical stack-sampling profiler.
+
+A native background thread reads ``sys._current_frames()`` every few
+milliseconds and counts the stacks it sees. Results are written in the
+collapsed-stack format (``thread;outer;inner count`` per line) read by
+flamegraph.pl, inferno and speedscope.
+
+Three ways to run it, all off unless ``PROFILER_ENABLED`` is set:
+
+* ``GET /debug/profile?seconds=N`` samples every thread of the worker for N
+  seconds (most useful with gevent or threaded workers, since a sync worker
+  is busy serving the profile request itself);
+* ``POST /debug/profile/requests?every=N&count=M`` samples every Nth request
+  this worker serves, M times, and ``GET /debug/profile/requests`` returns
+  the merged stacks;
+* ``PROFILER_SIGNAL`` (e.g. ``SIGUSR2``) sent to a worker samples it for
+  ``PROFILER_SIGNAL_SECONDS`` and writes ``profile-<pid>-<time>.folded`` to
+  ``PROFILER_OUTPUT_DIR``.
+
+Cost is bounded: one whole-worker run at a time, a minimum interval, a
+maximum duration, and caps on stack depth and distinct stacks.
+"""
+
+import _thread
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from flask import g
+
+logger = logging.getLogger(__name__)
+
+# Replaces the stacks recorded once ``max_stacks`` distinct ones are held
+TRUNCATED = "[truncated]"
+MIN_INTERVAL = 0.001
+
+
+def _gevent_patched():
+    """Return whether gevent has patched threading in this process."""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+def _native():
+    """Return native ``(start_new_thread, get_ident, allocate_lock, sleep)``.
+
+    Under gevent the patched versions would run the sampler as a greenlet,
+    which never sees the frames of the greenlet it is meant to interrupt.
+    """
+    if _gevent_patched():
+        monkey = sys.modules["gevent.monkey"]
+        start, ident, lock = monkey.get_original(
+            "_thread", ["start_new_thread", "get_ident", "allocate_lock"]
+        )
+        return start, ident, lock, monkey.get_original("time", "sleep")
+    return _thread.start_new_thread, _thread.get_ident, _thread.allocate_lock, time.sleep
+
+
+class _NativeEvent:
+    """A one-shot event on a native lock, shared with the sampling thread.
+
+    ``threading.Event`` is patched by gevent and cannot be set from a
+    native thread.
+    """
+
+    def __init__(self):
+        """Create the event unset."""
+        _, _, allocate_lock, _ = _native()
+        self._lock = allocate_lock()
+        self._lock.acquire()
+
+    def is_set(self):
+        """Return whether ``set`` was called."""
+        return not self._lock.locked()
+
+    def set(self):
+        """Set the event, waking every waiter."""
+        if self._lock.locked():
+            self._lock.release()
+
+    def wait(self, timeout):
+        """Wait up to ``timeout`` seconds for the event.
+
+        Returns:
+            True if the event is set.
+        """
+        if self._lock.acquire(True, timeout):
+            self._lock.release()
+            return True
+        return self.is_set()
+
+
+class StackSampler:
+    """Counts of collapsed stacks."""
+
+    def __init__(self, max_stacks=5000, max_depth=64):
+        """Initialize an empty profile.
+
+        Args:
+            max_stacks: Distinct stacks kept; later ones count as truncated.
+            max_depth: Innermost frames kept per stack.
+        """
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.counts = {}
+        self.samples = 0
+        self._labels = {}
+
+    def _label(self, code):
+        """Return the frame label for a code object, e.g. ``hello (api.py:29)``."""
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            label = self._labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+        return label
+
+    def sample(self, frames, names):
+        """Count one stack per thread.
+
+        Args:
+            frames: Mapping of thread ident to its current frame.
+            names: Mapping of thread ident to thread name.
+        """
+        for ident, frame in frames.items():
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if frame is not None:
+                stack.append("...")
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.add(";".join(reversed(stack)))
+        self.samples += 1
+
+    def add(self, key, count=1):
+        """Count ``key`` ``count`` times, within the ``max_stacks`` bound."""
+        if key not in self.counts and len(self.counts) >= self.max_stacks:
+            key = TRUNCATED
+        self.counts[key] = self.counts.get(key, 0) + count
+
+    def merge(self, other):
+        """Add another profile's counts to this one."""
+        for key, count in other.counts.items():
+            self.add(key, count)
+        self.samples += other.samples
+
+    def collapsed(self):
+        """Return the profile in collapsed-stack format, most frequent first."""
+        items = sorted(self.counts.items(), key=lambda item: -item[1])
+        return "".join(f"{key} {count}\n" for key, count in items)
+
+
+class SamplingRun:
+    """A native thread sampling stacks into a StackSampler until stopped."""
+
+    def __init__(self, sampler, interval, target=None, exclude=()):
+        """Prepare a run.
+
+        Args:
+            sampler: StackSampler receiving the samples.
+            interval: Seconds between samples.
+            target: Only sample this native thread ident, if given.
+            exclude: Native thread idents never sampled.
+        """
+        self.sampler = sampler
+        self.interval = max(interval, MIN_INTERVAL)
+        self.target = target
+        self.exclude = set(exclude)
+        self.stopped = _NativeEvent()
+        self.done = _NativeEvent()
+        self._names = {}
+
+    def start(self):
+        """Start sampling in a new native thread."""
+        self._names = {t.ident: t.name for t in threading.enumerate()}
+        start_new_thread, _, _, _ = _native()
+        start_new_thread(self._loop, ())
+
+    def _loop(self):
+        """Sample until stopped."""
+        _, get_ident, _, _ = _native()
+        self.exclude.add(get_ident())
+        try:
+            while not self.stopped.is_set():
+                frames = sys._current_frames()
+                if self.target is not None:
+                    frames = {self.target: frames[self.target]} if self.target in frames else {}
+                else:
+                    frames = {i: f for i, f in frames.items() if i not in self.exclude}
+                self.sampler.sample(frames, self._names)
+                self.stopped.wait(self.interval)
+        finally:
+            self.done.set()
+
+    def stop(self, timeout=1.0):
+        """Stop sampling and wait for the thread to finish.
+
+        Args:
+            timeout: Longest wait in seconds for the sample in progress.
+
+        Returns:
+            True if the thread finished within ``timeout``.
+        """
+        self.stopped.set()
+        return self.done.wait(timeout)
+
+
+class ProfilerBusy(Exception):
+    """Raised when a whole-worker profile is already running."""
+
+
+class Profiler:
+    """App-scoped entry point for on-demand profiling."""
+
+    def __init__(self, interval=0.01, max_seconds=30.0, max_stacks=5000, max_depth=64):
+        """Initialize the profiler.
+
+        Args:
+            interval: Default seconds between samples.
+            max_seconds: Longest allowed whole-worker run.
+            max_stacks: Distinct stacks kept per profile.
+            max_depth: Innermost frames kept per stack.
+        """
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        _, _, allocate_lock, _ = _native()
+        self._busy = allocate_lock()
+        self._lock = allocate_lock()
+        self._armed = None
+
+    def _sampler(self):
+        """Return an empty StackSampler with this profiler's bounds."""
+        return StackSampler(self.max_stacks, self.max_depth)
+
+    def profile(self, seconds, interval=None, exclude_current=True):
+        """Sample every thread of this process for ``seconds``.
+
+        Args:
+            seconds: Duration, at most ``max_seconds``.
+            interval: Seconds between samples, defaults to ``interval``.
+            exclude_current: Skip the calling thread, which only waits.
+
+        Returns:
+            StackSampler with the results.
+
+        Raises:
+            ProfilerBusy: If another whole-worker run is in progress.
+        """
+        if not self._busy.acquire(False):
+            raise ProfilerBusy()
+        try:
+            _, get_ident, _, _ = _native()
+            exclude = (get_ident(),) if exclude_current and not _gevent_patched() else ()
+            run = SamplingRun(self._sampler(), interval or self.interval, exclude=exclude)
+            run.start()
+            time.sleep(min(seconds, self.max_seconds))
+            run.stop()
+            return run.sampler
+        finally:
+            self._busy.release()
+
+    def profile_to_file(self, seconds, directory):
+        """Profile for ``seconds`` in the background and write a .folded file.
+
+        Args:
+            seconds: Duration, at most ``max_seconds``.
+            directory: Directory receiving ``profile-<pid>-<time>.folded``.
+
+        Returns:
+            Path the profile will be written to, or None if a run is active.
+        """
+        if not self._busy.acquire(False):
+            return None
+        path = os.path.join(directory, f"profile-{os.getpid()}-{int(time.time())}.folded")
+        run = SamplingRun(self._sampler(), self.interval)
+        start_new_thread, _, _, sleep = _native()
+
+        def finish():
+            """Stop the run after ``seconds`` and write its output."""
+            try:
+                sleep(min(seconds, self.max_seconds))
+                run.stop()
+                with open(path, "w") as f:
+                    f.write(run.sampler.collapsed())
+            finally:
+                self._busy.release()
+
+        run.start()
+        start_new_thread(finish, ())
+        return path
+
+    def arm(self, every, count, interval=None):
+        """Profile every ``every``-th request until ``count`` were profiled.
+
+        Replaces any previous request profile.
+        """
+        with self._lock:
+            self._armed = {
+                "every": every,
+                "count": count,
+                "interval": interval or self.interval,
+                "seen": 0,
+                "profiled": 0,
+                "active": 0,
+                "sampler": self._sampler(),
+            }
+
+    def request_status(self):
+        """Return the request profile's progress and merged StackSampler.
+
+        Returns:
+            Tuple of ``(status dict, StackSampler)``, or ``(None, None)``.
+        """
+        with self._lock:
+            armed = self._armed
+            if armed is None:
+                return None, None
+            status = {k: armed[k] for k in ("every", "count", "seen", "profiled", "active")}
+            sampler = self._sampler()
+            sampler.merge(armed["sampler"])
+        return status, sampler
+
+    def start_request(self):
+        """Start sampling the current request if it is due.
+
+        Returns:
+            ``(run, profile)`` to pass to ``finish_request``, or None.
+        """
+        armed = self._armed
+        if armed is None:
+            return None
+        with self._lock:
+            if armed["profiled"] + armed["active"] >= armed["count"]:
+                return None
+            armed["seen"] += 1
+            if armed["seen"] % armed["every"]:
+                return None
+            armed["active"] += 1
+        _, get_ident, _, _ = _native()
+        run = SamplingRun(self._sampler(), armed["interval"], target=get_ident())
+        run.start()
+        return run, armed
+
+    def finish_request(self, run, armed):
+        """Stop a request's run and merge its stacks into its request profile."""
+        run.stop()
+        with self._lock:
+            armed["sampler"].merge(run.sampler)
+            armed["active"] -= 1
+            armed["profiled"] += 1
+
+
+def install_profile_signal(app, profiler):
+    """Profile to a file when the worker receives ``PROFILER_SIGNAL``.
+
+    Args:
+        app: Flask application instance.
+        profiler: Profiler instance.
+
+    Returns:
+        Signal number installed, or None.
+    """
+    name = app.config.get("PROFILER_SIGNAL", "")
+    if not name:
+        return None
+    signum = getattr(signal, name.upper(), None)
+    if not isinstance(signum, signal.Signals):
+        logger.warning("Unknown PROFILER_SIGNAL %s; signal profiling disabled", name)
+        return None
+    seconds = app.config.get("PROFILER_SIGNAL_SECONDS", 10.0)
+    directory = app.config.get("PROFILER_OUTPUT_DIR") or tempfile.gettempdir()
+
+    def on_signal(signo, frame):
+        """Start a background profile and log where it will be written."""
+        path = profiler.profile_to_file(seconds, directory)
+        logger.info(
+            "Signal profile started" if path else "Signal profile skipped, profiler busy",
+            extra={"extra_fields": {"path": path, "seconds": seconds}},
+        )
+
+    try:
+        signal.signal(signum, on_signal)
+    except ValueError:
+        # Not the main thread; signals can only be handled there
+        logger.warning("Cannot install PROFILER_SIGNAL outside the main thread")
+        return None
+    return signum
+
+
+def setup_profiler(app):
+    """Create the profiler and its request hooks when enabled.
+
+    Requires ``PROFILER_ENABLED``, ``ENABLE_DEBUG_ENDPOINTS`` and a
+    ``DEBUG_TOKEN``, since profiles expose source paths and call stacks.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        Profiler instance, also stored in ``app.extensions``, or None.
+    """
+    if not app.config.get("PROFILER_ENABLED", False):
+        return None
+    if not app.config.get("ENABLE_DEBUG_ENDPOINTS", False) or not app.config.get("DEBUG_TOKEN"):
+        logger.warning("Profiler needs ENABLE_DEBUG_ENDPOINTS and DEBUG_TOKEN; disabled")
+        return None
+
+    profiler = Profiler(
+        interval=app.config.get("PROFILER_INTERVAL_MS", 10) / 1000,
+        max_seconds=app.config.get("PROFILER_MAX_SECONDS", 30.0),
+        max_stacks=app.config.get("PROFILER_MAX_STACKS", 5000),
+    )
+    app.extensions["profiler"] = profiler
+
+    @app.before_request
+    def start_request_profile():
+        """Sample this request if request profiling is armed and it is due."""
+        started = profiler.start_request()
+        if started is not None:
+            g.profile_run = started
+
+    @app.teardown_request
+    def finish_request_profile(exc):
+        """Stop sampling this request.
+
+        Args:
+            exc: Exception raised during the request, if any.
+        """
+        started = g.pop("profile_run", None)
+        if started is not None:
+            profiler.finish_request(*started)
+
+    install_profile_signal(app, profiler)
+    return profiler
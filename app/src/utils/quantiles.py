@@ -0,0 +1,266 @@
+"""Streaming latency quantiles over sliding windows.
+
+Latencies are counted in log-spaced buckets (the DDSketch mapping): bucket
+``i`` covers ``(gamma**(i-1), gamma**i]`` with ``gamma = (1 + a) / (1 - a)``,
+so any quantile is reported within relative accuracy ``a``. Recording is one
+``log``, an index and an in-place increment of a preallocated array.
+
+Each series (route and status class) keeps one bucket array per time slot.
+A window merges the slots it covers by adding counts, which is also how
+snapshots from other worker processes are merged in.
+"""
+
+import array
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+DEFAULT_WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+# Snapshot files shared between workers, one per process
+SNAPSHOT_FILE = "latency_sketch_{pid}.json"
+
+
+class LogMapping:
+    """Map values to log-spaced bucket indexes over a fixed range."""
+
+    def __init__(self, relative_accuracy=0.02, min_value=0.001, max_value=100000.0):
+        """Create a mapping.
+
+        Args:
+            relative_accuracy: Maximum relative error of reported values.
+            min_value: Values at or below this share the first bucket.
+            max_value: Values at or above this share the last bucket.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._multiplier = 1 / math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_value) * self._multiplier)
+        self.size = math.ceil(math.log(max_value) * self._multiplier) - self._offset + 1
+
+    def index(self, value):
+        """Return the bucket index for ``value``."""
+        if value <= self.min_value:
+            return 0
+        index = math.ceil(math.log(value) * self._multiplier) - self._offset
+        return index if index < self.size else self.size - 1
+
+    def value(self, index):
+        """Return the representative value of a bucket."""
+        return 2 * self.gamma ** (index + self._offset) / (self.gamma + 1)
+
+
+class Sketch:
+    """Bucket counts with their total count and sum."""
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self, size):
+        """Create an empty sketch with ``size`` buckets."""
+        self.counts = array.array("I", bytes(4 * size))
+        self.count = 0
+        self.total = 0.0
+
+    def merge(self, other):
+        """Add another sketch's counts to this one."""
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, mapping, q):
+        """Return the ``q`` quantile, or None if the sketch is empty.
+
+        Args:
+            mapping: LogMapping the counts were recorded with.
+            q: Quantile between 0 and 1.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen > rank:
+                return mapping.value(index)
+        return mapping.value(len(self.counts) - 1)
+
+
+class LatencyQuantiles:
+    """Per-route, per-status-class latency sketches over sliding windows.
+
+    Windows are made of whole slots, so a window of ``W`` seconds covers
+    between ``W - slot_seconds`` and ``W`` seconds of requests. Slots are
+    aligned to the wall clock so that workers' snapshots line up.
+    """
+
+    def __init__(
+        self,
+        windows=None,
+        relative_accuracy=0.02,
+        slot_seconds=15,
+        clock=time.time,
+    ):
+        """Create an empty registry.
+
+        Args:
+            windows: Mapping of window name to seconds, ``DEFAULT_WINDOWS`` if None.
+            relative_accuracy: Maximum relative error of reported quantiles.
+            slot_seconds: Width of the time slots windows are built from.
+            clock: Wall clock returning epoch seconds, injectable for tests.
+        """
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.mapping = LogMapping(relative_accuracy)
+        self.slot_seconds = slot_seconds
+        self.max_slots = math.ceil(max(self.windows.values()) / slot_seconds)
+        self.clock = clock
+        self._lock = threading.Lock()
+        # (route, status_class) -> {slot number: Sketch}
+        self._series = {}
+        self._current = {}
+
+    def record(self, route, status_code, duration_ms):
+        """Count one request.
+
+        Args:
+            route: Flask URL rule, or a fixed label for unmatched requests.
+            status_code: Response status code.
+            duration_ms: Request duration in milliseconds.
+        """
+        key = (route, f"{status_code // 100}xx")
+        number = int(self.clock() // self.slot_seconds)
+        index = self.mapping.index(duration_ms)
+        with self._lock:
+            current = self._current.get(key)
+            if current is None or current[0] != number:
+                current = self._current[key] = (number, self._new_slot(key, number))
+            sketch = current[1]
+            sketch.counts[index] += 1
+            sketch.count += 1
+            sketch.total += duration_ms
+
+    def _new_slot(self, key, number):
+        """Start a slot and drop slots no window covers; caller holds the lock."""
+        slots = self._series.setdefault(key, {})
+        for old in [n for n in slots if n <= number - self.max_slots]:
+            del slots[old]
+        sketch = slots[number] = Sketch(self.mapping.size)
+        return sketch
+
+    def snapshot(self):
+        """Return this process's slots in a JSON-serializable form.
+
+        Returns:
+            Dict with ``series``: a list of ``{"route", "status_class",
+            "slots"}`` where each slot lists its non-zero buckets.
+        """
+        with self._lock:
+            series = [
+                {
+                    "route": route,
+                    "status_class": status_class,
+                    "slots": [
+                        {
+                            "number": number,
+                            "count": sketch.count,
+                            "total": sketch.total,
+                            "buckets": [[i, c] for i, c in enumerate(sketch.counts) if c],
+                        }
+                        for number, sketch in slots.items()
+                    ],
+                }
+                for (route, status_class), slots in self._series.items()
+            ]
+        return {"slot_seconds": self.slot_seconds, "series": series}
+
+    def summaries(self, snapshots=(), quantiles=DEFAULT_QUANTILES):
+        """Merge this process and ``snapshots`` into per-window quantiles.
+
+        Args:
+            snapshots: Snapshots of other processes, see ``snapshot``.
+            quantiles: Quantiles to report.
+
+        Returns:
+            Dict mapping ``(route, status_class)`` to a dict mapping window
+            name to ``{"count", "sum", "quantiles": {q: value}}``; values
+            are in milliseconds. Windows without requests are omitted.
+        """
+        now = int(self.clock() // self.slot_seconds)
+        merged = {}
+        for snapshot in (self.snapshot(), *snapshots):
+            if snapshot.get("slot_seconds") != self.slot_seconds:
+                continue
+            for series in snapshot["series"]:
+                key = (series["route"], series["status_class"])
+                for window, sketch in self._window_sketches(series["slots"], now).items():
+                    merged.setdefault(key, {}).setdefault(window, Sketch(self.mapping.size)).merge(
+                        sketch
+                    )
+
+        return {
+            key: {
+                window: {
+                    "count": sketch.count,
+                    "sum": sketch.total,
+                    "quantiles": {q: sketch.quantile(self.mapping, q) for q in quantiles},
+                }
+                for window, sketch in windows.items()
+            }
+            for key, windows in merged.items()
+        }
+
+    def _window_sketches(self, slots, now):
+        """Merge serialized slots into one sketch per window that covers them."""
+        sketches = {}
+        for slot in slots:
+            age = now - slot["number"]
+            for window, seconds in self.windows.items():
+                if 0 <= age < math.ceil(seconds / self.slot_seconds):
+                    sketch = sketches.get(window)
+                    if sketch is None:
+                        sketch = sketches[window] = Sketch(self.mapping.size)
+                    for index, count in slot["buckets"]:
+                        sketch.counts[index] += count
+                    sketch.count += slot["count"]
+                    sketch.total += slot["total"]
+        return sketches
+
+    def write_snapshot(self, directory):
+        """Publish this process's snapshot for other workers to merge.
+
+        Args:
+            directory: Shared directory, e.g. ``PROMETHEUS_MULTIPROC_DIR``.
+        """
+        path = os.path.join(directory, SNAPSHOT_FILE.format(pid=os.getpid()))
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.snapshot(), f, separators=(",", ":"))
+        os.replace(temporary, path)
+
+    def read_snapshots(self, directory):
+        """Load the snapshots other workers published.
+
+        Args:
+            directory: Shared directory passed to ``write_snapshot``.
+
+        Returns:
+            List of snapshots, excluding this process's own file.
+        """
+        own = os.path.join(directory, SNAPSHOT_FILE.format(pid=os.getpid()))
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, SNAPSHOT_FILE.format(pid="*"))):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                # Removed by child_exit or replaced while reading
+                continue
+        return snapshots
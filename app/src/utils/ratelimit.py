@@ -0,0 +1,172 @@
+"""Token buckets in a memory-mapped table shared by worker processes.
+
+``SharedTokenBuckets`` keeps one bucket per key in a fixed-size hash table
+in a ``MAP_SHARED`` mmap. Gunicorn workers that map the same file (or
+inherit the mapping from a preloaded master) see and update the same
+buckets, so a client's limit holds across all workers of a task.
+
+The table is split into groups of ``SLOTS_PER_GROUP`` slots; a key hashes to
+one group and takes a free slot there, or evicts the group's least recently
+used bucket. An update locks only its group: a ``threading.Lock`` stripe
+within the process and an ``fcntl`` byte-range lock across processes, each
+held for a few microseconds. Each slot stores a 64-bit key hash, the token
+count and the last update time from the system-wide monotonic clock.
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import weakref
+
+# Key hash (0 = empty), tokens, last update (time.monotonic)
+SLOT = struct.Struct("<Qdd")
+SLOTS_PER_GROUP = 8
+GROUP_SIZE = SLOT.size * SLOTS_PER_GROUP
+# Thread lock stripes per process
+LOCK_STRIPES = 64
+
+# Tables alive in this process, given fresh thread locks in forked children
+_live_tables = weakref.WeakSet()
+
+
+def parse_rate_rules(spec):
+    """Parse per-route rate limits.
+
+    Args:
+        spec: Comma-separated ``<route>=<rate>:<burst>`` entries, e.g.
+            ``"/api/echo=5:10,/api/hello=100:200"``. A rate of 0 exempts
+            the route.
+
+    Returns:
+        Dict mapping Flask URL rule to ``(rate, burst)``.
+
+    Raises:
+        ValueError: If a rule is malformed or a value is negative.
+    """
+    rules = {}
+    for entry in (part.strip() for part in spec.split(",")):
+        if not entry:
+            continue
+        try:
+            route, limit = entry.rsplit("=", 1)
+            rate, burst = (float(value) for value in limit.split(":"))
+        except ValueError:
+            raise ValueError(f"Invalid rate limit rule: {entry!r}") from None
+        if rate < 0 or burst < 0 or (rate and burst < 1):
+            raise ValueError(f"Rate limit out of range in rule: {entry!r}")
+        rules[route.strip()] = (rate, burst)
+    return rules
+
+
+def key_hash(key):
+    """Return a stable, non-zero 64-bit hash of ``key``.
+
+    ``hash()`` is randomized per process, so workers started without
+    preload would not agree on it.
+    """
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class SharedTokenBuckets:
+    """Fixed-size table of token buckets shared through a memory map."""
+
+    def __init__(self, slots=8192, path=None, clock=time.monotonic):
+        """Map the table.
+
+        Args:
+            slots: Bucket capacity, rounded up to a whole group. Clients
+                beyond it evict the least recently used bucket of a group.
+            path: File backing the table. Processes mapping the same file
+                share buckets; ``/dev/shm`` keeps it in memory. Without a
+                path an unlinked temporary file is used, shared only with
+                processes forked after creation.
+            clock: Monotonic clock shared by all processes, injectable for tests.
+        """
+        self.groups = max(1, math.ceil(slots / SLOTS_PER_GROUP))
+        self.size = self.groups * GROUP_SIZE
+        self._clock = clock
+        if path:
+            self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), "r+b")
+        else:
+            self._file = tempfile.TemporaryFile()
+        self._fd = self._file.fileno()
+        if os.fstat(self._fd).st_size != self.size:
+            os.ftruncate(self._fd, self.size)
+        self._map = mmap.mmap(self._fd, self.size)
+        self._reset_locks()
+        _live_tables.add(self)
+
+    def _reset_locks(self):
+        # Also called in a forked child, where a parent's thread may have held one
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def take(self, key, rate, burst, cost=1.0):
+        """Take tokens from a key's bucket.
+
+        A bucket starts full with ``burst`` tokens and refills at ``rate``
+        tokens per second.
+
+        Args:
+            key: Bucket key, e.g. ``"<route>|<client>"``.
+            rate: Tokens added per second.
+            burst: Bucket capacity.
+            cost: Tokens the request needs.
+
+        Returns:
+            ``(allowed, retry_after)``; ``retry_after`` is the number of
+            seconds until enough tokens are available, 0 when allowed.
+        """
+        h = key_hash(key)
+        group = h % self.groups
+        offset = group * GROUP_SIZE
+        with self._locks[group % LOCK_STRIPES]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, GROUP_SIZE, offset)
+            try:
+                now = self._clock()
+                slot, tokens, updated = self._find(h, offset, burst, now)
+                # Clamped in case the table outlived a reboot of the monotonic clock
+                tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                SLOT.pack_into(self._map, slot, h, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, GROUP_SIZE, offset)
+        if allowed:
+            return True, 0.0
+        return False, (cost - tokens) / rate if rate else math.inf
+
+    def _find(self, h, offset, burst, now):
+        """Return ``(slot offset, tokens, updated)`` for ``h``; caller holds the group lock."""
+        oldest = None
+        for slot in range(offset, offset + GROUP_SIZE, SLOT.size):
+            slot_hash, tokens, updated = SLOT.unpack_from(self._map, slot)
+            if slot_hash == h:
+                return slot, tokens, updated
+            if slot_hash == 0:
+                return slot, burst, now
+            if oldest is None or updated < oldest[1]:
+                oldest = (slot, updated)
+        # Evicted clients start over with a full bucket
+        return oldest[0], burst, now
+
+    def close(self):
+        """Unmap the table."""
+        self._map.close()
+        self._file.close()
+
+
+def _reset_after_fork():
+    """Give every table fresh thread locks in a forked child."""
+    for table in list(_live_tables):
+        table._reset_locks()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,437 @@
+"""Response cache for views.
+
+``cache_response`` memoizes a view's response, keyed by the endpoint, its
+URL arguments and selected query arguments and headers. Entries expire
+after a TTL; the least recently used entries are evicted once the cache
+exceeds ``ROUTE_CACHE_MAX_BYTES``. Concurrent misses for the same key are
+coalesced: one request computes the response and the others wait for it.
+
+The backend is selected with ``ROUTE_CACHE_BACKEND``:
+
+- ``memory``: a dict per worker process.
+- ``sqlite``: a SQLite database in ``ROUTE_CACHE_PATH`` shared by all
+  workers of a task (``gunicorn_conf.py`` puts it in ``/dev/shm``).
+
+Only successful, non-streamed GET responses without cookies are cached.
+The view's response is cached before ``after_request`` hooks run, so
+request IDs, compression and CORS headers are applied to every hit. A
+JSON field named with ``timestamp=`` is set to the current time on hits.
+"""
+
+import functools
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+from flask import current_app, make_response, request
+
+from src.utils.runtime_config import on_settings_change
+
+logger = logging.getLogger(__name__)
+
+CachedResponse = namedtuple("CachedResponse", ["status", "headers", "body"])
+
+# Headers recomputed for every response
+_SKIPPED_HEADERS = frozenset({"content-length"})
+
+
+def encode_entry(entry):
+    """Serialize a CachedResponse to bytes for a backend."""
+    head = json.dumps([entry.status, entry.headers], separators=(",", ":")).encode()
+    return head + b"\n" + entry.body
+
+
+def decode_entry(data):
+    """Deserialize bytes written by ``encode_entry``."""
+    head, _, body = data.partition(b"\n")
+    status, headers = json.loads(head)
+    return CachedResponse(status, [tuple(header) for header in headers], body)
+
+
+class MemoryCacheBackend:
+    """LRU dict of entries with per-entry expiry, local to the process."""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, clock=time.monotonic):
+        """Create an empty backend.
+
+        Args:
+            max_bytes: Budget for keys and values; LRU entries are evicted above it.
+            clock: Monotonic clock, injectable for tests.
+        """
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the value stored under ``key``, or None if missing or expired."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value, size = item
+            if expires <= self._clock():
+                del self._entries[key]
+                self._size -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        """Store ``value`` under ``key`` for ``ttl`` seconds.
+
+        Values larger than the whole budget are not stored.
+        """
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[2]
+            self._entries[key] = (self._clock() + ttl, value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        """Return ``entries`` and ``size_bytes``."""
+        with self._lock:
+            return {"entries": len(self._entries), "size_bytes": self._size}
+
+
+class SQLiteCacheBackend:
+    """Entries in a SQLite database shared by processes opening the same file."""
+
+    def __init__(self, path, max_bytes=16 * 1024 * 1024, clock=time.time):
+        """Open (or create) the database.
+
+        Args:
+            path: Database file. Processes using the same file share entries.
+            max_bytes: Budget for keys and values across all processes.
+            clock: Wall clock shared by all processes, injectable for tests.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # One connection per process, shared by its threads or greenlets
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.evictions = 0
+
+    def _connection(self):
+        """Return this process's connection; caller holds the lock."""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Cache contents need not survive a crash
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB,"
+                " size INTEGER, expires REAL, accessed REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key):
+        """Return the value stored under ``key``, or None if missing or expired."""
+        now = self._clock()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value, ttl):
+        """Store ``value`` under ``key`` for ``ttl`` seconds, evicting LRU entries over budget."""
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        now = self._clock()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now + ttl, now),
+                )
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then LRU entries until within budget; caller holds the lock."""
+        conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        excess -= self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def stats(self):
+        """Return ``entries`` and ``size_bytes`` of the shared database."""
+        with self._lock:
+            entries, size = (
+                self._connection()
+                .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries")
+                .fetchone()
+            )
+        return {"entries": entries, "size_bytes": size}
+
+
+class _Flight:
+    """A response being computed, awaited by concurrent requests for the same key."""
+
+    __slots__ = ("done", "entry")
+
+    def __init__(self):
+        """Start an unfinished flight."""
+        self.done = threading.Event()
+        self.entry = None
+
+
+class RouteCache:
+    """Cache of view responses with single-flight misses."""
+
+    def __init__(self, backend, ttl=30.0, wait_timeout=10.0):
+        """Create a cache.
+
+        Args:
+            backend: ``MemoryCacheBackend`` or ``SQLiteCacheBackend``.
+            ttl: Default seconds an entry is served.
+            wait_timeout: Seconds a coalesced miss waits for the request
+                computing the response before computing it itself.
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """Return the CachedResponse for ``key``, or None."""
+        data = self.backend.get(key)
+        if data is None:
+            return None
+        with self._lock:
+            self.hits += 1
+        return decode_entry(data)
+
+    def fill(self, key, compute, ttl=None):
+        """Compute and cache the response for a missed key, once per key at a time.
+
+        Args:
+            key: Cache key.
+            compute: Callable returning the view's Flask response.
+            ttl: Seconds to serve the entry, ``self.ttl`` if None.
+
+        Returns:
+            ``(response, entry)``: the computed response, or None with the
+            entry computed by a concurrent request.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            if flight.done.wait(self.wait_timeout) and flight.entry is not None:
+                with self._lock:
+                    self.coalesced += 1
+                return None, flight.entry
+            # The computing request failed, timed out or was not cacheable
+            return compute(), None
+
+        with self._lock:
+            self.misses += 1
+        try:
+            response = compute()
+            flight.entry = cacheable_entry(response)
+            if flight.entry is not None:
+                self.backend.set(key, encode_entry(flight.entry), self.ttl if ttl is None else ttl)
+            return response, None
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        """Return counters and the backend's size.
+
+        Returns:
+            Dict with ``hits``, ``misses``, ``coalesced`` and ``evictions``
+            counts and the backend's ``entries`` and ``size_bytes``.
+        """
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.backend.evictions,
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+
+def cacheable_entry(response):
+    """Return a CachedResponse for a cacheable response, or None."""
+    if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+        return None
+    if "Set-Cookie" in response.headers:
+        return None
+    headers = [
+        (name, value)
+        for name, value in response.headers.items()
+        if name.lower() not in _SKIPPED_HEADERS
+    ]
+    return CachedResponse(response.status_code, headers, response.get_data())
+
+
+def _cache_key(query_args, headers):
+    """Build the key for the current request."""
+    parts = [request.endpoint]
+    parts.extend(f"{name}={value}" for name, value in sorted(request.view_args.items()))
+    parts.extend(f"?{name}={request.args.get(name, '')}" for name in query_args)
+    parts.extend(f"@{name}={request.headers.get(name, '')}" for name in headers)
+    return "|".join(parts)
+
+
+def _cached_response(entry, state, timestamp=None):
+    """Build a response from a cache entry, refreshing its timestamp field."""
+    body = entry.body
+    if timestamp is not None:
+        data = current_app.json.loads(body)
+        data[timestamp] = datetime.now(timezone.utc)
+        body = current_app.json.dumps(data)
+    response = current_app.response_class(body, status=entry.status, headers=entry.headers)
+    response.headers["X-Cache"] = state
+    return response
+
+
+def cache_response(ttl=None, query_args=(), headers=(), timestamp=None):
+    """Cache the decorated view's responses when the route cache is enabled.
+
+    Args:
+        ttl: Seconds to serve an entry, ``ROUTE_CACHE_TTL`` if None.
+        query_args: Query arguments that select different responses.
+        headers: Request headers that select different responses.
+        timestamp: Top-level field of a JSON body set to the current time
+            on every hit.
+
+    Returns:
+        View decorator. Responses carry ``X-Cache: HIT`` or ``MISS``.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get("route_cache")
+            if cache is None or request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+            key = _cache_key(query_args, headers)
+            entry = cache.get(key)
+            if entry is not None:
+                return _cached_response(entry, "HIT", timestamp)
+            response, entry = cache.fill(key, lambda: make_response(view(*args, **kwargs)), ttl=ttl)
+            if response is None:
+                return _cached_response(entry, "HIT", timestamp)
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _memory_backend(app):
+    return MemoryCacheBackend(max_bytes=app.config.get("ROUTE_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+
+def _sqlite_backend(app):
+    path = app.config.get("ROUTE_CACHE_PATH") or os.path.join(
+        tempfile.gettempdir(), f"demo-app-route-cache-{os.getpid()}.sqlite3"
+    )
+    return SQLiteCacheBackend(
+        path, max_bytes=app.config.get("ROUTE_CACHE_MAX_BYTES", 16 * 1024 * 1024)
+    )
+
+
+# ROUTE_CACHE_BACKEND values and the backend factories they select
+CACHE_BACKENDS = {
+    "memory": _memory_backend,
+    "sqlite": _sqlite_backend,
+}
+
+
+def setup_route_cache(app):
+    """Create the response cache used by ``cache_response`` views.
+
+    Must run before ``setup_metrics``, which exports its stats.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        RouteCache instance, also stored in ``app.extensions``, or None when
+        caching is disabled.
+
+    Raises:
+        ValueError: If ``ROUTE_CACHE_BACKEND`` names an unknown backend.
+    """
+    if not app.config.get("ROUTE_CACHE_ENABLED", False):
+        return None
+
+    name = app.config.get("ROUTE_CACHE_BACKEND", "memory")
+    factory = CACHE_BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown ROUTE_CACHE_BACKEND: {name!r}")
+    cache = RouteCache(factory(app), ttl=app.config.get("ROUTE_CACHE_TTL", 30.0))
+    app.extensions["route_cache"] = cache
+
+    def apply_settings(settings):
+        """Apply a reloaded ROUTE_CACHE_TTL to new entries."""
+        cache.ttl = settings.route_cache_ttl
+
+    on_settings_change(app, apply_settings)
+
+    logger.info(
+        "Route cache configured",
+        extra={
+            "extra_fields": {
+                "backend": name,
+                "ttl": cache.ttl,
+                "max_bytes": cache.backend.max_bytes,
+            }
+        },
+    )
+    return cache
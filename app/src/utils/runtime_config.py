@@ -0,0 +1,436 @@
+"""Settings that can be changed without restarting.
+
+``Config`` is read from the environment once, at import. The settings in
+``TUNABLE_SETTINGS`` can also be overridden while the app runs by a JSON
+object in ``RUNTIME_CONFIG_PATH``, e.g. ``{"LOG_LEVEL": "DEBUG"}``. They
+are validated and collected into an immutable ``Settings`` snapshot, which
+request code reads as attributes (``settings.trace_sample_rate``) instead of
+``app.config`` lookups.
+
+A reload builds a new snapshot and swaps it in with one assignment, so a
+request sees either the old settings or the new ones, never a mix. It then
+calls the listeners components registered with ``subscribe`` and mirrors
+the values into ``app.config``. A file with any invalid value is rejected
+as a whole, and the current snapshot is kept.
+
+Workers reload when they receive SIGHUP, and when they notice the file
+changed (checked every ``RUNTIME_CONFIG_POLL_INTERVAL`` seconds).
+``PUT /debug/config`` writes new overrides to the file, so the worker
+handling it applies them at once and its siblings at their next check.
+SIGHUP sent to the gunicorn master instead replaces the workers, which fork
+from the reloaded preloaded app (see ``src/gunicorn_conf.py``).
+
+Settings that decide which middleware is installed, such as
+``ENABLE_METRICS`` or ``PHASE_TIMING_ENABLED``, still need a restart.
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import math
+import os
+import signal
+import tempfile
+import threading
+
+from flask import current_app
+
+from src.utils.sampling import parse_sample_rules
+
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+def _boolean(value):
+    """Parse a JSON boolean or a ``"true"``/``"false"`` string."""
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    if not isinstance(value, bool):
+        raise ValueError(f"expected true or false, got {value!r}")
+    return value
+
+
+def _bounded(kind, minimum, maximum=None):
+    """Return a parser for numbers of ``kind`` between ``minimum`` and ``maximum``."""
+
+    def parse(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"expected a number, got {value!r}")
+        try:
+            number = kind(value)
+            if not math.isfinite(number):
+                raise ValueError(f"expected a finite number, got {value!r}")
+            if kind is int and number != float(value):
+                raise ValueError(f"expected an integer, got {value!r}")
+        except OverflowError:
+            raise ValueError(f"expected a finite number, got {value!r}") from None
+        if not minimum <= number or (maximum is not None and not number <= maximum):
+            bounds = f"between {minimum} and {maximum}" if maximum is not None else f">= {minimum}"
+            raise ValueError(f"expected a number {bounds}, got {value!r}")
+        return number
+
+    return parse
+
+
+def _log_level(value):
+    """Parse a logging level name."""
+    if not isinstance(value, str) or value.upper() not in LOG_LEVELS:
+        raise ValueError(f"expected one of {', '.join(LOG_LEVELS)}, got {value!r}")
+    return value.upper()
+
+
+def _sample_rules(value):
+    """Validate an access log sampling rule string."""
+    if not isinstance(value, str):
+        raise ValueError(f"expected a string, got {value!r}")
+    parse_sample_rules(value)
+    return value
+
+
+# Settings that can change at runtime and the parsers validating them
+TUNABLE_SETTINGS = {
+    "LOG_LEVEL": _log_level,
+    "ACCESS_LOG_SAMPLE_RULES": _sample_rules,
+    "ACCESS_LOG_SAMPLE_RATE": _bounded(float, 0.0, 1.0),
+    "ACCESS_LOG_SLOW_MS": _bounded(float, 0.0),
+    "TRACE_SAMPLE_RATE": _bounded(float, 0.0, 1.0),
+    "TRACE_SLOW_MS": _bounded(float, 0.0),
+    "SERVER_TIMING_ENABLED": _boolean,
+    "ROUTE_CACHE_TTL": _bounded(float, 0.0),
+    "ECHO_RAW_PASSTHROUGH": _boolean,
+    "ECHO_STREAM_MAX_BYTES": _bounded(int, 1),
+    "ECHO_STREAM_MAX_LINE": _bounded(int, 1),
+    "BATCH_MAX_REQUESTS": _bounded(int, 1),
+}
+
+
+class Settings(
+    collections.namedtuple("Settings", [name.lower() for name in TUNABLE_SETTINGS] + ["version"])
+):
+    """Immutable snapshot of the tunable settings.
+
+    ``version`` is a hash of the values, so workers with the same settings
+    report the same version.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_values(cls, values):
+        """Create a snapshot from validated values keyed by setting name."""
+        encoded = json.dumps(values, sort_keys=True).encode()
+        version = hashlib.sha256(encoded).hexdigest()[:12]
+        return cls(*(values[name] for name in TUNABLE_SETTINGS), version=version)
+
+    def as_config(self):
+        """Return the values keyed by setting name, as in ``app.config``."""
+        return {name: getattr(self, name.lower()) for name in TUNABLE_SETTINGS}
+
+
+def validate_settings(values):
+    """Validate and normalize tunable settings.
+
+    Args:
+        values: Dict of setting name to value.
+
+    Returns:
+        Dict of setting name to parsed value.
+
+    Raises:
+        ValueError: If a name is not in ``TUNABLE_SETTINGS`` or a value is
+            invalid; every problem is listed in the message.
+    """
+    parsed, errors = {}, []
+    for name, value in values.items():
+        parser = TUNABLE_SETTINGS.get(name)
+        if parser is None:
+            errors.append(f"{name}: not a runtime setting")
+            continue
+        try:
+            parsed[name] = parser(value)
+        except ValueError as exc:
+            errors.append(f"{name}: {exc}")
+    if errors:
+        raise ValueError("Invalid runtime settings: " + "; ".join(errors))
+    return parsed
+
+
+class RuntimeConfig:
+    """The current settings snapshot and the overrides file it was built from."""
+
+    def __init__(self, defaults, path=None):
+        """Create the config with no overrides applied.
+
+        Args:
+            defaults: Value of every tunable setting when not overridden.
+            path: JSON overrides file, or None to keep overrides in memory.
+
+        Raises:
+            ValueError: If a default is invalid.
+        """
+        self.defaults = validate_settings(defaults)
+        self.path = path
+        self.overrides = {}
+        self.current = Settings.from_values(self.defaults)
+        self.reloads = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._file_state = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._watcher = None
+        self._watcher_pid = None
+
+    def subscribe(self, listener):
+        """Call ``listener`` with every new snapshot after it is swapped in.
+
+        Args:
+            listener: Callable taking a ``Settings`` instance.
+        """
+        self._listeners.append(listener)
+
+    def _stat(self):
+        """Return what identifies the file's current contents, or None if absent."""
+        try:
+            stat = os.stat(self.path)
+        except (FileNotFoundError, TypeError):
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        """Return the overrides in the file, or those in memory when there is no file."""
+        if self.path is None:
+            return dict(self.overrides)
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                overrides = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if not isinstance(overrides, dict):
+            raise ValueError(f"{self.path} must contain a JSON object")
+        return overrides
+
+    def _write(self, overrides):
+        """Replace the file atomically, so readers never see a partial write."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".runtime-config-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(overrides, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _swap(self, overrides):
+        """Install the snapshot for ``overrides`` and notify listeners if it changed."""
+        settings = Settings.from_values(dict(self.defaults, **overrides))
+        self.overrides = overrides
+        if settings == self.current:
+            return False
+        previous, self.current = self.current, settings
+        self.reloads += 1
+        for listener in self._listeners:
+            try:
+                listener(settings)
+            except Exception:
+                logger.exception("Runtime settings listener failed")
+        changed = [
+            name
+            for name, value in settings.as_config().items()
+            if previous.as_config()[name] != value
+        ]
+        logger.info(
+            "Runtime settings changed",
+            extra={
+                "extra_fields": {
+                    "version": settings.version,
+                    "previous_version": previous.version,
+                    "changed": changed,
+                }
+            },
+        )
+        return True
+
+    def reload(self):
+        """Re-read the overrides file and swap in a new snapshot.
+
+        Returns:
+            True if the settings changed.
+
+        Raises:
+            ValueError: If the file is not a JSON object of valid settings.
+                The current snapshot is kept.
+        """
+        with self._lock:
+            # Recorded first, so an invalid file is reported once, not at every check
+            self._file_state = self._stat()
+            return self._swap(validate_settings(self._read()))
+
+    def check(self):
+        """Reload if the overrides file changed since it was last read.
+
+        Returns:
+            True if the settings changed.
+
+        Raises:
+            ValueError: If the changed file is invalid.
+        """
+        if self.path is None or self._stat() == self._file_state:
+            return False
+        return self.reload()
+
+    def update(self, changes):
+        """Change overrides, save them to the file and swap in a new snapshot.
+
+        Args:
+            changes: Dict of setting name to value; None removes the override.
+
+        Returns:
+            True if the settings changed.
+
+        Raises:
+            ValueError: If a change is invalid. Nothing is written.
+        """
+        removed = [name for name, value in changes.items() if value is None]
+        # Unknown names are reported even when removing them
+        parsed = validate_settings(
+            {
+                name: value
+                for name, value in changes.items()
+                if value is not None or name not in TUNABLE_SETTINGS
+            }
+        )
+        with self._lock:
+            # Start from the file, which other workers may have changed
+            overrides = validate_settings(self._read())
+            overrides.update(parsed)
+            for name in removed:
+                overrides.pop(name, None)
+            if self.path is not None:
+                self._write(overrides)
+                self._file_state = self._stat()
+            return self._swap(overrides)
+
+    def watch(self, interval):
+        """Start the thread that reloads on ``wake`` and on file changes.
+
+        Args:
+            interval: Seconds between file checks; 0 only reloads on ``wake``.
+        """
+        if self._watcher is not None and self._watcher_pid == os.getpid():
+            return
+        self._wakeup = threading.Event()
+        self._watcher_pid = os.getpid()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval or None,), name="runtime-config", daemon=True
+        )
+        self._watcher.start()
+
+    def wake(self):
+        """Ask the watcher thread to reload now."""
+        self._wakeup.set()
+
+    def stop(self):
+        """Stop the watcher thread."""
+        self._stopping.set()
+        self._wakeup.set()
+
+    def _watch(self, interval):
+        while not self._stopping.is_set():
+            woken = self._wakeup.wait(interval)
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                return
+            try:
+                self.reload() if woken else self.check()
+            except (OSError, ValueError) as exc:
+                logger.warning(
+                    "Runtime settings rejected",
+                    extra={"extra_fields": {"path": self.path, "error": str(exc)}},
+                )
+
+
+def current_settings():
+    """Return the current app's settings snapshot.
+
+    Returns:
+        Settings instance.
+    """
+    return current_app.extensions["runtime_config"].current
+
+
+def on_settings_change(app, listener):
+    """Call ``listener`` with the new settings after each reload.
+
+    Does nothing for apps without runtime settings.
+
+    Args:
+        app: Flask application instance.
+        listener: Callable taking a ``Settings`` instance.
+    """
+    runtime = app.extensions.get("runtime_config")
+    if runtime is not None:
+        runtime.subscribe(listener)
+
+
+def watch_runtime_config(app):
+    """Reload settings in this process on SIGHUP and when the file changes.
+
+    Called per process, like the profiler signal, because gunicorn resets
+    signal handlers in every worker and threads do not survive a fork.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        RuntimeConfig instance, or None when the app has none.
+    """
+    runtime = app.extensions.get("runtime_config")
+    if runtime is None:
+        return None
+    runtime.watch(app.config.get("RUNTIME_CONFIG_POLL_INTERVAL", 5.0))
+
+    def on_signal(signo, frame):
+        """Hand the reload to the watcher thread, which may take the lock."""
+        runtime.wake()
+
+    try:
+        signal.signal(signal.SIGHUP, on_signal)
+    except ValueError:
+        # Not the main thread; signals can only be handled there
+        logger.warning("Cannot install the SIGHUP settings reload outside the main thread")
+    return runtime
+
+
+def setup_runtime_config(app):
+    """Create the settings snapshot, applying the overrides file if present.
+
+    Runs right after the configuration is loaded, so ``app.config`` already
+    holds overridden values when the middleware is set up.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        RuntimeConfig instance, also stored in ``app.extensions``.
+
+    Raises:
+        ValueError: If a setting or the overrides file is invalid.
+    """
+    runtime = RuntimeConfig(
+        {name: app.config[name] for name in TUNABLE_SETTINGS},
+        path=app.config.get("RUNTIME_CONFIG_PATH") or None,
+    )
+
+    def apply_settings(settings):
+        """Mirror the settings into app.config and rebuild static bodies."""
+        app.config.update(settings.as_config())
+        app.extensions.pop("static_payloads", None)
+
+    runtime.subscribe(apply_settings)
+    runtime.reload()
+    app.extensions["runtime_config"] = runtime
+    return runtime
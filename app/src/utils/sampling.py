@@ -0,0 +1,192 @@
+"""Access log sampling.
+
+Sampling rules are written as a comma-separated list of
+``<route>:<status class>=<rate>`` entries, for example::
+
+    /api/hello:2xx=0.01,*:5xx=1.0
+
+``<route>`` is a Flask URL rule (``/api/hello``) or ``*``, ``<status class>``
+is ``1xx``-``5xx`` or ``*``. The most specific matching rule wins; requests
+slower than the slow threshold are always kept. Identical lines can be
+further limited with a token bucket per line key.
+"""
+
+import random
+import threading
+import time
+
+# Dedupe keys tracked before the table is reset, bounding memory
+MAX_DEDUPE_KEYS = 4096
+
+
+def parse_sample_rules(spec):
+    """Parse a sampling rule string.
+
+    Args:
+        spec: Rule string, e.g. ``"/api/hello:2xx=0.01,*:5xx=1"``.
+
+    Returns:
+        Dict mapping ``(route, status_class)`` to a rate between 0 and 1.
+
+    Raises:
+        ValueError: If a rule is malformed or a rate is out of range.
+    """
+    rules = {}
+    for entry in (part.strip() for part in spec.split(",")):
+        if not entry:
+            continue
+        try:
+            target, rate = entry.rsplit("=", 1)
+            route, status_class = target.rsplit(":", 1)
+            rate = float(rate)
+        except ValueError:
+            raise ValueError(f"Invalid access log sampling rule: {entry!r}") from None
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"Sampling rate out of range in rule: {entry!r}")
+        rules[(route.strip() or "*", status_class.strip().lower() or "*")] = rate
+    return rules
+
+
+class TokenBucket:
+    """Classic token bucket; ``allow`` spends one token if available."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "_clock")
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        """Create a full bucket.
+
+        Args:
+            rate: Tokens added per second.
+            burst: Bucket capacity.
+            clock: Monotonic clock, injectable for tests.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._clock = clock
+        self.updated = clock()
+
+    def allow(self):
+        """Spend a token.
+
+        Returns:
+            True if a token was available.
+        """
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class AccessLogSampler:
+    """Decide which access log lines to keep."""
+
+    def __init__(
+        self,
+        rules="",
+        default_rate=1.0,
+        slow_ms=0,
+        dedupe_rate=0.0,
+        dedupe_burst=10,
+        rand=random.random,
+        clock=time.monotonic,
+    ):
+        """Create a sampler.
+
+        Args:
+            rules: Rule string, see ``parse_sample_rules``.
+            default_rate: Rate for requests no rule matches.
+            slow_ms: Requests at least this slow are always kept (0 disables).
+            dedupe_rate: Identical lines allowed per second (0 disables).
+            dedupe_burst: Identical lines allowed in a burst.
+            rand: Random source returning floats in [0, 1).
+            clock: Monotonic clock for the token buckets.
+        """
+        self.rules = parse_sample_rules(rules)
+        self.default_rate = default_rate
+        self.slow_ms = slow_ms
+        self.dedupe_rate = dedupe_rate
+        self.dedupe_burst = dedupe_burst
+        self._rand = rand
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._suppressed = {}
+
+    def configure(self, rules, default_rate, slow_ms):
+        """Replace the sampling rules and rates.
+
+        Args:
+            rules: Rule string, see ``parse_sample_rules``.
+            default_rate: Rate for requests no rule matches.
+            slow_ms: Requests at least this slow are always kept (0 disables).
+        """
+        self.rules = parse_sample_rules(rules)
+        self.default_rate = default_rate
+        self.slow_ms = slow_ms
+
+    def rate_for(self, route, status_code):
+        """Return the sampling rate for a route and status code.
+
+        Args:
+            route: Flask URL rule, or the path when no rule matched.
+            status_code: Response status code.
+
+        Returns:
+            Rate between 0 and 1.
+        """
+        status_class = f"{status_code // 100}xx"
+        rules = self.rules
+        for key in ((route, status_class), (route, "*"), ("*", status_class), ("*", "*")):
+            rate = rules.get(key)
+            if rate is not None:
+                return rate
+        return self.default_rate
+
+    def sample(self, route, status_code, duration_ms, line_key):
+        """Decide whether to log a request.
+
+        Args:
+            route: Flask URL rule, or the path when no rule matched.
+            status_code: Response status code.
+            duration_ms: Request duration in milliseconds.
+            line_key: Hashable identifying identical lines for deduplication.
+
+        Returns:
+            None to drop the line, otherwise a dict of fields to add to it:
+            ``sample_rate`` and, after suppression, ``suppressed``.
+        """
+        if self.slow_ms and duration_ms >= self.slow_ms:
+            rate = 1.0
+        else:
+            rate = self.rate_for(route, status_code)
+            if rate < 1.0 and self._rand() >= rate:
+                return None
+
+        fields = {"sample_rate": rate}
+        if self.dedupe_rate:
+            suppressed = self._dedupe(line_key)
+            if suppressed is None:
+                return None
+            if suppressed:
+                fields["suppressed"] = suppressed
+        return fields
+
+    def _dedupe(self, line_key):
+        """Return lines suppressed since the last kept one, or None to suppress."""
+        with self._lock:
+            bucket = self._buckets.get(line_key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_DEDUPE_KEYS:
+                    self._buckets.clear()
+                    self._suppressed.clear()
+                bucket = self._buckets[line_key] = TokenBucket(
+                    self.dedupe_rate, self.dedupe_burst, self._clock
+                )
+            if not bucket.allow():
+                self._suppressed[line_key] = self._suppressed.get(line_key, 0) + 1
+                return None
+            return self._suppressed.pop(line_key, 0)
@@ -0,0 +1,144 @@
+"""Precomputed JSON payloads for near-constant endpoints.
+
+Identity endpoints (``/``, ``/health``, ``/api/info``) return bodies that
+only change with configuration. Each body is serialized once per worker,
+with only the timestamp patched in per request. Responses carry an ETag
+over the static part and honor ``If-None-Match`` with 304.
+
+When timestamps are enabled the ETag is weak, because bodies differ byte
+for byte between requests; with ``STATIC_PAYLOAD_TIMESTAMPS`` disabled the
+body is fully static and the ETag is strong.
+
+With compression enabled (``src/middleware/compression.py``) fully static
+bodies are compressed once per worker and encoding. Timestamped bodies are
+compressed per request: they are small, and copying a saved zlib state for
+the constant part costs more than compressing the whole body.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from flask import current_app, request
+
+from src.utils.json_provider import isoformat
+
+TIMESTAMP_PLACEHOLDER = "__static_payload_timestamp__"
+
+
+class StaticPayload:
+    """A JSON body serialized once, with an optional per-request timestamp."""
+
+    def __init__(self, body, status=200, timestamp=False):
+        """Create a payload from a serialized body.
+
+        Args:
+            body: Serialized JSON bytes. When ``timestamp`` is set, it must
+                contain ``TIMESTAMP_PLACEHOLDER`` as a JSON string.
+            status: HTTP status code.
+            timestamp: Whether to patch the current time into the body.
+        """
+        self.status = status
+        self.timestamp = timestamp
+        if timestamp:
+            marker = f'"{TIMESTAMP_PLACEHOLDER}"'.encode()
+            self.prefix, _, self.suffix = body.partition(marker)
+            self.body = None
+        else:
+            self.prefix = self.suffix = b""
+            self.body = body
+        digest = hashlib.sha256(self.prefix + b"\0" + self.suffix if timestamp else body)
+        self.etag = digest.hexdigest()[:32]
+        # Rendered size, approximating the timestamp as 30 bytes
+        self.size = len(body) if not timestamp else len(self.prefix) + 30 + len(self.suffix)
+        # Compressed static body per encoding
+        self._encoded = {}
+
+    @classmethod
+    def from_data(cls, app, data, status=200, timestamp=False):
+        """Serialize ``data`` exactly as ``jsonify`` would.
+
+        Args:
+            app: Flask application whose JSON provider to use.
+            data: JSON-serializable dict.
+            status: HTTP status code.
+            timestamp: Whether to add a per-request ``timestamp`` field.
+
+        Returns:
+            StaticPayload instance.
+        """
+        if timestamp:
+            data = dict(data, timestamp=TIMESTAMP_PLACEHOLDER)
+        body = app.json.response(data).get_data()
+        return cls(body, status=status, timestamp=timestamp)
+
+    def render(self):
+        """Return the body for the current request.
+
+        Returns:
+            Body bytes with the current timestamp patched in if enabled.
+        """
+        if self.body is not None:
+            return self.body
+        now = isoformat(datetime.now(timezone.utc))
+        return b'%s"%s"%s' % (self.prefix, now.encode(), self.suffix)
+
+    def encoded(self, encoding, compressor):
+        """Return the body for the current request in a content coding.
+
+        Args:
+            encoding: Content coding negotiated by ``compressor``.
+            compressor: Compressor from ``src.middleware.compression``.
+
+        Returns:
+            Compressed body bytes.
+        """
+        if self.body is None:
+            return compressor.compress(self.render(), encoding)
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = compressor.compress(self.body, encoding)
+        return encoded
+
+    def response(self):
+        """Build a conditional response for the current request.
+
+        Returns:
+            Flask response, 304 when ``If-None-Match`` matches the ETag.
+        """
+        app = current_app._get_current_object()
+        compressor = app.extensions.get("compression")
+        encoding = None
+        if compressor is not None and self.size >= compressor.min_size:
+            encoding = compressor.negotiate(request.accept_encodings)
+        if encoding is None:
+            body, etag = self.render(), self.etag
+        else:
+            body, etag = self.encoded(encoding, compressor), f"{self.etag}-{encoding}"
+        response = app.response_class(body, status=self.status, mimetype=app.json.mimetype)
+        if compressor is not None and self.size >= compressor.min_size:
+            response.vary.add("Accept-Encoding")
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag, weak=self.timestamp)
+        return response.make_conditional(request)
+
+
+def static_response(name, build, timestamp=True):
+    """Serve a precomputed payload, building it on first use in this worker.
+
+    Args:
+        name: Cache key for the payload.
+        build: Callable taking the app and returning the response dict.
+        timestamp: Whether the payload carries a ``timestamp`` field. It is
+            dropped when ``STATIC_PAYLOAD_TIMESTAMPS`` is disabled.
+
+    Returns:
+        Flask response.
+    """
+    app = current_app._get_current_object()
+    payloads = app.extensions.setdefault("static_payloads", {})
+    payload = payloads.get(name)
+    if payload is None:
+        timestamp = timestamp and app.config.get("STATIC_PAYLOAD_TIMESTAMPS", True)
+        payload = payloads[name] = StaticPayload.from_data(app, build(app), timestamp=timestamp)
+    return payload.response()
@@ -0,0 +1,141 @@
+"""In-process dispatch of batched API calls.
+
+``POST /api/batch`` runs each sub-request through the regular Flask request
+cycle (``before_request`` hooks, the view, ``after_request`` hooks) in a
+fresh application and request context, without another WSGI round trip.
+Sub-requests therefore get their own request ID, metrics labels and a span
+in the batch's trace, while their access log lines are folded into the
+single line of the batch.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, request
+from werkzeug.test import EnvironBuilder
+
+from src.utils.tracing import outgoing_headers
+
+# Set on sub-request environs to the request ID of the enclosing batch
+BATCH_ID_ENVIRON_KEY = "demo_app.batch_id"
+
+
+class BatchDispatcher:
+    """Dispatch sub-requests against one blueprint, optionally in parallel."""
+
+    def __init__(self, app, blueprint="api", exclude=(), max_workers=4):
+        """Create a dispatcher.
+
+        Args:
+            app: Flask application to dispatch into.
+            blueprint: Only endpoints of this blueprint may be called.
+            exclude: Endpoints that may not be called, e.g. the batch itself.
+            max_workers: Threads used for parallel batches.
+        """
+        self.app = app
+        self.blueprint = blueprint
+        self.exclude = frozenset(exclude)
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+
+    def dispatch(self, specs, batch_id, parallel=False):
+        """Run sub-requests and collect their results.
+
+        Must be called inside the batch request: sub-requests inherit its
+        host, client address and User-Agent.
+
+        Args:
+            specs: List of dicts with ``path`` and optional ``method``,
+                ``headers`` and JSON ``body``.
+            batch_id: Request ID of the batch; sub-request ``i`` is given
+                the request ID ``<batch_id>.<i>``.
+            parallel: Whether to run sub-requests on the thread pool.
+
+        Returns:
+            List of result dicts with ``method``, ``path``, ``status``,
+            ``request_id``, ``duration_ms`` and ``body``, in request order.
+        """
+        # Environs are built here because ``request`` is bound to this thread
+        environs = [self._environ(spec, batch_id, i) for i, spec in enumerate(specs)]
+        if parallel and len(environs) > 1:
+            return list(self._pool().map(self._run, environs))
+        return [self._run(environ) for environ in environs]
+
+    def _pool(self):
+        # Created lazily and re-created after fork: the parent's threads are gone
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="batch")
+            self._pid = os.getpid()
+        return self._executor
+
+    def _environ(self, spec, batch_id, index):
+        headers = {"User-Agent": request.headers.get("User-Agent", "")}
+        # Bodies are decoded into the batch response, so sub-responses stay uncompressed
+        headers.update(
+            (name, value)
+            for name, value in (spec.get("headers") or {}).items()
+            if name.lower() != "accept-encoding"
+        )
+        headers["X-Request-ID"] = f"{batch_id}.{index}"
+        # Sub-requests continue the batch's trace as children of its span
+        headers.update(outgoing_headers())
+        builder = EnvironBuilder(
+            path=spec["path"],
+            base_url=request.host_url,
+            method=spec.get("method", "GET").upper(),
+            headers=headers,
+            json=spec.get("body"),
+            environ_base={"REMOTE_ADDR": request.remote_addr, BATCH_ID_ENVIRON_KEY: batch_id},
+        )
+        try:
+            return builder.get_environ()
+        finally:
+            builder.close()
+
+    def _run(self, environ):
+        start = time.perf_counter()
+        # A new app context gives the sub-request its own ``g``
+        with self.app.app_context(), self.app.request_context(environ):
+            if request.routing_exception is None and not self._allowed(request.endpoint):
+                response = self.app.make_response(
+                    ({"error": f"{request.path} cannot be called in a batch"}, 400)
+                )
+            else:
+                try:
+                    response = self.app.full_dispatch_request()
+                except Exception as e:
+                    response = self.app.handle_exception(e)
+            body = response.get_json(silent=True)
+            if body is None:
+                body = response.get_data(as_text=True)
+            response.close()
+        return {
+            "method": environ["REQUEST_METHOD"],
+            "path": environ["PATH_INFO"],
+            "status": response.status_code,
+            "request_id": environ["HTTP_X_REQUEST_ID"],
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "body": body,
+        }
+
+    def _allowed(self, endpoint):
+        return endpoint.startswith(f"{self.blueprint}.") and endpoint not in self.exclude
+
+
+def batch_dispatcher():
+    """Return the dispatcher of the current app, creating it on first use.
+
+    Returns:
+        BatchDispatcher instance, also stored in ``app.extensions``.
+    """
+    app = current_app._get_current_object()
+    dispatcher = app.extensions.get("batch_dispatcher")
+    if dispatcher is None:
+        dispatcher = app.extensions["batch_dispatcher"] = BatchDispatcher(
+            app,
+            exclude=("api.batch",),
+            max_workers=app.config.get("BATCH_MAX_WORKERS", 4),
+        )
+    return dispatcher
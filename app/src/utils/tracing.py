@@ -0,0 +1,539 @@
+"""W3C trace context and a tail-sampling span recorder.
+
+``traceparent``/``tracestate`` headers (https://www.w3.org/TR/trace-context/)
+are parsed on the way in and generated for downstream calls. Trace and span
+IDs come from ``random.getrandbits``, which needs no system call and is
+reseeded in forked workers by the ``random`` module itself.
+
+Spans of a request are kept in a per-request ``RequestTrace`` buffer. When
+the request ends the ``Tracer`` decides whether to keep the whole trace:
+errors and slow requests always, everything else at ``sample_rate`` (or when
+the caller marked the trace as sampled). Kept traces are handed to a
+``BackgroundBatcher``, so encoding and export happen off the request thread,
+in batches, to a sink with an ``export(spans)`` method.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import time
+import urllib.request
+
+from src.utils.batching import BackgroundBatcher
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+TRACESTATE_HEADER = "tracestate"
+# tracestate is limited to 32 list members; longer values may be dropped
+MAX_TRACESTATE_LENGTH = 512
+
+_TRACEPARENT_RE = re.compile(r"([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+_INVALID_TRACE_ID = "0" * 32
+_INVALID_SPAN_ID = "0" * 16
+FLAG_SAMPLED = 0x01
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_ERROR = 2
+
+# Trace of the request being handled in this thread or greenlet
+_current = contextvars.ContextVar("request_trace", default=None)
+
+
+def new_trace_id():
+    """Return a random, non-zero 32-character hex trace ID."""
+    return f"{random.getrandbits(128) or 1:032x}"
+
+
+def new_span_id():
+    """Return a random, non-zero 16-character hex span ID."""
+    return f"{random.getrandbits(64) or 1:016x}"
+
+
+def parse_traceparent(value):
+    """Parse a ``traceparent`` header.
+
+    Versions other than ``00`` are accepted as long as they start with the
+    version 00 fields, as the specification requires.
+
+    Args:
+        value: Header value, or None.
+
+    Returns:
+        ``(trace_id, parent_id, flags)`` tuple, or None if absent or invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    match = _TRACEPARENT_RE.match(value)
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == "ff" or (version == "00" and len(value) != 55):
+        return None
+    if len(value) > 55 and value[55] != "-":
+        return None
+    if trace_id == _INVALID_TRACE_ID or parent_id == _INVALID_SPAN_ID:
+        return None
+    return trace_id, parent_id, int(flags, 16)
+
+
+def format_traceparent(trace_id, span_id, sampled):
+    """Return a version 00 ``traceparent`` header value."""
+    return f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, name, trace_id, parent_id=None, kind=SPAN_KIND_INTERNAL, attributes=None):
+        """Start a span now.
+
+        Args:
+            name: Span name.
+            trace_id: Trace the span belongs to.
+            parent_id: Span ID of the parent, None for a root span.
+            kind: OTLP span kind.
+            attributes: Optional dict of attributes.
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes if attributes is not None else {}
+        self.error = None
+
+    def end(self):
+        """Record the end time, unless already ended."""
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self):
+        """Return the span's duration in milliseconds, up to now if still open."""
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+
+class RequestTrace:
+    """Buffer of the spans recorded during one request."""
+
+    __slots__ = (
+        "trace_id",
+        "tracestate",
+        "sampled",
+        "root",
+        "spans",
+        "max_spans",
+        "dropped",
+        "status_code",
+        "token",
+        "_stack",
+    )
+
+    def __init__(self, name, trace_id, parent_id, tracestate, sampled, max_spans=256):
+        """Start the request's root span.
+
+        Args:
+            name: Root span name.
+            trace_id: Trace ID, continued from the caller or new.
+            parent_id: Caller's span ID, or None for a new trace.
+            tracestate: Caller's ``tracestate`` header, passed on unchanged.
+            sampled: Whether the trace is sampled regardless of its outcome.
+            max_spans: Child spans kept before further spans are dropped.
+        """
+        self.trace_id = trace_id
+        self.tracestate = tracestate
+        self.sampled = sampled
+        self.root = Span(name, trace_id, parent_id, SPAN_KIND_SERVER)
+        self.spans = [self.root]
+        self.max_spans = max_spans
+        self.dropped = 0
+        # Set by the request hooks and ``Tracer.start_request``
+        self.status_code = None
+        self.token = None
+        self._stack = [self.root]
+
+    @property
+    def span_id(self):
+        """Return the ID of the innermost open span."""
+        return self._stack[-1].span_id
+
+    def traceparent(self):
+        """Return the ``traceparent`` to send to downstream services."""
+        return format_traceparent(self.trace_id, self.span_id, self.sampled)
+
+    def headers(self):
+        """Return the trace context headers for a downstream call."""
+        headers = {TRACEPARENT_HEADER: self.traceparent()}
+        if self.tracestate:
+            headers[TRACESTATE_HEADER] = self.tracestate
+        return headers
+
+    def start_span(self, name, attributes=None):
+        """Open a child of the innermost open span.
+
+        Returns:
+            The new span, or None when the buffer is full.
+        """
+        if len(self.spans) > self.max_spans:
+            self.dropped += 1
+            return None
+        span = Span(name, self.trace_id, self.span_id, attributes=attributes)
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def end_span(self, span):
+        """End a span opened with ``start_span``."""
+        span.end()
+        if span in self._stack:
+            self._stack.remove(span)
+
+
+def current_trace():
+    """Return the trace of the current request, or None."""
+    return _current.get()
+
+
+def outgoing_headers():
+    """Return trace context headers for a call made by the current request.
+
+    Returns:
+        Dict with ``traceparent`` (and ``tracestate``), empty outside a trace.
+    """
+    trace = _current.get()
+    return trace.headers() if trace is not None else {}
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Record the enclosed block as a child span of the current request.
+
+    Does nothing outside a traced request. Exceptions mark the span as
+    failed and propagate.
+
+    Args:
+        name: Span name.
+        **attributes: Span attributes.
+
+    Yields:
+        The span, or None when not recorded.
+    """
+    trace = _current.get()
+    child = trace.start_span(name, attributes) if trace is not None else None
+    if child is None:
+        yield None
+        return
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        trace.end_span(child)
+
+
+def _attribute(key, value):
+    """Encode one attribute as an OTLP ``KeyValue``."""
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+def encode_otlp(spans, resource):
+    """Encode spans as an OTLP/JSON ``ExportTraceServiceRequest``.
+
+    Args:
+        spans: Iterable of ended spans.
+        resource: Dict of resource attributes, e.g. ``service.name``.
+
+    Returns:
+        Dict ready for ``json.dumps``.
+    """
+    encoded = []
+    for s in spans:
+        item = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": s.kind,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns if s.end_ns is not None else s.start_ns),
+            "attributes": [_attribute(k, v) for k, v in s.attributes.items()],
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        if s.error:
+            item["status"] = {"code": STATUS_ERROR, "message": s.error}
+        encoded.append(item)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_attribute(k, v) for k, v in resource.items()]},
+                "scopeSpans": [{"scope": {"name": "src.utils.tracing"}, "spans": encoded}],
+            }
+        ]
+    }
+
+
+class FileSpanSink:
+    """Append exported spans to a file, one OTLP/JSON document per line.
+
+    This is the format the OpenTelemetry Collector's file exporter writes
+    and its ``otlpjsonfile`` receiver reads.
+    """
+
+    def __init__(self, path, resource=None):
+        """Create a sink.
+
+        Args:
+            path: File path; ``{pid}`` is replaced by the writing process ID,
+                so every gunicorn worker gets its own file.
+            resource: Dict of resource attributes.
+        """
+        self.path = path
+        self.resource = dict(resource or {})
+
+    def export(self, spans):
+        """Write one batch of spans."""
+        line = json.dumps(encode_otlp(spans, self.resource), separators=(",", ":"))
+        with open(self.path.format(pid=os.getpid()), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTLPHTTPSpanSink:
+    """POST exported spans to an OTLP/HTTP endpoint as JSON.
+
+    Meant for a collector or agent on the same host; the call runs on the
+    exporter thread with a short timeout.
+    """
+
+    def __init__(self, endpoint, resource=None, timeout=2.0):
+        """Create a sink.
+
+        Args:
+            endpoint: Traces URL, e.g. ``http://localhost:4318/v1/traces``.
+            resource: Dict of resource attributes.
+            timeout: Seconds to wait for the collector.
+        """
+        self.endpoint = endpoint
+        self.resource = dict(resource or {})
+        self.timeout = timeout
+
+    def export(self, spans):
+        """Send one batch of spans.
+
+        Raises:
+            urllib.error.URLError: If the collector is unreachable or rejects the batch.
+        """
+        body = json.dumps(encode_otlp(spans, self.resource), separators=(",", ":")).encode()
+        request = urllib.request.Request(
+            self.endpoint,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:  # nosec B310
+            response.read()
+
+
+class Tracer:
+    """Start request traces and export the ones tail sampling keeps."""
+
+    def __init__(
+        self,
+        sink=None,
+        sample_rate=0.01,
+        slow_ms=500.0,
+        max_spans=256,
+        flush_interval=5.0,
+        max_queue=2048,
+        rand=random.random,
+    ):
+        """Create a tracer.
+
+        Args:
+            sink: Object with an ``export(spans)`` method. Without one, trace
+                context is still propagated and logged but nothing is recorded.
+            sample_rate: Share of ordinary (fast, successful) traces kept.
+            slow_ms: Requests at least this slow are always kept (0 disables).
+            max_spans: Spans buffered per request.
+            flush_interval: Seconds between exports.
+            max_queue: Kept traces waiting for export before new ones are dropped.
+            rand: Random source returning floats in [0, 1).
+        """
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_spans = max_spans
+        self._rand = rand
+        self.started = 0
+        self.kept = 0
+        self.exported = 0
+        self._batcher = None
+        if sink is not None:
+            self._batcher = BackgroundBatcher(
+                self._export,
+                name="span-exporter",
+                max_queue=max_queue,
+                max_batch=64,
+                flush_interval=flush_interval,
+                overflow="drop",
+            )
+
+    def configure(self, settings):
+        """Apply reloaded ``TRACE_SAMPLE_RATE`` and ``TRACE_SLOW_MS``.
+
+        Args:
+            settings: Settings from ``src.utils.runtime_config``.
+        """
+        self.sample_rate = settings.trace_sample_rate
+        self.slow_ms = settings.trace_slow_ms
+
+    @property
+    def recording(self):
+        """Return whether spans are recorded and exported."""
+        return self._batcher is not None
+
+    def start_request(self, name, traceparent=None, tracestate=None):
+        """Start the trace of an incoming request and make it current.
+
+        Continues the caller's trace when ``traceparent`` is valid, and
+        starts a new one otherwise. A new trace's sampled flag is decided
+        here, so downstream services see the same decision.
+
+        Args:
+            name: Root span name.
+            traceparent: Incoming ``traceparent`` header.
+            tracestate: Incoming ``tracestate`` header.
+
+        Returns:
+            RequestTrace to pass to ``finish_request``.
+        """
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, flags = parent
+            sampled = bool(flags & FLAG_SAMPLED)
+            if not tracestate or len(tracestate) > MAX_TRACESTATE_LENGTH:
+                tracestate = None
+        else:
+            trace_id, parent_id, tracestate = new_trace_id(), None, None
+            sampled = self.sample_rate >= 1.0 or self._rand() < self.sample_rate
+        trace = RequestTrace(name, trace_id, parent_id, tracestate, sampled, self.max_spans)
+        trace.token = _current.set(trace)
+        self.started += 1
+        return trace
+
+    def keep_reason(self, trace, status_code):
+        """Return why a finished trace is kept, or None to discard it.
+
+        Args:
+            trace: Finished request trace.
+            status_code: Response status code.
+
+        Returns:
+            ``"error"``, ``"slow"``, ``"sampled"`` or None.
+        """
+        if status_code >= 500 or trace.root.error:
+            return "error"
+        if self.slow_ms and trace.root.duration_ms >= self.slow_ms:
+            return "slow"
+        if trace.sampled:
+            return "sampled"
+        return None
+
+    def finish_request(self, trace, status_code):
+        """End a request's trace and decide whether to keep it.
+
+        Discarded traces need no further work; kept ones are passed to
+        ``export`` once the caller has added its attributes.
+
+        Args:
+            trace: Trace returned by ``start_request``.
+            status_code: Response status code, 500 if the request failed.
+
+        Returns:
+            Keep reason, or None if the trace is discarded or not recorded.
+        """
+        _current.reset(trace.token)
+        trace.root.end()
+        if self._batcher is None:
+            return None
+        return self.keep_reason(trace, status_code)
+
+    def export(self, trace, reason):
+        """Queue a kept trace for export.
+
+        Args:
+            trace: Trace finished with ``finish_request``.
+            reason: Keep reason returned by ``finish_request``.
+
+        Returns:
+            True if queued, False if dropped because the queue is full.
+        """
+        trace.root.attributes["sampling.reason"] = reason
+        if trace.dropped:
+            trace.root.attributes["spans.dropped"] = trace.dropped
+        if not self._batcher.submit(trace.spans):
+            return False
+        self.kept += 1
+        return True
+
+    def stats(self):
+        """Return export counters.
+
+        Returns:
+            Dict with ``started``, ``kept`` and ``dropped`` trace counts,
+            ``exported`` span count and ``queue_depth``.
+        """
+        batcher = self._batcher
+        return {
+            "started": self.started,
+            "kept": self.kept,
+            "dropped": batcher.dropped if batcher is not None else 0,
+            "exported": self.exported,
+            "queue_depth": batcher.depth if batcher is not None else 0,
+        }
+
+    def flush(self):
+        """Export all queued traces on the calling thread."""
+        if self._batcher is not None:
+            self._batcher.flush()
+
+    def close(self):
+        """Export pending traces and stop the exporter thread."""
+        if self._batcher is not None:
+            self._batcher.close()
+
+    def _export(self, traces):
+        spans = [s for spans in traces for s in spans]
+        self.sink.export(spans)
+        self.exported += len(spans)
@@ -0,0 +1,169 @@
+"""Warm-up requests run before the app reports ready.
+
+The first request through a fresh app pays for lazy work: Werkzeug compiles
+the URL map, static payloads are serialized, lazily imported modules load
+and thread pools start. ``Warmup.run`` sends one request to every route
+through the full middleware stack so real traffic does not pay for it.
+
+Warm-up requests carry ``WARMUP_ENVIRON_KEY`` in their WSGI environ and are
+kept out of access logs, Prometheus, latency sketches, phase timings and
+CloudWatch.
+
+Warm-up runs outside ``create_app``, so callers can still add routes to the
+app. Under gunicorn (``src/gunicorn_conf.py``) it runs once in the master
+with ``preload_app``, so that work is shared copy-on-write, and again in
+every worker before it accepts connections, for per-process state.
+``/health/ready`` answers 503 in a process that has not warmed up yet, so
+the app never reports ready before it; other servers call ``warm_up``
+before serving (see ``src/app.py``).
+"""
+
+import logging
+import os
+import threading
+import time
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENVIRON_KEY = "demo_app.warmup"
+
+# Routes that need a body; GET routes without URL arguments are found automatically
+BODY_REQUESTS = (("POST", "/api/echo", {"warmup": True}),)
+# The readiness probe itself, the metrics endpoint and the static file route
+EXCLUDED_ENDPOINTS = frozenset({"health.ready", "prometheus_metrics", "static"})
+EXCLUDED_BLUEPRINTS = frozenset({"debug"})
+
+
+def is_warmup_request():
+    """Return whether the current request is a warm-up request."""
+    return WARMUP_ENVIRON_KEY in request.environ
+
+
+class Warmup:
+    """Warm-up state and runner for one app."""
+
+    def __init__(self, enabled=True):
+        """Initialize the state.
+
+        Args:
+            enabled: Whether warm-up runs at all. When disabled the app is
+                ready immediately.
+        """
+        self.enabled = enabled
+        # Held while running, so concurrent callers warm up once
+        self.lock = threading.Lock()
+        self.pid = None
+        self.duration_ms = None
+        self.routes = {}
+
+    @property
+    def warmed(self):
+        """Return whether warm-up is disabled or has run in this process."""
+        return not self.enabled or self.pid == os.getpid()
+
+    def requests(self, app):
+        """List the warm-up requests for ``app``.
+
+        Returns:
+            List of ``(method, path, json_body)`` tuples.
+        """
+        found = []
+        for rule in app.url_map.iter_rules():
+            blueprint = rule.endpoint.rpartition(".")[0]
+            if (
+                "GET" not in rule.methods
+                or rule.arguments
+                or rule.endpoint in EXCLUDED_ENDPOINTS
+                or blueprint in EXCLUDED_BLUEPRINTS
+            ):
+                continue
+            found.append(("GET", rule.rule, None))
+        paths = {rule.rule for rule in app.url_map.iter_rules()}
+        found.extend(r for r in BODY_REQUESTS if r[1] in paths)
+        return found
+
+    def run(self, app):
+        """Send every warm-up request through the app.
+
+        Failing routes are logged but do not keep the app from becoming
+        ready; warm-up only moves work out of the first real requests.
+
+        Args:
+            app: Flask application instance.
+
+        Returns:
+            Dict mapping ``"METHOD path"`` to ``{"status", "ms"}``.
+        """
+        started = time.perf_counter()
+        client = app.test_client()
+        environ = {WARMUP_ENVIRON_KEY: True, "REMOTE_ADDR": "127.0.0.1"}
+        routes = {}
+        for method, path, body in self.requests(app):
+            began = time.perf_counter()
+            try:
+                response = client.open(path, method=method, json=body, environ_base=environ)
+                status = response.status_code
+                response.close()
+            except Exception as e:
+                logger.warning("Warm-up request %s %s failed: %s", method, path, e)
+                status = None
+            routes[f"{method} {path}"] = {
+                "status": status,
+                "ms": round((time.perf_counter() - began) * 1000, 3),
+            }
+
+        self.routes = routes
+        self.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.pid = os.getpid()
+        failed = [route for route, r in routes.items() if r["status"] is None or r["status"] >= 500]
+        if failed:
+            logger.warning(
+                "Warm-up requests failed",
+                extra={"extra_fields": {"routes": failed}},
+            )
+        return routes
+
+
+def setup_warmup(app):
+    """Create the warm-up state and mark warm-up requests as untracked.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        Warmup instance, also stored in ``app.extensions``.
+    """
+    warmup = Warmup(enabled=app.config.get("WARMUP_ENABLED", True))
+    app.extensions["warmup"] = warmup
+
+    @app.before_request
+    def skip_warmup_metrics():
+        """Keep warm-up requests out of the Prometheus request metrics."""
+        if is_warmup_request():
+            request.prom_do_not_track = True
+
+    return warmup
+
+
+def warm_up(app):
+    """Run the app's warm-up if enabled and not yet run in this process.
+
+    Concurrent callers wait for the first one's warm-up instead of running
+    their own.
+
+    Args:
+        app: Flask application instance.
+
+    Returns:
+        Warmup instance, or None if the app has no warm-up state.
+    """
+    warmup = app.extensions.get("warmup")
+    if warmup is None or warmup.warmed:
+        return warmup
+    with warmup.lock:
+        # Another thread may have finished warming up while this one waited
+        if not warmup.warmed:
+            warmup.run(app)
+    return warmup
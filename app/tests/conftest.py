@@ -3,6 +3,7 @@
 import pytest
 from prometheus_client import REGISTRY
 from src.app import create_app
+from src.config import DevelopmentConfig
 
 
 @pytest.fixture(autouse=True)
@@ -42,6 +43,25 @@ def app():
     return app
 
 
+@pytest.fixture
+def make_app(monkeypatch):
+    """Create application instances with configuration overrides.
+
+    Overrides are set on ``DevelopmentConfig`` for the duration of the test.
+
+    Returns:
+        Callable taking setting names and values and returning a new dev app.
+    """
+
+    def factory(**config):
+        """Create the dev app with ``config`` applied."""
+        for key, value in config.items():
+            monkeypatch.setattr(DevelopmentConfig, key, value)
+        return create_app("dev")
+
+    return factory
+
+
 @pytest.fixture
 def client(app):
     """Create test client.
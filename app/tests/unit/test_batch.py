@@ -0,0 +1,103 @@
+"""Unit tests for the /api/batch endpoint."""
+
+import logging
+
+import pytest
+
+from src.app import create_app
+
+
+def post_batch(client, requests, **options):
+    """Post a batch and return the response."""
+    return client.post(
+        "/api/batch",
+        json=dict(options, requests=requests),
+        headers={"X-Request-ID": "batch-1"},
+    )
+
+
+class TestBatch:
+    """Test suite for in-process batched API calls."""
+
+    @pytest.mark.parametrize("parallel", [False, True])
+    def test_results_in_request_order(self, client, parallel):
+        """Test that each sub-request result is returned in order."""
+        response = post_batch(
+            client,
+            [
+                {"path": "/api/hello?name=Batch"},
+                {"path": "/api/info"},
+                {"method": "POST", "path": "/api/echo", "body": {"k": "v"}},
+            ],
+            parallel=parallel,
+        )
+        assert response.status_code == 200
+        results = response.get_json()["responses"]
+        assert [r["status"] for r in results] == [200, 200, 200]
+        assert results[0]["body"]["message"] == "Hello, Batch!"
+        assert results[1]["body"]["service"]["name"] == "demo-app"
+        assert results[2]["body"]["echo"] == {"k": "v"}
+
+    def test_sub_requests_get_own_request_ids(self, client):
+        """Test that sub-request IDs derive from the batch ID."""
+        results = post_batch(client, [{"path": "/api/hello"}] * 2).get_json()["responses"]
+        assert [r["request_id"] for r in results] == ["batch-1.0", "batch-1.1"]
+
+    def test_errors_are_per_sub_request(self, client):
+        """Test that failing sub-requests do not fail the batch."""
+        results = post_batch(
+            client,
+            [{"path": "/api/missing"}, {"path": "/health"}, {"path": "/api/batch"}],
+        ).get_json()["responses"]
+        assert [r["status"] for r in results] == [404, 400, 405]
+
+    @pytest.mark.parametrize("encoding", ["gzip", "br"])
+    def test_sub_responses_not_compressed(self, make_app, encoding):
+        """Test that a spec asking for compression still gets a decodable body."""
+        client = make_app(COMPRESSION_MIN_SIZE=0).test_client()
+        (result,) = post_batch(
+            client,
+            [{"path": "/api/info", "headers": {"accept-encoding": encoding}}],
+        ).get_json()["responses"]
+        assert result["status"] == 200
+        assert result["body"]["service"]["name"] == "demo-app"
+
+    def test_batch_cannot_call_itself(self, client):
+        """Test that nested batches are rejected."""
+        (result,) = post_batch(
+            client, [{"method": "POST", "path": "/api/batch", "body": {}}]
+        ).get_json()["responses"]
+        assert result["status"] == 400
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            {},
+            {"requests": []},
+            {"requests": [{"method": "GET"}]},
+            {"requests": [{"path": "/api/hello"}] * 21},
+        ],
+    )
+    def test_invalid_batches_rejected(self, client, body):
+        """Test that malformed or oversized batches return 400."""
+        assert client.post("/api/batch", json=body).status_code == 400
+
+    def test_one_aggregated_log_line(self, client, caplog):
+        """Test that the batch logs one line covering all sub-requests."""
+        with caplog.at_level(logging.INFO, logger="src.app"):
+            post_batch(client, [{"path": "/api/hello"}, {"path": "/api/info"}])
+
+        access = [r.extra_fields for r in caplog.records if "status_code" in r.extra_fields]
+        assert len(access) == 1
+        assert access[0]["path"] == "/api/batch"
+        batch = access[0]["batch"]
+        assert batch["size"] == 2
+        assert [r["request_id"] for r in batch["requests"]] == ["batch-1.0", "batch-1.1"]
+
+    def test_sub_requests_labelled_in_metrics(self):
+        """Test that each sub-request is counted under its own path."""
+        client = create_app("dev").test_client()
+        post_batch(client, [{"path": "/api/hello"}, {"path": "/api/info"}])
+        body = client.get("/metrics").get_data(as_text=True)
+        assert 'path="/api/hello"' in body
+        assert 'path="/api/info"' in body
@@ -0,0 +1,68 @@
+"""Unit tests for the benchmark suite and its regression gate."""
+
+from benchmarks import bench_routes
+from benchmarks.run import compare, main
+from src.config import config_by_name
+
+BASELINE = {
+    "meta": {"python": "3.11"},
+    "routes": {"in_process": {"full": {"GET /api/hello": {"rps": 1000.0, "p50_ms": 1.0}}}},
+}
+
+
+def with_route_stats(**stats):
+    """Return results with the hello route's stats replaced."""
+    return {"routes": {"in_process": {"full": {"GET /api/hello": stats}}}}
+
+
+class TestRegressionGate:
+    """Test suite for comparing results with a baseline."""
+
+    def test_within_threshold_passes(self):
+        """Test that small changes are not reported."""
+        current = with_route_stats(rps=900.0, p50_ms=1.2)
+        assert compare(BASELINE, current, 0.25, {"rps", "p50_ms"}) == []
+
+    def test_latency_increase_reported(self):
+        """Test that slower latencies beyond the threshold are regressions."""
+        current = with_route_stats(rps=1000.0, p50_ms=1.5)
+        ((path, metric, old, new, change),) = compare(BASELINE, current, 0.25, {"p50_ms"})
+        assert path == "routes / in_process / full / GET /api/hello"
+        assert (metric, old, new) == ("p50_ms", 1.0, 1.5)
+        assert round(change, 2) == 0.5
+
+    def test_throughput_drop_reported(self):
+        """Test that lower throughput beyond the threshold is a regression."""
+        current = with_route_stats(rps=500.0, p50_ms=1.0)
+        assert [r[1] for r in compare(BASELINE, current, 0.25, {"rps", "p50_ms"})] == ["rps"]
+
+    def test_ungated_metrics_ignored(self):
+        """Test that only gated metrics fail the run."""
+        current = with_route_stats(rps=100.0, p50_ms=10.0)
+        assert compare(BASELINE, current, 0.25, {"p99_ms"}) == []
+
+    def test_missing_baseline_fails(self, tmp_path, capsys):
+        """Test that the gate fails without a baseline instead of recording one."""
+        baseline = tmp_path / "baseline.json"
+        assert main(["--baseline", str(baseline), "--output", str(tmp_path / "out.json")]) == 2
+        assert "--update-baseline" in capsys.readouterr().err
+        assert not baseline.exists()
+
+
+class TestRouteBenchmark:
+    """Smoke test for the in-process driver."""
+
+    def test_in_process_stats(self):
+        """Test that the WSGI driver reports throughput and percentiles."""
+        app = bench_routes.build_app("no_cors")
+        stats = bench_routes.run_in_process(app, "GET", "/health/live", None, 20)
+        assert set(stats) == {"rps", "p50_ms", "p99_ms", "p999_ms"}
+        assert stats["rps"] > 0
+        assert stats["p50_ms"] <= stats["p99_ms"] <= stats["p999_ms"]
+
+    def test_build_app_leaves_config_untouched(self):
+        """Test that variant configs are not left in the shared config registry."""
+        before = dict(config_by_name)
+        bench_routes.build_app("custom", {"config": {"ENABLE_METRICS": False}})
+        assert config_by_name == before
+        assert "custom" not in bench_routes.VARIANTS
@@ -0,0 +1,246 @@
+"""Unit tests for the batched CloudWatch emitter."""
+
+import json
+import logging
+
+import boto3
+from botocore.exceptions import ClientError
+from botocore.stub import ANY, Stubber
+
+from src.app import create_app
+from src.config import DevelopmentConfig
+from src.utils.cloudwatch import (
+    CloudWatchEmitter,
+    EMFEmitter,
+    aggregate_samples,
+    build_emf_documents,
+)
+
+DIMS = (("Environment", "test"), ("StatusCode", "200"), ("Method", "GET"), ("Endpoint", "x"))
+
+
+class FakeCloudWatch:
+    """Minimal stand-in for a boto3 CloudWatch client."""
+
+    def __init__(self, fail=False):
+        """Create a fake client that optionally fails every call."""
+        self.calls = []
+        self.fail = fail
+
+    def put_metric_data(self, Namespace, MetricData):
+        """Record the call or raise a throttling error."""
+        if self.fail:
+            raise ClientError({"Error": {"Code": "Throttling"}}, "PutMetricData")
+        self.calls.append((Namespace, MetricData))
+
+
+class TestAggregation:
+    """Test suite for rolling samples up per dimension set."""
+
+    def test_samples_grouped_by_dimensions(self):
+        """Test that samples with equal dimensions share one aggregate."""
+        other = DIMS[:1] + (("StatusCode", "500"),) + DIMS[2:]
+        series = aggregate_samples([(DIMS, 1.0), (DIMS, 1.04), (other, 3.0)])
+        assert series[DIMS].count == 2
+        assert series[DIMS].latencies == {1.0: 2}
+        assert series[other].count == 1
+
+
+class TestCloudWatchEmitter:
+    """Test suite for CloudWatchEmitter."""
+
+    def test_flush_sends_one_call_per_window(self):
+        """Test that many requests become a single PutMetricData call."""
+        client = FakeCloudWatch()
+        emitter = CloudWatchEmitter(lambda: client, "DemoApp/test", flush_interval=3600)
+        for _ in range(50):
+            emitter.record(DIMS, 2.0)
+        emitter.flush()
+
+        assert len(client.calls) == 1
+        namespace, data = client.calls[0]
+        assert namespace == "DemoApp/test"
+        count = next(d for d in data if d["MetricName"] == "RequestCount")
+        assert count["StatisticValues"]["SampleCount"] == 50
+        latency = next(d for d in data if d["MetricName"] == "Latency")
+        assert latency["Values"] == [2.0] and latency["Counts"] == [50]
+        assert emitter.stats()["flushed"] == 50
+        emitter.close()
+
+    def test_full_queue_drops_samples(self):
+        """Test that samples beyond the queue bound are shed."""
+        client = FakeCloudWatch()
+        emitter = CloudWatchEmitter(
+            lambda: client, "DemoApp/test", flush_interval=3600, max_queue=5, max_batch=100
+        )
+        results = [emitter.record(DIMS, 1.0) for _ in range(8)]
+        assert results.count(False) == 3
+        assert emitter.stats()["dropped"] == 3
+        emitter.close()
+
+    def test_circuit_breaker_opens_after_failures(self):
+        """Test that repeated ClientErrors open the breaker and shed batches."""
+        client = FakeCloudWatch(fail=True)
+        now = [0.0]
+        emitter = CloudWatchEmitter(
+            lambda: client,
+            "DemoApp/test",
+            flush_interval=3600,
+            failure_threshold=2,
+            reset_timeout=30,
+            clock=lambda: now[0],
+        )
+        for _ in range(2):
+            emitter.record(DIMS, 1.0)
+            emitter.flush()
+        assert emitter.stats()["failed"] == 2
+        assert emitter.circuit_open
+
+        emitter.record(DIMS, 1.0)
+        emitter.flush()
+        assert emitter.stats()["dropped"] == 1
+
+        # After the reset timeout a trial call is allowed and closes the breaker
+        now[0] = 31.0
+        client.fail = False
+        emitter.record(DIMS, 1.0)
+        emitter.flush()
+        assert not emitter.circuit_open
+        assert emitter.stats()["flushed"] == 1
+        emitter.close()
+
+    def test_failed_trial_reopens_breaker(self):
+        """Test that one failed call after the reset timeout reopens the breaker."""
+        client = FakeCloudWatch(fail=True)
+        now = [0.0]
+        emitter = CloudWatchEmitter(
+            lambda: client,
+            "DemoApp/test",
+            flush_interval=3600,
+            failure_threshold=3,
+            reset_timeout=30,
+            clock=lambda: now[0],
+        )
+        for _ in range(3):
+            emitter.record(DIMS, 1.0)
+            emitter.flush()
+        assert emitter.circuit_open
+
+        now[0] = 31.0
+        emitter.record(DIMS, 1.0)
+        emitter.flush()
+        assert emitter.circuit_open
+        assert emitter.stats()["failed"] == 4
+        emitter.close()
+
+    def test_any_client_error_counts_as_failure(self):
+        """Test that unexpected exceptions from the client trip the breaker too."""
+        client = FakeCloudWatch()
+        client.put_metric_data = lambda **kwargs: 1 / 0
+        emitter = CloudWatchEmitter(
+            lambda: client, "DemoApp/test", flush_interval=3600, failure_threshold=1
+        )
+        emitter.record(DIMS, 1.0)
+        emitter.flush()
+        assert emitter.stats()["failed"] == 1
+        assert emitter.circuit_open
+        emitter.close()
+
+    def test_against_botocore_stubber(self):
+        """Test the emitted request against the real PutMetricData model."""
+        client = boto3.client(
+            "cloudwatch",
+            region_name="us-east-1",
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+        )
+        emitter = CloudWatchEmitter(lambda: client, "DemoApp/test", flush_interval=3600)
+        with Stubber(client) as stubber:
+            stubber.add_response(
+                "put_metric_data", {}, {"Namespace": "DemoApp/test", "MetricData": ANY}
+            )
+            emitter.record(DIMS, 12.5)
+            emitter.flush()
+            stubber.assert_no_pending_responses()
+        assert emitter.stats()["flushed"] == 1
+        emitter.close()
+
+
+class TestCloudWatchMiddleware:
+    """Test suite for the CloudWatch after_request hook."""
+
+    def test_requests_are_queued_not_sent(self, monkeypatch):
+        """Test that requests only enqueue samples and stats reach /metrics."""
+        monkeypatch.setattr(DevelopmentConfig, "ENABLE_CLOUDWATCH", True)
+        app = create_app("dev")
+        emitter = app.extensions["cloudwatch_emitter"]
+        client = FakeCloudWatch()
+        emitter._client = client
+        test_client = app.test_client()
+
+        test_client.get("/api/hello")
+        test_client.get("/health")
+        assert client.calls == []
+
+        emitter.flush()
+        assert emitter.stats()["flushed"] == 1
+        body = test_client.get("/metrics").get_data(as_text=True)
+        assert "cloudwatch_emitter_flushed_total 1.0" in body
+        emitter.close()
+
+
+class TestEMFEmitter:
+    """Test suite for the Embedded Metric Format emitter."""
+
+    def test_document_structure(self):
+        """Test that a window becomes one EMF document per dimension set."""
+        series = aggregate_samples([(DIMS, 1.0)] * 3 + [(DIMS, 7.0)])
+        (document,) = build_emf_documents(series, "DemoApp/test", 1700000000000)
+
+        assert document["RequestCount"] == 4
+        assert document["Latency"] == [1.0, 1.0, 1.0, 7.0]
+        assert document["Endpoint"] == "x"
+        directive = document["_aws"]["CloudWatchMetrics"][0]
+        assert document["_aws"]["Timestamp"] == 1700000000000
+        assert directive["Namespace"] == "DemoApp/test"
+        assert directive["Dimensions"] == [["Environment", "StatusCode", "Method", "Endpoint"]]
+
+    def test_large_windows_spill_latency_values(self):
+        """Test that latency samples beyond the EMF limit go to extra documents."""
+        series = aggregate_samples([(DIMS, 1.0)] * 250)
+        documents = build_emf_documents(series, "DemoApp/test", 0)
+
+        assert [len(d["Latency"]) for d in documents] == [100, 100, 50]
+        assert sum(d.get("RequestCount", 0) for d in documents) == 250
+
+    def test_flush_logs_documents(self, caplog):
+        """Test that flushing writes documents through the logger."""
+        emf_logger = logging.getLogger("test.emf")
+        emitter = EMFEmitter("DemoApp/test", flush_interval=3600, emf_logger=emf_logger)
+        with caplog.at_level(logging.INFO, logger="test.emf"):
+            for _ in range(10):
+                emitter.record(DIMS, 2.0)
+            emitter.flush()
+
+        (record,) = caplog.records
+        assert record.extra_fields["RequestCount"] == 10
+        assert emitter.stats()["flushed"] == 10
+        emitter.close()
+
+    def test_emf_mode_writes_to_stdout(self, monkeypatch, capsys):
+        """Test that EMF mode emits metrics on the JSON log stream at any log level."""
+        monkeypatch.setattr(DevelopmentConfig, "LOG_LEVEL", "ERROR")
+        monkeypatch.setattr(DevelopmentConfig, "ENABLE_CLOUDWATCH", True)
+        monkeypatch.setattr(DevelopmentConfig, "CLOUDWATCH_MODE", "emf")
+        app = create_app("dev")
+        emitter = app.extensions["cloudwatch_emitter"]
+        assert isinstance(emitter, EMFEmitter)
+
+        app.test_client().get("/api/hello")
+        emitter.flush()
+
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        (document,) = [line for line in lines if "_aws" in line]
+        assert document["RequestCount"] == 1
+        assert document["Endpoint"] == "api.hello"
+        emitter.close()
@@ -0,0 +1,142 @@
+"""Unit tests for response compression."""
+
+import gzip
+import json
+import zlib
+
+import pytest
+
+from src.app import create_app
+from src.config import DevelopmentConfig
+from src.middleware.compression import Compressor
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def large_body():
+    """Return a JSON document well above the compression threshold."""
+    return {"items": [{"id": i, "name": "compressible"} for i in range(200)]}
+
+
+class TestNegotiation:
+    """Test suite for choosing a content coding."""
+
+    def test_large_body_gzipped(self, client):
+        """Test that a large reply is gzipped and decodes to the plain body."""
+        plain = client.post("/api/echo", json=large_body())
+        compressed = client.post("/api/echo", json=large_body(), headers=GZIP)
+
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in compressed.headers["Vary"]
+        assert int(compressed.headers["Content-Length"]) == len(compressed.get_data())
+        assert len(compressed.get_data()) < len(plain.get_data())
+        decoded = json.loads(gzip.decompress(compressed.get_data()))
+        assert decoded["echo"] == plain.get_json()["echo"]
+
+    def test_identity_without_accept_encoding(self, client):
+        """Test that clients not asking for compression get the plain body."""
+        response = client.post("/api/echo", json=large_body())
+        assert "Content-Encoding" not in response.headers
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+    def test_refused_coding_respected(self, client):
+        """Test that a coding with q=0 is never used."""
+        response = client.post(
+            "/api/echo", json=large_body(), headers={"Accept-Encoding": "gzip;q=0, identity"}
+        )
+        assert "Content-Encoding" not in response.headers
+
+    def test_small_body_untouched(self, client):
+        """Test that bodies below the threshold are sent as they are."""
+        response = client.get("/api/hello", headers=GZIP)
+        assert "Content-Encoding" not in response.headers
+        assert response.get_json()["message"] == "Hello, World!"
+
+    def test_brotli_preferred_when_installed(self):
+        """Test that br is chosen over gzip when the binding is installed."""
+        brotli = pytest.importorskip("brotli")
+        client = create_app("dev").test_client()
+        response = client.post(
+            "/api/echo", json=large_body(), headers={"Accept-Encoding": "gzip, br"}
+        )
+        assert response.headers["Content-Encoding"] == "br"
+        assert json.loads(brotli.decompress(response.get_data()))["echo"] == large_body()
+
+    def test_disabled(self, monkeypatch):
+        """Test that nothing is compressed when compression is disabled."""
+        monkeypatch.setattr(DevelopmentConfig, "COMPRESSION_ENABLED", False)
+        client = create_app("dev").test_client()
+        response = client.post("/api/echo", json=large_body(), headers=GZIP)
+        assert "Content-Encoding" not in response.headers
+
+
+class TestStreaming:
+    """Test suite for streamed responses."""
+
+    def test_ndjson_stream_compressed_per_chunk(self, client):
+        """Test that each streamed chunk can be decoded as soon as it arrives."""
+        body = b"".join(json.dumps({"n": i}).encode() + b"\n" for i in range(3))
+        response = client.post(
+            "/api/echo/stream",
+            data=body,
+            headers=dict(GZIP, **{"Content-Type": "application/x-ndjson"}),
+            buffered=False,
+        )
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in response.headers
+
+        decoder = zlib.decompressobj(31)
+        chunks = iter(response.response)
+        assert decoder.decompress(next(chunks)) == body
+        assert decoder.decompress(b"".join(chunks)) == b""
+        assert decoder.eof
+        response.close()
+
+
+class TestPrecompressed:
+    """Test suite for bodies that are compressed once."""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        """Return a client whose static payloads are above the threshold."""
+        monkeypatch.setattr(DevelopmentConfig, "COMPRESSION_MIN_SIZE", 0)
+        return create_app("dev").test_client()
+
+    def test_static_body_compressed_once(self, client):
+        """Test that a static payload reuses its compressed body."""
+        first = client.get("/", headers=GZIP)
+        second = client.get("/", headers=GZIP)
+        plain = client.get("/")
+
+        assert first.headers["Content-Encoding"] == "gzip"
+        assert first.get_data() == second.get_data()
+        assert gzip.decompress(first.get_data()) == plain.get_data()
+        assert first.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+
+        response = client.get("/", headers=dict(GZIP, **{"If-None-Match": first.headers["ETag"]}))
+        assert response.status_code == 304
+
+    def test_timestamped_body_compressed_per_request(self, client):
+        """Test that timestamped payloads compress to the current body."""
+        response = client.get("/api/info", headers=GZIP)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["ETag"].startswith("W/")
+        data = json.loads(gzip.decompress(response.get_data()))
+        assert data["service"]["name"] == "demo-app"
+        assert data["timestamp"].endswith("Z")
+
+    def test_unchanged_scrape_compressed_once(self):
+        """Test that identical bodies for a cached key share one compression."""
+        compressor = Compressor()
+        body = b"metric 1\n" * 500
+        first = compressor.compress_cached("prometheus_metrics", body, "gzip")
+        assert compressor.compress_cached("prometheus_metrics", bytes(body), "gzip") is first
+        changed = compressor.compress_cached("prometheus_metrics", body + b"x", "gzip")
+        assert gzip.decompress(changed) == body + b"x"
+
+    def test_metrics_compressed(self, client):
+        """Test that the Prometheus exposition is compressed."""
+        client.get("/api/hello")
+        response = client.get("/metrics", headers=GZIP)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert b"app_info" in gzip.decompress(response.get_data())
@@ -0,0 +1,258 @@
+"""Unit tests for adaptive concurrency limiting."""
+
+import threading
+import time
+
+import pytest
+
+from src.app import create_app
+from src.config import DevelopmentConfig
+from src.utils.concurrency import AdaptiveConcurrencyLimiter
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        """Start at an arbitrary time."""
+        self.now = 1000.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+def run_request(limiter, clock, latency):
+    """Admit a request, advance the clock by ``latency`` and release it."""
+    token = limiter.acquire()
+    clock.now += latency
+    limiter.release(token)
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test suite for the AIMD limit."""
+
+    def test_sheds_beyond_limit(self):
+        """Test that requests beyond the limit are shed until a slot frees up."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, clock=FakeClock())
+        tokens = [limiter.acquire(), limiter.acquire()]
+        assert None not in tokens
+        assert limiter.acquire() is None
+        limiter.release(tokens[0])
+        assert limiter.acquire() is not None
+        assert limiter.stats()["shed"] == 1
+
+    def test_slow_requests_cut_limit_once_per_round_trip(self):
+        """Test that latency above the tolerance cuts the limit multiplicatively."""
+        clock = FakeClock()
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=20, clock=clock)
+        run_request(limiter, clock, 0.010)
+
+        # Requests admitted together all finish slowly: one cut, not sixteen
+        tokens = [limiter.acquire() for _ in range(16)]
+        clock.now += 0.100
+        for token in tokens:
+            limiter.release(token)
+        assert limiter.limit == pytest.approx(18)
+
+        tokens = [limiter.acquire() for _ in range(14)]
+        clock.now += 0.100
+        limiter.release(tokens[-1])
+        assert limiter.limit == pytest.approx(16.2)
+
+    def test_slow_request_with_spare_slots_keeps_limit(self):
+        """Test that a slow request admitted with most of the limit unused cuts nothing."""
+        clock = FakeClock()
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=20, clock=clock)
+        run_request(limiter, clock, 0.010)
+        run_request(limiter, clock, 0.100)
+        assert limiter.limit == 20
+
+    def test_mixed_routes_not_congestion(self):
+        """Test that fast and slow routes sharing a worker keep the limit.
+
+        Four requests are always in flight; one in five is a 30 ms route
+        and the rest a 1 ms route. Each route is compared with its own
+        baseline, and four of twenty slots in use is no queueing.
+        """
+        clock = FakeClock()
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=20, clock=clock)
+        finishing = []
+        for number in range(2000):
+            slow = number % 5 == 0
+            token = limiter.acquire("/slow" if slow else "/fast")
+            assert token is not None
+            finishing.append((clock.now + (0.030 if slow else 0.001), number, token))
+            if len(finishing) == 4:
+                finishing.sort()
+                clock.now, _, token = finishing.pop(0)
+                limiter.release(token)
+        assert limiter.limit == 20
+
+    def test_limit_grows_only_when_used(self):
+        """Test that fast requests raise the limit only while it is in use."""
+        clock = FakeClock()
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=5, clock=clock)
+        for _ in range(10):
+            run_request(limiter, clock, 0.010)
+        assert limiter.limit == 4
+
+        for _ in range(20):
+            tokens = [limiter.acquire() for _ in range(3)]
+            clock.now += 0.010
+            for token in tokens:
+                limiter.release(token)
+        assert limiter.limit == 5
+
+    def test_overloaded_after_sustained_shedding(self):
+        """Test that only continuous shedding marks the worker overloaded."""
+        clock = FakeClock()
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, overload_seconds=5, clock=clock)
+        limiter.acquire()
+        for _ in range(6):
+            assert limiter.acquire() is None
+            assert not limiter.overloaded()
+            clock.now += 0.9
+        assert limiter.acquire() is None
+        assert limiter.overloaded()
+
+        clock.now += 2
+        assert not limiter.overloaded()
+        # A new episode starts from scratch
+        assert limiter.acquire() is None
+        assert not limiter.overloaded()
+
+
+@pytest.fixture
+def limited_app(make_app):
+    """Return an app with a fixed limit of 2 and a slow endpoint."""
+    app = make_app(
+        CONCURRENCY_LIMIT_ENABLED=True,
+        CONCURRENCY_INITIAL_LIMIT=2,
+        CONCURRENCY_MAX_LIMIT=2,
+        CONCURRENCY_OVERLOAD_SECONDS=0,
+        # Warm-up would request the blocking endpoint
+        WARMUP_ENABLED=False,
+    )
+    release = threading.Event()
+
+    @app.route("/test/block")
+    def block():
+        """Hold the request until the test releases it."""
+        release.wait(5)
+        return {"ok": True}
+
+    app.release = release
+    return app
+
+
+def hold_slots(app, count):
+    """Start ``count`` blocked requests and wait until they hold their slots."""
+    limiter = app.extensions["concurrency_limiter"]
+    threads = [
+        threading.Thread(target=lambda: app.test_client().get("/test/block")) for _ in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    while limiter.inflight < count:
+        time.sleep(0.001)
+    return threads
+
+
+class TestLoadShedding:
+    """Test suite for the shedding hook and readiness."""
+
+    def test_excess_requests_shed_and_health_served(self, limited_app):
+        """Test that a full worker sheds API requests but still answers probes."""
+        app = limited_app
+        threads = hold_slots(app, 2)
+        client = app.test_client()
+        try:
+            response = client.get("/api/hello")
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+            assert client.get("/health").status_code == 200
+            assert client.get("/metrics").status_code == 200
+
+            ready = client.get("/health/ready")
+            assert ready.status_code == 503
+            assert ready.get_json()["checks"]["concurrency"] == "overloaded"
+        finally:
+            app.release.set()
+            for thread in threads:
+                thread.join()
+
+        assert client.get("/api/hello").status_code == 200
+        assert app.extensions["concurrency_limiter"].inflight == 0
+
+    def test_stats_exported(self, limited_app):
+        """Test that the limit and shed count appear in /metrics."""
+        app = limited_app
+        threads = hold_slots(app, 2)
+        client = app.test_client()
+        client.get("/api/hello")
+        app.release.set()
+        for thread in threads:
+            thread.join()
+
+        body = client.get("/metrics").get_data(as_text=True)
+        assert "concurrency_limiter_limit 2.0" in body
+        assert "concurrency_limiter_shed_total 1.0" in body
+
+    def test_p99_bounded_under_overload(self, monkeypatch):
+        """Test that admitted requests stay fast while an overloaded worker sheds.
+
+        The slow endpoint serves two requests at a time, so requests beyond
+        that queue; with the limit, the excess is shed instead.
+        """
+        monkeypatch.setattr(DevelopmentConfig, "CONCURRENCY_LIMIT_ENABLED", True)
+        monkeypatch.setattr(DevelopmentConfig, "CONCURRENCY_INITIAL_LIMIT", 6)
+        monkeypatch.setattr(DevelopmentConfig, "CONCURRENCY_MIN_LIMIT", 2)
+        # Two apps in one test would register their metrics twice
+        monkeypatch.setattr(DevelopmentConfig, "ENABLE_METRICS", False)
+        app = create_app("dev")
+        limited = run_overload(app)
+        monkeypatch.setattr(DevelopmentConfig, "CONCURRENCY_LIMIT_ENABLED", False)
+        unlimited = run_overload(create_app("dev"))
+
+        assert limited["shed"] > 0
+        assert unlimited["shed"] == 0
+        assert limited["p99"] < unlimited["p99"] / 2
+
+
+def run_overload(app, clients=24, requests=8, service_time=0.02):
+    """Drive a slow endpoint with more clients than it can serve.
+
+    Returns:
+        Dict with the p99 latency of successful requests and the shed count.
+    """
+    capacity = threading.Semaphore(2)
+
+    @app.route("/test/slow")
+    def slow():
+        """Serve at most two requests at a time."""
+        with capacity:
+            time.sleep(service_time)
+        return {"ok": True}
+
+    latencies = []
+    shed = []
+
+    def client_loop():
+        client = app.test_client()
+        for _ in range(requests):
+            began = time.perf_counter()
+            status = client.get("/test/slow").status_code
+            if status == 503:
+                shed.append(status)
+                time.sleep(service_time)
+            else:
+                latencies.append(time.perf_counter() - began)
+
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return {"p99": latencies[int(len(latencies) * 0.99) - 1], "shed": len(shed)}
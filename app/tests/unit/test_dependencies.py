@@ -0,0 +1,409 @@
+"""Unit tests for pooled dependency clients, against local socket servers."""
+
+import http.server
+import os
+import select
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+import urllib3
+
+from src.utils.dependencies import Dependencies, parse_dependency_urls
+from src.utils.pools import PoolTimeout, socket_alive, tcp_pool
+
+
+class FakeClock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self):
+        """Start at zero."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+class TCPServer:
+    """Accepts connections and keeps them open until told to close them."""
+
+    def __init__(self):
+        """Listen on a free local port."""
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.accepted = []
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def _accept(self):
+        """Accept connections until the listener is closed."""
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            self.accepted.append(conn)
+
+    def drop_clients(self):
+        """Close the server side of every accepted connection."""
+        for conn in self.accepted:
+            conn.close()
+
+    def close(self):
+        """Stop listening and close every connection."""
+        self.listener.close()
+        self.drop_clients()
+
+
+class HealthHandler(http.server.BaseHTTPRequestHandler):
+    """Answers every GET with the status in the server's ``status`` attribute."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """Send the configured status with a small body."""
+        body = b"ok"
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Keep the test output quiet."""
+
+
+class ThreadedHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """HTTP server handling each keep-alive connection in its own thread."""
+
+    daemon_threads = True
+
+
+@pytest.fixture
+def tcp_server():
+    """Run a TCP server on a free local port."""
+    server = TCPServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def http_server():
+    """Run an HTTP server on a free local port."""
+    server = ThreadedHTTPServer(("127.0.0.1", 0), HealthHandler)
+    server.status = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def free_port():
+    """Return a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def local_url(server, path="/"):
+    """Return the parsed URL of a local HTTP server."""
+    return parse_dependency_urls(f"api=http://127.0.0.1:{server.server_port}{path}")["api"]
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll ``condition`` until it holds or ``timeout`` passes."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestConnectionPool:
+    """Test suite for the TCP connection pool."""
+
+    def test_connections_reused(self, tcp_server):
+        """Test that a released connection is handed out again."""
+        pool = tcp_pool("db", "127.0.0.1", tcp_server.port)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            assert second is first
+        assert pool.stats()["created"] == 1
+
+    def test_size_limit_times_out(self, tcp_server):
+        """Test that borrowers beyond max_size wait, then get a 503 error."""
+        pool = tcp_pool("db", "127.0.0.1", tcp_server.port, max_size=2, acquire_timeout=0.05)
+        held = [pool.acquire(), pool.acquire()]
+        with pytest.raises(PoolTimeout) as error:
+            pool.acquire()
+        assert error.value.code == 503
+        assert error.value.pool == "db"
+        assert pool.stats()["timeouts"] == 1
+
+        pool.release(held.pop())
+        assert pool.acquire() is not None
+        assert pool.stats()["created"] == 2
+
+    def test_waiter_woken_by_release(self, tcp_server):
+        """Test that a waiting borrower gets the connection released meanwhile."""
+        pool = tcp_pool("db", "127.0.0.1", tcp_server.port, max_size=1, acquire_timeout=5)
+        conn = pool.acquire()
+        threading.Timer(0.05, pool.release, [conn]).start()
+        assert pool.acquire() is conn
+
+    def test_idle_timeout(self, tcp_server):
+        """Test that connections idle for too long are closed, not reused."""
+        clock = FakeClock()
+        pool = tcp_pool("db", "127.0.0.1", tcp_server.port, idle_timeout=30, clock=clock)
+        with pool.connection() as first:
+            pass
+        clock.now = 31
+        with pool.connection() as second:
+            assert second is not first
+        assert first.fileno() == -1
+        assert pool.stats()["discarded"] == 1
+
+    def test_closed_by_peer_discarded(self, tcp_server):
+        """Test that connections the server closed are dropped when found."""
+        pool = tcp_pool("db", "127.0.0.1", tcp_server.port)
+        with pool.connection() as first:
+            pass
+        assert wait_for(lambda: tcp_server.accepted)
+        tcp_server.drop_clients()
+        time.sleep(0.05)
+        with pool.connection() as second:
+            assert second is not first
+        assert pool.stats()["discarded"] == 1
+
+    @pytest.mark.parametrize("poll", [True, False])
+    def test_alive_check_on_high_descriptor(self, tcp_server, monkeypatch, poll):
+        """Test that sockets numbered past select()'s limit are still checked."""
+        if not poll:
+            monkeypatch.delattr(select, "poll")
+        with socket.create_connection(("127.0.0.1", tcp_server.port)) as conn:
+            high = os.dup2(conn.fileno(), 4000)
+            with socket.socket(fileno=high) as sock:
+                assert socket_alive(sock)
+                assert wait_for(lambda: tcp_server.accepted)
+                tcp_server.drop_clients()
+                assert wait_for(lambda: not socket_alive(sock))
+
+    def test_error_discards_connection(self, tcp_server):
+        """Test that a connection is closed if the with block raises."""
+        pool = tcp_pool("db", "127.0.0.1", tcp_server.port)
+        with pytest.raises(RuntimeError):
+            with pool.connection():
+                raise RuntimeError("protocol error")
+        assert pool.stats() == {
+            "max_size": 10,
+            "in_use": 0,
+            "idle": 0,
+            "created": 1,
+            "discarded": 1,
+            "timeouts": 0,
+        }
+
+    def test_warm_opens_connections(self, tcp_server):
+        """Test that warm connects ahead, once."""
+        pool = tcp_pool("db", "127.0.0.1", tcp_server.port, max_size=3)
+        assert pool.warm(5) == 3
+        assert pool.warm(2) == 0
+        assert wait_for(lambda: len(tcp_server.accepted) == 3)
+        assert pool.stats()["idle"] == 3
+
+    def test_warm_tolerates_unreachable(self):
+        """Test that warming a pool for a server that is down logs instead of raising."""
+        pool = tcp_pool("db", "127.0.0.1", free_port())
+        assert pool.warm(2) == 0
+        assert pool.stats()["in_use"] == 0
+        with pytest.raises(OSError):
+            pool.check()
+
+
+class TestHTTPPool:
+    """Test suite for the urllib3 pool."""
+
+    def test_keep_alive_reused(self, http_server):
+        """Test that requests share one kept-alive connection."""
+        pool = Dependencies({"api": local_url(http_server, "/health")}).pool("api")
+        assert pool.request("GET", "/").status == 200
+        assert pool.request("GET", "/").status == 200
+        assert pool.stats()["created"] == 1
+        assert pool.stats()["in_use"] == 0
+
+    def test_size_limit_times_out(self, http_server):
+        """Test that a full pool answers PoolTimeout."""
+        pool = Dependencies({"api": local_url(http_server)}, max_size=1, acquire_timeout=0.05).pool(
+            "api"
+        )
+        response = pool.request("GET", "/", preload_content=False)
+        with pytest.raises(PoolTimeout):
+            pool.request("GET", "/")
+        response.drain_conn()
+        response.release_conn()
+        assert pool.request("GET", "/").status == 200
+        assert pool.stats()["timeouts"] == 1
+
+    def test_idle_timeout(self, http_server):
+        """Test that an idle connection is reopened after the idle timeout."""
+        clock = FakeClock()
+        pool = Dependencies({"api": local_url(http_server)}).pool("api")
+        pool._clock = clock
+        pool.request("GET", "/")
+        clock.now = 61
+        pool.request("GET", "/")
+        assert pool.stats()["discarded"] == 1
+
+    def test_warm_and_check(self, http_server):
+        """Test warm-up and the health path check."""
+        pool = Dependencies({"api": local_url(http_server)}, max_size=3).pool("api")
+        assert pool.warm(2) == 2
+        assert pool.stats()["idle"] == 2
+        assert pool.check()
+        assert pool.stats()["created"] == 2
+
+        http_server.status = 503
+        with pytest.raises(RuntimeError):
+            pool.check()
+
+    def test_check_unreachable(self):
+        """Test that a check against a closed port raises."""
+        url = parse_dependency_urls(f"api=http://127.0.0.1:{free_port()}/")["api"]
+        pool = Dependencies({"api": url}, connect_timeout=0.5).pool("api")
+        assert pool.warm(1) == 0
+        with pytest.raises(urllib3.exceptions.HTTPError):
+            pool.check()
+
+
+class TestDependencies:
+    """Test suite for the per-process registry."""
+
+    @pytest.mark.parametrize(
+        "spec",
+        ["db", "db=tcp://", "=tcp://db:5432", "db=ftp://files:21", "db=tcp://db"],
+    )
+    def test_invalid_urls_rejected(self, spec):
+        """Test that malformed dependency specs raise ValueError."""
+        with pytest.raises(ValueError):
+            Dependencies(parse_dependency_urls(spec)).pool("db")
+
+    def test_pools_created_once(self, tcp_server):
+        """Test that a dependency's pool is shared within the process."""
+        dependencies = Dependencies(parse_dependency_urls(f"db=tcp://127.0.0.1:{tcp_server.port}"))
+        assert dependencies.pool("db") is dependencies.pool("db")
+        with pytest.raises(KeyError):
+            dependencies.pool("search")
+
+    def test_pools_recreated_after_fork(self, tcp_server):
+        """Test that a forked worker opens its own connections."""
+        dependencies = Dependencies(parse_dependency_urls(f"db=tcp://127.0.0.1:{tcp_server.port}"))
+        parent = dependencies.pool("db")
+        assert dependencies.warm() == {"db": 1}
+
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child
+            ok = dependencies.stats() == {} and dependencies.pool("db") is not parent
+            ok = ok and dependencies.warm() == {"db": 1}
+            os.write(write_end, b"1" if ok else b"0")
+            os._exit(0)
+        os.close(write_end)
+        result = os.read(read_end, 1)
+        os.waitpid(pid, 0)
+        os.close(read_end)
+
+        assert result == b"1"
+        assert dependencies.pool("db") is parent
+        assert wait_for(lambda: len(tcp_server.accepted) == 2)
+
+    def test_aws_client_per_process(self, monkeypatch):
+        """Test that boto3 clients are created once, bounded by the pool size."""
+        pytest.importorskip("boto3")
+        dependencies = Dependencies(max_size=4, region="eu-west-1")
+        dependencies.aws_services.append("cloudwatch")
+        assert dependencies.warm() == {"cloudwatch": 1}
+
+        client = dependencies.aws_client("cloudwatch")
+        assert client is dependencies.aws_client("cloudwatch")
+        assert client.meta.region_name == "eu-west-1"
+        assert client.meta.config.max_pool_connections == 4
+
+        monkeypatch.setattr(dependencies, "_pid", -1)
+        assert dependencies.aws_client("cloudwatch") is not client
+
+
+class TestAppIntegration:
+    """Test suite for readiness checks, views and metrics using the pools."""
+
+    def test_readiness_borrows_from_pools(self, make_app, tcp_server, http_server):
+        """Test that configured dependencies replace the simulated checks."""
+        urls = (
+            f"database=tcp://127.0.0.1:{tcp_server.port},"
+            f"search=http://127.0.0.1:{http_server.server_port}/health"
+        )
+        flask_app = make_app(WARMUP_ENABLED=False, DEPENDENCY_URLS=urls)
+        data = flask_app.test_client().get("/health/ready").get_json()
+        assert data["checks"] == {"database": "ok", "search": "ok", "cache": "ok"}
+        assert flask_app.extensions["dependencies"].stats()["database"]["idle"] == 1
+
+    def test_readiness_fails_when_down(self, make_app):
+        """Test that a dependency that is down makes the worker not ready."""
+        flask_app = make_app(
+            WARMUP_ENABLED=False, DEPENDENCY_URLS=f"database=tcp://127.0.0.1:{free_port()}"
+        )
+        response = flask_app.test_client().get("/health/ready")
+        assert response.status_code == 503
+        assert response.get_json()["checks"]["database"] == "failed"
+
+    def test_pool_timeout_answers_503(self, make_app, tcp_server):
+        """Test that a view giving up on a pool answers 503 with Retry-After."""
+        flask_app = make_app(
+            WARMUP_ENABLED=False,
+            DEPENDENCY_URLS=f"database=tcp://127.0.0.1:{tcp_server.port}",
+            DEPENDENCY_POOL_SIZE=1,
+            DEPENDENCY_ACQUIRE_TIMEOUT=0.01,
+        )
+
+        @flask_app.route("/test/query")
+        def query():
+            """Borrow the only connection twice."""
+            from src.utils.dependencies import dependency
+
+            with dependency("database").connection():
+                with dependency("database").connection():
+                    return "unreachable"
+
+        response = flask_app.test_client().get("/test/query")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_metrics_exported(self, make_app, tcp_server):
+        """Test that pool utilization and wait time appear in /metrics."""
+        flask_app = make_app(
+            WARMUP_ENABLED=False, DEPENDENCY_URLS=f"database=tcp://127.0.0.1:{tcp_server.port}"
+        )
+        dependencies = flask_app.extensions["dependencies"]
+        dependencies.warm()
+        with dependencies.pool("database").connection():
+            pass
+        body = flask_app.test_client().get("/metrics").get_data(as_text=True)
+        assert 'dependency_pool_max_size{pool="database"} 10.0' in body
+        assert 'dependency_pool_connections{pool="database",state="idle"} 1.0' in body
+        assert 'dependency_pool_connections{pool="database",state="in_use"} 0.0' in body
+        assert 'dependency_pool_wait_seconds_count{pool="database"} 1.0' in body
+
+    def test_invalid_urls_fail_startup(self, make_app):
+        """Test that a bad DEPENDENCY_URLS is reported at startup."""
+        with pytest.raises(ValueError):
+            make_app(WARMUP_ENABLED=False, DEPENDENCY_URLS="database=redis://cache:6379")
+
+    def test_no_connections_at_startup(self, make_app, tcp_server):
+        """Test that creating the app connects nothing, so the master stays clean."""
+        flask_app = make_app(
+            WARMUP_ENABLED=False, DEPENDENCY_URLS=f"database=tcp://127.0.0.1:{tcp_server.port}"
+        )
+        assert flask_app.extensions["dependencies"].stats() == {}
+        assert wait_for(lambda: not tcp_server.accepted, timeout=0.1)
@@ -0,0 +1,81 @@
+"""Unit tests for the /api/echo variants."""
+
+import json
+
+
+def post_json(client, path, body, content_type="application/json"):
+    """POST raw bytes to the app."""
+    return client.post(path, data=body, content_type=content_type)
+
+
+class TestEchoLimits:
+    """Test suite for request size limits."""
+
+    def test_oversized_body_rejected(self, app, client):
+        """Test that bodies over MAX_CONTENT_LENGTH get 413."""
+        app.config["MAX_CONTENT_LENGTH"] = 64
+        response = post_json(client, "/api/echo", json.dumps({"x": "a" * 100}))
+        assert response.status_code == 413
+
+
+class TestEchoRawPassthrough:
+    """Test suite for the raw passthrough mode."""
+
+    def test_raw_matches_parsed_echo(self, client):
+        """Test that raw mode echoes the same document as the parsed mode."""
+        body = json.dumps({"test": "data", "nested": {"n": [1, 2.5, None]}})
+        parsed = post_json(client, "/api/echo", body).get_json()
+        raw = post_json(client, "/api/echo?raw=1", body)
+        assert raw.status_code == 200
+        assert raw.get_json()["echo"] == parsed["echo"]
+        assert raw.get_json()["content_type"] == "application/json"
+
+    def test_raw_keeps_original_bytes(self, client):
+        """Test that the body is spliced in without re-serialization."""
+        body = b'{"b": 1,   "a": 2}'
+        response = post_json(client, "/api/echo?raw=1", body)
+        assert body in response.get_data()
+
+    def test_raw_rejects_invalid_json(self, client):
+        """Test that invalid JSON is rejected with 400."""
+        assert post_json(client, "/api/echo?raw=1", b'{"a": ').status_code == 400
+
+    def test_raw_requires_json_content_type(self, client):
+        """Test that non-JSON content types are rejected like get_json does."""
+        response = post_json(client, "/api/echo?raw=1", b"{}", content_type="text/plain")
+        assert response.status_code == 415
+
+    def test_raw_empty_document_becomes_object(self, client):
+        """Test that falsy documents echo as {} like the parsed mode."""
+        assert post_json(client, "/api/echo?raw=1", b"null").get_json()["echo"] == {}
+
+
+class TestEchoStream:
+    """Test suite for the NDJSON streaming echo."""
+
+    def test_records_echoed(self, client):
+        """Test that every record is echoed, including a final unterminated one."""
+        body = b'{"i": 1}\n\n{"i": 2}\n{"i": 3}'
+        response = post_json(client, "/api/echo/stream", body, "application/x-ndjson")
+        assert response.mimetype == "application/x-ndjson"
+        records = [json.loads(line) for line in response.get_data().splitlines()]
+        assert records == [{"i": 1}, {"i": 2}, {"i": 3}]
+
+    def test_large_stream_spans_chunks(self, client):
+        """Test bodies much larger than the read chunk size."""
+        lines = [json.dumps({"i": i, "pad": "x" * 100}).encode() for i in range(5000)]
+        response = post_json(client, "/api/echo/stream", b"\n".join(lines), "application/x-ndjson")
+        assert response.get_data().splitlines() == lines
+
+    def test_invalid_record_reported_in_band(self, client):
+        """Test that a bad record ends the stream with an error record."""
+        body = b'{"i": 1}\nnot json\n{"i": 3}\n'
+        response = post_json(client, "/api/echo/stream", body, "application/x-ndjson")
+        records = [json.loads(line) for line in response.get_data().splitlines()]
+        assert records == [{"i": 1}, {"error": "Invalid JSON on line 2"}]
+
+    def test_stream_limit(self, app, client):
+        """Test that the stream has its own size limit."""
+        app.extensions["runtime_config"].update({"ECHO_STREAM_MAX_BYTES": 16})
+        response = post_json(client, "/api/echo/stream", b'{"i": 1}\n' * 10, "application/x-ndjson")
+        assert response.status_code == 413
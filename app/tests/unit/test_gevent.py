@@ -0,0 +1,128 @@
+"""Unit tests for running the middleware under gevent.
+
+Monkey patching cannot be undone, so each scenario runs in a subprocess.
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip("gevent")
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_patched(script):
+    """Run ``script`` in a gevent-patched interpreter and return its stdout lines."""
+    code = "from gevent import monkey\nmonkey.patch_all()\n" + textwrap.dedent(script)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env=dict(os.environ, LOG_LEVEL="WARNING"),
+    )
+    assert result.returncode == 0, result.stderr
+    return [line for line in result.stdout.splitlines() if line.startswith("RESULT ")]
+
+
+class TestGeventMode:
+    """Test suite for cooperative concurrency."""
+
+    def test_request_context_isolated_per_greenlet(self):
+        """Test that concurrent greenlets never see each other's request IDs."""
+        lines = run_patched(
+            """
+            import time
+            import gevent
+            from flask import g
+            from src.app import create_app
+
+            app = create_app("prod")
+
+            @app.route("/slow")
+            def slow():
+                before = g.request_id
+                time.sleep(0.05)
+                return {"before": before, "after": g.request_id}
+
+            def call(i):
+                response = app.test_client().get("/slow", headers={"X-Request-ID": str(i)})
+                body = response.get_json()
+                return body["before"] == body["after"] == str(i)
+
+            start = time.perf_counter()
+            jobs = [gevent.spawn(call, i) for i in range(50)]
+            gevent.joinall(jobs)
+            elapsed = time.perf_counter() - start
+            print("RESULT", all(job.value for job in jobs), elapsed < 1.0)
+            """
+        )
+        assert lines == ["RESULT True True"]
+
+    def test_health_checks_run_concurrently(self):
+        """Test that slow dependency checks overlap instead of queueing."""
+        lines = run_patched(
+            """
+            import time
+            from src.utils.health_checks import CheckRegistry
+
+            registry = CheckRegistry(max_workers=4)
+            for name in ("a", "b", "c", "d"):
+                registry.register(name, lambda: time.sleep(0.2), timeout=2.0)
+
+            start = time.perf_counter()
+            results = registry.results()
+            elapsed = time.perf_counter() - start
+            print("RESULT", sorted(r.status for r in results.values()), elapsed < 0.6)
+            """
+        )
+        assert lines == ["RESULT ['ok', 'ok', 'ok', 'ok'] True"]
+
+    def test_background_flushers_work(self):
+        """Test that the CloudWatch emitter's flush thread runs as a greenlet."""
+        lines = run_patched(
+            """
+            import time
+            from src.utils.cloudwatch import CloudWatchEmitter
+
+            class Client:
+                calls = 0
+
+                def put_metric_data(self, Namespace, MetricData):
+                    time.sleep(0.01)
+                    Client.calls += 1
+
+            emitter = CloudWatchEmitter(Client, "DemoApp/test", flush_interval=0.05)
+            emitter.record((("Endpoint", "x"),), 1.0)
+            time.sleep(0.3)
+            print("RESULT", Client.calls, emitter.stats()["flushed"])
+            emitter.close()
+            """
+        )
+        assert lines == ["RESULT 1 1"]
+
+
+class TestGunicornConfig:
+    """Test suite for patching from the gunicorn configuration."""
+
+    @pytest.mark.parametrize("prepatched, warned", [(False, True), (True, False)])
+    def test_late_patch_logged(self, prepatched, warned):
+        """Test that loading the config after ssl was imported warns about it."""
+        code = "import ssl\nfrom src import gunicorn_conf\n"
+        if prepatched:
+            code = "from gevent import monkey\nmonkey.patch_all()\n" + code
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+            timeout=60,
+            env=dict(os.environ, WORKER_CLASS="gevent", WORKERS="1"),
+        )
+        assert result.returncode == 0, result.stderr
+        assert ("python -m gevent.monkey" in result.stderr) is warned
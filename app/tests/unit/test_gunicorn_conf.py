@@ -0,0 +1,52 @@
+"""Unit tests for the gunicorn configuration hooks.
+
+Loading ``src/gunicorn_conf.py`` sets process-wide environment variables,
+so each scenario runs in a subprocess.
+"""
+
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ON_EXIT = """
+import os
+from src import gunicorn_conf
+
+names = ("RATE_LIMIT_SHM_PATH", "ROUTE_CACHE_PATH", "RUNTIME_CONFIG_PATH")
+paths = [os.environ[name] for name in names]
+for path in paths + [paths[1] + "-wal"]:
+    open(path, "w").close()
+gunicorn_conf.on_exit(None)
+print("RESULT", *[os.path.exists(path) for path in paths + [paths[1] + "-wal"]])
+"""
+
+
+class TestOnExit:
+    """Test suite for removing shared files on shutdown."""
+
+    def test_operator_paths_kept(self, tmp_path):
+        """Test that only files the config named itself are removed."""
+        operator_path = tmp_path / "ratelimit"
+        env = {
+            key: value
+            for key, value in os.environ.items()
+            if key not in ("ROUTE_CACHE_PATH", "RUNTIME_CONFIG_PATH")
+        }
+        result = subprocess.run(
+            [sys.executable, "-c", ON_EXIT],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+            timeout=60,
+            env=dict(
+                env,
+                WORKERS="2",
+                PROMETHEUS_MULTIPROC_DIR=str(tmp_path / "metrics"),
+                RATE_LIMIT_SHM_PATH=str(operator_path),
+            ),
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ["RESULT", "True", "False", "False", "False"]
+        assert operator_path.exists()
@@ -2,6 +2,8 @@
 
 import json
 
+from src.utils.warmup import warm_up
+
 
 class TestHealthEndpoint:
     """Test suite for /health endpoint."""
@@ -36,8 +38,9 @@ class TestHealthEndpoint:
 class TestReadyEndpoint:
     """Test suite for /health/ready endpoint."""
 
-    def test_ready_endpoint_returns_200(self, client):
+    def test_ready_endpoint_returns_200(self, app, client):
         """Test that ready endpoint returns 200 OK when all checks pass."""
+        warm_up(app)
         response = client.get("/health/ready")
         assert response.status_code == 200
 
@@ -0,0 +1,95 @@
+"""Unit tests for the cached dependency check registry."""
+
+import threading
+import time
+
+from src.utils.health_checks import CheckRegistry
+from src.utils.warmup import warm_up
+
+
+class TestCheckRegistry:
+    """Test suite for CheckRegistry."""
+
+    def test_checks_run_concurrently(self):
+        """Test that slow checks run in parallel on the first probe."""
+        registry = CheckRegistry()
+        for name in ("a", "b", "c"):
+            registry.register(name, lambda: time.sleep(0.2), timeout=2)
+
+        start = time.perf_counter()
+        results = registry.results()
+        assert time.perf_counter() - start < 0.5
+        assert {name: r.status for name, r in results.items()} == {
+            "a": "ok",
+            "b": "ok",
+            "c": "ok",
+        }
+
+    def test_results_cached_within_ttl(self):
+        """Test that probes within the TTL do not rerun checks."""
+        calls = []
+        registry = CheckRegistry()
+        registry.register("db", lambda: calls.append(1), ttl=60)
+        for _ in range(5):
+            registry.results()
+        assert len(calls) == 1
+
+    def test_stale_results_refreshed_in_background(self):
+        """Test that a stale result is served while a refresh runs."""
+        now = [0.0]
+        release = threading.Event()
+        outcomes = iter([True, False])
+        registry = CheckRegistry(clock=lambda: now[0])
+
+        def check():
+            outcome = next(outcomes)
+            if not outcome:
+                release.wait(2)
+            return outcome
+
+        registry.register("db", check, ttl=10, timeout=30)
+        assert registry.results()["db"].status == "ok"
+
+        now[0] = 11.0
+        assert registry.results()["db"].status == "ok"  # cached while refreshing
+        release.set()
+        # refresh() waits for the in-flight run instead of starting another
+        assert registry.refresh()["db"].status == "failed"
+
+    def test_hung_check_reported_as_timeout(self):
+        """Test that a check exceeding its timeout reports a timeout."""
+        release = threading.Event()
+        registry = CheckRegistry()
+        registry.register("db", lambda: release.wait(5), timeout=0.05)
+        result = registry.results()["db"]
+        release.set()
+        assert result.status == "timeout"
+
+    def test_failures_reported(self):
+        """Test that raising or returning False fails a check."""
+        registry = CheckRegistry()
+        registry.register("false", lambda: False)
+        registry.register("raises", lambda: 1 / 0)
+        results = registry.refresh()
+        assert results["false"].status == "failed"
+        assert results["raises"].status == "failed"
+        assert "division" in results["raises"].error
+
+
+class TestReadyEndpointChecks:
+    """Test suite for /health/ready backed by the registry."""
+
+    def test_ready_reports_latency_and_age(self, app, client):
+        """Test that per-check details are included."""
+        warm_up(app)
+        data = client.get("/health/ready").get_json()
+        assert set(data["details"]) == {"database", "cache"}
+        assert {"status", "latency_ms", "age_seconds"} <= set(data["details"]["database"])
+
+    def test_failed_check_makes_not_ready(self, app, client):
+        """Test that a failing dependency degrades readiness."""
+        app.extensions["health_checks"].register("queue", lambda: False)
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.get_json()["status"] == "not_ready"
+        assert response.get_json()["checks"]["queue"] == "failed"
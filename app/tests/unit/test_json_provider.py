@@ -0,0 +1,166 @@
+"""Unit tests for the fast JSON provider."""
+
+import dataclasses
+import decimal
+import json
+import math
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from src.app import create_app
+from src.config import DevelopmentConfig
+from src.utils.json_provider import FastJSONProvider, isoformat, load_backend
+
+
+@dataclasses.dataclass
+class Point:
+    """Dataclass serialized through ``asdict``."""
+
+    x: int
+    y: int
+
+
+def sample():
+    """Return a body with every type the provider handles."""
+    return {
+        "z": [1, 2.5, None, True],
+        "a": {"nested": "value"},
+        "utc": datetime(2024, 1, 2, 3, 4, 5, 678900, tzinfo=timezone.utc),
+        "offset": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=2))),
+        "naive": datetime(2024, 1, 2, 3, 4, 5),
+        "day": date(2024, 1, 2),
+        "amount": decimal.Decimal("1.10"),
+        "id": uuid.UUID(int=1),
+        "point": Point(1, 2),
+    }
+
+
+# Providers only keep a weak reference to their app
+BARE_APP = Flask(__name__)
+
+
+def provider(backend):
+    """Return a provider for ``backend`` on a bare Flask app."""
+    return FastJSONProvider(BARE_APP, backend=backend)
+
+
+class TestBackends:
+    """Test suite for backend selection and output compatibility."""
+
+    def test_auto_prefers_installed_fast_backend(self):
+        """Test that auto picks orjson when installed."""
+        pytest.importorskip("orjson")
+        assert provider("auto").backend == "orjson"
+
+    def test_stdlib_selected(self):
+        """Test that JSON_BACKEND=json uses the standard library."""
+        assert load_backend("json")[0] == "json"
+
+    def test_unknown_backend_rejected(self):
+        """Test that a misspelled backend raises ValueError."""
+        with pytest.raises(ValueError):
+            load_backend("simdjson")
+
+    def test_stdlib_matches_flask(self):
+        """Test that the stdlib backend produces Flask's compact output byte for byte."""
+        flask_provider = DefaultJSONProvider(BARE_APP)
+        flask_provider.compact = True
+        data = {"b": [1, 2.5, None], "a": "café", "n": {"y": 1, "x": 2}}
+        expected = flask_provider.response(data).get_data()
+        assert provider("json").response(data).get_data() == expected
+
+    @pytest.mark.parametrize("backend", ["auto", "json"])
+    def test_types_serialized_alike(self, backend):
+        """Test that every backend writes dates, decimals and dataclasses the same way."""
+        decoded = json.loads(provider(backend).dumps_bytes(sample()))
+        assert decoded["utc"] == "2024-01-02T03:04:05.678900Z"
+        assert decoded["offset"] == "2024-01-02T03:04:05+02:00"
+        assert decoded["naive"] == "2024-01-02T03:04:05"
+        assert decoded["day"] == "2024-01-02"
+        assert decoded["amount"] == "1.10"
+        assert decoded["id"] == str(uuid.UUID(int=1))
+        assert decoded["point"] == {"x": 1, "y": 2}
+
+    def test_fast_and_stdlib_agree(self):
+        """Test that the fast backend's bytes equal the stdlib's for ASCII data."""
+        pytest.importorskip("orjson")
+        assert provider("auto").dumps_bytes(sample()) == provider("json").dumps_bytes(sample())
+
+    def test_rejected_values_fall_back(self):
+        """Test that values beyond the fast backend's range still serialize."""
+        assert json.loads(provider("auto").dumps({"big": 2**70})) == {"big": 2**70}
+        assert json.loads(provider("auto").dumps({2: "b", 1: "a"})) == {"1": "a", "2": "b"}
+
+    def test_loads_like_stdlib(self):
+        """Test that request bodies are parsed exactly as the stdlib parses them."""
+        assert provider("auto").loads('{"n": 1}') == {"n": 1}
+        assert provider("auto").loads("[123456789012345678901234567890]") == [
+            123456789012345678901234567890
+        ]
+        assert math.isnan(provider("auto").loads("[NaN]")[0])
+        with pytest.raises(ValueError):
+            provider("auto").loads("{")
+
+    @pytest.mark.parametrize("backend", ["auto", "json"])
+    def test_round_trip_exact(self, backend):
+        """Test that large integers and non-finite numbers survive parsing and serializing."""
+        text = '{"big":123456789012345678901234567890,"inf":-Infinity,"nan":NaN}'
+        json_provider = provider(backend)
+        assert json_provider.dumps_bytes(json_provider.loads(text)).decode() == text
+
+    def test_isoformat(self):
+        """Test that only a zero UTC offset is written as Z."""
+        assert isoformat(datetime(2024, 1, 1, tzinfo=timezone.utc)) == "2024-01-01T00:00:00Z"
+        assert isoformat(date(2024, 1, 1)) == "2024-01-01"
+
+
+class TestProviderInApp:
+    """Test suite for the provider installed by create_app."""
+
+    def test_responses_compact_in_debug(self, client):
+        """Test that debug mode no longer pretty-prints responses."""
+        assert client.application.debug
+        body = client.get("/api/hello").get_data()
+        assert b"\n " not in body
+        assert body.endswith(b"}\n")
+
+    def test_indented_on_request(self, app):
+        """Test that compact=False still selects indented output."""
+        app.json.compact = False
+        assert b'\n  "message"' in app.test_client().get("/api/hello").get_data()
+
+    def test_view_timestamps_serialized(self, client):
+        """Test that datetimes returned by views come out as ISO 8601 with Z."""
+        timestamp = client.get("/api/hello").get_json()["timestamp"]
+        assert timestamp.endswith("Z")
+        assert datetime.fromisoformat(timestamp[:-1] + "+00:00").tzinfo is not None
+        assert client.get("/health/live").get_json()["timestamp"].endswith("Z")
+
+    @pytest.mark.parametrize("raw", ["0", "1"])
+    def test_echo_round_trip_exact(self, client, raw):
+        """Test that parsed and raw echo modes return large integers and NaN unchanged."""
+        response = client.post(
+            f"/api/echo?raw={raw}",
+            data='{"big": 123456789012345678901234567890, "nan": NaN}',
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+        body = response.get_data(as_text=True)
+        assert "123456789012345678901234567890" in body
+        assert "NaN" in body
+
+    def test_invalid_request_json_rejected(self, client):
+        """Test that malformed request bodies still get 400."""
+        response = client.post("/api/echo", data="{", content_type="application/json")
+        assert response.status_code == 400
+
+    def test_backend_configurable(self, monkeypatch):
+        """Test that JSON_BACKEND selects the provider's backend."""
+        monkeypatch.setattr(DevelopmentConfig, "JSON_BACKEND", "json")
+        app = create_app("dev")
+        assert isinstance(app.json, FastJSONProvider)
+        assert app.json.backend == "json"
@@ -0,0 +1,248 @@
+"""Unit tests for structured logging."""
+
+import io
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from flask import g, request
+
+from src.app import create_app
+from src.config import DevelopmentConfig
+from src.middleware.logging import AsyncLogHandler, JSONFormatter
+from src.utils.batching import BackgroundBatcher
+from src.utils.tracing import current_trace
+
+
+def make_record(msg="hello %s", args=("world",), name="test"):
+    """Build a log record outside any request."""
+    return logging.LogRecord(name, logging.INFO, __file__, 10, msg, args, None)
+
+
+def reference_format(formatter, record):
+    """Format a record the way JSONFormatter did before the fast path."""
+    log_data = {
+        "timestamp": datetime.fromtimestamp(record.created, timezone.utc)
+        .isoformat()
+        .replace("+00:00", "Z"),
+        "level": record.levelname,
+        "logger": record.name,
+        "message": record.getMessage(),
+        "module": record.module,
+        "function": record.funcName,
+        "line": record.lineno,
+    }
+    try:
+        if hasattr(g, "request_id"):
+            log_data["request_id"] = g.request_id
+        if request:
+            log_data["request"] = {
+                "method": request.method,
+                "path": request.path,
+                "remote_addr": request.remote_addr,
+            }
+    except RuntimeError:
+        pass
+    trace = current_trace()
+    if trace is not None:
+        log_data["trace_id"] = trace.trace_id
+        log_data["span_id"] = trace.span_id
+    if record.exc_info:
+        log_data["exception"] = formatter.formatException(record.exc_info)
+    if hasattr(record, "extra_fields"):
+        log_data.update(record.extra_fields)
+    return json.dumps(log_data)
+
+
+def sample_records():
+    """Build records covering messages, extras, exceptions and odd timestamps."""
+    records = [make_record(), make_record("caf\u00e9 %d%%", (5,))]
+    record = make_record()
+    record.extra_fields = {"request_id": "override", "status_code": 200, "path": "/x"}
+    records.append(record)
+    try:
+        raise KeyError("missing")
+    except KeyError:
+        records.append(
+            logging.LogRecord("test", logging.ERROR, __file__, 1, "err", None, sys.exc_info())
+        )
+    for created in (1700000000.0, 1700000000.0000005, 1700000000.9999996):
+        record = make_record()
+        record.created = created
+        records.append(record)
+    return records
+
+
+def make_handler(**kwargs):
+    """Build an async handler writing to an in-memory stream."""
+    stream = io.StringIO()
+    handler = AsyncLogHandler(stream, flush_interval=3600, **kwargs)
+    handler.setFormatter(JSONFormatter())
+    return handler, stream
+
+
+class TestJSONFormatter:
+    """Test suite for JSONFormatter."""
+
+    def test_formats_record_as_json(self):
+        """Test that core fields are present and the timestamp is UTC."""
+        data = json.loads(JSONFormatter().format(make_record()))
+        assert data["message"] == "hello world"
+        assert data["level"] == "INFO"
+        assert data["timestamp"].endswith("Z")
+        assert "request_id" not in data
+
+    def test_includes_extra_fields(self):
+        """Test that extra_fields are merged into the output."""
+        record = make_record()
+        record.extra_fields = {"status_code": 200}
+        assert json.loads(JSONFormatter().format(record))["status_code"] == 200
+
+
+class TestJSONFormatterFastPath:
+    """Test that the optimized formatter is byte-identical to the original."""
+
+    def test_identical_outside_request(self):
+        """Test records logged outside any request."""
+        formatter = JSONFormatter()
+        for record in sample_records():
+            assert formatter.format(record) == reference_format(formatter, record)
+
+    def test_identical_inside_request(self, app):
+        """Test records logged during a request, using the cached context."""
+        formatter = JSONFormatter()
+        with app.test_request_context("/api/hello", headers={"X-Request-ID": "abc"}):
+            app.preprocess_request()
+            assert g.log_context["request_id"] == "abc"
+            for record in sample_records():
+                assert formatter.format(record) == reference_format(formatter, record)
+
+    def test_static_fields_appended(self):
+        """Test that pre-serialized static fields are spliced into each line."""
+        static = {"service": "demo-app", "version": "1.0", "environment": "test"}
+        formatter = JSONFormatter(static_fields=static)
+        record = make_record()
+        data = json.loads(formatter.format(record))
+        assert data == dict(json.loads(reference_format(formatter, record)), **static)
+
+        record.extra_fields = {"version": "override"}
+        assert json.loads(formatter.format(record))["version"] == "override"
+
+    def test_orjson_backend_equivalent(self):
+        """Test that the orjson backend produces the same document."""
+        pytest.importorskip("orjson")
+        formatter = JSONFormatter(backend="orjson")
+        for record in sample_records():
+            expected = json.loads(reference_format(formatter, record))
+            assert json.loads(formatter.format(record)) == expected
+
+
+class TestAsyncLogHandler:
+    """Test suite for the queue-based log pipeline."""
+
+    def test_records_written_in_one_batch(self):
+        """Test that queued records are coalesced into a single write."""
+        handler, stream = make_handler()
+        for i in range(5):
+            handler.handle(make_record("line %d", (i,)))
+        assert stream.getvalue() == ""
+
+        handler.flush()
+        lines = stream.getvalue().splitlines()
+        assert [json.loads(line)["message"] for line in lines] == [f"line {i}" for i in range(5)]
+        assert handler.stats()["written"] == 5
+        handler.close()
+
+    def test_drop_policy_counts_dropped_records(self):
+        """Test that the drop policy discards new records when full."""
+        handler, stream = make_handler(max_queue=2, overflow="drop")
+        for i in range(4):
+            handler.handle(make_record("line %d", (i,)))
+        assert handler.stats() == {"queue_depth": 2, "dropped": 2, "written": 0}
+
+        handler.flush()
+        assert "line 0" in stream.getvalue() and "line 3" not in stream.getvalue()
+        handler.close()
+
+    def test_drop_oldest_policy_keeps_newest(self):
+        """Test that the drop_oldest policy evicts queued records."""
+        handler, stream = make_handler(max_queue=2, overflow="drop_oldest")
+        for i in range(4):
+            handler.handle(make_record("line %d", (i,)))
+        handler.flush()
+
+        messages = [json.loads(line)["message"] for line in stream.getvalue().splitlines()]
+        assert messages == ["line 2", "line 3"]
+        assert handler.stats()["dropped"] == 2
+        handler.close()
+
+    def test_block_policy_never_waits_on_own_flush(self):
+        """Test that records logged while delivering a batch cannot deadlock a full queue."""
+        batcher = None
+
+        def handler(batch):
+            """Resubmit like a failing handler logging through the same queue."""
+            for item in batch:
+                if item == "first":
+                    assert batcher.submit("retry 1") is True
+                    assert batcher.submit("retry 2") is False
+
+        batcher = BackgroundBatcher(handler, "block-test", max_queue=1, overflow="block")
+        batcher.submit("first")
+        flusher = threading.Thread(target=batcher.flush, daemon=True)
+        flusher.start()
+        flusher.join(timeout=5)
+        assert not flusher.is_alive()
+        assert (batcher.depth, batcher.dropped, batcher.processed) == (0, 1, 2)
+        batcher.close()
+
+    def test_exception_rendered_before_queueing(self):
+        """Test that tracebacks are rendered and released on the emitting thread."""
+        handler, stream = make_handler()
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("async-test").addHandler(handler)
+            logging.getLogger("async-test").exception("failed")
+            logging.getLogger("async-test").removeHandler(handler)
+        handler.flush()
+
+        data = json.loads(stream.getvalue())
+        assert "ValueError: boom" in data["exception"]
+        handler.close()
+
+    def test_forked_child_starts_with_empty_queue(self):
+        """Test that a forked worker does not re-emit the parent's records."""
+        handler, _ = make_handler()
+        handler.handle(make_record())
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child
+            os.write(write_fd, str(handler.stats()["queue_depth"]).encode())
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert os.read(read_fd, 16) == b"0"
+        assert handler.stats()["queue_depth"] == 1
+        handler.close()
+
+    def test_request_context_captured_on_request_thread(self, monkeypatch, capsys):
+        """Test that request fields survive formatting on the writer thread."""
+        monkeypatch.setattr(DevelopmentConfig, "LOG_ASYNC", True)
+        app = create_app("dev")
+        pipeline = app.extensions["log_pipeline"]
+
+        app.test_client().get("/api/hello", headers={"X-Request-ID": "req-123"})
+        pipeline.flush()
+
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        (access,) = [line for line in lines if line.get("path") == "/api/hello"]
+        assert access["request_id"] == "req-123"
+        assert access["request"]["method"] == "GET"
+        assert "log_pipeline_written_total" in app.test_client().get("/metrics").get_data(
+            as_text=True
+        )
+        pipeline.close()
@@ -0,0 +1,247 @@
+"""Unit tests for worker memory telemetry, allocation tracing and recycling."""
+
+import gc
+import os
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils.memory import GCTimer, MemoryMonitor, read_rss, recycle_worker
+
+AUTH = {"Authorization": "Bearer s3cret"}
+MB = 1024 * 1024
+
+
+class FakeClock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self):
+        """Start at zero."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+class FakeRSS:
+    """RSS reading set by the test."""
+
+    def __init__(self, value):
+        """Start at ``value`` bytes."""
+        self.value = value
+
+    def __call__(self):
+        """Return the current reading."""
+        return self.value
+
+
+@pytest.fixture
+def traced_app(make_app):
+    """Return the dev app with allocation tracing allowed; stops tracing afterwards."""
+    yield make_app(
+        WARMUP_ENABLED=False,
+        ENABLE_DEBUG_ENDPOINTS=True,
+        DEBUG_TOKEN="s3cret",
+        MEMORY_TRACE_ENABLED=True,
+    )
+    tracemalloc.stop()
+
+
+class TestSampling:
+    """Test suite for memory samples and GC timing."""
+
+    def test_rss_follows_allocations(self):
+        """Test that RSS grows with memory the process touches."""
+        before = read_rss()
+        block = b"x" * (64 * MB)
+        assert read_rss() - before > 32 * MB
+        del block
+
+    def test_sample_fields(self):
+        """Test that a sample has RSS, allocator blocks and GC generation counts."""
+        sample = MemoryMonitor(timer=GCTimer()).sample()
+        assert sample["rss_bytes"] > 0
+        assert sample["python_blocks"] > 0
+        assert len(sample["gc_objects"]) == len(gc.get_count())
+
+    def test_gc_pauses_timed(self):
+        """Test that collections are timed per generation and drained once."""
+        timer = GCTimer()
+        timer("start", {"generation": 2})
+        timer("stop", {"generation": 2, "collected": 0, "uncollectable": 0})
+        timer("stop", {"generation": 0, "collected": 0, "uncollectable": 0})
+        assert timer.collections[2] == 1 and timer.collections[0] == 0
+        pauses = timer.drain()
+        assert [generation for generation, _ in pauses] == [2]
+        assert pauses[0][1] >= 0
+        assert timer.drain() == []
+
+    def test_gc_history_reset_after_fork(self):
+        """Test that forked workers do not inherit the master's GC history."""
+        timer = GCTimer()
+        timer("start", {"generation": 0})
+        timer("stop", {"generation": 0})
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child
+            os.write(write_end, b"1" if timer.collections[0] == 0 else b"0")
+            os._exit(0)
+        os.close(write_end)
+        result = os.read(read_end, 1)
+        os.waitpid(pid, 0)
+        os.close(read_end)
+        assert result == b"1"
+        assert timer.collections[0] == 1
+
+    def test_timer_installed_once(self):
+        """Test that installing twice registers a single callback."""
+        timer = GCTimer()
+        try:
+            timer.install()
+            timer.install()
+            assert gc.callbacks.count(timer) == 1
+            gc.collect()
+            assert timer.collections[2] >= 1
+        finally:
+            gc.callbacks.remove(timer)
+
+    def test_sampling_rate_limited(self):
+        """Test that check samples at most once per interval unless forced."""
+        clock, rss = FakeClock(), FakeRSS(100)
+        monitor = MemoryMonitor(interval=1.0, rss=rss, timer=GCTimer(), clock=clock)
+        monitor.check()
+        rss.value = 200
+        monitor.check()
+        assert monitor.last["rss_bytes"] == 100
+        clock.now = 1.0
+        monitor.check()
+        assert monitor.last["rss_bytes"] == 200
+
+
+class TestRecycling:
+    """Test suite for RSS-based recycling."""
+
+    def test_threshold_jittered_below_budget(self):
+        """Test that workers draw different thresholds within the jitter."""
+        thresholds = {
+            MemoryMonitor(budget_bytes=100 * MB, jitter=0.2, timer=GCTimer()).threshold
+            for _ in range(20)
+        }
+        assert len(thresholds) > 1
+        assert all(80 * MB <= threshold <= 100 * MB for threshold in thresholds)
+        assert MemoryMonitor(timer=GCTimer()).threshold is None
+
+    def test_recycle_due_over_threshold(self, caplog):
+        """Test that passing the threshold flags the worker once and logs it."""
+        clock, rss = FakeClock(), FakeRSS(50 * MB)
+        monitor = MemoryMonitor(
+            budget_bytes=100 * MB, jitter=0, rss=rss, timer=GCTimer(), clock=clock
+        )
+        assert not monitor.check()
+        rss.value = 100 * MB
+        assert not monitor.check()  # Not sampled again yet
+        clock.now = 1.0
+        assert monitor.check()
+        assert monitor.stats()["recycle_due"]
+        warnings = [r for r in caplog.records if "memory threshold" in r.getMessage()]
+        assert len(warnings) == 1
+
+    def test_forked_worker_draws_own_threshold(self, monkeypatch):
+        """Test that a new process resets the flag and draws a new threshold."""
+        monitor = MemoryMonitor(budget_bytes=100 * MB, rss=FakeRSS(200 * MB), timer=GCTimer())
+        assert monitor.check()
+        monkeypatch.setattr(monitor, "_pid", -1)
+        monkeypatch.setattr("random.uniform", lambda low, high: high)
+        assert monitor.stats()["recycle_due"] is False
+        assert monitor.threshold == 90 * MB
+
+    def test_recycle_worker_stops_gunicorn_worker(self, make_app):
+        """Test that the post_request hook stops a worker over its threshold."""
+        flask_app = make_app(WARMUP_ENABLED=False, MEMORY_RECYCLE_RSS_MB=1)
+        worker = SimpleNamespace(wsgi=flask_app, alive=True)
+        assert not recycle_worker(worker)
+        flask_app.test_client().get("/api/hello")
+        assert recycle_worker(worker)
+        assert worker.alive is False
+        assert not recycle_worker(worker)
+
+    def test_recycle_off_by_default(self, app):
+        """Test that without a budget no worker is ever recycled."""
+        app.test_client().get("/api/hello")
+        assert app.extensions["memory_monitor"].threshold is None
+        assert not recycle_worker(SimpleNamespace(wsgi=app, alive=True))
+        assert not recycle_worker(SimpleNamespace(wsgi=object(), alive=True))
+
+
+class TestMetrics:
+    """Test suite for the exported memory metrics."""
+
+    def test_exported_on_metrics(self, make_app):
+        """Test that memory, GC and recycling metrics appear after a request."""
+        flask_app = make_app(WARMUP_ENABLED=False, MEMORY_RECYCLE_RSS_MB=1, MEMORY_RECYCLE_JITTER=0)
+        client = flask_app.test_client()
+        client.get("/api/hello")
+        gc.collect()
+        flask_app.extensions["memory_monitor"].check(force=True)
+        body = client.get("/metrics").get_data(as_text=True)
+        assert "worker_memory_rss_bytes " in body
+        assert "worker_memory_python_blocks " in body
+        assert "worker_memory_recycle_threshold_bytes 1.048576e+06" in body
+        assert 'worker_gc_objects{generation="0"}' in body
+        assert 'worker_gc_pause_seconds_count{generation="2"}' in body
+        assert "worker_memory_recycles_total 1.0" in body
+
+    def test_monitor_without_metrics(self, make_app):
+        """Test that recycling works with metrics disabled, and nothing is set up otherwise."""
+        flask_app = make_app(WARMUP_ENABLED=False, ENABLE_METRICS=False, MEMORY_RECYCLE_RSS_MB=1)
+        assert flask_app.extensions["memory_monitor"].metrics is None
+        assert "memory_monitor" not in make_app(MEMORY_RECYCLE_RSS_MB=0).extensions
+
+
+class TestDebugEndpoints:
+    """Test suite for /debug/memory."""
+
+    def test_memory_status(self, traced_app):
+        """Test that the worker's figures are reported."""
+        data = traced_app.test_client().get("/debug/memory", headers=AUTH).get_json()
+        assert data["pid"] == os.getpid()
+        assert data["rss_bytes"] > 0
+        assert len(data["gc_collections"]) == len(gc.get_count())
+        assert data["tracemalloc"] == {"tracing": False}
+
+    def test_trace_reports_growing_sites(self, traced_app):
+        """Test that a diff points at the line that allocated since the baseline."""
+        client = traced_app.test_client()
+        response = client.post("/debug/memory/trace", headers=AUTH)
+        assert response.status_code == 202
+        assert response.get_json()["tracing"] is True
+
+        retained = [bytearray(1024) for _ in range(2000)]  # The growing site
+        data = client.get("/debug/memory/trace?diff=true&limit=5", headers=AUTH).get_json()
+        top = data["sites"][0]
+        assert top["site"][0]["filename"] == __file__
+        assert top["size_diff_bytes"] >= 2000 * 1024
+        assert len(retained) == 2000
+
+        data = client.get("/debug/memory/trace?group_by=filename", headers=AUTH).get_json()
+        assert data["sites"] and "size_diff_bytes" not in data["sites"][0]
+
+        assert client.delete("/debug/memory/trace", headers=AUTH).get_json() == {"tracing": False}
+        assert not tracemalloc.is_tracing()
+
+    def test_trace_needs_start(self, traced_app):
+        """Test that sites are refused until tracing is started."""
+        client = traced_app.test_client()
+        assert client.get("/debug/memory/trace", headers=AUTH).status_code == 409
+        response = client.get("/debug/memory/trace?group_by=module", headers=AUTH)
+        assert response.status_code == 400
+
+    def test_trace_guarded(self, traced_app, make_app):
+        """Test that tracing needs the token, and is off without MEMORY_TRACE_ENABLED."""
+        assert traced_app.test_client().post("/debug/memory/trace").status_code == 403
+        flask_app = make_app(ENABLE_METRICS=False, MEMORY_TRACE_ENABLED=False)
+        client = flask_app.test_client()
+        assert client.post("/debug/memory/trace", headers=AUTH).status_code == 404
+        assert client.get("/debug/memory", headers=AUTH).status_code == 404
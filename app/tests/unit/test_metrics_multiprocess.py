@@ -0,0 +1,162 @@
+"""Unit tests for Prometheus multiprocess mode.
+
+``prometheus_client`` picks its storage when first imported, so each
+scenario runs in a subprocess with ``PROMETHEUS_MULTIPROC_DIR`` set.
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FORKED_WORKERS = """
+    import os
+    from types import SimpleNamespace
+
+    from prometheus_client.parser import text_string_to_metric_families
+
+    from src import gunicorn_conf
+    from src.app import create_app
+
+
+    def scrape():
+        body = create_app("prod").test_client().get("/metrics").get_data(as_text=True)
+        return {
+            (sample.name, sample.labels.get("path") or sample.labels.get("route")): sample.value
+            for family in text_string_to_metric_families(body)
+            for sample in family.samples
+        }
+
+
+    pids = []
+    for worker in range(3):
+        pid = os.fork()
+        if pid == 0:
+            app = create_app("prod")
+            client = app.test_client()
+            for _ in range(worker + 1):
+                client.get("/api/hello")
+            app.extensions["log_pipeline"].flush()
+            app.extensions["metrics_stats_bridge"].refresh(force=True)
+            app.extensions["latency_quantiles"].write_snapshot(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+            os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    before = scrape()
+    for pid in pids:
+        gunicorn_conf.child_exit(None, SimpleNamespace(pid=pid))
+    after = scrape()
+
+    key = ("flask_http_request_duration_seconds_count", "/api/hello")
+    print("RESULT", before[key], after[key])
+    print("RESULT", before[("log_pipeline_written_total", None)] > 0)
+    print("RESULT", after.get(("log_pipeline_written_total", None), 0.0))
+    key = ("http_request_latency_window_seconds_count", "/api/hello")
+    print("RESULT", before[key], after.get(key, 0.0))
+"""
+
+
+PRELOADED_WORKERS = """
+    import os
+
+    from prometheus_client.parser import text_string_to_metric_families
+
+    from src import gunicorn_conf  # noqa: F401, prepares the metrics directory
+    from src.app import create_app, init_worker
+    from src.utils.warmup import warm_up
+
+    # What gunicorn does with preload_app: create and warm up in the master
+    app = create_app("prod")
+    warm_up(app)
+    pids = []
+    for worker in range(2):
+        pid = os.fork()
+        if pid == 0:
+            init_worker(app)
+            client = app.test_client()
+            for _ in range(worker + 1):
+                client.get("/api/hello")
+            os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    body = app.test_client().get("/metrics").get_data(as_text=True)
+    samples = {
+        (sample.name, sample.labels.get("path")): sample.value
+        for family in text_string_to_metric_families(body)
+        for sample in family.samples
+    }
+    print("RESULT", samples[("flask_http_request_duration_seconds_count", "/api/hello")])
+    print("RESULT", samples.get(("flask_http_request_duration_seconds_count", "/"), 0.0))
+    print("RESULT", samples[("app_info", None)])
+"""
+
+SNAPSHOT_WRITER = """
+    import threading
+
+    from src.app import create_app
+
+    app = create_app("prod")
+    latency = app.extensions["latency_quantiles"]
+    threads = []
+    write_snapshot = latency.write_snapshot
+
+
+    def record_thread(directory):
+        threads.append(threading.current_thread())
+        write_snapshot(directory)
+
+
+    latency.write_snapshot = record_thread
+    app.test_client().get("/api/hello")
+    app.extensions["latency_snapshot_writer"].close()
+    print("RESULT", len(threads), threading.main_thread() in threads)
+"""
+
+
+def run_script(script, tmp_path):
+    """Run ``script`` with a fresh multiprocess directory and return its result lines."""
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script)],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env=dict(
+            os.environ,
+            PROMETHEUS_MULTIPROC_DIR=str(tmp_path),
+            LOG_ASYNC="true",
+            LOG_LEVEL="WARNING",
+        ),
+    )
+    assert result.returncode == 0, result.stderr
+    return [line for line in result.stdout.splitlines() if line.startswith("RESULT ")]
+
+
+class TestMultiprocessMetrics:
+    """Test suite for metrics aggregated across worker processes."""
+
+    def test_counts_summed_across_forked_workers(self, tmp_path):
+        """Test that /metrics sums all workers and drops dead workers' live state."""
+        lines = run_script(FORKED_WORKERS, tmp_path)
+        # Workers made 1 + 2 + 3 requests; counters outlive their workers
+        # Latency sketches are merged while their workers are alive
+        assert lines == ["RESULT 6.0 6.0", "RESULT True", "RESULT 0.0", "RESULT 6.0 0.0"]
+
+    def test_preloaded_app_counts_only_worker_traffic(self, tmp_path):
+        """Test that a preloaded, warmed-up app keeps warm-up out of the metrics."""
+        lines = run_script(PRELOADED_WORKERS, tmp_path)
+        # Workers made 1 + 2 requests; the warm-up requests of the master and
+        # of each worker are not counted, and app_info set in the master survives
+        assert lines == ["RESULT 3.0", "RESULT 0.0", "RESULT 1.0"]
+
+    def test_latency_snapshots_written_off_request_thread(self, tmp_path):
+        """Test that a due latency snapshot is written by the background writer."""
+        lines = run_script(SNAPSHOT_WRITER, tmp_path)
+        assert lines == ["RESULT 1 False"]
+        assert any(name.startswith("latency") for name in os.listdir(tmp_path))
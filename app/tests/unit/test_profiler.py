@@ -0,0 +1,182 @@
+"""Unit tests for the sampling profiler and /debug/profile."""
+
+import os
+import signal
+import sys
+import threading
+import time
+
+import pytest
+
+from src.utils.profiler import TRUNCATED, SamplingRun, StackSampler
+
+AUTH = {"Authorization": "Bearer s3cret"}
+
+
+# Settings that enable the profiler endpoints
+PROFILED = {"ENABLE_DEBUG_ENDPOINTS": True, "DEBUG_TOKEN": "s3cret", "PROFILER_ENABLED": True}
+
+
+def spin_until(event):
+    """Keep a thread busy in Python code until ``event`` is set."""
+    while not event.is_set():
+        time.sleep(0.001)
+
+
+class TestStackSampler:
+    """Test suite for StackSampler."""
+
+    def test_collapsed_format(self):
+        """Test that stacks are root-first, named after the thread, and counted."""
+        sampler = StackSampler()
+        frame = sys._getframe()
+        sampler.sample({1: frame}, {1: "worker"})
+        sampler.sample({1: frame}, {1: "worker"})
+
+        ((line),) = sampler.collapsed().splitlines()
+        stack, count = line.rsplit(" ", 1)
+        assert count == "2"
+        assert stack.startswith("worker;")
+        line_no = frame.f_code.co_firstlineno
+        assert stack.endswith(f";test_collapsed_format (test_profiler.py:{line_no})")
+
+    def test_bounded(self):
+        """Test that stack depth and distinct stacks are capped."""
+        sampler = StackSampler(max_stacks=2, max_depth=3)
+        for key in ("a", "b", "c", "d"):
+            sampler.add(key)
+        assert sampler.counts == {"a": 1, "b": 1, TRUNCATED: 2}
+
+        sampler = StackSampler(max_depth=1)
+        sampler.sample({1: sys._getframe()}, {})
+        ((stack),) = sampler.counts
+        assert stack.split(";")[:2] == ["thread-1", "..."]
+
+
+class TestSamplingRun:
+    """Test suite for SamplingRun."""
+
+    def test_stop_does_not_wait_for_interval(self):
+        """Test that stopping wakes a run sleeping through a long interval."""
+        run = SamplingRun(StackSampler(), interval=30.0)
+        run.start()
+        while not run.sampler.samples:
+            time.sleep(0.001)
+        started = time.monotonic()
+        assert run.stop(timeout=5.0)
+        assert time.monotonic() - started < 5.0
+
+
+class TestProfileEndpoint:
+    """Test suite for /debug/profile."""
+
+    def test_disabled_by_default(self, make_app):
+        """Test that the profiler needs PROFILER_ENABLED and a debug token."""
+        app = make_app(ENABLE_DEBUG_ENDPOINTS=True)
+        assert app.test_client().get("/debug/profile").status_code == 403
+        assert "profiler" not in app.extensions
+
+        app = make_app(DEBUG_TOKEN="s3cret", ENABLE_METRICS=False)
+        headers = {"Authorization": "Bearer s3cret"}
+        assert app.test_client().get("/debug/profile", headers=headers).status_code == 404
+        assert "profiler" not in app.extensions
+
+    def test_requires_token(self, make_app):
+        """Test that unauthenticated requests are rejected."""
+        client = make_app(**PROFILED).test_client()
+        assert client.get("/debug/profile?seconds=0.05").status_code == 403
+
+    def test_samples_other_threads(self, make_app):
+        """Test that a busy thread shows up in the collapsed stacks."""
+        client = make_app(**PROFILED).test_client()
+        stop = threading.Event()
+        thread = threading.Thread(target=spin_until, args=(stop,), name="spinner")
+        thread.start()
+        try:
+            response = client.get("/debug/profile?seconds=0.2&interval_ms=2", headers=AUTH)
+        finally:
+            stop.set()
+            thread.join()
+
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+        assert int(response.headers["X-Profile-Samples"]) > 0
+        assert "spinner;" in response.get_data(as_text=True)
+        assert "spin_until (test_profiler.py" in response.get_data(as_text=True)
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "seconds=x",
+            "seconds=0",
+            "seconds=1000",
+            "interval_ms=0",
+            "seconds=0.1&interval_ms=1000",
+        ],
+    )
+    def test_invalid_arguments(self, make_app, query):
+        """Test that out-of-range durations and intervals are rejected."""
+        client = make_app(**PROFILED).test_client()
+        assert client.get(f"/debug/profile?{query}", headers=AUTH).status_code == 400
+
+    def test_one_profile_at_a_time(self, make_app):
+        """Test that a concurrent whole-worker profile is refused."""
+        app = make_app(**PROFILED)
+        profiler = app.extensions["profiler"]
+        profiler._busy.acquire()
+        try:
+            response = app.test_client().get("/debug/profile?seconds=0.05", headers=AUTH)
+        finally:
+            profiler._busy.release()
+        assert response.status_code == 409
+
+
+class TestRequestProfile:
+    """Test suite for profiling every Nth request."""
+
+    def test_every_nth_request(self, make_app):
+        """Test that only due requests are sampled, up to the count."""
+        app = make_app(**PROFILED, PROFILER_INTERVAL_MS=1)
+
+        @app.route("/slow")
+        def slow():
+            """Take long enough to be sampled."""
+            time.sleep(0.02)
+            return {"ok": True}
+
+        client = app.test_client()
+        assert client.get("/debug/profile/requests", headers=AUTH).status_code == 404
+        armed = client.post("/debug/profile/requests?every=2&count=2", headers=AUTH)
+        assert armed.status_code == 202
+        for _ in range(6):
+            client.get("/slow")
+
+        response = client.get("/debug/profile/requests", headers=AUTH)
+        assert response.headers["X-Profile-Requests"] == "2/2"
+        assert "slow (test_profiler.py" in response.get_data(as_text=True)
+        status, _ = app.extensions["profiler"].request_status()
+        assert (status["seen"], status["profiled"]) == (4, 2)
+
+
+class TestSignalProfile:
+    """Test suite for signal-triggered profiles."""
+
+    def test_signal_writes_folded_file(self, make_app, tmp_path):
+        """Test that the configured signal writes a profile to the output dir."""
+        previous = signal.getsignal(signal.SIGUSR2)
+        try:
+            make_app(
+                **PROFILED,
+                PROFILER_SIGNAL="SIGUSR2",
+                PROFILER_SIGNAL_SECONDS=0.1,
+                PROFILER_OUTPUT_DIR=str(tmp_path),
+            )
+            os.kill(os.getpid(), signal.SIGUSR2)
+            deadline = time.monotonic() + 5
+            while not list(tmp_path.glob("*.folded")) and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            signal.signal(signal.SIGUSR2, previous)
+
+        (path,) = tmp_path.glob("*.folded")
+        assert path.name.startswith(f"profile-{os.getpid()}-")
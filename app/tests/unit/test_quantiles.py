@@ -0,0 +1,149 @@
+"""Unit tests for streaming latency quantiles."""
+
+import random
+import tracemalloc
+
+from src.app import create_app
+from src.config import DevelopmentConfig
+from src.utils.quantiles import LatencyQuantiles, LogMapping
+
+
+class FakeClock:
+    """Settable wall clock."""
+
+    def __init__(self, now=1_700_000_000.0):
+        """Start the clock at ``now``."""
+        self.now = now
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+class TestLogMapping:
+    """Test suite for the log-bucket mapping."""
+
+    def test_values_within_relative_accuracy(self):
+        """Test that every bucket's representative is within the accuracy bound."""
+        mapping = LogMapping(relative_accuracy=0.02)
+        rand = random.Random(1)
+        for _ in range(10000):
+            value = 10 ** rand.uniform(-2, 4)
+            assert abs(mapping.value(mapping.index(value)) - value) / value <= 0.02 + 1e-9
+
+    def test_out_of_range_values_clamped(self):
+        """Test that tiny and huge values land in the edge buckets."""
+        mapping = LogMapping()
+        assert mapping.index(0.0) == 0
+        assert mapping.index(1e12) == mapping.size - 1
+
+
+class TestLatencyQuantiles:
+    """Test suite for LatencyQuantiles."""
+
+    def test_quantiles_match_exact_values(self):
+        """Test that sketch quantiles are within 2% of the exact ones."""
+        latency = LatencyQuantiles(clock=FakeClock())
+        rand = random.Random(2)
+        values = sorted(rand.lognormvariate(0, 1) for _ in range(20000))
+        for value in values:
+            latency.record("/api/hello", 200, value)
+
+        summary = latency.summaries()[("/api/hello", "2xx")]["1m"]
+        assert summary["count"] == len(values)
+        for q, estimate in summary["quantiles"].items():
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(estimate - exact) / exact <= 0.03
+
+    def test_windows_slide(self):
+        """Test that old requests leave the short windows first."""
+        clock = FakeClock()
+        latency = LatencyQuantiles(clock=clock)
+        latency.record("/api/hello", 200, 100.0)
+        clock.now += 400
+        latency.record("/api/hello", 200, 1.0)
+
+        windows = latency.summaries()[("/api/hello", "2xx")]
+        assert windows["1m"]["count"] == 1
+        assert windows["5m"]["count"] == 1
+        assert windows["15m"]["count"] == 2
+
+        clock.now += 1000
+        assert latency.summaries() == {}
+
+    def test_series_by_status_class(self):
+        """Test that status classes are kept apart."""
+        latency = LatencyQuantiles(clock=FakeClock())
+        latency.record("/api/echo", 200, 1.0)
+        latency.record("/api/echo", 415, 1.0)
+        assert set(latency.summaries()) == {("/api/echo", "2xx"), ("/api/echo", "4xx")}
+
+    def test_snapshots_merge_across_workers(self, tmp_path):
+        """Test that published snapshots of other processes are merged in."""
+        clock = FakeClock()
+        worker, scraper = LatencyQuantiles(clock=clock), LatencyQuantiles(clock=clock)
+        for _ in range(3):
+            worker.record("/api/hello", 200, 5.0)
+        scraper.record("/api/hello", 200, 50.0)
+
+        snapshots = [worker.snapshot()]
+        summary = scraper.summaries(snapshots)[("/api/hello", "2xx")]["1m"]
+        assert summary["count"] == 4
+        assert abs(summary["quantiles"][0.5] - 5.0) <= 0.1
+
+        scraper.write_snapshot(tmp_path)
+        assert scraper.read_snapshots(tmp_path) == []
+
+    def test_record_does_not_allocate(self):
+        """Test that steady-state recording keeps no new memory."""
+        latency = LatencyQuantiles(clock=FakeClock())
+        latency.record("/api/hello", 200, 1.0)
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for i in range(10000):
+            latency.record("/api/hello", 200, 0.5 + i % 100)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        growth = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+        assert growth < 4096
+
+
+class TestLatencyEndpoints:
+    """Test suite for exporting the sketches."""
+
+    def test_metrics_summary(self):
+        """Test that /metrics carries windowed quantiles per route."""
+        client = create_app("dev").test_client()
+        client.get("/api/hello")
+        body = client.get("/metrics").get_data(as_text=True)
+        assert "# TYPE http_request_latency_window_seconds summary" in body
+        assert (
+            'http_request_latency_window_seconds{quantile="0.99",route="/api/hello",'
+            'status_class="2xx",window="1m"}' in body
+        )
+
+    def test_debug_endpoint_disabled_by_default(self, client):
+        """Test that /debug/latency is opt-in."""
+        assert client.get("/debug/latency").status_code == 404
+
+    def test_debug_endpoint_requires_token(self, monkeypatch):
+        """Test that /debug/latency reports merged quantiles behind the token."""
+        monkeypatch.setattr(DevelopmentConfig, "ENABLE_DEBUG_ENDPOINTS", True)
+        monkeypatch.setattr(DevelopmentConfig, "DEBUG_TOKEN", "secret")
+        client = create_app("dev").test_client()
+        client.get("/health/live")
+        assert client.get("/debug/latency").status_code == 403
+
+        response = client.get("/debug/latency", headers={"Authorization": "Bearer secret"})
+        assert response.status_code == 200
+        (entry,) = [e for e in response.get_json()["windows"]["1m"] if e["route"] == "/health/live"]
+        assert entry["count"] == 1
+        assert entry["p99.9_ms"] > 0
+
+    def test_debug_endpoint_closed_without_token(self, monkeypatch):
+        """Test that /debug/latency is refused when no token is configured."""
+        monkeypatch.setattr(DevelopmentConfig, "ENABLE_DEBUG_ENDPOINTS", True)
+        monkeypatch.setattr(DevelopmentConfig, "DEBUG_TOKEN", "")
+        client = create_app("dev").test_client()
+        assert client.get("/debug/latency").status_code == 403
+        assert client.get("/debug/latency", headers={"Authorization": "Bearer "}).status_code == 403
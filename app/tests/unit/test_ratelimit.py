@@ -0,0 +1,181 @@
+"""Unit tests for per-client rate limiting."""
+
+import os
+
+import pytest
+
+from src.utils.ratelimit import SharedTokenBuckets, parse_rate_rules
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        """Start at an arbitrary time."""
+        self.now = 1000.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+class TestRules:
+    """Test suite for per-route limit parsing."""
+
+    def test_parse_rules(self):
+        """Test that rules map routes to rate and burst."""
+        assert parse_rate_rules(" /api/echo=5:10, /api/hello=0:0 ,") == {
+            "/api/echo": (5.0, 10.0),
+            "/api/hello": (0.0, 0.0),
+        }
+
+    @pytest.mark.parametrize(
+        "spec", ["/api/echo", "/api/echo=5", "/api/echo=x:1", "/a=-1:5", "/a=5:0"]
+    )
+    def test_invalid_rules_rejected(self, spec):
+        """Test that malformed or out-of-range rules raise ValueError."""
+        with pytest.raises(ValueError):
+            parse_rate_rules(spec)
+
+
+class TestSharedTokenBuckets:
+    """Test suite for the shared bucket table."""
+
+    def test_burst_then_refill(self):
+        """Test that a bucket allows its burst, then refills at the rate."""
+        clock = FakeClock()
+        buckets = SharedTokenBuckets(slots=16, clock=clock)
+        assert [buckets.take("a", rate=2, burst=3)[0] for _ in range(3)] == [True] * 3
+
+        allowed, retry_after = buckets.take("a", rate=2, burst=3)
+        assert not allowed
+        assert retry_after == pytest.approx(0.5)
+
+        clock.now += 0.5
+        assert buckets.take("a", rate=2, burst=3) == (True, 0.0)
+        # Other keys have their own bucket
+        assert buckets.take("b", rate=2, burst=3) == (True, 0.0)
+        buckets.close()
+
+    def test_refill_capped_at_burst(self):
+        """Test that an idle bucket holds at most ``burst`` tokens."""
+        clock = FakeClock()
+        buckets = SharedTokenBuckets(slots=16, clock=clock)
+        buckets.take("a", rate=1, burst=2)
+        clock.now += 3600
+        results = [buckets.take("a", rate=1, burst=2)[0] for _ in range(3)]
+        assert results == [True, True, False]
+        buckets.close()
+
+    def test_least_recently_used_evicted(self):
+        """Test that a full group evicts its least recently updated bucket."""
+        clock = FakeClock()
+        buckets = SharedTokenBuckets(slots=1, clock=clock)
+        assert buckets.groups == 1
+        for i in range(8):
+            clock.now += 1
+            buckets.take(f"client-{i}", rate=0.001, burst=1)
+        clock.now += 1
+        # A ninth key replaces client-0, which starts over with a full bucket
+        assert buckets.take("client-8", rate=0.001, burst=1)[0]
+        assert buckets.take("client-0", rate=0.001, burst=1)[0]
+        assert not buckets.take("client-8", rate=0.001, burst=1)[0]
+        buckets.close()
+
+    def test_shared_through_file(self, tmp_path):
+        """Test that tables mapping the same file share buckets."""
+        path = str(tmp_path / "buckets")
+        first = SharedTokenBuckets(slots=16, path=path)
+        second = SharedTokenBuckets(slots=16, path=path)
+        assert first.take("a", rate=0.001, burst=1)[0]
+        assert not second.take("a", rate=0.001, burst=1)[0]
+        first.close()
+        second.close()
+
+    def test_shared_with_forked_workers(self):
+        """Test that forked workers draw from the parent's buckets."""
+        buckets = SharedTokenBuckets(slots=16)
+        pids = []
+        for _ in range(4):
+            pid = os.fork()
+            if pid == 0:
+                allowed = sum(buckets.take("a", rate=0.001, burst=10)[0] for _ in range(5))
+                os._exit(allowed)
+            pids.append(pid)
+        allowed = sum(os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) for pid in pids)
+        assert allowed == 10
+        assert not buckets.take("a", rate=0.001, burst=10)[0]
+        buckets.close()
+
+
+@pytest.fixture
+def limited(make_app):
+    """Return a test client limited to 2 requests per client."""
+    return make_app(
+        RATE_LIMIT_ENABLED=True,
+        RATE_LIMIT_RATE=0.001,
+        RATE_LIMIT_BURST=2,
+        RATE_LIMIT_RULES="/api/echo=0.001:5,/api/info=0:0",
+        RATE_LIMIT_KEY_HEADER="X-API-Key",
+    ).test_client()
+
+
+def statuses(client, path, count, **kwargs):
+    """Return the status codes of ``count`` GET requests to ``path``."""
+    return [client.get(path, **kwargs).status_code for _ in range(count)]
+
+
+class TestRateLimitMiddleware:
+    """Test suite for the rate limiting hook."""
+
+    def test_over_limit_gets_429(self, limited):
+        """Test that requests over the burst get 429 with Retry-After."""
+        assert statuses(limited, "/api/hello", 2) == [200, 200]
+        response = limited.get("/api/hello")
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert response.get_json()["retry_after"] == int(response.headers["Retry-After"])
+
+    def test_health_and_metrics_exempt(self, limited):
+        """Test that probes and scrapes are never limited."""
+        assert set(statuses(limited, "/health", 5)) == {200}
+        assert set(statuses(limited, "/metrics", 5)) == {200}
+
+    def test_forwarded_for_keys_clients(self, limited):
+        """Test that clients behind the ALB are told apart by X-Forwarded-For."""
+        first = {"X-Forwarded-For": "spoofed, 203.0.113.1"}
+        second = {"X-Forwarded-For": "203.0.113.2"}
+        assert statuses(limited, "/api/hello", 3, headers=first) == [200, 200, 429]
+        assert statuses(limited, "/api/hello", 2, headers=second) == [200, 200]
+        # Only the address added by the trusted proxy counts
+        spoofed = {"X-Forwarded-For": "198.51.100.7, 203.0.113.1"}
+        assert limited.get("/api/hello", headers=spoofed).status_code == 429
+
+    def test_api_key_keys_clients(self, limited):
+        """Test that an API key gets its own bucket regardless of address."""
+        assert statuses(limited, "/api/hello", 3) == [200, 200, 429]
+        assert statuses(limited, "/api/hello", 2, headers={"X-API-Key": "k1"}) == [200, 200]
+
+    def test_route_overrides(self, limited):
+        """Test that per-route rules replace or lift the default limit."""
+        codes = [limited.post("/api/echo", json={}).status_code for _ in range(6)]
+        assert codes == [200] * 5 + [429]
+        assert set(statuses(limited, "/api/info", 5)) == {200}
+
+    def test_batch_counted_once(self, limited):
+        """Test that a batch's sub-requests do not use up the client's tokens."""
+        batch = {"requests": [{"method": "GET", "path": "/api/hello"}] * 3}
+        response = limited.post("/api/batch", json=batch)
+        assert response.status_code == 200
+        assert [item["status"] for item in response.get_json()["responses"]] == [200] * 3
+
+    def test_metrics_exported(self, limited):
+        """Test that allowed and throttled requests are counted per route."""
+        statuses(limited, "/api/hello", 3)
+        body = limited.get("/metrics").get_data(as_text=True)
+        assert 'http_rate_limit_requests_total{outcome="allowed",route="/api/hello"} 2.0' in body
+        assert 'http_rate_limit_requests_total{outcome="throttled",route="/api/hello"} 1.0' in body
+
+    def test_disabled_by_default(self, client):
+        """Test that no limiter is installed unless enabled."""
+        assert "rate_limiter" not in client.application.extensions
@@ -0,0 +1,207 @@
+"""Unit tests for the route response cache."""
+
+import os
+import threading
+
+import pytest
+from flask import Flask
+
+from src.app import create_app
+from src.config import DevelopmentConfig
+from src.utils.route_cache import (
+    CachedResponse,
+    MemoryCacheBackend,
+    RouteCache,
+    SQLiteCacheBackend,
+    decode_entry,
+    encode_entry,
+)
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        """Start at an arbitrary time."""
+        self.now = 1000.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    """Return each backend with a fake clock and a 100-byte budget."""
+    clock = FakeClock()
+    if request.param == "memory":
+        backend = MemoryCacheBackend(max_bytes=100, clock=clock)
+    else:
+        backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), max_bytes=100, clock=clock)
+    backend.clock = clock
+    return backend
+
+
+class TestBackends:
+    """Test suite for expiry and eviction in both backends."""
+
+    def test_entries_expire(self, backend):
+        """Test that entries are served until their TTL passes."""
+        backend.set("k", b"value", ttl=10)
+        backend.clock.now += 9
+        assert backend.get("k") == b"value"
+        backend.clock.now += 1
+        assert backend.get("k") is None
+
+    def test_least_recently_used_evicted(self, backend):
+        """Test that the budget evicts the entry used longest ago."""
+        backend.set("a", b"x" * 39, ttl=60)
+        backend.clock.now += 1
+        backend.set("b", b"x" * 39, ttl=60)
+        backend.clock.now += 1
+        assert backend.get("a") is not None
+        backend.clock.now += 1
+        backend.set("c", b"x" * 39, ttl=60)
+
+        assert backend.get("b") is None
+        assert backend.get("a") is not None
+        assert backend.get("c") is not None
+        assert backend.evictions == 1
+        assert backend.stats() == {"entries": 2, "size_bytes": 80}
+
+    def test_oversized_value_not_stored(self, backend):
+        """Test that a value larger than the budget is skipped."""
+        backend.set("big", b"x" * 200, ttl=60)
+        assert backend.get("big") is None
+        assert backend.stats()["entries"] == 0
+
+    def test_entry_round_trip(self):
+        """Test that cached responses survive encoding."""
+        entry = CachedResponse(200, [("Content-Type", "application/json")], b'{"a":1}\n')
+        assert decode_entry(encode_entry(entry)) == entry
+
+
+class TestSQLiteSharing:
+    """Test suite for the backend shared between processes."""
+
+    def test_shared_through_file(self, tmp_path):
+        """Test that backends opening the same file share entries."""
+        path = str(tmp_path / "cache.sqlite3")
+        SQLiteCacheBackend(path).set("k", b"value", ttl=60)
+        assert SQLiteCacheBackend(path).get("k") == b"value"
+
+    def test_forked_worker_reconnects(self, tmp_path):
+        """Test that a forked worker opens its own connection and sees the parent's entries."""
+        backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"))
+        backend.set("parent", b"1", ttl=60)
+        pid = os.fork()
+        if pid == 0:
+            found = backend.get("parent") == b"1"
+            backend.set("child", b"2", ttl=60)
+            os._exit(0 if found else 1)
+        assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+        assert backend.get("child") == b"2"
+
+
+class TestSingleFlight:
+    """Test suite for coalescing concurrent misses."""
+
+    def run_concurrent_misses(self, status):
+        """Fill one key from 8 threads while the first computation is blocked."""
+        app = Flask(__name__)
+        cache = RouteCache(MemoryCacheBackend())
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return app.response_class(b"body", status=status)
+
+        def miss():
+            with app.app_context():
+                results.append(cache.fill("k", compute))
+
+        threads = [threading.Thread(target=miss) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        while not calls:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+        return cache, calls, results
+
+    def test_concurrent_misses_computed_once(self):
+        """Test that waiting requests reuse the first request's response."""
+        cache, calls, results = self.run_concurrent_misses(200)
+        assert len(calls) <= 8
+        computed = [response for response, _ in results if response is not None]
+        shared = [entry for _, entry in results if entry is not None]
+        assert len(computed) == len(calls) == cache.misses
+        assert len(shared) == cache.coalesced == 8 - len(calls)
+        assert all(entry.body == b"body" for entry in shared)
+
+    def test_uncacheable_response_not_shared(self):
+        """Test that waiters compute their own response when the first one is an error."""
+        cache, calls, results = self.run_concurrent_misses(500)
+        assert len(calls) == 8
+        assert cache.coalesced == 0
+        assert cache.backend.stats()["entries"] == 0
+
+
+@pytest.fixture
+def cached_client(make_app):
+    """Return a test client with the route cache enabled."""
+    return make_app(ROUTE_CACHE_ENABLED=True).test_client()
+
+
+class TestCacheResponse:
+    """Test suite for the view decorator."""
+
+    def test_hello_cached_per_name(self, cached_client):
+        """Test that /api/hello is served from the cache per name argument."""
+        first = cached_client.get("/api/hello?name=A")
+        second = cached_client.get("/api/hello?name=A")
+        other = cached_client.get("/api/hello?name=B")
+
+        assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+        hit, miss = second.get_json(), first.get_json()
+        assert hit.pop("timestamp") >= miss.pop("timestamp")
+        assert hit == miss
+        assert other.headers["X-Cache"] == "MISS"
+        assert other.get_json()["message"] == "Hello, B!"
+        # after_request hooks still run for hits
+        assert second.headers["Access-Control-Allow-Origin"] == "*"
+
+    def test_stats_exported(self, cached_client):
+        """Test that hits, misses and size appear in /metrics."""
+        cached_client.get("/api/hello")
+        cached_client.get("/api/hello")
+        body = cached_client.get("/metrics").get_data(as_text=True)
+        assert "route_cache_hits_total 1.0" in body
+        assert "route_cache_misses_total 1.0" in body
+        assert "route_cache_entries 1.0" in body
+
+    def test_sqlite_backend(self, monkeypatch, tmp_path):
+        """Test that the shared backend serves hits to another app on the same file."""
+        monkeypatch.setattr(DevelopmentConfig, "ROUTE_CACHE_ENABLED", True)
+        monkeypatch.setattr(DevelopmentConfig, "ROUTE_CACHE_BACKEND", "sqlite")
+        monkeypatch.setattr(DevelopmentConfig, "ROUTE_CACHE_PATH", str(tmp_path / "c.sqlite3"))
+        monkeypatch.setattr(DevelopmentConfig, "ENABLE_METRICS", False)
+        first = create_app("dev").test_client().get("/api/hello")
+        second = create_app("dev").test_client().get("/api/hello")
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.get_json()["message"] == first.get_json()["message"]
+
+    def test_unknown_backend_rejected(self, monkeypatch):
+        """Test that a misspelled backend fails at startup."""
+        monkeypatch.setattr(DevelopmentConfig, "ROUTE_CACHE_ENABLED", True)
+        monkeypatch.setattr(DevelopmentConfig, "ROUTE_CACHE_BACKEND", "redis")
+        with pytest.raises(ValueError):
+            create_app("dev")
+
+    def test_disabled_by_default(self, client):
+        """Test that nothing is cached unless enabled."""
+        assert "X-Cache" not in client.get("/api/hello").headers
@@ -0,0 +1,306 @@
+"""Unit tests for runtime-tunable settings."""
+
+import json
+import logging
+import os
+import signal
+import time
+
+import pytest
+
+from src.config import DevelopmentConfig
+from src.utils.runtime_config import (
+    TUNABLE_SETTINGS,
+    RuntimeConfig,
+    validate_settings,
+    watch_runtime_config,
+)
+
+AUTH = {"Authorization": "Bearer s3cret"}
+
+
+def defaults():
+    """Return valid defaults for every tunable setting."""
+    return {name: getattr(DevelopmentConfig, name) for name in TUNABLE_SETTINGS}
+
+
+def write(path, overrides):
+    """Write an overrides file."""
+    path.write_text(json.dumps(overrides))
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll ``condition`` until it holds or ``timeout`` passes."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def settings_app(make_app, tmp_path):
+    """Return the dev app with an overrides file and the config endpoints."""
+    return make_app(
+        RUNTIME_CONFIG_PATH=str(tmp_path / "runtime.json"),
+        ENABLE_DEBUG_ENDPOINTS=True,
+        DEBUG_TOKEN="s3cret",
+        TRACE_SAMPLE_RATE=0.01,
+    )
+
+
+class TestValidation:
+    """Test suite for parsing and validating settings."""
+
+    def test_values_normalized(self):
+        """Test that strings from JSON or env style values are parsed."""
+        parsed = validate_settings(
+            {"LOG_LEVEL": "debug", "SERVER_TIMING_ENABLED": "true", "BATCH_MAX_REQUESTS": "5"}
+        )
+        assert parsed == {
+            "LOG_LEVEL": "DEBUG",
+            "SERVER_TIMING_ENABLED": True,
+            "BATCH_MAX_REQUESTS": 5,
+        }
+
+    @pytest.mark.parametrize(
+        "name, value",
+        [
+            ("LOG_LEVEL", "LOUD"),
+            ("TRACE_SAMPLE_RATE", 1.5),
+            ("TRACE_SAMPLE_RATE", "nan"),
+            ("BATCH_MAX_REQUESTS", 2.5),
+            ("BATCH_MAX_REQUESTS", 0),
+            ("BATCH_MAX_REQUESTS", float("inf")),
+            ("BATCH_MAX_REQUESTS", 10**400),
+            ("ROUTE_CACHE_TTL", "inf"),
+            ("ECHO_RAW_PASSTHROUGH", 1),
+            ("ACCESS_LOG_SAMPLE_RULES", "/api/hello:2xx=2"),
+            ("ENABLE_METRICS", False),
+        ],
+    )
+    def test_invalid_values_rejected(self, name, value):
+        """Test that out-of-range, mistyped and unknown settings raise ValueError."""
+        with pytest.raises(ValueError, match=name):
+            validate_settings({name: value})
+
+    def test_errors_listed_together(self):
+        """Test that every invalid setting is named in one error."""
+        with pytest.raises(ValueError) as error:
+            validate_settings({"LOG_LEVEL": "LOUD", "BATCH_MAX_REQUESTS": -1})
+        assert "LOG_LEVEL" in str(error.value) and "BATCH_MAX_REQUESTS" in str(error.value)
+
+
+class TestRuntimeConfig:
+    """Test suite for reloading the snapshot."""
+
+    def test_snapshot_immutable(self):
+        """Test that settings cannot be changed in place."""
+        runtime = RuntimeConfig(defaults())
+        with pytest.raises(AttributeError):
+            runtime.current.log_level = "ERROR"
+
+    def test_reload_swaps_snapshot(self, tmp_path):
+        """Test that a reload replaces the snapshot and notifies listeners."""
+        path = tmp_path / "runtime.json"
+        runtime = RuntimeConfig(defaults(), path=str(path))
+        seen = []
+        runtime.subscribe(seen.append)
+        before = runtime.current
+
+        write(path, {"TRACE_SAMPLE_RATE": 0.5})
+        assert runtime.reload()
+
+        assert before.trace_sample_rate == DevelopmentConfig.TRACE_SAMPLE_RATE
+        assert runtime.current.trace_sample_rate == 0.5
+        assert runtime.current.version != before.version
+        assert seen == [runtime.current]
+        assert not runtime.reload()
+
+    def test_version_depends_only_on_values(self, tmp_path):
+        """Test that workers with the same settings report the same version."""
+        path = tmp_path / "runtime.json"
+        write(path, {"LOG_LEVEL": "ERROR"})
+        first, second = RuntimeConfig(defaults(), str(path)), RuntimeConfig(defaults(), str(path))
+        first.reload()
+        second.reload()
+        assert first.current.version == second.current.version
+        assert first.current.version != RuntimeConfig(defaults()).current.version
+
+    def test_invalid_file_keeps_snapshot(self, tmp_path):
+        """Test that a file with one bad value is rejected as a whole."""
+        path = tmp_path / "runtime.json"
+        runtime = RuntimeConfig(defaults(), path=str(path))
+        write(path, {"TRACE_SAMPLE_RATE": 0.5, "BATCH_MAX_REQUESTS": "many"})
+        with pytest.raises(ValueError):
+            runtime.reload()
+        assert runtime.current.trace_sample_rate == DevelopmentConfig.TRACE_SAMPLE_RATE
+
+        path.write_text("[1, 2]")
+        with pytest.raises(ValueError):
+            runtime.reload()
+
+    def test_check_only_reloads_changed_file(self, tmp_path):
+        """Test that check re-reads the file only after it changes."""
+        path = tmp_path / "runtime.json"
+        runtime = RuntimeConfig(defaults(), path=str(path))
+        assert not runtime.check()
+        write(path, {"BATCH_MAX_REQUESTS": 3})
+        assert runtime.check()
+        assert not runtime.check()
+        os.remove(path)
+        assert runtime.check()
+        assert runtime.current.batch_max_requests == DevelopmentConfig.BATCH_MAX_REQUESTS
+
+    def test_update_shared_through_file(self, tmp_path):
+        """Test that an update in one worker reaches another through the file."""
+        path = str(tmp_path / "runtime.json")
+        first, second = RuntimeConfig(defaults(), path), RuntimeConfig(defaults(), path)
+        first.update({"TRACE_SAMPLE_RATE": 0.25})
+        second.update({"LOG_LEVEL": "WARNING"})
+
+        assert second.current.trace_sample_rate == 0.25
+        assert first.check()
+        assert first.current == second.current
+        first.update({"TRACE_SAMPLE_RATE": None})
+        assert json.loads((tmp_path / "runtime.json").read_text()) == {"LOG_LEVEL": "WARNING"}
+
+    def test_invalid_update_not_written(self, tmp_path):
+        """Test that a rejected update leaves the file alone."""
+        path = tmp_path / "runtime.json"
+        runtime = RuntimeConfig(defaults(), path=str(path))
+        with pytest.raises(ValueError):
+            runtime.update({"LOG_LEVEL": "LOUD"})
+        with pytest.raises(ValueError):
+            runtime.update({"ENABLE_METRICS": None})
+        assert not path.exists()
+
+    def test_sighup_reloads(self, settings_app, tmp_path):
+        """Test that SIGHUP makes the watcher reload the file."""
+        runtime = settings_app.extensions["runtime_config"]
+        previous = signal.getsignal(signal.SIGHUP)
+        settings_app.config["RUNTIME_CONFIG_POLL_INTERVAL"] = 0
+        try:
+            watch_runtime_config(settings_app)
+            write(tmp_path / "runtime.json", {"TRACE_SAMPLE_RATE": 0.75})
+            os.kill(os.getpid(), signal.SIGHUP)
+            assert wait_for(lambda: runtime.current.trace_sample_rate == 0.75)
+        finally:
+            runtime.stop()
+            signal.signal(signal.SIGHUP, previous)
+
+    def test_watcher_polls_file(self, settings_app, tmp_path):
+        """Test that the watcher picks up file changes without a signal."""
+        runtime = settings_app.extensions["runtime_config"]
+        runtime.watch(0.01)
+        try:
+            write(tmp_path / "runtime.json", {"BATCH_MAX_REQUESTS": 2})
+            assert wait_for(lambda: runtime.current.batch_max_requests == 2)
+        finally:
+            runtime.stop()
+
+
+class TestAppSettings:
+    """Test suite for components following the runtime settings."""
+
+    def test_file_applied_at_startup(self, make_app, tmp_path):
+        """Test that overrides present at startup reach app.config and middleware."""
+        path = tmp_path / "runtime.json"
+        write(path, {"TRACE_SAMPLE_RATE": 1.0, "LOG_LEVEL": "WARNING"})
+        app = make_app(RUNTIME_CONFIG_PATH=str(path))
+        assert app.config["TRACE_SAMPLE_RATE"] == 1.0
+        assert app.extensions["tracer"].sample_rate == 1.0
+        assert logging.getLogger().level == logging.WARNING
+
+    def test_invalid_file_fails_startup(self, make_app, tmp_path):
+        """Test that a bad overrides file is reported at startup."""
+        path = tmp_path / "runtime.json"
+        write(path, {"LOG_LEVEL": "LOUD"})
+        with pytest.raises(ValueError):
+            make_app(RUNTIME_CONFIG_PATH=str(path))
+
+    def test_infinite_value_in_file_rejected(self, make_app, tmp_path):
+        """Test that Infinity in the file fails startup and leaves a reload's snapshot alone."""
+        path = tmp_path / "runtime.json"
+        path.write_text('{"BATCH_MAX_REQUESTS": Infinity}')
+        with pytest.raises(ValueError):
+            make_app(RUNTIME_CONFIG_PATH=str(path))
+
+        write(path, {})
+        runtime = make_app(RUNTIME_CONFIG_PATH=str(path)).extensions["runtime_config"]
+        version = runtime.current.version
+        path.write_text('{"BATCH_MAX_REQUESTS": Infinity}')
+        with pytest.raises(ValueError):
+            runtime.reload()
+        assert runtime.current.version == version
+
+    def test_reload_applied_to_components(self, settings_app, tmp_path):
+        """Test that a reload updates logging, tracing and request limits."""
+        write(
+            tmp_path / "runtime.json",
+            {"LOG_LEVEL": "ERROR", "TRACE_SAMPLE_RATE": 0.5, "BATCH_MAX_REQUESTS": 1},
+        )
+        settings_app.extensions["runtime_config"].reload()
+
+        assert logging.getLogger().level == logging.ERROR
+        assert settings_app.logger.level == logging.ERROR
+        assert settings_app.extensions["tracer"].sample_rate == 0.5
+        assert settings_app.config["BATCH_MAX_REQUESTS"] == 1
+        batch = {"requests": [{"path": "/health/live"}, {"path": "/health/live"}]}
+        response = settings_app.test_client().post("/api/batch", json=batch)
+        assert response.status_code == 400
+
+    def test_info_reports_version(self, settings_app, tmp_path):
+        """Test that /api/info shows the active version and follows reloads."""
+        client = settings_app.test_client()
+        runtime = settings_app.extensions["runtime_config"]
+        before = client.get("/api/info").get_json()["config_version"]
+        assert before == runtime.current.version
+
+        write(tmp_path / "runtime.json", {"TRACE_SAMPLE_RATE": 0.5})
+        runtime.reload()
+        assert client.get("/api/info").get_json()["config_version"] == runtime.current.version
+        assert runtime.current.version != before
+
+
+class TestConfigEndpoint:
+    """Test suite for /debug/config."""
+
+    def test_update_and_read(self, settings_app, tmp_path):
+        """Test that PUT applies overrides, saves them and GET reports them."""
+        client = settings_app.test_client()
+        response = client.put("/debug/config", json={"TRACE_SAMPLE_RATE": 0.2}, headers=AUTH)
+        assert response.status_code == 200
+        assert response.get_json()["settings"]["TRACE_SAMPLE_RATE"] == 0.2
+        assert json.loads((tmp_path / "runtime.json").read_text()) == {"TRACE_SAMPLE_RATE": 0.2}
+
+        status = client.get("/debug/config", headers=AUTH).get_json()
+        assert status["overrides"] == {"TRACE_SAMPLE_RATE": 0.2}
+        assert status["version"] == settings_app.extensions["runtime_config"].current.version
+
+    def test_invalid_update_rejected(self, settings_app):
+        """Test that invalid settings get 400 and change nothing."""
+        client = settings_app.test_client()
+        version = settings_app.extensions["runtime_config"].current.version
+        response = client.put("/debug/config", json={"TRACE_SAMPLE_RATE": 5}, headers=AUTH)
+        assert response.status_code == 400
+        assert client.put("/debug/config", json=[1], headers=AUTH).status_code == 400
+        assert settings_app.extensions["runtime_config"].current.version == version
+
+    def test_infinite_update_rejected(self, settings_app):
+        """Test that Infinity for an integer setting gets 400 rather than a server error."""
+        response = settings_app.test_client().put(
+            "/debug/config",
+            data='{"BATCH_MAX_REQUESTS": Infinity}',
+            content_type="application/json",
+            headers=AUTH,
+        )
+        assert response.status_code == 400
+        assert "BATCH_MAX_REQUESTS" in response.get_data(as_text=True)
+
+    def test_token_required(self, settings_app):
+        """Test that reads and updates need the debug token, even when none is configured."""
+        client = settings_app.test_client()
+        assert client.put("/debug/config", json={"LOG_LEVEL": "ERROR"}).status_code == 403
+        settings_app.config["DEBUG_TOKEN"] = ""
+        assert client.put("/debug/config", json={"LOG_LEVEL": "ERROR"}).status_code == 403
+        assert client.get("/debug/config").status_code == 403
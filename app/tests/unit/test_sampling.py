@@ -0,0 +1,89 @@
+"""Unit tests for access log sampling."""
+
+import json
+
+import pytest
+
+from src.app import create_app
+from src.config import DevelopmentConfig
+from src.utils.sampling import AccessLogSampler, TokenBucket, parse_sample_rules
+
+
+class TestSampleRules:
+    """Test suite for rule parsing and matching."""
+
+    def test_parse_rules(self):
+        """Test that rules are parsed into route/status-class keys."""
+        rules = parse_sample_rules("/api/hello:2xx=0.01, *:5xx=1")
+        assert rules == {("/api/hello", "2xx"): 0.01, ("*", "5xx"): 1.0}
+
+    @pytest.mark.parametrize("spec", ["/api/hello=0.5", "/api/hello:2xx=abc", "*:*=2"])
+    def test_invalid_rules_rejected(self, spec):
+        """Test that malformed rules fail fast."""
+        with pytest.raises(ValueError):
+            parse_sample_rules(spec)
+
+    def test_most_specific_rule_wins(self):
+        """Test rule precedence from route+class down to the default."""
+        sampler = AccessLogSampler(
+            "/api/hello:2xx=0.01,/api/hello:*=0.5,*:5xx=1,*:*=0.2", default_rate=0.9
+        )
+        assert sampler.rate_for("/api/hello", 200) == 0.01
+        assert sampler.rate_for("/api/hello", 404) == 0.5
+        assert sampler.rate_for("/api/info", 503) == 1.0
+        assert sampler.rate_for("/api/info", 200) == 0.2
+        assert AccessLogSampler(default_rate=0.9).rate_for("/", 200) == 0.9
+
+
+class TestAccessLogSampler:
+    """Test suite for sampling decisions."""
+
+    def test_sampled_lines_carry_rate(self):
+        """Test that kept lines report the rate they were sampled at."""
+        sampler = AccessLogSampler("*:2xx=0.25", rand=lambda: 0.1)
+        assert sampler.sample("/api/hello", 200, 1.0, "k") == {"sample_rate": 0.25}
+        dropping = AccessLogSampler("*:2xx=0.25", rand=lambda: 0.5)
+        assert dropping.sample("/api/hello", 200, 1.0, "k") is None
+
+    def test_slow_requests_always_kept(self):
+        """Test that slow requests bypass sampling."""
+        sampler = AccessLogSampler("*:*=0", slow_ms=100)
+        assert sampler.sample("/api/hello", 200, 50.0, "k") is None
+        assert sampler.sample("/api/hello", 200, 150.0, "k") == {"sample_rate": 1.0}
+
+    def test_identical_lines_suppressed(self):
+        """Test the per-line token bucket and the suppressed count."""
+        now = [0.0]
+        sampler = AccessLogSampler(dedupe_rate=1.0, dedupe_burst=2, clock=lambda: now[0])
+        kept = [sampler.sample("/api/hello", 200, 1.0, "k") for _ in range(5)]
+        assert kept == [{"sample_rate": 1.0}] * 2 + [None] * 3
+        assert sampler.sample("/api/info", 200, 1.0, "other") is not None
+
+        now[0] = 1.0
+        assert sampler.sample("/api/hello", 200, 1.0, "k") == {"sample_rate": 1.0, "suppressed": 3}
+
+    def test_token_bucket_refills(self):
+        """Test that tokens refill at the configured rate up to the burst."""
+        now = [0.0]
+        bucket = TokenBucket(rate=2.0, burst=1, clock=lambda: now[0])
+        assert bucket.allow() and not bucket.allow()
+        now[0] = 0.5
+        assert bucket.allow()
+
+
+class TestAccessLogMiddleware:
+    """Test suite for the sampled access log."""
+
+    def test_access_log_sampling(self, monkeypatch, capsys):
+        """Test that per-route rules drop lines and kept lines are annotated."""
+        monkeypatch.setattr(DevelopmentConfig, "ACCESS_LOG_SAMPLE_RULES", "/api/hello:2xx=0")
+        client = create_app("dev").test_client()
+        capsys.readouterr()
+
+        client.get("/api/hello")
+        client.get("/api/info")
+
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [line["path"] for line in lines] == ["/api/info"]
+        assert lines[0]["sample_rate"] == 1.0
+        assert lines[0]["duration_ms"] >= 0
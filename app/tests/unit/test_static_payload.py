@@ -0,0 +1,63 @@
+"""Unit tests for precomputed static payloads and conditional GET."""
+
+import json
+
+import pytest
+
+from src.app import create_app
+from src.config import DevelopmentConfig
+from src.utils.static_payload import StaticPayload
+
+
+class TestStaticPayload:
+    """Test suite for StaticPayload."""
+
+    def test_matches_jsonify_output(self, app):
+        """Test that the precomputed body is what jsonify would produce."""
+        data = {"b": 1, "a": {"nested": [1, 2]}}
+        payload = StaticPayload.from_data(app, data)
+        assert payload.render() == app.json.response(data).get_data()
+
+    def test_timestamp_patched_per_render(self, app):
+        """Test that only the timestamp changes between renders."""
+        payload = StaticPayload.from_data(app, {"status": "healthy"}, timestamp=True)
+        data = json.loads(payload.render())
+        assert data["status"] == "healthy"
+        assert data["timestamp"].endswith("Z")
+
+
+class TestConditionalGet:
+    """Test suite for ETag handling on identity endpoints."""
+
+    @pytest.mark.parametrize("path", ["/", "/health", "/api/info"])
+    def test_etag_and_not_modified(self, client, path):
+        """Test that a matching If-None-Match yields an empty 304."""
+        first = client.get(path)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+
+        second = client.get(path, headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.get_data() == b""
+
+    def test_etag_weak_with_timestamp(self, client):
+        """Test that bodies with a live timestamp get weak ETags."""
+        assert client.get("/health").headers["ETag"].startswith("W/")
+        assert not client.get("/").headers["ETag"].startswith("W/")
+
+    def test_timestamps_can_be_dropped(self, monkeypatch):
+        """Test that disabling timestamps makes bodies static with strong ETags."""
+        monkeypatch.setattr(DevelopmentConfig, "STATIC_PAYLOAD_TIMESTAMPS", False)
+        client = create_app("dev").test_client()
+        first, second = client.get("/api/info"), client.get("/api/info")
+        assert "timestamp" not in first.get_json()
+        assert first.get_data() == second.get_data()
+        assert not first.headers["ETag"].startswith("W/")
+
+    def test_payload_built_once_per_app(self, app, client, monkeypatch):
+        """Test that hostname and config are only read on the first request."""
+        calls = []
+        monkeypatch.setattr("socket.gethostname", lambda: calls.append(1) or "host")
+        for _ in range(3):
+            client.get("/api/info")
+        assert len(calls) == 1
@@ -0,0 +1,84 @@
+"""Unit tests for per-phase timing and the Server-Timing header."""
+
+import pytest
+
+from src.middleware.timing import TOKEN_HEADER, format_server_timing
+
+
+def phases(header):
+    """Return the metric names in a Server-Timing header value."""
+    return [entry.split(";")[0] for entry in header.split(", ")]
+
+
+class TestServerTimingHeader:
+    """Test suite for the Server-Timing header."""
+
+    def test_disabled_by_default(self, client, app):
+        """Test that hooks and views are left unwrapped when disabled."""
+        response = client.get("/api/hello")
+        assert "Server-Timing" not in response.headers
+        assert not hasattr(app.view_functions["api.hello"], "timed_phase")
+
+    def test_header_lists_phases(self, make_app):
+        """Test that every hook and the view appear in the header."""
+        app = make_app(PHASE_TIMING_ENABLED=True, SERVER_TIMING_ENABLED=True)
+        assert app.view_functions["api.hello"].timed_phase == "view"
+        response = app.test_client().get("/api/hello")
+
+        names = phases(response.headers["Server-Timing"])
+        for name in ("add_request_id", "view", "log_request", "record_latency", "total"):
+            assert name in names
+        assert "prometheus_flask_exporter.before" in names
+        assert "start_phase_timing" not in names
+
+    def test_durations_in_milliseconds(self, make_app):
+        """Test that the total covers the phases."""
+        app = make_app(PHASE_TIMING_ENABLED=True, SERVER_TIMING_ENABLED=True)
+        header = app.test_client().get("/api/hello").headers["Server-Timing"]
+
+        durations = {e.split(";dur=")[0]: float(e.split(";dur=")[1]) for e in header.split(", ")}
+        total = durations.pop("total")
+        assert 0 < sum(durations.values()) <= total
+
+    @pytest.mark.parametrize("sent, expected", [(None, False), ("wrong", False), ("s3cret", True)])
+    def test_token_enables_header(self, make_app, sent, expected):
+        """Test that only requests with the configured token get the header."""
+        app = make_app(PHASE_TIMING_ENABLED=True, SERVER_TIMING_TOKEN="s3cret")
+        headers = {TOKEN_HEADER: sent} if sent else {}
+        response = app.test_client().get("/api/hello", headers=headers)
+        assert ("Server-Timing" in response.headers) is expected
+
+    def test_repeated_phases_summed(self):
+        """Test that a phase timed twice is reported once."""
+        header = format_server_timing([("view", 1_000_000), ("view", 500_000)], 2_000_000)
+        assert header == "view;dur=1.500, total;dur=2.000"
+
+
+class TestPhaseMetrics:
+    """Test suite for exported per-phase totals."""
+
+    def test_totals_exported(self, make_app):
+        """Test that phase time and call counters appear on /metrics."""
+        app = make_app(PHASE_TIMING_ENABLED=True)
+        client = app.test_client()
+        client.get("/api/hello")
+        client.get("/api/hello")
+
+        body = client.get("/metrics").get_data(as_text=True)
+        assert 'http_request_phase_calls_total{phase="view"} 2.0' in body
+        assert 'http_request_phase_seconds_total{phase="add_request_id"}' in body
+        assert 'http_request_phase_calls_total{phase="prometheus_flask_exporter.teardown"}' in body
+
+    def test_batch_sub_requests_timed_separately(self, make_app):
+        """Test that sequential sub-requests keep their own phase lists."""
+        app = make_app(PHASE_TIMING_ENABLED=True, SERVER_TIMING_ENABLED=True)
+        client = app.test_client()
+        response = client.post(
+            "/api/batch",
+            json={"requests": [{"method": "GET", "path": "/api/hello"}] * 2, "parallel": False},
+        )
+        assert response.status_code == 200
+        assert phases(response.headers["Server-Timing"]).count("view") == 1
+
+        body = client.get("/metrics").get_data(as_text=True)
+        assert 'http_request_phase_calls_total{phase="view"} 3.0' in body
@@ -0,0 +1,249 @@
+"""Unit tests for trace context propagation and tail-sampled span export."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from src.app import create_app
+from src.utils.tracing import (
+    OTLPHTTPSpanSink,
+    RequestTrace,
+    Span,
+    Tracer,
+    format_traceparent,
+    parse_traceparent,
+    span,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+TRACEPARENT = f"00-{TRACE_ID}-{PARENT_ID}-01"
+
+
+@pytest.fixture
+def file_export(tmp_path):
+    """Return settings exporting spans to a file in ``tmp_path``, sampling none."""
+    return {
+        "TRACE_EXPORTER": "file",
+        "TRACE_EXPORT_PATH": str(tmp_path / "spans.jsonl"),
+        "TRACE_SAMPLE_RATE": 0.0,
+    }
+
+
+def exported_spans(app, tmp_path):
+    """Flush the tracer and return the exported spans by name."""
+    app.extensions["tracer"].flush()
+    path = tmp_path / "spans.jsonl"
+    if not path.exists():
+        return {}
+    spans = {}
+    for line in path.read_text().splitlines():
+        for resource_spans in json.loads(line)["resourceSpans"]:
+            for scope_spans in resource_spans["scopeSpans"]:
+                for item in scope_spans["spans"]:
+                    spans[item["name"]] = item
+    return spans
+
+
+def attributes(item):
+    """Return an OTLP span's attributes as a plain dict."""
+    return {a["key"]: next(iter(a["value"].values())) for a in item["attributes"]}
+
+
+class TestTraceparent:
+    """Test suite for traceparent parsing."""
+
+    def test_round_trip(self):
+        """Test that a formatted header parses back to its fields."""
+        assert parse_traceparent(TRACEPARENT) == (TRACE_ID, PARENT_ID, 1)
+        assert format_traceparent(TRACE_ID, PARENT_ID, True) == TRACEPARENT
+
+    @pytest.mark.parametrize(
+        "value",
+        [
+            None,
+            "",
+            "garbage",
+            f"ff-{TRACE_ID}-{PARENT_ID}-01",
+            f"00-{'0' * 32}-{PARENT_ID}-01",
+            f"00-{TRACE_ID}-{'0' * 16}-01",
+            f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+            f"00-{TRACE_ID}-{PARENT_ID}-01-extra",
+        ],
+    )
+    def test_invalid_rejected(self, value):
+        """Test that malformed headers start a new trace."""
+        assert parse_traceparent(value) is None
+
+    def test_future_version_accepted(self):
+        """Test that later versions are read by their version 00 prefix."""
+        assert parse_traceparent(f"01-{TRACE_ID}-{PARENT_ID}-00-more") == (TRACE_ID, PARENT_ID, 0)
+
+
+class TestTailSampling:
+    """Test suite for keeping or discarding finished traces."""
+
+    def finished(self, tracer, sampled=False, duration_ms=1.0):
+        """Return a finished trace with the given outcome."""
+        trace = RequestTrace("GET /", TRACE_ID, None, None, sampled)
+        trace.root.end_ns = trace.root.start_ns + int(duration_ms * 1e6)
+        return trace
+
+    def test_reasons(self):
+        """Test that errors and slow requests are always kept."""
+        tracer = Tracer(sample_rate=0.0, slow_ms=100)
+        assert tracer.keep_reason(self.finished(tracer), 503) == "error"
+        assert tracer.keep_reason(self.finished(tracer, duration_ms=150), 200) == "slow"
+        assert tracer.keep_reason(self.finished(tracer, sampled=True), 200) == "sampled"
+        assert tracer.keep_reason(self.finished(tracer), 200) is None
+
+    def test_sampling_decided_at_start(self):
+        """Test that new traces are sampled at the configured rate."""
+        tracer = Tracer(sample_rate=0.5, rand=iter([0.1, 0.9]).__next__)
+        first = tracer.start_request("GET /")
+        tracer.finish_request(first, 200)
+        second = tracer.start_request("GET /")
+        tracer.finish_request(second, 200)
+        assert (first.sampled, second.sampled) == (True, False)
+
+    def test_caller_flag_honored(self):
+        """Test that a continued trace keeps the caller's sampled flag and tracestate."""
+        tracer = Tracer(sample_rate=1.0)
+        trace = tracer.start_request("GET /", f"00-{TRACE_ID}-{PARENT_ID}-00", "k=v")
+        tracer.finish_request(trace, 200)
+        assert not trace.sampled
+        assert trace.root.parent_id == PARENT_ID
+        assert trace.headers() == {
+            "traceparent": f"00-{TRACE_ID}-{trace.root.span_id}-00",
+            "tracestate": "k=v",
+        }
+
+    def test_span_buffer_bounded(self):
+        """Test that spans beyond the limit are counted instead of kept."""
+        trace = RequestTrace("GET /", TRACE_ID, None, None, True, max_spans=2)
+        for _ in range(4):
+            child = trace.start_span("child")
+            if child is not None:
+                trace.end_span(child)
+        assert len(trace.spans) == 3
+        assert trace.dropped == 2
+
+
+class TestRequestTracing:
+    """Test suite for the request hooks."""
+
+    def test_trace_ids_in_logs(self, capsys):
+        """Test that log lines carry the continued trace ID."""
+        app = create_app("dev")
+        capsys.readouterr()
+        app.test_client().get("/api/hello", headers={"traceparent": TRACEPARENT})
+
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        (access,) = [line for line in lines if line["message"] == "GET /api/hello 200"]
+        assert access["trace_id"] == TRACE_ID
+        assert len(access["span_id"]) == 16
+        assert access["span_id"] != PARENT_ID
+
+    def test_fast_requests_discarded(self, make_app, file_export, tmp_path):
+        """Test that unsampled successful requests are not exported."""
+        app = make_app(**file_export)
+        assert app.test_client().get("/api/hello").status_code == 200
+        assert exported_spans(app, tmp_path) == {}
+        assert app.extensions["tracer"].stats()["started"] == 1
+
+    def test_errors_exported_with_child_spans(self, make_app, file_export, tmp_path):
+        """Test that a failing request is exported with its child spans."""
+        app = make_app(**file_export)
+
+        @app.route("/boom")
+        def boom():
+            """Fail inside a child span."""
+            with span("doomed", step=1):
+                raise RuntimeError("boom")
+
+        response = app.test_client().get("/boom", headers={"traceparent": TRACEPARENT})
+        assert response.status_code == 500
+
+        spans = exported_spans(app, tmp_path)
+        root, child = spans["GET /boom"], spans["doomed"]
+        assert root["traceId"] == child["traceId"] == TRACE_ID
+        assert root["parentSpanId"] == PARENT_ID
+        assert child["parentSpanId"] == root["spanId"]
+        assert child["status"]["message"] == "RuntimeError"
+        assert attributes(root)["sampling.reason"] == "error"
+        assert attributes(root)["http.response.status_code"] == "500"
+        assert attributes(child)["step"] == "1"
+
+    def test_slow_requests_exported(self, make_app, file_export, tmp_path):
+        """Test that requests over the slow threshold are exported."""
+        app = make_app(**file_export, TRACE_SLOW_MS=0.000001)
+        app.test_client().get("/api/hello", headers={"X-Request-ID": "req-1"})
+        assert attributes(exported_spans(app, tmp_path)["GET /api/hello"]) == {
+            "http.route": "/api/hello",
+            "http.request.method": "GET",
+            "url.path": "/api/hello",
+            "http.response.status_code": "200",
+            "request_id": "req-1",
+            "sampling.reason": "slow",
+        }
+
+    def test_batch_sub_requests_join_trace(self, make_app, file_export, tmp_path):
+        """Test that batched sub-requests are children of the batch's span."""
+        app = make_app(**dict(file_export, TRACE_SAMPLE_RATE=1.0))
+        app.test_client().post("/api/batch", json={"requests": [{"path": "/api/hello"}]})
+
+        spans = exported_spans(app, tmp_path)
+        batch, sub = spans["POST /api/batch"], spans["GET /api/hello"]
+        assert sub["traceId"] == batch["traceId"]
+        assert sub["parentSpanId"] == batch["spanId"]
+
+    def test_disabled(self, make_app):
+        """Test that no tracer is created when tracing is disabled."""
+        app = make_app(TRACING_ENABLED=False)
+        assert "tracer" not in app.extensions
+        assert app.test_client().get("/api/hello").status_code == 200
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    """Local OTLP/HTTP collector stand-in that stores request bodies."""
+
+    bodies = []
+
+    def do_POST(self):
+        """Store the posted document."""
+        length = int(self.headers["Content-Length"])
+        self.bodies.append((self.path, self.headers["Content-Type"], self.rfile.read(length)))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        """Keep the test output quiet."""
+
+
+class TestOTLPSink:
+    """Test suite for the OTLP/HTTP sink."""
+
+    def test_posts_otlp_json(self):
+        """Test that a batch is posted as one OTLP/JSON document."""
+        server = HTTPServer(("127.0.0.1", 0), CollectorHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            sink = OTLPHTTPSpanSink(
+                f"http://127.0.0.1:{server.server_port}/v1/traces",
+                resource={"service.name": "demo-app"},
+            )
+            root = Span("GET /", TRACE_ID)
+            root.end()
+            sink.export([root])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        ((path, content_type, body),) = CollectorHandler.bodies
+        document = json.loads(body)["resourceSpans"][0]
+        assert (path, content_type) == ("/v1/traces", "application/json")
+        assert document["resource"]["attributes"][0]["key"] == "service.name"
+        assert document["scopeSpans"][0]["spans"][0]["spanId"] == root.span_id
@@ -0,0 +1,137 @@
+"""Unit tests for warm-up and fast startup."""
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from src import package_version
+from src.app import create_app
+from src.config import Config, DevelopmentConfig
+from src.utils.warmup import warm_up
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestWarmup:
+    """Test suite for warm-up requests."""
+
+    def test_requests_cover_routes(self):
+        """Test that every plain route is warmed, except probes and metrics."""
+        app = create_app("dev")
+        requests = app.extensions["warmup"].requests(app)
+        targets = {(method, path) for method, path, _ in requests}
+
+        assert {("GET", "/"), ("GET", "/api/hello"), ("GET", "/health")} <= targets
+        assert ("POST", "/api/echo") in targets
+        assert ("GET", "/health/ready") not in targets
+        assert ("GET", "/metrics") not in targets
+
+    def test_runs_once_per_process(self):
+        """Test that warm-up reports each route and does not run twice."""
+        app = create_app("dev")
+        warmup = warm_up(app)
+
+        assert warmup.warmed
+        assert all(r["status"] == 200 for r in warmup.routes.values())
+        routes = warmup.routes
+        assert warm_up(app).routes is routes
+
+    def test_concurrent_callers_run_once(self, monkeypatch):
+        """Test that threads racing to warm up share a single run."""
+        app = create_app("dev")
+        warmup = app.extensions["warmup"]
+        runs = []
+        run = warmup.run
+
+        def slow_run(flask_app):
+            """Count the run and give the other threads time to arrive."""
+            runs.append(threading.get_ident())
+            time.sleep(0.05)
+            return run(flask_app)
+
+        monkeypatch.setattr(warmup, "run", slow_run)
+        threads = [threading.Thread(target=warm_up, args=(app,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(runs) == 1
+        assert warmup.warmed
+
+    def test_not_counted_as_traffic(self, caplog):
+        """Test that warm-up requests stay out of logs, metrics and latency sketches."""
+        app = create_app("dev")
+        with caplog.at_level(logging.INFO, logger="src.app"):
+            warm_up(app)
+
+        assert not [r for r in caplog.records if r.getMessage().startswith("GET /api/hello")]
+        assert app.extensions["latency_quantiles"].summaries() == {}
+        body = app.test_client().get("/metrics").get_data(as_text=True)
+        assert 'path="/api/hello"' not in body
+
+    def test_readiness_waits_for_warmup(self):
+        """Test that readiness probes answer 503 until the warm-up has run."""
+        app = create_app("dev")
+        client = app.test_client()
+
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.get_json()["checks"]["warmup"] == "pending"
+        assert not app.extensions["warmup"].warmed
+
+        warm_up(app)
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert "warmup" not in response.get_json()["checks"]
+
+    def test_disabled(self, monkeypatch):
+        """Test that a disabled warm-up counts as done without running."""
+        monkeypatch.setattr(DevelopmentConfig, "WARMUP_ENABLED", False)
+        app = create_app("dev")
+        app.test_client().get("/health/ready")
+        assert app.extensions["warmup"].warmed
+        assert app.extensions["warmup"].routes == {}
+
+
+class TestStartup:
+    """Test suite for import-time work."""
+
+    def test_version_resolved_on_demand(self, monkeypatch):
+        """Test that package metadata is only read when APP_VERSION is unset."""
+        assert Config.APP_VERSION == os.environ.get("APP_VERSION")
+        monkeypatch.setattr(DevelopmentConfig, "APP_VERSION", None)
+        app = create_app("dev")
+        assert app.config["APP_VERSION"] == package_version()
+
+    def test_optional_features_not_imported(self):
+        """Test that disabled features are not imported by create_app."""
+        script = (
+            "import sys\n"
+            "from src import package_version\n"
+            "from src.app import create_app\n"
+            "imported = package_version.cache_info().currsize\n"
+            "create_app('prod')\n"
+            "lazy = ['flask_cors', 'src.routes.debug', 'src.utils.profiler',"
+            " 'src.utils.cloudwatch', 'boto3']\n"
+            "print('RESULT', imported, [m for m in lazy if m in sys.modules])\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+            timeout=60,
+            env=dict(
+                os.environ,
+                ENVIRONMENT="prod",
+                LOG_LEVEL="WARNING",
+                APP_VERSION="1.2.3",
+                CORS_ORIGINS="",
+            ),
+        )
+        assert result.returncode == 0, result.stderr
+        lines = [line for line in result.stdout.splitlines() if line.startswith("RESULT ")]
+        assert lines == ["RESULT 0 []"]